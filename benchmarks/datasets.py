@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+SIZES = {
+    '1e3': (1_000, 10),
+    '1e4': (10_000, 100),
+    '1e5': (100_000, 1_000),
+    '1e6': (1_000_000, 10_000),
+    '1e7': (10_000_000, 100_000),
+}
+
+MICROGRAPH_SHAPE = (4092, 5760)
+BOX_SIZE = 256
+WRITE_CHUNK = 500_000
+
+OPTICS_HEADER = """
+# version 30001
+
+data_optics
+
+loop_
+_rlnOpticsGroupName #1
+_rlnOpticsGroup #2
+_rlnMicrographOriginalPixelSize #3
+_rlnVoltage #4
+_rlnSphericalAberration #5
+_rlnAmplitudeContrast #6
+_rlnImagePixelSize #7
+_rlnImageSize #8
+_rlnImageDimensionality #9
+opticsGroup1 1 0.830000 300.000000 2.700000 0.100000 1.660000 {box} 2
+opticsGroup2 2 0.830000 300.000000 2.700000 0.100000 1.660000 {box} 2
+
+
+# version 30001
+
+data_particles
+
+loop_
+"""
+
+
+def generate_particles(n_particles, n_micrographs, seed=0):
+    rng = np.random.default_rng(seed)
+
+    weights = rng.gamma(shape=4.0, scale=1.0, size=n_micrographs)
+    counts = rng.multinomial(n_particles, weights / weights.sum())
+    micrograph_index = np.repeat(np.arange(n_micrographs), counts)
+
+    height, width = MICROGRAPH_SHAPE
+    margin = BOX_SIZE // 2
+    x = rng.uniform(margin, width - margin, n_particles).round(1)
+    y = rng.uniform(margin, height - margin, n_particles).round(1)
+
+    session_trend = np.linspace(12000.0, 28000.0, n_micrographs)
+    micrograph_defocus = session_trend + rng.normal(0.0, 1500.0, n_micrographs)
+    defocus_u = (micrograph_defocus[micrograph_index]
+                 + rng.normal(0.0, 50.0, n_particles)).round(2)
+    defocus_v = (defocus_u - rng.uniform(50.0, 500.0, n_particles)).round(2)
+    angle = rng.uniform(-180.0, 180.0, n_particles).round(2)
+
+    names = np.array([f'MotionCorr/job002/Movies/FoilHole_{i:08d}_fractions.mrc'
+                      for i in range(n_micrographs)], dtype=object)
+
+    return pd.DataFrame({
+        'CoordinateX': x,
+        'CoordinateY': y,
+        'AnglePsi': angle,
+        'ClassNumber': rng.integers(1, 51, n_particles),
+        'AutopickFigureOfMerit': rng.normal(1.5, 0.5, n_particles).round(6),
+        'MicrographName': names[micrograph_index],
+        'OpticsGroup': 1 + (micrograph_index % 2),
+        'DefocusU': defocus_u,
+        'DefocusV': defocus_v,
+        'DefocusAngle': rng.uniform(0.0, 180.0, n_particles).round(2),
+    })
+
+
+def _write_chunks(df, f, sep, header):
+    for start in range(0, len(df), WRITE_CHUNK):
+        chunk = df.iloc[start:start + WRITE_CHUNK]
+        chunk.to_csv(f, sep=sep, header=header and start == 0, index=False,
+                     lineterminator='\n')
+
+
+def write_star(df, path):
+    with open(path, 'w') as f:
+        f.write(OPTICS_HEADER.format(box=BOX_SIZE))
+        for i, col in enumerate(df.columns, 1):
+            f.write(f'_rln{col} #{i}\n')
+        _write_chunks(df, f, ' ', header=False)
+
+
+def write_csv(df, path):
+    with open(path, 'w') as f:
+        _write_chunks(df, f, ',', header=True)
+
+
+def write_box(df, path):
+    box = pd.DataFrame({
+        'x': (df['CoordinateX'] - BOX_SIZE / 2).round().astype(np.int64),
+        'y': (df['CoordinateY'] - BOX_SIZE / 2).round().astype(np.int64),
+        'width': BOX_SIZE,
+        'height': BOX_SIZE,
+    })
+    with open(path, 'w') as f:
+        _write_chunks(box, f, '\t', header=False)
+
+
+WRITERS = {
+    'star': (write_star, '.star'),
+    'csv': (write_csv, '.csv'),
+    'box': (write_box, '.box'),
+}
+
+
+def generate_dataset(size, file_type, outdir, seed=0):
+    n_particles, n_micrographs = SIZES[size]
+    writer, suffix = WRITERS[file_type]
+
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    path = outdir / f'synthetic_{size}_seed{seed}{suffix}'
+
+    if not path.exists():
+        tmp_path = path.with_name(path.name + '.tmp')
+        writer(generate_particles(n_particles, n_micrographs, seed=seed), tmp_path)
+        tmp_path.replace(path)
+
+    return path
@@ -0,0 +1,277 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.datasets import SIZES, generate_dataset
+from particle_picker.parsers.loader import get_parser_class
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.visualization.plots import ParticleVisualizations
+
+BENCHMARK_DIR = Path(__file__).parent
+DEFAULT_BASELINE = BENCHMARK_DIR / 'baseline.json'
+DEFAULT_DATA_DIR = BENCHMARK_DIR / 'data'
+
+STATISTICS_METHODS = [
+    ('get_distribution_per_micrograph', {}),
+    ('get_summary_statistics', {}),
+    ('get_coordinate_statistics', {}),
+    ('get_defocus_statistics', {}),
+    ('get_heatmap_data', {'bin_size': 200}),
+]
+
+FIGURE_METHODS = [
+    ('create_summary_table', {}),
+    ('create_distribution_bar_chart', {}),
+    ('create_histogram', {}),
+    ('create_coordinate_scatter', {}),
+    ('create_heatmap', {'bin_size': 200}),
+    ('create_defocus_distribution', {}),
+]
+
+LOWER_IS_BETTER = {
+    'seconds': 'time',
+    'peak_bytes': 'memory',
+    'payload_bytes': 'memory',
+}
+
+
+def best_of(func, repeat):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(func):
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def bench_parse(path, file_type, repeat, memory):
+    parser_class = get_parser_class(file_type)
+    seconds, parser = best_of(lambda: parser_class(path), repeat)
+    df = parser.get_particles()
+
+    size_bytes = path.stat().st_size
+    result = {
+        'seconds': seconds,
+        'rows': len(df),
+        'file_bytes': size_bytes,
+        'mb_per_s': size_bytes / 1e6 / seconds,
+        'rows_per_s': len(df) / seconds,
+    }
+    if memory:
+        result['peak_bytes'] = peak_memory(lambda: parser_class(path))
+    return result, df
+
+
+def bench_statistics(stats, repeat):
+    results = {}
+    for method, kwargs in STATISTICS_METHODS:
+        seconds, _ = best_of(lambda: getattr(stats, method)(**kwargs), repeat)
+        results[method] = {'seconds': seconds}
+    return results
+
+
+def bench_figures(viz, repeat):
+    results = {}
+    for method, kwargs in FIGURE_METHODS:
+        seconds, fig = best_of(lambda: getattr(viz, method)(**kwargs), repeat)
+        serialize_seconds, payload = best_of(fig.to_json, repeat)
+        results[method] = {
+            'seconds': seconds,
+            'serialize_seconds': serialize_seconds,
+            'payload_bytes': len(payload),
+        }
+    return results
+
+
+def bench_cli_startup(data_dir, repeat):
+    star_path = generate_dataset('1e3', 'star', data_dir)
+    commands = {
+        'cli/help': ['--help'],
+        'cli/list/1e3': ['list', '-i', str(star_path), '-t', 'star'],
+        'cli/analyze/1e3': ['analyze', '-i', str(star_path), '-t', 'star'],
+    }
+
+    results = {}
+    for key, argv in commands.items():
+        command = [sys.executable, '-m', 'particle_picker.cli.particle_cli'] + argv
+        seconds, _ = best_of(lambda: subprocess.run(command, capture_output=True), repeat)
+        results[key] = {'seconds': seconds}
+    return results
+
+
+def run_benchmarks(sizes, file_types, data_dir, repeat=3, memory=True, cli=True, log=print):
+    results = {}
+
+    if cli:
+        log("cli startup")
+        results.update(bench_cli_startup(data_dir, repeat))
+
+    for size in sizes:
+        frames = {}
+        for file_type in file_types:
+            path = generate_dataset(size, file_type, data_dir)
+            log(f"parse/{file_type}/{size} ({path.stat().st_size / 1e6:.1f} MB)")
+            results[f'parse/{file_type}/{size}'], frames[file_type] = bench_parse(
+                path, file_type, repeat, memory
+            )
+
+        df = frames.get('star', frames[file_types[0]])
+        stats = ParticleStatistics(df)
+
+        log(f"stats/{size}")
+        for method, result in bench_statistics(stats, repeat).items():
+            results[f'stats/{method}/{size}'] = result
+
+        log(f"figure/{size}")
+        for method, result in bench_figures(ParticleVisualizations(stats), repeat).items():
+            results[f'figure/{method}/{size}'] = result
+
+    return results
+
+
+def compare_to_baseline(results, baseline, time_threshold=0.25, memory_threshold=0.10,
+                        min_seconds=0.005):
+    regressions = []
+    thresholds = {'time': time_threshold, 'memory': memory_threshold}
+
+    for key, metrics in results.items():
+        reference = baseline.get(key)
+        if reference is None:
+            continue
+
+        for metric, value in metrics.items():
+            kind = LOWER_IS_BETTER.get(metric) or (
+                'time' if metric.endswith('_seconds') else None
+            )
+            if kind is None or metric not in reference:
+                continue
+
+            expected = reference[metric]
+            if kind == 'time' and max(value, expected) < min_seconds:
+                continue
+
+            limit = expected * (1 + thresholds[kind])
+            if value > limit:
+                regressions.append({
+                    'benchmark': key,
+                    'metric': metric,
+                    'baseline': expected,
+                    'current': value,
+                    'change': value / expected - 1 if expected else float('inf'),
+                })
+
+    return regressions
+
+
+def environment_info():
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        description='Particle picker performance benchmarks',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Examples:
+  %(prog)s
+  %(prog)s --sizes 1e3 1e4 1e5 1e6 --output results.json
+  %(prog)s --save-baseline
+        '''
+    )
+    parser.add_argument('--sizes', nargs='+', default=['1e3', '1e4', '1e5'],
+                        choices=list(SIZES), help='Dataset sizes (particles)')
+    parser.add_argument('--types', nargs='+', default=['star', 'csv', 'box'],
+                        choices=['star', 'csv', 'box'], help='File types to parse')
+    parser.add_argument('--data-dir', default=str(DEFAULT_DATA_DIR),
+                        help='Directory for generated datasets')
+    parser.add_argument('--repeat', type=int, default=3, help='Repetitions per measurement')
+    parser.add_argument('--no-memory', action='store_true', help='Skip peak memory runs')
+    parser.add_argument('--no-cli', action='store_true', help='Skip CLI startup timings')
+    parser.add_argument('-o', '--output', help='Write results to this JSON file')
+    parser.add_argument('--baseline', default=str(DEFAULT_BASELINE), help='Baseline JSON file')
+    parser.add_argument('--save-baseline', action='store_true',
+                        help='Store these results as the new baseline')
+    parser.add_argument('--time-threshold', type=float, default=0.25,
+                        help='Allowed relative slowdown (default: 0.25)')
+    parser.add_argument('--memory-threshold', type=float, default=0.10,
+                        help='Allowed relative memory/payload growth (default: 0.10)')
+    return parser
+
+
+def main(argv=None):
+    args = parse_arguments().parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.types, args.data_dir,
+                             repeat=args.repeat, memory=not args.no_memory,
+                             cli=not args.no_cli)
+    report = {'environment': environment_info(), 'results': results}
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nResults saved to: {args.output}")
+
+    baseline_path = Path(args.baseline)
+
+    if args.save_baseline:
+        baseline = {}
+        if baseline_path.exists():
+            with open(baseline_path) as f:
+                baseline = json.load(f).get('results', {})
+        baseline.update(results)
+        with open(baseline_path, 'w') as f:
+            json.dump({'environment': report['environment'], 'results': baseline}, f, indent=2)
+        print(f"\nBaseline saved to: {baseline_path}")
+        return 0
+
+    if not baseline_path.exists():
+        print(f"\nNo baseline found at {baseline_path}; run with --save-baseline first")
+        return 0
+
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    regressions = compare_to_baseline(results, baseline, args.time_threshold,
+                                      args.memory_threshold)
+
+    print("\n" + "=" * 60)
+    if not regressions:
+        print(f"No regressions against {baseline_path.name}")
+        return 0
+
+    print(f"{len(regressions)} regression(s) against {baseline_path.name}:")
+    for regression in regressions:
+        print(f"  {regression['benchmark']} {regression['metric']}: "
+              f"{regression['baseline']:.4g} -> {regression['current']:.4g} "
+              f"({regression['change']:+.0%})")
+    return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
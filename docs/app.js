@@ -1,11 +1,13 @@
 let currentData = null;
-let currentStats = null;
+let currentBins = null;
+let currentWorker = null;
 
 const uploadArea = document.getElementById('uploadArea');
 const fileInput = document.getElementById('fileInput');
 const fileInfo = document.getElementById('fileInfo');
 const alerts = document.getElementById('alerts');
 const statsSection = document.getElementById('statsSection');
+const progressArea = document.getElementById('progressArea');
 
 uploadArea.addEventListener('click', () => fileInput.click());
 
@@ -35,13 +37,6 @@ fileInput.addEventListener('change', (e) => {
 });
 
 function handleFile(file) {
-    const maxSize = 50 * 1024 * 1024;
-    
-    if (file.size > maxSize) {
-        showAlert('File too large. Maximum size is 50MB.', 'error');
-        return;
-    }
-    
     const ext = file.name.split('.').pop().toLowerCase();
     const validExtensions = ['star', 'csv', 'box', 'txt'];
     
@@ -55,54 +50,102 @@ function handleFile(file) {
     document.getElementById('fileType').textContent = ext.toUpperCase();
     fileInfo.style.display = 'block';
     
+    const fileType = ext === 'txt' ? 'box' : ext;
+    
+    if (currentWorker) {
+        currentWorker.terminate();
+        currentWorker = null;
+    }
+    
     showAlert('Processing file...', 'success');
+    showProgress(0, file.size);
+    
+    try {
+        currentWorker = new Worker('worker.js');
+    } catch (error) {
+        // Workers are unavailable, e.g. for pages opened from file://
+        parseOnPage(file, fileType);
+        return;
+    }
     
-    const reader = new FileReader();
-    reader.onload = (e) => {
-        processFile(e.target.result, ext);
+    const worker = currentWorker;
+    worker.onmessage = (e) => {
+        const message = e.data;
+        if (message.type === 'progress') {
+            updateProgress(message);
+        } else if (message.type === 'done') {
+            worker.terminate();
+            currentWorker = null;
+            processResult(message.result);
+        } else if (message.type === 'error') {
+            worker.terminate();
+            currentWorker = null;
+            hideProgress();
+            showAlert('Error processing file: ' + message.message, 'error');
+        }
     };
-    reader.onerror = () => {
-        showAlert('Error reading file.', 'error');
+    worker.onerror = (e) => {
+        e.preventDefault();
+        worker.terminate();
+        currentWorker = null;
+        parseOnPage(file, fileType);
     };
-    reader.readAsText(file);
+    worker.postMessage({ file, fileType });
 }
 
-async function processFile(content, fileType) {
+async function parseOnPage(file, fileType) {
+    console.warn('Web Worker unavailable, parsing on the page');
     try {
-        let particles;
-        
-        if (fileType === 'star') {
-            particles = ParticleParser.parseStarFile(content);
-        } else if (fileType === 'csv') {
-            particles = await ParticleParser.parseCsvFile(content);
-        } else if (fileType === 'box') {
-            particles = ParticleParser.parseBoxFile(content);
-        }
-        
-        if (!particles || particles.length === 0) {
-            showAlert('No particle data found in file.', 'error');
-            return;
-        }
-        
-        currentData = particles;
-        currentStats = new ParticleStatistics(particles);
-        
-        showAlert(`Successfully loaded ${particles.length.toLocaleString()} particles!`, 'success');
-        
-        displayStatistics();
-        createVisualizations();
-        
-        statsSection.style.display = 'block';
-        statsSection.scrollIntoView({ behavior: 'smooth' });
-        
+        const result = await parseParticleFile(file, fileType, updateProgress);
+        processResult(result);
     } catch (error) {
         console.error('Error processing file:', error);
+        hideProgress();
         showAlert('Error processing file: ' + error.message, 'error');
     }
 }
 
-function displayStatistics() {
-    const summary = currentStats.getSummaryStatistics();
+function updateProgress(progress) {
+    showProgress(progress.loaded, progress.total);
+    if (progress.summary.totalParticles > 0) {
+        displayStatistics(progress.summary);
+        statsSection.style.display = 'block';
+    }
+}
+
+function processResult(result) {
+    hideProgress();
+    
+    if (!result || result.bins.summary.totalParticles === 0) {
+        showAlert('No particle data found in file.', 'error');
+        return;
+    }
+    
+    currentData = result.columns;
+    currentBins = result.bins;
+    
+    showAlert(`Successfully loaded ${currentBins.summary.totalParticles.toLocaleString()} particles!`, 'success');
+    
+    displayStatistics(currentBins.summary);
+    createVisualizations();
+    
+    statsSection.style.display = 'block';
+    statsSection.scrollIntoView({ behavior: 'smooth' });
+}
+
+function showProgress(loaded, total) {
+    const percent = total > 0 ? Math.round(loaded / total * 100) : 100;
+    progressArea.style.display = 'block';
+    document.getElementById('progressBar').style.width = percent + '%';
+    document.getElementById('progressText').textContent =
+        `${formatBytes(loaded)} of ${formatBytes(total)} (${percent}%)`;
+}
+
+function hideProgress() {
+    progressArea.style.display = 'none';
+}
+
+function displayStatistics(summary) {
     const statsGrid = document.getElementById('statsGrid');
     
     statsGrid.innerHTML = `
@@ -140,21 +183,10 @@ function createVisualizations() {
 }
 
 function createDistributionChart() {
-    const distribution = currentStats.getDistributionPerMicrograph();
-    const micrographs = Object.keys(distribution);
-    const counts = Object.values(distribution);
-    
-    const sortedIndices = counts
-        .map((value, index) => ({ value, index }))
-        .sort((a, b) => b.value - a.value)
-        .map(item => item.index);
-    
-    const sortedMicrographs = sortedIndices.map(i => micrographs[i]);
-    const sortedCounts = sortedIndices.map(i => counts[i]);
-    
-    const displayLimit = 50;
-    const displayMicrographs = sortedMicrographs.slice(0, displayLimit);
-    const displayCounts = sortedCounts.slice(0, displayLimit);
+    const distribution = currentBins.distribution;
+    const displayLimit = distribution.names.length;
+    const displayMicrographs = distribution.names;
+    const displayCounts = Array.from(distribution.counts);
     
     const data = [{
         type: 'bar',
@@ -181,13 +213,19 @@ function createDistributionChart() {
 }
 
 function createHistogramChart() {
-    const distribution = currentStats.getDistributionPerMicrograph();
-    const counts = Object.values(distribution);
+    const histogram = currentBins.histogram;
+    const counts = Array.from(histogram.counts);
     
     const data = [{
-        type: 'histogram',
-        x: counts,
-        nbinsx: 30,
+        type: 'bar',
+        x: counts.map((_, i) => histogram.start + (i + 0.5) * histogram.size),
+        y: counts,
+        width: histogram.size,
+        customdata: counts.map((_, i) => [
+            histogram.start + i * histogram.size,
+            histogram.start + (i + 1) * histogram.size - 1
+        ]),
+        hovertemplate: '<b>Particles:</b> %{customdata[0]} to %{customdata[1]}<br><b>Micrographs:</b> %{y}<extra></extra>',
         marker: {
             color: 'rgba(102, 126, 234, 0.7)',
             line: {
@@ -201,6 +239,7 @@ function createHistogramChart() {
         title: 'Distribution of Particles per Micrograph',
         xaxis: { title: 'Number of Particles' },
         yaxis: { title: 'Frequency' },
+        bargap: 0,
         height: 400
     };
     
@@ -208,26 +247,16 @@ function createHistogramChart() {
 }
 
 function createScatterChart() {
-    const coords = currentStats.getCoordinates();
+    const scatter = currentBins.scatter;
     
-    if (!coords) {
+    if (!currentBins.xCol || !currentBins.yCol || scatter.x.length === 0) {
         document.getElementById('scatterChart').innerHTML = 
             '<p style="text-align: center; padding: 40px; color: #666;">No coordinate data available</p>';
         return;
     }
     
-    const maxPoints = 10000;
-    let x = coords.x;
-    let y = coords.y;
-    
-    if (x.length > maxPoints) {
-        const indices = [];
-        for (let i = 0; i < maxPoints; i++) {
-            indices.push(Math.floor(Math.random() * x.length));
-        }
-        x = indices.map(i => x[i]);
-        y = indices.map(i => y[i]);
-    }
+    const x = scatter.x;
+    const y = scatter.y;
     
     const data = [{
         type: 'scattergl',
@@ -243,8 +272,8 @@ function createScatterChart() {
     
     const layout = {
         title: `Particle Coordinates (${x.length.toLocaleString()} points)`,
-        xaxis: { title: coords.xCol },
-        yaxis: { title: coords.yCol },
+        xaxis: { title: currentBins.xCol },
+        yaxis: { title: currentBins.yCol },
         height: 500
     };
     
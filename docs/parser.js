@@ -1,273 +1,366 @@
-class ParticleParser {
-    
-    static parseStarFile(content) {
-        console.log('Starting STAR file parsing...');
-        console.log('File length:', content.length, 'characters');
-        
-        const lines = content.split('\n').map(line => line.trim());
-        console.log('Total lines:', lines.length);
-        
-        const particles = [];
-        let inParticlesSection = false;
-        let inLoop = false;
-        let headers = [];
-        let dataLineCount = 0;
-        
-        for (let i = 0; i < lines.length; i++) {
-            const line = lines[i];
-            
-            if (line.length === 0) continue;
-            
-            if (line === 'data_particles' || line.startsWith('data_particles')) {
-                console.log('Found data_particles at line', i);
-                inParticlesSection = true;
-                inLoop = false;
-                headers = [];
-                continue;
-            }
-            
-            if (inParticlesSection && line === 'loop_') {
-                console.log('Found loop_ at line', i);
-                inLoop = true;
-                continue;
-            }
-            
-            if (inParticlesSection && inLoop && line.startsWith('_rln')) {
-                const parts = line.split(/\s+/);
-                const headerName = parts[0].replace('_rln', '');
-                headers.push(headerName);
-                if (headers.length === 1) {
-                    console.log('First header:', headerName);
-                }
-                continue;
-            }
-            
-            if (inParticlesSection && headers.length > 0) {
-                if (!line.startsWith('_') && !line.startsWith('data_') && !line.startsWith('loop_') && !line.startsWith('#')) {
-                    const values = line.split(/\s+/).filter(v => v.length > 0);
-                    
-                    if (values.length >= headers.length) {
-                        const particle = {};
-                        headers.forEach((header, idx) => {
-                            if (idx < values.length) {
-                                const value = values[idx];
-                                particle[header] = isNaN(value) ? value : parseFloat(value);
-                            }
-                        });
-                        particles.push(particle);
-                        dataLineCount++;
-                        
-                        if (dataLineCount === 1) {
-                            console.log('First particle:', particle);
-                        }
-                    }
-                }
-            }
-            
-            if (inParticlesSection && line.startsWith('data_') && line !== 'data_particles') {
-                console.log('End of particles section at line', i);
-                break;
+const CHUNK_SIZE = 8 * 1024 * 1024;
+
+const MICROGRAPH_COLUMNS = [
+    'MicrographName',
+    'Micrographs Filename',
+    'micrograph',
+    'image',
+    'ImageName',
+    '_rlnMicrographName',
+    'rlnMicrographName'
+];
+const X_COLUMNS = ['X-Coordinate', 'CoordinateX', 'x', 'X', '_rlnCoordinateX', 'rlnCoordinateX', 'pos_x', 'posX', 'x_coord'];
+const Y_COLUMNS = ['Y-Coordinate', 'CoordinateY', 'y', 'Y', '_rlnCoordinateY', 'rlnCoordinateY', 'pos_y', 'posY', 'y_coord'];
+
+function findColumn(headers, candidates, matches) {
+    for (const col of candidates) {
+        const index = headers.indexOf(col);
+        if (index >= 0) return index;
+    }
+    return headers.findIndex(col => matches(col.toLowerCase(), col));
+}
+
+function isCoordinateColumn(axis) {
+    return (lower, col) => lower.includes(axis) &&
+        (lower.includes('coord') || lower.includes('pos') || col === axis || col === axis.toUpperCase());
+}
+
+function isMicrographColumn(lower) {
+    return lower.includes('micrograph') || lower.includes('image') || lower.includes('filename');
+}
+
+function splitCsvLine(line) {
+    if (!line.includes('"')) {
+        return line.split(',').map(v => v.trim());
+    }
+
+    const values = [];
+    let value = '';
+    let quoted = false;
+    for (let i = 0; i < line.length; i++) {
+        const ch = line[i];
+        if (ch === '"') {
+            if (quoted && line[i + 1] === '"') {
+                value += '"';
+                i++;
+            } else {
+                quoted = !quoted;
             }
+        } else if (ch === ',' && !quoted) {
+            values.push(value.trim());
+            value = '';
+        } else {
+            value += ch;
         }
-        
-        console.log('Headers found:', headers.length, 'headers');
-        console.log('Header names:', headers.slice(0, 5), '...');
-        console.log('Total particles parsed:', particles.length);
-        
-        if (particles.length === 0) {
-            console.error('ERROR: No particles found!');
-            console.log('Debug info:');
-            console.log('- inParticlesSection was set:', inParticlesSection);
-            console.log('- headers array length:', headers.length);
-            console.log('- First 20 lines of file:');
-            lines.slice(0, 20).forEach((line, i) => {
-                console.log(`  ${i}: "${line}"`);
-            });
+    }
+    values.push(value.trim());
+    return values;
+}
+
+// Growable typed array, so columns never become arrays of boxed numbers
+class ColumnBuilder {
+
+    constructor(ArrayType, capacity = 65536) {
+        this.ArrayType = ArrayType;
+        this.data = new ArrayType(capacity);
+        this.length = 0;
+    }
+
+    push(value) {
+        if (this.length === this.data.length) {
+            const grown = new this.ArrayType(this.data.length * 2);
+            grown.set(this.data);
+            this.data = grown;
         }
-        
-        return particles;
+        this.data[this.length++] = value;
     }
-    
-    static parseCsvFile(content) {
-        return new Promise((resolve, reject) => {
-            Papa.parse(content, {
-                header: true,
-                dynamicTyping: true,
-                skipEmptyLines: true,
-                complete: (results) => {
-                    resolve(results.data);
-                },
-                error: (error) => {
-                    reject(error);
-                }
-            });
-        });
+
+    toArray() {
+        return this.data.slice(0, this.length);
     }
-    
-    static parseBoxFile(content) {
-        const lines = content.split('\n').map(line => line.trim()).filter(line => line);
-        const particles = [];
-        
-        lines.forEach(line => {
-            const values = line.split(/\s+/).map(v => parseFloat(v));
-            if (values.length >= 4) {
-                particles.push({
-                    x: values[0],
-                    y: values[1],
-                    width: values[2],
-                    height: values[3]
-                });
-            }
-        });
-        
-        return particles;
+}
+
+// Micrograph names are stored once; particles keep an integer code
+class MicrographDictionary {
+
+    constructor() {
+        this.codes = new Map();
+        this.names = [];
+        this.counts = new ColumnBuilder(Int32Array, 1024);
+    }
+
+    encode(name) {
+        let code = this.codes.get(name);
+        if (code === undefined) {
+            code = this.names.length;
+            this.codes.set(name, code);
+            this.names.push(name);
+            this.counts.push(0);
+        }
+        this.counts.data[code]++;
+        return code;
     }
 }
 
-class ParticleStatistics {
-    
-    constructor(particles) {
-        this.particles = particles;
-        this.micrographCol = this.findMicrographColumn();
+// Parses a file pushed in text chunks of any size. Lines split across
+// chunks are carried over, and only the columns the charts need are kept.
+class StreamingParticleParser {
+
+    constructor(fileType) {
+        this.fileType = fileType;
+        this.leftover = '';
+        this.headers = null;
+        this.columns = null;
+        this.inParticlesSection = false;
+        this.inLoop = false;
+        this.done = false;
+        this.particles = 0;
+        this.x = new ColumnBuilder(Float32Array);
+        this.y = new ColumnBuilder(Float32Array);
+        this.codes = new ColumnBuilder(Int32Array);
+        this.micrographs = new MicrographDictionary();
     }
-    
-    findMicrographColumn() {
-        if (this.particles.length === 0) return null;
-        
-        const firstParticle = this.particles[0];
-        const possibleCols = [
-            'MicrographName', 
-            'Micrographs Filename',
-            'micrograph', 
-            'image', 
-            'ImageName',
-            '_rlnMicrographName',
-            'rlnMicrographName'
-        ];
-        
-        for (const col of possibleCols) {
-            if (firstParticle.hasOwnProperty(col)) {
-                console.log('Using micrograph column:', col);
-                return col;
-            }
+
+    push(text) {
+        const lines = (this.leftover + text).split('\n');
+        this.leftover = lines.pop();
+        for (let i = 0; i < lines.length && !this.done; i++) {
+            this.parseLine(lines[i].trim());
         }
-        
-        for (const key in firstParticle) {
-            if (key.toLowerCase().includes('micrograph') || 
-                key.toLowerCase().includes('image') ||
-                key.toLowerCase().includes('filename')) {
-                console.log('Auto-detected micrograph column:', key);
-                return key;
-            }
+    }
+
+    finish() {
+        if (this.leftover && !this.done) {
+            this.parseLine(this.leftover.trim());
+        }
+        this.leftover = '';
+        if (this.particles === 0 && this.headers) {
+            console.error('No particles found. Headers:', this.headers.slice(0, 5));
+        }
+    }
+
+    parseLine(line) {
+        if (line.length === 0) return;
+
+        if (this.fileType === 'star') {
+            this.parseStarLine(line);
+        } else if (this.fileType === 'csv') {
+            this.parseCsvLine(line);
+        } else {
+            this.parseBoxLine(line);
         }
-        
-        return null;
     }
-    
-    getDistributionPerMicrograph() {
-        if (!this.micrographCol) return {};
-        
-        const distribution = {};
-        
-        this.particles.forEach(particle => {
-            const micrograph = particle[this.micrographCol];
-            if (micrograph) {
-                distribution[micrograph] = (distribution[micrograph] || 0) + 1;
+
+    parseStarLine(line) {
+        if (line.startsWith('data_')) {
+            if (this.inParticlesSection && this.headers.length > 0) {
+                this.done = true;
+                return;
             }
-        });
-        
-        return distribution;
+            this.inParticlesSection = line.startsWith('data_particles');
+            this.inLoop = false;
+            this.headers = [];
+            return;
+        }
+
+        if (!this.inParticlesSection) return;
+
+        if (line === 'loop_') {
+            this.inLoop = true;
+            return;
+        }
+
+        if (this.inLoop && line.startsWith('_rln')) {
+            this.headers.push(line.split(/\s+/)[0].replace('_rln', ''));
+            return;
+        }
+
+        if (this.headers.length === 0 || line.startsWith('_') || line.startsWith('#')) return;
+
+        const values = line.split(/\s+/);
+        if (values.length < this.headers.length) return;
+        this.addParticle(values);
     }
-    
-    getSummaryStatistics() {
-        const distribution = this.getDistributionPerMicrograph();
-        const counts = Object.values(distribution);
-        
-        return {
-            totalParticles: this.particles.length,
-            totalMicrographs: Object.keys(distribution).length,
-            avgParticlesPerMicrograph: counts.length > 0 ? (counts.reduce((a, b) => a + b, 0) / counts.length) : 0,
-            minParticlesPerMicrograph: counts.length > 0 ? Math.min(...counts) : 0,
-            maxParticlesPerMicrograph: counts.length > 0 ? Math.max(...counts) : 0,
-            stdParticlesPerMicrograph: this.calculateStd(counts)
+
+    parseCsvLine(line) {
+        if (this.headers === null) {
+            this.headers = splitCsvLine(line);
+            return;
+        }
+        this.addParticle(splitCsvLine(line));
+    }
+
+    parseBoxLine(line) {
+        if (this.headers === null) {
+            this.headers = ['x', 'y', 'width', 'height'];
+        }
+        const values = line.split(/\s+/);
+        if (values.length >= 4) {
+            this.addParticle(values);
+        }
+    }
+
+    resolveColumns() {
+        const columns = {
+            x: findColumn(this.headers, X_COLUMNS, isCoordinateColumn('x')),
+            y: findColumn(this.headers, Y_COLUMNS, isCoordinateColumn('y')),
+            micrograph: this.fileType === 'box' ? -1 :
+                findColumn(this.headers, MICROGRAPH_COLUMNS, isMicrographColumn)
         };
+        columns.xCol = columns.x >= 0 ? this.headers[columns.x] : null;
+        columns.yCol = columns.y >= 0 ? this.headers[columns.y] : null;
+        columns.micrographCol = columns.micrograph >= 0 ? this.headers[columns.micrograph] : null;
+        console.log('Using columns:', columns.xCol, columns.yCol, columns.micrographCol);
+        return columns;
     }
-    
-    calculateStd(values) {
-        if (values.length === 0) return 0;
-        const mean = values.reduce((a, b) => a + b, 0) / values.length;
-        const squareDiffs = values.map(value => Math.pow(value - mean, 2));
-        const avgSquareDiff = squareDiffs.reduce((a, b) => a + b, 0) / squareDiffs.length;
-        return Math.sqrt(avgSquareDiff);
+
+    addParticle(values) {
+        if (this.columns === null) {
+            this.columns = this.resolveColumns();
+        }
+        const columns = this.columns;
+
+        this.x.push(columns.x >= 0 ? parseFloat(values[columns.x]) : NaN);
+        this.y.push(columns.y >= 0 ? parseFloat(values[columns.y]) : NaN);
+        if (columns.micrograph >= 0) {
+            const micrograph = values[columns.micrograph];
+            this.codes.push(micrograph ? this.micrographs.encode(micrograph) : -1);
+        }
+        this.particles++;
     }
-    
-    getCoordinates() {
-        const xCols = ['X-Coordinate', 'CoordinateX', 'x', 'X', '_rlnCoordinateX', 'rlnCoordinateX', 'pos_x', 'posX', 'x_coord'];
-        const yCols = ['Y-Coordinate', 'CoordinateY', 'y', 'Y', '_rlnCoordinateY', 'rlnCoordinateY', 'pos_y', 'posY', 'y_coord'];
-
-        let xCol = null, yCol = null;
-        
-        if (this.particles.length > 0) {
-            const firstParticle = this.particles[0];
-            const availableColumns = Object.keys(firstParticle);
-            
-            console.log('Available columns in data:', availableColumns);
-            
-            for (const col of xCols) {
-                if (firstParticle.hasOwnProperty(col)) {
-                    xCol = col;
-                    break;
-                }
-            }
-            
-            if (!xCol) {
-                for (const col of availableColumns) {
-                    if (col.toLowerCase().includes('x') && 
-                        (col.toLowerCase().includes('coord') || 
-                         col.toLowerCase().includes('pos') ||
-                         col === 'x' || col === 'X')) {
-                        xCol = col;
-                        console.log('Auto-detected X column:', col);
-                        break;
-                    }
-                }
-            }
-            
-            for (const col of yCols) {
-                if (firstParticle.hasOwnProperty(col)) {
-                    yCol = col;
-                    break;
-                }
-            }
-            
-            if (!yCol) {
-                for (const col of availableColumns) {
-                    if (col.toLowerCase().includes('y') && 
-                        (col.toLowerCase().includes('coord') || 
-                         col.toLowerCase().includes('pos') ||
-                         col === 'y' || col === 'Y')) {
-                        yCol = col;
-                        console.log('Auto-detected Y column:', col);
-                        break;
-                    }
-                }
-            }
-            
-            console.log('Using X column:', xCol);
-            console.log('Using Y column:', yCol);
+
+    summary() {
+        const counts = this.micrographs.counts;
+        return ParticleBins.summarize(this.particles, counts.data.subarray(0, counts.length));
+    }
+
+    result() {
+        return {
+            columns: {
+                x: this.x.toArray(),
+                y: this.y.toArray(),
+                micrographCodes: this.codes.toArray(),
+                micrographNames: this.micrographs.names,
+                xCol: this.columns ? this.columns.xCol : null,
+                yCol: this.columns ? this.columns.yCol : null,
+                micrographCol: this.columns ? this.columns.micrographCol : null
+            },
+            bins: ParticleBins.build(this)
+        };
+    }
+}
+
+// Everything the charts draw, reduced in the parser so the page never
+// holds one object per particle
+class ParticleBins {
+
+    static summarize(particles, counts) {
+        let total = 0, min = Infinity, max = -Infinity;
+        for (let i = 0; i < counts.length; i++) {
+            total += counts[i];
+            if (counts[i] < min) min = counts[i];
+            if (counts[i] > max) max = counts[i];
         }
-        
-        if (!xCol || !yCol) {
-            console.warn('Could not find coordinate columns. Available columns:', 
-                        this.particles.length > 0 ? Object.keys(this.particles[0]) : 'none');
-            return null;
+        const mean = counts.length > 0 ? total / counts.length : 0;
+        let squares = 0;
+        for (let i = 0; i < counts.length; i++) {
+            squares += (counts[i] - mean) * (counts[i] - mean);
         }
-        
+
         return {
-            x: this.particles.map(p => p[xCol]).filter(v => v !== undefined && !isNaN(v)),
-            y: this.particles.map(p => p[yCol]).filter(v => v !== undefined && !isNaN(v)),
-            xCol,
-            yCol
+            totalParticles: particles,
+            totalMicrographs: counts.length,
+            avgParticlesPerMicrograph: mean,
+            minParticlesPerMicrograph: counts.length > 0 ? min : 0,
+            maxParticlesPerMicrograph: counts.length > 0 ? max : 0,
+            stdParticlesPerMicrograph: counts.length > 0 ? Math.sqrt(squares / counts.length) : 0
         };
     }
+
+    static build(parser, { topMicrographs = 50, histogramBins = 30, maxPoints = 10000 } = {}) {
+        const counts = parser.micrographs.counts.toArray();
+        return {
+            summary: ParticleBins.summarize(parser.particles, counts),
+            distribution: ParticleBins.topMicrographs(counts, parser.micrographs.names, topMicrographs),
+            histogram: ParticleBins.histogram(counts, histogramBins),
+            scatter: ParticleBins.sample(parser.x.data, parser.y.data, parser.particles, maxPoints),
+            xCol: parser.columns ? parser.columns.xCol : null,
+            yCol: parser.columns ? parser.columns.yCol : null
+        };
+    }
+
+    static topMicrographs(counts, names, limit) {
+        const order = Array.from(counts.keys())
+            .sort((a, b) => counts[b] - counts[a])
+            .slice(0, limit);
+        return {
+            names: order.map(i => names[i]),
+            counts: Int32Array.from(order, i => counts[i])
+        };
+    }
+
+    static histogram(counts, bins) {
+        if (counts.length === 0) {
+            return { start: 0, size: 1, counts: new Int32Array(0) };
+        }
+        let min = Infinity, max = -Infinity;
+        for (const count of counts) {
+            if (count < min) min = count;
+            if (count > max) max = count;
+        }
+        const size = Math.max(1, Math.ceil((max - min + 1) / bins));
+        const frequencies = new Int32Array(Math.floor((max - min) / size) + 1);
+        for (const count of counts) {
+            frequencies[Math.floor((count - min) / size)]++;
+        }
+        return { start: min, size, counts: frequencies };
+    }
+
+    static sample(xs, ys, length, maxPoints) {
+        const n = Math.min(length, maxPoints);
+        const x = new Float32Array(n);
+        const y = new Float32Array(n);
+        let kept = 0;
+        for (let attempt = 0; kept < n && attempt < 4 * n; attempt++) {
+            const index = length > maxPoints ? Math.floor(Math.random() * length) : attempt;
+            if (index >= length) break;
+            if (isNaN(xs[index]) || isNaN(ys[index])) continue;
+            x[kept] = xs[index];
+            y[kept] = ys[index];
+            kept++;
+        }
+        return { x: x.slice(0, kept), y: y.slice(0, kept) };
+    }
+}
+
+// Reads the file in File.slice chunks, so no more than one chunk of text is
+// in memory. Runs unchanged in the worker and, as a fallback, on the page.
+async function parseParticleFile(file, fileType, onProgress, chunkSize = CHUNK_SIZE) {
+    const parser = new StreamingParticleParser(fileType);
+    const decoder = new TextDecoder();
+
+    for (let offset = 0; offset < file.size && !parser.done; offset += chunkSize) {
+        const buffer = await file.slice(offset, offset + chunkSize).arrayBuffer();
+        parser.push(decoder.decode(buffer, { stream: true }));
+        if (onProgress) {
+            onProgress({
+                loaded: Math.min(offset + chunkSize, file.size),
+                total: file.size,
+                summary: parser.summary()
+            });
+        }
+    }
+    parser.push(decoder.decode());
+    parser.finish();
+
+    return parser.result();
+}
+
+function transferables(result) {
+    const { columns, bins } = result;
+    return [
+        columns.x.buffer, columns.y.buffer, columns.micrographCodes.buffer,
+        bins.distribution.counts.buffer, bins.histogram.counts.buffer,
+        bins.scatter.x.buffer, bins.scatter.y.buffer
+    ];
 }
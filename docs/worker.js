@@ -0,0 +1,14 @@
+importScripts('parser.js');
+
+self.onmessage = async (event) => {
+    const { file, fileType } = event.data;
+
+    try {
+        const result = await parseParticleFile(file, fileType, (progress) => {
+            self.postMessage({ type: 'progress', ...progress });
+        });
+        self.postMessage({ type: 'done', result }, transferables(result));
+    } catch (error) {
+        self.postMessage({ type: 'error', message: error.message });
+    }
+};
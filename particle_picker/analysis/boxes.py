@@ -0,0 +1,174 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from particle_picker.analysis.statistics import coordinate_columns
+from particle_picker.parsers.mrc import open_mrc, read_mrc_header, resolve_micrograph
+from particle_picker.profiling import profiled, span
+
+BOX_COLUMNS = ['box_mean', 'box_std', 'box_contrast', 'edge_distance', 'near_edge']
+# Boxes gathered per vectorized step, bounded by bytes rather than count
+CHUNK_BYTES = 32 * 1024 * 1024
+CONTRAST_SAMPLE = 512
+
+
+def box_size_from_optics(optics, micrograph_pixel_size=None):
+    # ImageSize is the extracted box, which may have been rescaled; convert
+    # it back to micrograph pixels when both pixel sizes are known
+    if optics is None or 'ImageSize' not in optics.columns or optics.empty:
+        return None
+
+    size = float(optics['ImageSize'].iloc[0])
+    if 'MicrographPixelSize' in optics.columns:
+        micrograph_pixel_size = float(optics['MicrographPixelSize'].iloc[0])
+    if 'ImagePixelSize' in optics.columns and micrograph_pixel_size:
+        size *= float(optics['ImagePixelSize'].iloc[0]) / micrograph_pixel_size
+    return int(round(size))
+
+
+def box_size_from_table(table):
+    for col in ('width', 'height'):
+        if col in table and table.is_numeric(col) and len(table):
+            return int(round(float(np.median(table[col]))))
+    return None
+
+
+def _sample_std(image):
+    step_y = max(1, image.shape[0] // CONTRAST_SAMPLE)
+    step_x = max(1, image.shape[1] // CONTRAST_SAMPLE)
+    return float(np.std(np.asarray(image[::step_y, ::step_x], dtype=np.float64)))
+
+
+def micrograph_box_statistics(task):
+    # One micrograph: x and y are box centres in micrograph pixels. Boxes are
+    # gathered from a sliding-window view of the memory map in chunks, so no
+    # Python-level loop runs per particle.
+    mrc_path, x, y, box = task
+    image = open_mrc(mrc_path)
+    height, width = image.shape
+    n = len(x)
+
+    edge_distance = np.minimum(np.minimum(x, width - 1 - x), np.minimum(y, height - 1 - y))
+    result = {
+        'box_mean': np.full(n, np.nan),
+        'box_std': np.full(n, np.nan),
+        'box_contrast': np.full(n, np.nan),
+        'edge_distance': edge_distance,
+        'near_edge': edge_distance < box / 2,
+    }
+    if box < 4 or box > min(height, width) or not n:
+        return result
+
+    # Boxes crossing an edge are shifted inside the frame; near_edge marks them
+    half = box // 2
+    left = np.clip(np.rint(x).astype(np.int64) - half, 0, width - box)
+    top = np.clip(np.rint(y).astype(np.int64) - half, 0, height - box)
+    windows = np.lib.stride_tricks.sliding_window_view(image, (box, box))
+
+    quarter = box // 4
+    inner_pixels = (box - 2 * quarter) ** 2
+    outer_pixels = box * box - inner_pixels
+    background_std = _sample_std(image) or 1.0
+    chunk = max(1, CHUNK_BYTES // (box * box * image.dtype.itemsize))
+
+    for start in range(0, n, chunk):
+        rows = slice(start, start + chunk)
+        boxes = windows[top[rows], left[rows]]
+        total = boxes.sum(axis=(1, 2), dtype=np.float64)
+        squares = np.einsum('ijk,ijk->i', boxes, boxes, dtype=np.float64)
+        centre = boxes[:, quarter:box - quarter, quarter:box - quarter]
+        inner = centre.sum(axis=(1, 2), dtype=np.float64)
+
+        mean = total / (box * box)
+        result['box_mean'][rows] = mean
+        result['box_std'][rows] = np.sqrt(np.maximum(squares / (box * box) - mean ** 2, 0))
+        result['box_contrast'][rows] = (
+            (inner / inner_pixels - (total - inner) / outer_pixels) / background_std
+        )
+
+    return result
+
+
+def _run_tasks(tasks, jobs):
+    if jobs > 1 and len(tasks) > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), mp_context=context) as pool:
+            return list(pool.map(micrograph_box_statistics, tasks))
+    return [micrograph_box_statistics(task) for task in tasks]
+
+
+def _centres(table, file_type, x_col, y_col, box):
+    x = np.asarray(table[x_col], dtype=np.float64)
+    y = np.asarray(table[y_col], dtype=np.float64)
+    if file_type == 'box':
+        # .box coordinates are the lower-left corner of each box
+        widths = table['width'] if 'width' in table else box
+        heights = table['height'] if 'height' in table else box
+        x = x + np.asarray(widths, dtype=np.float64) / 2
+        y = y + np.asarray(heights, dtype=np.float64) / 2
+    return x, y
+
+
+@profiled('boxes.statistics')
+def box_statistics(table, file_type, particles_path, box_size=None, optics=None, root=None,
+                   jobs=1):
+    # Returns (columns, report): one array per BOX_COLUMNS entry aligned with
+    # the table's rows (NaN where the micrograph was not found), plus counts
+    from particle_picker.parsers.parallel import resolve_jobs
+
+    x_col, y_col = ('x', 'y') if file_type == 'box' else coordinate_columns(table.column_names)
+    if x_col not in table or y_col not in table:
+        raise ValueError("No coordinate columns found")
+
+    if table.names is not None:
+        codes = np.asarray(table.codes)
+        names = list(table.names)
+    else:
+        # A .box file holds the picks of the micrograph it is named after
+        codes = np.zeros(len(table), dtype=np.int64)
+        names = [Path(particles_path).with_suffix('.mrc').name]
+
+    paths = [resolve_micrograph(name, particles_path, root) for name in names]
+    found = [path for path in paths if path is not None]
+
+    if box_size is None:
+        box_size = box_size_from_table(table) if file_type == 'box' else None
+    if box_size is None and found:
+        box_size = box_size_from_optics(optics, read_mrc_header(found[0]).pixel_size)
+    if box_size is None:
+        raise ValueError("Box size unknown: pass it explicitly or include optics ImageSize")
+
+    x, y = _centres(table, file_type, x_col, y_col, box_size)
+    order = np.argsort(codes, kind='stable')
+    bounds = np.searchsorted(codes[order], np.arange(len(names) + 1))
+
+    tasks, rows = [], []
+    for code, path in enumerate(paths):
+        selected = order[bounds[code]:bounds[code + 1]]
+        if path is not None and len(selected):
+            tasks.append((str(path), x[selected], y[selected], box_size))
+            rows.append(selected)
+
+    columns = {name: np.full(len(table), np.nan) for name in BOX_COLUMNS}
+    columns['near_edge'] = np.zeros(len(table), dtype=bool)
+
+    with span('boxes.extract', rows=len(table)):
+        for selected, result in zip(rows, _run_tasks(tasks, resolve_jobs(jobs))):
+            for name in BOX_COLUMNS:
+                columns[name][selected] = result[name]
+
+    measured = np.zeros(len(table), dtype=bool)
+    for selected in rows:
+        measured[selected] = True
+
+    report = {
+        'box_size': box_size,
+        'micrographs': len(tasks),
+        'missing_micrographs': [name for name, path in zip(names, paths) if path is None],
+        'particles': int(measured.sum()),
+        'near_edge': int(columns['near_edge'].sum()),
+    }
+    return columns, report
@@ -0,0 +1,269 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+import numpy as np
+
+from particle_picker import metrics
+
+STATISTICS_SECONDS = metrics.histogram('particle_picker_statistics_seconds',
+                                       'Time to compute a statistic for a cached dataset',
+                                       ['statistic'])
+
+
+def file_fingerprint(filepath):
+    path = Path(filepath).resolve()
+    stat = path.stat()
+    return str(path), stat.st_size, stat.st_mtime_ns, stat.st_ino
+
+
+def resident_bytes(value):
+    # Tables and arrays report their buffers; DataFrames include the strings
+    # in object columns. Other values (statistics) share a table's memory.
+    if hasattr(value, 'memory_usage'):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    return int(getattr(value, 'nbytes', 0))
+
+
+def cache_metrics(name, hits, misses, evictions, entries):
+    samples = [
+        ('particle_picker_cache_hits_total', 'Cache lookups answered from the cache', hits),
+        ('particle_picker_cache_misses_total', 'Cache lookups that computed the value', misses),
+        ('particle_picker_cache_evictions_total', 'Entries dropped to stay within the limit',
+         evictions),
+    ]
+    result = []
+    for metric_name, description, value in samples:
+        counter = metrics.Counter(metric_name, description, ['cache'])
+        counter.inc(value, cache=name)
+        result.append(counter)
+
+    gauge = metrics.Gauge('particle_picker_cache_entries', 'Entries held by the cache', ['cache'])
+    gauge.set(entries, cache=name)
+    return result + [gauge]
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share one computation: the first
+    # caller runs it, later ones wait for its result or exception
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._calls)
+
+    def do(self, key, compute):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+
+        if not leader:
+            return future.result()
+
+        try:
+            value = compute()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(value)
+            return value
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+
+def _freeze(value):
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+def _share(value):
+    # Cached results are handed out without a deep copy: arrays are frozen
+    # read-only, pandas objects come back as shallow copies (new columns or
+    # sorting do not reach the cache) and containers are copied per level
+    if isinstance(value, dict):
+        return {key: _share(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(_share(item) for item in value)
+    if hasattr(value, 'iloc'):
+        return value.copy(deep=False)
+    return value
+
+
+class MemoizedStatistics:
+    # Results of calls with arguments (heatmap bin sizes) are kept in a small
+    # LRU; per-micrograph picks are cheap slices and are not cached at all
+    UNCACHED = ('get_micrograph_picks',)
+    MAX_ARGUMENT_RESULTS = 32
+
+    def __init__(self, stats):
+        self._stats = stats
+        self._results = OrderedDict()
+        self._flights = SingleFlight()
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        attr = getattr(self._stats, name)
+        if not name.startswith('get_') or not callable(attr) or name in self.UNCACHED:
+            return attr
+
+        def method(*args, **kwargs):
+            key = (name, args, tuple(sorted(kwargs.items())))
+            with self._lock:
+                if key in self._results:
+                    self._results.move_to_end(key)
+                    return _share(self._results[key])
+
+            # Different statistics compute concurrently; callers asking for
+            # the same one share a single computation
+            return _share(self._flights.do(key, lambda: self._compute(key, attr, args, kwargs)))
+
+        return method
+
+    def _compute(self, key, attr, args, kwargs):
+        with self._lock:
+            if key in self._results:
+                return self._results[key]
+
+        with STATISTICS_SECONDS.time(statistic=key[0]):
+            value = _freeze(attr(*args, **kwargs))
+
+        with self._lock:
+            self._results[key] = value
+            with_arguments = [k for k in self._results if k[1] or k[2]]
+            for stale in with_arguments[:-self.MAX_ARGUMENT_RESULTS]:
+                del self._results[stale]
+        return value
+
+
+class DatasetCache:
+
+    def __init__(self, max_datasets=8):
+        self.max_datasets = max_datasets
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._datasets = OrderedDict()
+        self._sizes = {}
+        self._flights = SingleFlight()
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._datasets)
+
+    def get(self, filepath, file_type, kind, compute):
+        fingerprint = file_fingerprint(filepath)
+        key = (fingerprint, file_type)
+
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is not None and kind in dataset:
+                self._datasets.move_to_end(key)
+                self.hits += 1
+                return dataset[kind]
+
+        # compute() runs outside the lock, so one large file does not hold up
+        # lookups of others, and concurrent misses on it share one parse
+        return self._flights.do((key, kind), lambda: self._load(key, kind, compute))
+
+    def _load(self, key, kind, compute):
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is not None and kind in dataset:
+                self.hits += 1
+                return dataset[kind]
+            self.misses += 1
+
+        value = compute()
+
+        size = resident_bytes(value)
+
+        with self._lock:
+            dataset = self._datasets.get(key)
+            if dataset is None:
+                for stale in [k for k in self._datasets
+                              if k[0][0] == key[0][0] and k[0] != key[0]]:
+                    self._evict(stale)
+                dataset = self._datasets[key] = {}
+
+            dataset[kind] = value
+            self._sizes[key, kind] = size
+            self._datasets.move_to_end(key)
+            while len(self._datasets) > self.max_datasets:
+                self._evict(next(iter(self._datasets)))
+            return value
+
+    def _evict(self, key):
+        for kind in self._datasets.pop(key):
+            self._sizes.pop((key, kind), None)
+        self.evictions += 1
+
+    def get_particles(self, filepath, file_type, load):
+        return self.get(filepath, file_type, 'particles', load)
+
+    def get_table(self, filepath, file_type, load, compact=False):
+        return self.get(filepath, file_type, 'compact-table' if compact else 'table', load)
+
+    def get_statistics(self, filepath, file_type, particles, compact=False):
+        from particle_picker.analysis.statistics import ParticleStatistics
+
+        return self.get(filepath, file_type, 'compact-statistics' if compact else 'statistics',
+                        lambda: MemoizedStatistics(ParticleStatistics(particles)))
+
+    def clear(self):
+        with self._lock:
+            self._datasets.clear()
+            self._sizes.clear()
+
+    def info(self):
+        with self._lock:
+            return {
+                'datasets': len(self._datasets),
+                'max_datasets': self.max_datasets,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def memory_usage(self):
+        # (path, file type, kind, bytes) for every cached value
+        with self._lock:
+            return [(key[0][0], key[1], kind, size)
+                    for (key, kind), size in self._sizes.items()]
+
+    def metrics(self, name='datasets'):
+        info = self.info()
+        result = cache_metrics(name, info['hits'], info['misses'], info['evictions'],
+                               info['datasets'])
+        resident = metrics.Gauge('particle_picker_dataset_resident_bytes',
+                                 'Approximate memory held by a cached dataset',
+                                 ['cache', 'path', 'type', 'kind'])
+        for path, file_type, kind, size in self.memory_usage():
+            if size:
+                resident.set(size, cache=name, path=path, type=file_type, kind=kind)
+        return result + [resident]
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_cache():
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = DatasetCache()
+        return _shared_cache
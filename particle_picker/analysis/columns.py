@@ -0,0 +1,9 @@
+def find_micrograph_column(columns, preferred='MicrographName'):
+    if preferred in columns:
+        return preferred
+
+    possible_cols = [col for col in columns
+                     if 'micrograph' in col.lower() or 'image' in col.lower()]
+    if possible_cols:
+        return possible_cols[0]
+    return preferred
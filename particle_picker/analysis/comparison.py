@@ -0,0 +1,115 @@
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from particle_picker.profiling import profiled
+
+
+def normalize_micrograph_names(names):
+    # Same basename rule command_list uses for display
+    names = pd.Series(np.asarray(names, dtype=object), dtype=object).astype(str)
+    return names.str.rsplit('/', n=1).str[-1].str.rsplit('\\', n=1).str[-1].to_numpy(dtype=object)
+
+
+def run_labels(paths):
+    labels = []
+    seen = {}
+    for path in paths:
+        label = Path(str(path)).name
+        seen[label] = seen.get(label, 0) + 1
+        labels.append(label if seen[label] == 1 else f"{label}#{seen[label]}")
+    return labels
+
+
+def average_ranks(counts):
+    # Column-wise average ranks (ties share their mean rank). Counts are
+    # small integers, so one histogram per column replaces a sort.
+    counts = np.asarray(counts)
+    rows, columns = counts.shape
+    if not counts.size:
+        return np.zeros(counts.shape)
+
+    low = int(counts.min())
+    span = int(counts.max()) - low + 1
+    if counts.dtype.kind not in 'iu' or span * columns > 4 * counts.size + 1024:
+        return pd.DataFrame(counts).rank(axis=0).to_numpy(dtype=np.float64)
+
+    keys = (counts - low).astype(np.int64) + np.arange(columns) * span
+    histogram = np.bincount(keys.ravel(), minlength=span * columns)
+    below = np.cumsum(histogram) - histogram
+    return below[keys] - np.arange(columns) * rows + (histogram[keys] + 1) / 2
+
+
+def rank_correlation(counts):
+    # Spearman rho between every pair of columns: Pearson on average ranks,
+    # as one matrix product rather than a loop over pairs
+    ranks = average_ranks(counts)
+    ranks -= ranks.mean(axis=0)
+    norms = np.sqrt((ranks ** 2).sum(axis=0))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ranks /= norms
+    correlation = ranks.T @ ranks
+    correlation[:, ~(norms > 0)] = np.nan
+    correlation[~(norms > 0), :] = np.nan
+    return correlation
+
+
+@profiled('compare.per_micrograph')
+def compare_micrographs(distributions, labels):
+    # distributions: one (names, counts) pair per run. Names from all runs
+    # are dictionary-encoded together, so the join is one scatter into a
+    # micrographs x runs matrix instead of pairwise merges.
+    lengths = [len(run_names) for run_names, _ in distributions]
+    all_names = (np.concatenate([np.asarray(run_names, dtype=object)
+                                 for run_names, _ in distributions])
+                 if distributions else np.empty(0, dtype=object))
+
+    # Normalize each distinct name once, then merge names that share a basename
+    raw_codes, raw_names = pd.factorize(all_names)
+    basename_codes, micrographs = pd.factorize(normalize_micrograph_names(raw_names))
+    codes = basename_codes[raw_codes]
+    runs = np.repeat(np.arange(len(labels)), lengths)
+    counts = np.concatenate([np.asarray(run_counts, dtype=np.int64)
+                             for _, run_counts in distributions]) if distributions else np.empty(0)
+
+    matrix = np.zeros((len(micrographs), len(labels)), dtype=np.int32)
+    if len(micrographs) == len(raw_names):
+        matrix[codes, runs] = counts
+    else:
+        # Some names share a basename and may land in the same cell
+        np.add.at(matrix, (codes, runs), counts)
+    present = np.zeros(matrix.shape, dtype=bool)
+    present[codes, runs] = True
+
+    order = np.argsort(np.asarray(micrographs, dtype=object), kind='stable')
+    matrix, present = matrix[order], present[order]
+    index = pd.Index(np.asarray(micrographs, dtype=object)[order], name='Micrograph')
+
+    deltas = matrix - matrix[:, :1]
+    wide = pd.DataFrame(np.hstack([matrix, deltas[:, 1:]]), index=index,
+                        columns=list(labels) + [f'delta:{label}' for label in labels[1:]])
+    wide['present'] = present.sum(axis=1)
+    wide['max_abs_delta'] = np.abs(deltas).max(axis=1) if len(labels) else 0
+
+    correlation = rank_correlation(matrix)
+    totals = matrix.sum(axis=0)
+    summary = []
+    for i, label in enumerate(labels):
+        micrograph_count = int(present[:, i].sum())
+        summary.append({
+            'run': label,
+            'micrographs': micrograph_count,
+            'missing_micrographs': int(len(index) - micrograph_count),
+            'particles': int(totals[i]),
+            'avg_particles_per_micrograph': float(totals[i] / micrograph_count)
+            if micrograph_count else 0.0,
+            'delta_particles': int(totals[i] - totals[0]),
+            'spearman_vs_reference': float(correlation[i, 0]),
+        })
+
+    return {
+        'matrix': wide,
+        'correlation': pd.DataFrame(correlation, index=labels, columns=labels),
+        'runs': summary,
+    }
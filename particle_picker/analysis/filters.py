@@ -0,0 +1,350 @@
+import re
+import numpy as np
+import pandas as pd
+
+from particle_picker.analysis.columns import find_micrograph_column
+
+GROUP_FUNCTIONS = {'count', 'mean', 'min', 'max', 'std', 'sum'}
+ROW_FUNCTIONS = {'abs', 'basename'}
+KEYWORDS = {'and', 'or', 'not', 'in', 'between'}
+COMPARISONS = {'==', '!=', '<', '<=', '>', '>='}
+
+TOKEN_PATTERN = re.compile(r'''
+    \s*(?:
+        (?P<number>\d+\.\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?|\d+(?:[eE][-+]?\d+)?)
+      | (?P<string>'[^']*'|"[^"]*")
+      | (?P<file>@[^\s\]\)]+)
+      | (?P<name>[A-Za-z_][A-Za-z0-9_\.]*)
+      | (?P<op>==|!=|<=|>=|<|>|\+|-|\*|/|\(|\)|\[|\]|,)
+    )
+''', re.VERBOSE)
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+def tokenize(expression):
+    tokens = []
+    pos = 0
+    expression = expression.strip()
+
+    while pos < len(expression):
+        match = TOKEN_PATTERN.match(expression, pos)
+        if not match or match.end() == pos:
+            raise FilterSyntaxError(f"Unexpected character at position {pos}: {expression[pos:]!r}")
+
+        kind = match.lastgroup
+        value = match.group(kind)
+
+        if kind == 'number':
+            tokens.append(('number', float(value)))
+        elif kind == 'string':
+            tokens.append(('string', value[1:-1]))
+        elif kind == 'file':
+            tokens.append(('file', value[1:]))
+        elif kind == 'name' and value.lower() in KEYWORDS:
+            tokens.append(('keyword', value.lower()))
+        else:
+            tokens.append((kind, value))
+
+        pos = match.end()
+        while pos < len(expression) and expression[pos].isspace():
+            pos += 1
+
+    return tokens
+
+
+class _ExpressionParser:
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+
+    def parse(self):
+        node = self._parse_or()
+        if self.pos != len(self.tokens):
+            raise FilterSyntaxError(f"Unexpected token: {self.tokens[self.pos][1]!r}")
+        return node
+
+    def _peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def _accept(self, kind, value=None):
+        token_kind, token_value = self._peek()
+        if token_kind == kind and (value is None or token_value == value):
+            self.pos += 1
+            return token_value
+        return None
+
+    def _expect(self, kind, value=None):
+        token_value = self._accept(kind, value)
+        if token_value is None:
+            found = self._peek()[1]
+            raise FilterSyntaxError(f"Expected {value or kind!r}, found {found!r}")
+        return token_value
+
+    def _parse_or(self):
+        node = self._parse_and()
+        while self._accept('keyword', 'or'):
+            node = ('or', node, self._parse_and())
+        return node
+
+    def _parse_and(self):
+        node = self._parse_not()
+        while self._accept('keyword', 'and'):
+            node = ('and', node, self._parse_not())
+        return node
+
+    def _parse_not(self):
+        if self._accept('keyword', 'not'):
+            return ('not', self._parse_not())
+        return self._parse_comparison()
+
+    def _parse_comparison(self):
+        left = self._parse_sum()
+        kind, value = self._peek()
+
+        if kind == 'op' and value in COMPARISONS:
+            self.pos += 1
+            return ('cmp', value, left, self._parse_sum())
+
+        if self._accept('keyword', 'between'):
+            low = self._parse_sum()
+            self._expect('keyword', 'and')
+            return ('between', left, low, self._parse_sum())
+
+        if self._accept('keyword', 'not'):
+            self._expect('keyword', 'in')
+            return ('not', ('in', left, self._parse_values()))
+
+        if self._accept('keyword', 'in'):
+            return ('in', left, self._parse_values())
+
+        return left
+
+    def _parse_values(self):
+        filename = self._accept('file')
+        if filename is not None:
+            return read_value_list(filename)
+
+        self._expect('op', '[')
+        values = []
+        while self._accept('op', ']') is None:
+            if values:
+                self._expect('op', ',')
+            negative = self._accept('op', '-') is not None
+            kind, value = self._peek()
+            if kind == 'number':
+                values.append(-value if negative else value)
+            elif kind in ('string', 'name') and not negative:
+                values.append(value)
+            else:
+                raise FilterSyntaxError(f"Invalid list value: {value!r}")
+            self.pos += 1
+        return values
+
+    def _parse_sum(self):
+        node = self._parse_term()
+        while True:
+            op = self._accept('op', '+') or self._accept('op', '-')
+            if op is None:
+                return node
+            node = ('binop', op, node, self._parse_term())
+
+    def _parse_term(self):
+        node = self._parse_unary()
+        while True:
+            op = self._accept('op', '*') or self._accept('op', '/')
+            if op is None:
+                return node
+            node = ('binop', op, node, self._parse_unary())
+
+    def _parse_unary(self):
+        if self._accept('op', '-'):
+            return ('neg', self._parse_unary())
+        return self._parse_atom()
+
+    def _parse_atom(self):
+        kind, value = self._peek()
+
+        if kind == 'number':
+            self.pos += 1
+            return ('const', value)
+
+        if kind == 'string':
+            self.pos += 1
+            return ('const', value)
+
+        if kind == 'name':
+            self.pos += 1
+            if self._accept('op', '('):
+                return self._parse_call(value)
+            return ('column', value)
+
+        if self._accept('op', '('):
+            node = self._parse_or()
+            self._expect('op', ')')
+            return node
+
+        raise FilterSyntaxError(f"Unexpected token: {value!r}")
+
+    def _parse_call(self, name):
+        func = name.lower()
+        arg = None
+
+        if self._accept('op', ')') is None:
+            arg = self._expect('name')
+            self._expect('op', ')')
+
+        if func in GROUP_FUNCTIONS:
+            if func != 'count' and arg is None:
+                raise FilterSyntaxError(f"{func}() requires a column argument")
+            return ('group', func, arg)
+
+        if func in ROW_FUNCTIONS:
+            if arg is None:
+                raise FilterSyntaxError(f"{func}() requires a column argument")
+            return ('call', func, ('column', arg))
+
+        raise FilterSyntaxError(f"Unknown function: {name}")
+
+
+def read_value_list(filepath):
+    values = []
+    with open(filepath, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                values.append(line)
+    return values
+
+
+def _walk(node):
+    yield node
+    for child in node[1:]:
+        if isinstance(child, tuple):
+            yield from _walk(child)
+
+
+class ParticleFilter:
+
+    def __init__(self, expression, micrograph_col='MicrographName'):
+        self.expression = expression
+        self.micrograph_col = micrograph_col
+        self.tree = _ExpressionParser(tokenize(expression)).parse()
+
+        self.group_terms = sorted({(node[1], node[2]) for node in _walk(self.tree)
+                                   if node[0] == 'group'}, key=str)
+        self.columns = sorted({node[1] for node in _walk(self.tree) if node[0] == 'column'} |
+                              {term[1] for term in self.group_terms if term[1]})
+
+    @property
+    def requires_groups(self):
+        return bool(self.group_terms)
+
+    def mask(self, df):
+        missing = [col for col in self.columns if col not in df.columns]
+        if missing:
+            raise KeyError(f"Columns not found: {', '.join(missing)}")
+
+        group_values = self._compute_group_values(df) if self.group_terms else {}
+        result = self._evaluate(self.tree, df, group_values)
+
+        if np.ndim(result) == 0:
+            return np.full(len(df), bool(result))
+        return np.asarray(result, dtype=bool)
+
+    def apply(self, df):
+        return df[self.mask(df)]
+
+    def _compute_group_values(self, df):
+        micrograph_col = find_micrograph_column(df.columns, self.micrograph_col)
+        if micrograph_col not in df.columns:
+            raise KeyError("Group functions require a micrograph column")
+
+        codes, _ = pd.factorize(df[micrograph_col])
+        spec = {}
+        for func, col in self.group_terms:
+            key = f'{func}_{col}'
+            spec[key] = (micrograph_col, 'size') if func == 'count' else (col, func)
+
+        aggregated = df.groupby(codes).agg(**spec)
+
+        return {(func, col): aggregated[f'{func}_{col}'].to_numpy()[codes]
+                for func, col in self.group_terms}
+
+    def _evaluate(self, node, df, group_values):
+        kind = node[0]
+
+        if kind == 'const':
+            return node[1]
+
+        if kind == 'column':
+            return df[node[1]].to_numpy()
+
+        if kind == 'group':
+            return group_values[(node[1], node[2])]
+
+        if kind == 'call':
+            values = self._evaluate(node[2], df, group_values)
+            if node[1] == 'abs':
+                return np.abs(values)
+            return pd.Series(values, dtype=str).str.replace(r'^.*[/\\]', '', regex=True).to_numpy()
+
+        if kind == 'neg':
+            return -self._evaluate(node[1], df, group_values)
+
+        if kind == 'binop':
+            left = self._evaluate(node[2], df, group_values)
+            right = self._evaluate(node[3], df, group_values)
+            if node[1] == '+':
+                return left + right
+            if node[1] == '-':
+                return left - right
+            if node[1] == '*':
+                return left * right
+            return left / right
+
+        if kind == 'cmp':
+            left = self._evaluate(node[2], df, group_values)
+            right = self._evaluate(node[3], df, group_values)
+            if node[1] == '==':
+                return left == right
+            if node[1] == '!=':
+                return left != right
+            if node[1] == '<':
+                return left < right
+            if node[1] == '<=':
+                return left <= right
+            if node[1] == '>':
+                return left > right
+            return left >= right
+
+        if kind == 'between':
+            values = self._evaluate(node[1], df, group_values)
+            low = self._evaluate(node[2], df, group_values)
+            high = self._evaluate(node[3], df, group_values)
+            return (values >= low) & (values <= high)
+
+        if kind == 'in':
+            values = self._evaluate(node[1], df, group_values)
+            dtype = object if _has_strings(node[2]) else float
+            return np.isin(values, np.asarray(node[2], dtype=dtype))
+
+        if kind == 'not':
+            return ~self._as_mask(self._evaluate(node[1], df, group_values), len(df))
+
+        left = self._as_mask(self._evaluate(node[1], df, group_values), len(df))
+        right = self._as_mask(self._evaluate(node[2], df, group_values), len(df))
+        return (left & right) if kind == 'and' else (left | right)
+
+    @staticmethod
+    def _as_mask(values, length):
+        if np.ndim(values) == 0:
+            return np.full(length, bool(values))
+        return np.asarray(values, dtype=bool)
+
+
+def _has_strings(values):
+    return any(isinstance(value, str) for value in values)
@@ -0,0 +1,159 @@
+import threading
+import numpy as np
+import pandas as pd
+from pathlib import Path
+
+from particle_picker.analysis.columns import find_micrograph_column
+from particle_picker.parsers.tail_reader import IncrementalReader
+
+
+class RunningMoments:
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def update(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if len(values) == 0:
+            return
+
+        batch_count = len(values)
+        batch_mean = float(values.mean())
+        batch_m2 = float(((values - batch_mean) ** 2).sum())
+
+        total = self.count + batch_count
+        delta = batch_mean - self.mean
+        self.mean += delta * batch_count / total
+        self.m2 += batch_m2 + delta * delta * self.count * batch_count / total
+        self.count = total
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+    def to_dict(self):
+        return {
+            'mean': self.mean,
+            'std': float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else float('nan'),
+            'min': self.min,
+            'max': self.max
+        }
+
+
+class IncrementalStatistics:
+
+    def __init__(self, micrograph_col='MicrographName'):
+        self.micrograph_col = micrograph_col
+        self.reset()
+
+    def reset(self):
+        self.total_particles = 0
+        self.micrograph_counts = {}
+        self.coordinate_moments = {}
+        self.defocus_moments = {}
+        self._columns_resolved = False
+
+    def update(self, df):
+        if df is None or df.empty:
+            return
+
+        if not self._columns_resolved:
+            self._resolve_columns(df)
+
+        self.total_particles += len(df)
+
+        if self.micrograph_col in df.columns:
+            counts = self.micrograph_counts
+            for micrograph, count in df[self.micrograph_col].value_counts(sort=False).items():
+                counts[micrograph] = counts.get(micrograph, 0) + int(count)
+
+        for moments in (self.coordinate_moments, self.defocus_moments):
+            for col, running in moments.items():
+                if col in df.columns and pd.api.types.is_numeric_dtype(df[col]):
+                    running.update(df[col].to_numpy())
+
+    def _resolve_columns(self, df):
+        self.micrograph_col = find_micrograph_column(df.columns, self.micrograph_col)
+
+        for col in df.columns:
+            if not pd.api.types.is_numeric_dtype(df[col]):
+                continue
+            if any(x in col.lower() for x in ['coordinatex', 'coordinatey', '_x', '_y']):
+                self.coordinate_moments[col] = RunningMoments()
+            elif 'defocus' in col.lower():
+                self.defocus_moments[col] = RunningMoments()
+
+        self._columns_resolved = True
+
+    def get_distribution_per_micrograph(self):
+        if not self.micrograph_counts:
+            return pd.Series(dtype=int)
+        return pd.Series(self.micrograph_counts).sort_values(ascending=False)
+
+    def get_coordinate_statistics(self):
+        return {col: running.to_dict() for col, running in self.coordinate_moments.items()
+                if running.count}
+
+    def get_defocus_statistics(self):
+        return {col: running.to_dict() for col, running in self.defocus_moments.items()
+                if running.count}
+
+    def get_summary_statistics(self):
+        summary = {
+            'total_particles': self.total_particles,
+            'total_micrographs': 0,
+            'avg_particles_per_micrograph': 0,
+            'min_particles_per_micrograph': 0,
+            'max_particles_per_micrograph': 0,
+            'std_particles_per_micrograph': 0
+        }
+
+        if self.micrograph_counts:
+            counts = np.fromiter(self.micrograph_counts.values(), dtype=np.int64,
+                                 count=len(self.micrograph_counts))
+            summary['total_micrographs'] = len(counts)
+            summary['avg_particles_per_micrograph'] = float(counts.mean())
+            summary['min_particles_per_micrograph'] = int(counts.min())
+            summary['max_particles_per_micrograph'] = int(counts.max())
+            summary['std_particles_per_micrograph'] = (
+                float(counts.std(ddof=1)) if len(counts) > 1 else float('nan')
+            )
+
+        return summary
+
+
+class FileWatcher:
+
+    def __init__(self, filepath, file_type):
+        self.reader = IncrementalReader(filepath, file_type)
+        self.stats = IncrementalStatistics()
+        self.updates = 0
+        self._lock = threading.Lock()
+
+    def poll(self):
+        with self._lock:
+            df = self.reader.read_new()
+            if self.reader.truncated:
+                self.stats.reset()
+
+            if df is None or df.empty:
+                return 0
+
+            self.stats.update(df)
+            self.updates += 1
+            return len(df)
+
+
+_watchers = {}
+_watchers_lock = threading.Lock()
+
+
+def get_watcher(filepath, file_type):
+    key = (str(Path(filepath).resolve()), file_type)
+    with _watchers_lock:
+        if key not in _watchers:
+            _watchers[key] = FileWatcher(filepath, file_type)
+        return _watchers[key]
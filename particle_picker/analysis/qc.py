@@ -0,0 +1,115 @@
+import numpy as np
+import pandas as pd
+
+from particle_picker.profiling import profiled
+
+# Iglewicz and Hoaglin: |modified z| > 3.5 marks a likely outlier
+DEFAULT_THRESHOLD = 3.5
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+FEATURES = ['count', 'spread', 'centroid_offset', 'defocus_residual']
+# Flag -> (feature, direction); direction 0 flags both tails
+FLAG_RULES = {
+    'few_picks': ('count', -1),
+    'over_picked': ('count', 1),
+    'clustered': ('spread', -1),
+    'off_center': ('centroid_offset', 1),
+    'defocus': ('defocus_residual', 0),
+}
+FLAGS = ['empty'] + list(FLAG_RULES)
+
+
+def robust_zscores(features):
+    # Column-wise (x - median) / (1.4826 * MAD) for an (n, k) matrix. Columns
+    # with MAD 0 fall back to the mean absolute deviation, then to 0
+    features = np.asarray(features, dtype=np.float64)
+    median = np.nanmedian(features, axis=0)
+    deviation = np.abs(features - median)
+
+    scale = MAD_SCALE * np.nanmedian(deviation, axis=0)
+    fallback = MEAN_AD_SCALE * np.nanmean(deviation, axis=0)
+    scale = np.where(scale > 0, scale, fallback)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        scores = (features - median) / scale
+    scores[:, ~(scale > 0)] = 0.0
+    return scores
+
+
+def rolling_trend(values, window):
+    # Centered rolling median in acquisition order
+    return pd.Series(values).rolling(window, center=True, min_periods=1).median().to_numpy()
+
+
+def micrograph_features(stats, window=None, expected=None):
+    table = stats.get_per_micrograph_table()
+    names = np.asarray(stats.table.names if stats.table.names is not None else [], dtype=object)
+    acquisition = pd.Index(names).get_indexer(table.index)
+
+    features = pd.DataFrame({
+        'order': acquisition,
+        'count': table['count'].to_numpy(),
+        'spread': table['spread'].to_numpy(),
+        'defocus_mean': table['defocus_mean'].to_numpy(),
+    }, index=table.index)
+
+    centroid = table[['centroid_x', 'centroid_y']].to_numpy()
+    features['centroid_offset'] = np.hypot(*(centroid - np.nanmedian(centroid, axis=0)).T)
+
+    defocus = features['defocus_mean'].to_numpy()
+    if window and window > 1:
+        in_order = np.argsort(acquisition, kind='stable')
+        trend = np.empty_like(defocus)
+        trend[in_order] = rolling_trend(defocus[in_order], window)
+    else:
+        trend = np.full_like(defocus, np.nanmedian(defocus) if len(defocus) else np.nan)
+    features['defocus_trend'] = trend
+    features['defocus_residual'] = defocus - trend
+
+    if expected is not None:
+        missing = pd.Index(expected).difference(features.index)
+        if len(missing):
+            empty = pd.DataFrame({'order': -1, 'count': 0}, index=missing)
+            features = pd.concat([features, empty]).rename_axis(table.index.name)
+
+    return features
+
+
+@profiled('qc.flag_micrographs')
+def flag_micrographs(stats, threshold=DEFAULT_THRESHOLD, window=None, expected=None):
+    features = micrograph_features(stats, window=window, expected=expected)
+    picked = features['count'].to_numpy() > 0
+
+    scores = np.full((len(features), len(FEATURES)), np.nan)
+    if picked.any():
+        scores[picked] = robust_zscores(features.loc[picked, FEATURES].to_numpy())
+    for i, feature in enumerate(FEATURES):
+        features[f'z_{feature}'] = scores[:, i]
+
+    masks = {'empty': ~picked}
+    for flag, (feature, direction) in FLAG_RULES.items():
+        z = scores[:, FEATURES.index(feature)]
+        with np.errstate(invalid='ignore'):
+            masks[flag] = (np.abs(z) if direction == 0 else direction * z) > threshold
+
+    # Build one label per distinct flag combination instead of per row
+    bits = sum(masks[flag].astype(np.int64) << i for i, flag in enumerate(FLAGS))
+    combinations, inverse = np.unique(bits, return_inverse=True)
+    labels = np.array([','.join(flag for i, flag in enumerate(FLAGS) if value >> i & 1)
+                       for value in combinations], dtype=object)
+    features['flags'] = labels[inverse]
+    return features
+
+
+def flagged_micrographs(features):
+    return features[features['flags'] != '']
+
+
+def write_exclusion_list(features, output_path, threshold=DEFAULT_THRESHOLD):
+    flagged = flagged_micrographs(features)
+    with open(output_path, 'w') as f:
+        f.write(f"# {len(flagged)} micrographs flagged by qc (|z| > {threshold})\n")
+        for name in flagged.index:
+            f.write(f"{name}\n")
+    return len(flagged)
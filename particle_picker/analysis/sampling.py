@@ -0,0 +1,283 @@
+import io
+import math
+
+import numpy as np
+import pandas as pd
+
+from particle_picker.profiling import span
+from particle_picker.analysis.columns import find_micrograph_column
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.parsers import parallel
+from particle_picker.parsers.compression import detect_compression
+from particle_picker.parsers.tokenizer import summarize_counts
+
+Z_95 = 1.959963984540054
+DEFAULT_SAMPLE_ROWS = 10000
+PILOT_ROWS = 2000
+MAX_SAMPLE_ROWS = 200000
+MAX_SAMPLE_FRACTION = 0.25
+PROBE_BYTES = 64 * 1024
+BOX_COLUMNS = ['x', 'y', 'width', 'height']
+
+
+class ReservoirSampler:
+
+    def __init__(self, size, seed=None):
+        self.size = size
+        self.rows_seen = 0
+        self.sample = None
+        self._keys = np.empty(0)
+        self._rng = np.random.default_rng(seed)
+
+    def update(self, df):
+        if df is None or df.empty:
+            return
+
+        # Keeping the rows with the smallest random keys is equivalent to
+        # reservoir sampling, and works on whole batches at a time
+        keys = self._rng.random(len(df))
+        df = df.reset_index(drop=True)
+        df.index += self.rows_seen
+        self.rows_seen += len(df)
+
+        if self.sample is not None:
+            df = pd.concat([self.sample, df])
+            keys = np.concatenate([self._keys, keys])
+
+        if len(df) > self.size:
+            keep = np.sort(np.argpartition(keys, self.size - 1)[:self.size])
+            df = df.iloc[keep]
+            keys = keys[keep]
+
+        self.sample = df
+        self._keys = keys
+
+    def get_sample(self, size=None):
+        if self.sample is None or size is None or size >= len(self.sample):
+            return self.sample
+        keep = np.sort(np.argpartition(self._keys, size - 1)[:size])
+        return self.sample.iloc[keep]
+
+
+def _locate_body(filepath, file_type):
+    if file_type == 'star':
+        return parallel.locate_star_loop(filepath)
+    if file_type == 'csv':
+        return parallel.locate_csv_body(filepath)
+    if file_type == 'box':
+        with open(filepath, 'rb') as f:
+            f.seek(0, 2)
+            return BOX_COLUMNS, 0, f.tell()
+    return None
+
+
+def _parse_lines(file_type, columns, lines):
+    if file_type == 'star':
+        from particle_picker.parsers.star_parser import StarFileParser
+
+        rows = [values for values in (line.decode().split() for line in lines)
+                if len(values) == len(columns)]
+        return StarFileParser._rows_to_frame(rows, columns)
+
+    data = io.BytesIO(b''.join(line if line.endswith(b'\n') else line + b'\n' for line in lines))
+
+    if file_type == 'csv':
+        from particle_picker.parsers.csv_parser import CSVParticleParser, declared_dtypes
+
+        dtypes = declared_dtypes(columns)
+        try:
+            df = pd.read_csv(data, header=None, names=columns, dtype=dtypes or None)
+        except (ValueError, TypeError):
+            data.seek(0)
+            df, dtypes = pd.read_csv(data, header=None, names=columns), {}
+        return CSVParticleParser._convert_numeric(df, skip=dtypes)
+
+    df = pd.read_csv(data, sep=r'\s+', header=None, names=columns)
+    for col in df.columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce')
+    return df.dropna()
+
+
+def sample_by_offsets(filepath, file_type, size, seed=None):
+    if detect_compression(filepath) is not None:
+        return None
+
+    layout = _locate_body(filepath, file_type)
+    if layout is None:
+        return None
+
+    columns, start, end = layout
+    body = end - start
+
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        probe = f.read(min(PROBE_BYTES, body))
+        probe_lines = probe.count(b'\n')
+        if not probe_lines or size >= MAX_SAMPLE_FRACTION * body * probe_lines / len(probe):
+            return None
+
+        # Each offset selects the line that starts after it, so rows are
+        # drawn close to uniformly as long as row lengths are similar
+        lines = {}
+        rng = np.random.default_rng(seed)
+        with span('sample.read_offsets', rows=size):
+            for offset in np.sort(rng.integers(start, end, size)):
+                f.seek(offset - 1 if offset > start else start)
+                if offset > start:
+                    f.readline()
+                position = f.tell()
+                if position < end and position not in lines:
+                    lines[position] = f.readline()[:end - position]
+
+    lines = [line for line in lines.values() if line.strip()]
+    if len(lines) < 2:
+        return None
+
+    with span('sample.parse', rows=len(lines)):
+        sample = _parse_lines(file_type, columns, lines).reset_index(drop=True)
+    if sample.empty:
+        return None
+
+    lengths = np.array([len(line) for line in lines], dtype=float)
+    valid = len(sample) / len(lines)
+    estimate = body / lengths.mean() * valid
+    relative_se = math.sqrt(((lengths.std(ddof=1) / lengths.mean()) ** 2
+                             + (1 - valid) / valid) / len(lines))
+    interval = (estimate * (1 - Z_95 * relative_se), estimate * (1 + Z_95 * relative_se))
+
+    return sample, int(round(estimate)), tuple(int(round(value)) for value in interval)
+
+
+def sample_by_reservoir(filepath, file_type, size, seed=None, batch_size=100000):
+    from particle_picker.parsers.loader import iter_particle_batches
+
+    sampler = ReservoirSampler(size, seed)
+    counts = {}
+    micrograph_col = None
+
+    for df in iter_particle_batches(filepath, file_type, batch_size=batch_size):
+        if df is None or df.empty:
+            continue
+        if micrograph_col is None:
+            micrograph_col = find_micrograph_column(df.columns)
+        if micrograph_col in df.columns:
+            for name, count in df[micrograph_col].value_counts(sort=False).items():
+                counts[name] = counts.get(name, 0) + int(count)
+        sampler.update(df)
+
+    return sampler, counts
+
+
+def rows_for_error(sample, relative_error, z=Z_95):
+    stats = ParticleStatistics(sample)
+    needed = PILOT_ROWS
+    columns = {**stats.get_coordinate_statistics(), **stats.get_defocus_statistics()}
+
+    for values in columns.values():
+        if values['mean'] and math.isfinite(values['std']):
+            needed = max(needed, math.ceil(
+                (z * values['std'] / (relative_error * abs(values['mean']))) ** 2
+            ))
+    return min(needed, MAX_SAMPLE_ROWS)
+
+
+class ApproximateStatistics:
+
+    def __init__(self, sample, total_particles, method, total_ci=None, counts=None, z=Z_95):
+        self.df = sample
+        self.stats = ParticleStatistics(sample)
+        self.table = self.stats.table
+        self.micrograph_col = self.stats.micrograph_col
+        self.total_particles = total_particles
+        self.total_ci = total_ci or (total_particles, total_particles)
+        self.method = method
+        self.counts = counts
+        self.z = z
+
+    @property
+    def sample_rows(self):
+        return len(self.df)
+
+    def _with_intervals(self, stats, median=False):
+        for col, values in stats.items():
+            ordered = np.sort(self.df[col].dropna().to_numpy(dtype=float))
+            n = len(ordered)
+            half = self.z * values['std'] / math.sqrt(n) if n > 1 else float('nan')
+            values['mean_ci'] = [values['mean'] - half, values['mean'] + half]
+
+            if median and n:
+                spread = self.z * math.sqrt(n) / 2
+                low = max(int(math.floor(n / 2 - spread)), 0)
+                high = min(int(math.ceil(n / 2 + spread)), n - 1)
+                values['median_ci'] = [float(ordered[low]), float(ordered[high])]
+        return stats
+
+    def get_coordinate_statistics(self):
+        return self._with_intervals(self.stats.get_coordinate_statistics(), median=True)
+
+    def get_defocus_statistics(self):
+        return self._with_intervals(self.stats.get_defocus_statistics())
+
+    def get_distribution_per_micrograph(self):
+        if not self.counts:
+            return pd.Series(dtype=int)
+        return pd.Series(self.counts).sort_values(ascending=False)
+
+    def get_summary_statistics(self):
+        if self.counts is not None:
+            summary = summarize_counts(self.total_particles, self.counts)
+        else:
+            summary = {'total_particles': self.total_particles}
+
+        summary['total_particles_ci'] = list(self.total_ci)
+        summary['sample_rows'] = self.sample_rows
+        summary['sampling'] = self.method
+        return summary
+
+    def get_heatmap_data(self, bin_size=100):
+        data = self.stats.get_heatmap_data(bin_size=bin_size)
+        if data is not None and self.sample_rows:
+            data['histogram'] = data['histogram'] * (self.total_particles / self.sample_rows)
+        return data
+
+
+def approximate_statistics(filepath, file_type, sample_rows=None, error=None, count=None,
+                           seed=None):
+    sample_rows = sample_rows or DEFAULT_SAMPLE_ROWS
+
+    with span('sample.approximate'):
+        result = None
+        if error is not None:
+            pilot = sample_by_offsets(filepath, file_type, PILOT_ROWS, seed)
+            if pilot is not None:
+                sample_rows = rows_for_error(pilot[0], error)
+                result = sample_by_offsets(filepath, file_type, sample_rows, seed)
+        else:
+            result = sample_by_offsets(filepath, file_type, sample_rows, seed)
+
+        counts = None
+        if result is not None:
+            sample, total, total_ci = result
+            method = 'byte-offset'
+            if count is not None:
+                counts = count()
+        else:
+            sampler, scanned = sample_by_reservoir(
+                filepath, file_type, MAX_SAMPLE_ROWS if error is not None else sample_rows, seed
+            )
+            if sampler.sample is None:
+                return None
+            if error is not None:
+                sample_rows = rows_for_error(sampler.sample, error)
+            sample = sampler.get_sample(sample_rows)
+            total, total_ci = sampler.rows_seen, None
+            method = 'reservoir'
+            counts = (total, scanned)
+
+    if counts is not None:
+        total, total_ci = counts[0], None
+        counts = counts[1]
+
+    if sample.empty:
+        return None
+    return ApproximateStatistics(sample, total, method, total_ci=total_ci, counts=counts)
@@ -2,61 +2,173 @@ import pandas as pd
 import numpy as np
 from pathlib import Path
 
+from particle_picker.profiling import profiled
+from particle_picker.analysis.columns import find_micrograph_column
+from particle_picker.analysis.table import ParticleTable
+
+
+def _row_count(stats):
+    return len(stats.table)
+
+
+def _describe(values, median=False):
+    values = np.asarray(values, dtype=np.float64)
+    missing = np.isnan(values)
+    if missing.any():
+        values = values[~missing]
+
+    n = len(values)
+    if n == 0:
+        stats = {'mean': float('nan'), 'std': float('nan'),
+                 'min': float('nan'), 'max': float('nan')}
+    else:
+        mean = values.sum() / n
+        std = np.sqrt(((mean - values) ** 2).sum() / (n - 1)) if n > 1 else np.nan
+        stats = {
+            'mean': float(mean),
+            'std': float(std),
+            'min': float(values.min()),
+            'max': float(values.max())
+        }
+
+    if median:
+        stats['median'] = float(np.median(values)) if n else float('nan')
+    return stats
+
+
+def _segment_describe(values, starts):
+    # Per-segment count/mean/std/min/max of rows grouped contiguously,
+    # skipping NaN; one reduceat per moment instead of a groupby per metric
+    values = np.asarray(values, dtype=np.float64)
+    valid = ~np.isnan(values)
+    lengths = np.diff(np.append(starts, len(values)))
+
+    n = np.add.reduceat(valid.astype(np.int64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = np.add.reduceat(np.where(valid, values, 0.0), starts) / n
+        deviations = np.where(valid, values - np.repeat(mean, lengths), 0.0)
+        std = np.sqrt(np.add.reduceat(deviations ** 2, starts) / (n - 1))
+    std[n < 2] = np.nan
+
+    return mean, std, np.fmin.reduceat(values, starts), np.fmax.reduceat(values, starts)
+
+
+PER_MICROGRAPH_COLUMNS = [
+    'count', 'defocus_mean', 'defocus_std', 'centroid_x', 'centroid_y', 'std_x', 'std_y',
+    'spread', 'min_x', 'max_x', 'min_y', 'max_y'
+]
+
+
+def coordinate_columns(columns):
+    x_cols = [col for col in columns
+              if 'coordinatex' in col.lower() or col.lower().endswith('_x')]
+    y_cols = [col for col in columns
+              if 'coordinatey' in col.lower() or col.lower().endswith('_y')]
+    return (x_cols[0] if x_cols else None), (y_cols[0] if y_cols else None)
+
 class ParticleStatistics:
     
-    def __init__(self, particles_df, micrograph_col='MicrographName'):
-        self.df = particles_df
-        self.micrograph_col = micrograph_col
-        
-        if self.micrograph_col not in self.df.columns:
-            possible_cols = [col for col in self.df.columns 
-                           if 'micrograph' in col.lower() or 'image' in col.lower()]
-            if possible_cols:
-                self.micrograph_col = possible_cols[0]
+    def __init__(self, particles, micrograph_col='MicrographName'):
+        if isinstance(particles, ParticleTable):
+            self.table = particles
+            self._df = None
+        else:
+            self.table = ParticleTable.from_pandas(
+                particles, find_micrograph_column(particles.columns, micrograph_col)
+            )
+            self._df = particles
+        self.micrograph_col = (self.table.micrograph_column or
+                               find_micrograph_column(self.table.column_names, micrograph_col))
+
+    @property
+    def df(self):
+        if self._df is None:
+            self._df = self.table.to_pandas()
+        return self._df
     
+    def _micrograph_counts(self):
+        counts = self.table.micrograph_counts()
+        present = np.flatnonzero(counts)
+        names = self.table.names[present] if len(present) else np.empty(0, dtype=object)
+        order = np.argsort(names, kind='stable')
+        return names[order], counts[present][order]
+
+    @profiled('statistics.get_distribution_per_micrograph', rows=_row_count)
     def get_distribution_per_micrograph(self):
-        if self.micrograph_col not in self.df.columns:
+        if self.table.micrograph_column is None:
             return pd.Series(dtype=int)
         
-        return self.df.groupby(self.micrograph_col).size().sort_values(ascending=False)
+        names, counts = self._micrograph_counts()
+        distribution = pd.Series(counts, index=pd.Index(names, name=self.micrograph_col))
+        return distribution.sort_values(ascending=False)
+
+    @profiled('statistics.get_per_micrograph_table', rows=_row_count)
+    def get_per_micrograph_table(self):
+        if self.table.micrograph_column is None or len(self.table) == 0:
+            return pd.DataFrame(columns=PER_MICROGRAPH_COLUMNS)
+
+        grouped, starts, _ = self.table.group_by_micrograph()
+        codes = grouped.codes[starts]
+        columns = {'count': np.diff(np.append(starts, len(grouped)))}
+        nan = np.full(len(starts), np.nan)
+
+        defocus_cols = [col for col in grouped.column_names
+                        if 'defocus' in col.lower() and 'angle' not in col.lower()
+                        and grouped.is_numeric(col)]
+        if defocus_cols:
+            defocus = np.mean([grouped[col].astype(np.float64) for col in defocus_cols], axis=0)
+            columns['defocus_mean'], columns['defocus_std'] = _segment_describe(defocus, starts)[:2]
+        else:
+            columns['defocus_mean'] = columns['defocus_std'] = nan
+
+        x_col, y_col = self._coordinate_columns()
+        for axis, col in (('x', x_col), ('y', y_col)):
+            if col is not None and grouped.is_numeric(col):
+                mean, std, low, high = _segment_describe(grouped[col], starts)
+            else:
+                mean = std = low = high = nan
+            columns[f'centroid_{axis}'], columns[f'std_{axis}'] = mean, std
+            columns[f'min_{axis}'], columns[f'max_{axis}'] = low, high
+        columns['spread'] = np.sqrt(columns['std_x'] ** 2 + columns['std_y'] ** 2)
+
+        present = codes >= 0
+        names = self.table.names[codes[present]]
+        order = np.argsort(names, kind='stable')
+        per_micrograph = pd.DataFrame(
+            {name: columns[name][present][order] for name in PER_MICROGRAPH_COLUMNS},
+            index=pd.Index(names[order], name=self.micrograph_col)
+        )
+        return per_micrograph
     
+    def _coordinate_columns(self):
+        return coordinate_columns(self.table.column_names)
+
+    @profiled('statistics.get_coordinate_statistics', rows=_row_count)
     def get_coordinate_statistics(self):
-        stats = {}
-        
-        coord_cols = [col for col in self.df.columns 
-                     if any(x in col.lower() for x in ['coordinatex', 'coordinatey', '_x', '_y'])]
-        
-        for col in coord_cols:
-            if pd.api.types.is_numeric_dtype(self.df[col]):
-                stats[col] = {
-                    'mean': float(self.df[col].mean()),
-                    'std': float(self.df[col].std()),
-                    'min': float(self.df[col].min()),
-                    'max': float(self.df[col].max()),
-                    'median': float(self.df[col].median())
-                }
-        
-        return stats
+        coord_cols = [col for col in self.table.column_names
+                      if any(x in col.lower() for x in ['coordinatex', 'coordinatey', '_x', '_y'])]
+
+        return {col: _describe(self.table[col], median=True)
+                for col in coord_cols if self.table.is_numeric(col)}
     
+    @profiled('statistics.get_defocus_statistics', rows=_row_count)
     def get_defocus_statistics(self):
-        stats = {}
+        defocus_cols = [col for col in self.table.column_names if 'defocus' in col.lower()]
         
-        defocus_cols = [col for col in self.df.columns if 'defocus' in col.lower()]
-        
-        for col in defocus_cols:
-            if pd.api.types.is_numeric_dtype(self.df[col]):
-                stats[col] = {
-                    'mean': float(self.df[col].mean()),
-                    'std': float(self.df[col].std()),
-                    'min': float(self.df[col].min()),
-                    'max': float(self.df[col].max())
-                }
+        return {col: _describe(self.table[col])
+                for col in defocus_cols if self.table.is_numeric(col)}
+
+    @profiled('statistics.get_box_statistics', rows=_row_count)
+    def get_box_statistics(self):
+        from particle_picker.analysis.boxes import BOX_COLUMNS
         
-        return stats
+        return {col: _describe(self.table[col])
+                for col in BOX_COLUMNS if col in self.table and self.table.is_numeric(col)}
     
+    @profiled('statistics.get_summary_statistics', rows=_row_count)
     def get_summary_statistics(self):
         summary = {
-            'total_particles': len(self.df),
+            'total_particles': len(self.table),
             'total_micrographs': 0,
             'avg_particles_per_micrograph': 0,
             'min_particles_per_micrograph': 0,
@@ -64,36 +176,32 @@ class ParticleStatistics:
             'std_particles_per_micrograph': 0
         }
         
-        if self.micrograph_col in self.df.columns:
-            dist = self.get_distribution_per_micrograph()
-            summary['total_micrographs'] = len(dist)
-            summary['avg_particles_per_micrograph'] = float(dist.mean())
-            summary['min_particles_per_micrograph'] = int(dist.min())
-            summary['max_particles_per_micrograph'] = int(dist.max())
-            summary['std_particles_per_micrograph'] = float(dist.std())
+        if self.table.micrograph_column is not None:
+            counts = self.get_distribution_per_micrograph().to_numpy()
+            if len(counts):
+                summary['total_micrographs'] = len(counts)
+                summary['avg_particles_per_micrograph'] = float(counts.mean())
+                summary['min_particles_per_micrograph'] = int(counts.min())
+                summary['max_particles_per_micrograph'] = int(counts.max())
+                summary['std_particles_per_micrograph'] = (
+                    float(counts.std(ddof=1)) if len(counts) > 1 else float('nan')
+                )
         
         return summary
     
+    @profiled('statistics.get_heatmap_data', rows=_row_count)
     def get_heatmap_data(self, bin_size=100):
-        coord_x_cols = [col for col in self.df.columns 
-                       if 'coordinatex' in col.lower() or col.lower().endswith('_x')]
-        coord_y_cols = [col for col in self.df.columns 
-                       if 'coordinatey' in col.lower() or col.lower().endswith('_y')]
+        x_col, y_col = self._coordinate_columns()
         
-        if not coord_x_cols or not coord_y_cols:
+        if x_col is None or y_col is None:
             return None
         
-        x_col = coord_x_cols[0]
-        y_col = coord_y_cols[0]
+        x = self.table[x_col]
+        y = self.table[y_col]
+        x_bins = np.arange(float(np.nanmin(x)), float(np.nanmax(x)) + bin_size, bin_size)
+        y_bins = np.arange(float(np.nanmin(y)), float(np.nanmax(y)) + bin_size, bin_size)
         
-        x_bins = np.arange(self.df[x_col].min(), self.df[x_col].max() + bin_size, bin_size)
-        y_bins = np.arange(self.df[y_col].min(), self.df[y_col].max() + bin_size, bin_size)
-        
-        hist, x_edges, y_edges = np.histogram2d(
-            self.df[x_col],
-            self.df[y_col],
-            bins=[x_bins, y_bins]
-        )
+        hist, x_edges, y_edges = np.histogram2d(x, y, bins=[x_bins, y_bins])
         
         return {
             'histogram': hist,
@@ -102,3 +210,17 @@ class ParticleStatistics:
             'x_col': x_col,
             'y_col': y_col
         }
+
+    def get_micrograph_picks(self, micrograph):
+        x_col, y_col = self._coordinate_columns()
+
+        if x_col is None or y_col is None or self.table.names is None:
+            return None
+
+        picks = self.table.micrograph(micrograph)
+        return {
+            'x': np.asarray(picks[x_col], dtype=np.float64),
+            'y': np.asarray(picks[y_col], dtype=np.float64),
+            'x_col': x_col,
+            'y_col': y_col
+        }
@@ -0,0 +1,403 @@
+import json
+import math
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from particle_picker.analysis.columns import find_micrograph_column
+from particle_picker.profiling import span
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL,
+    file_type TEXT NOT NULL,
+    name TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    columns TEXT NOT NULL,
+    particle_count INTEGER NOT NULL DEFAULT 0,
+    ingested_at TEXT NOT NULL,
+    UNIQUE (path, file_type)
+);
+CREATE TABLE IF NOT EXISTS run_tags (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (run_id, key)
+);
+CREATE TABLE IF NOT EXISTS micrographs (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS particles (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    micrograph_id INTEGER REFERENCES micrographs(id),
+    optics_group INTEGER,
+    x REAL,
+    y REAL,
+    defocus_u REAL,
+    defocus_v REAL,
+    defocus_angle REAL
+);
+CREATE INDEX IF NOT EXISTS idx_particles_run_micrograph ON particles(run_id, micrograph_id);
+CREATE INDEX IF NOT EXISTS idx_particles_micrograph ON particles(micrograph_id);
+CREATE INDEX IF NOT EXISTS idx_particles_run_optics ON particles(run_id, optics_group);
+CREATE INDEX IF NOT EXISTS idx_run_tags_key ON run_tags(key, value);
+"""
+
+VALUE_FIELDS = ('optics_group', 'x', 'y', 'defocus_u', 'defocus_v', 'defocus_angle')
+COORDINATE_FIELDS = ('x', 'y')
+DEFOCUS_FIELDS = ('defocus_u', 'defocus_v', 'defocus_angle')
+
+LOOKUP_CHUNK = 500
+
+
+def _field_for_column(column):
+    name = column.lower()
+    if name.startswith('_rln'):
+        name = name[4:]
+    elif name.startswith('rln'):
+        name = name[3:]
+
+    if name in ('coordinatex', 'x') or name.endswith('_x'):
+        return 'x'
+    if name in ('coordinatey', 'y') or name.endswith('_y'):
+        return 'y'
+    if 'defocusangle' in name:
+        return 'defocus_angle'
+    if 'defocusu' in name:
+        return 'defocus_u'
+    if 'defocusv' in name:
+        return 'defocus_v'
+    if name == 'opticsgroup':
+        return 'optics_group'
+    return None
+
+
+def map_columns(df):
+    mapping = {}
+    for col in df.columns:
+        field = _field_for_column(col)
+        if field and field not in mapping and pd.api.types.is_numeric_dtype(df[col]):
+            mapping[field] = col
+    return mapping
+
+
+def _is_coordinate_column(column):
+    return any(x in column.lower() for x in ['coordinatex', 'coordinatey', '_x', '_y'])
+
+
+class ParticleStore:
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.conn = sqlite3.connect(str(self.path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.execute('PRAGMA synchronous = NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _micrograph_ids(self, names):
+        ids = {}
+        self.conn.executemany('INSERT OR IGNORE INTO micrographs (name) VALUES (?)',
+                              ((name,) for name in names))
+        for i in range(0, len(names), LOOKUP_CHUNK):
+            chunk = names[i:i + LOOKUP_CHUNK]
+            placeholders = ','.join('?' * len(chunk))
+            ids.update(self.conn.execute(
+                f'SELECT name, id FROM micrographs WHERE name IN ({placeholders})', chunk
+            ).fetchall())
+        return np.array([ids[name] for name in names], dtype=object)
+
+    def _insert_batch(self, run_id, df, mapping, micrograph_col):
+        n = len(df)
+
+        if micrograph_col in df.columns:
+            codes, uniques = pd.factorize(df[micrograph_col])
+            ids = self._micrograph_ids([str(name) for name in uniques])
+            micrograph_ids = np.append(ids, None)[codes].tolist()
+        else:
+            micrograph_ids = [None] * n
+
+        # SQLite stores NaN as NULL, so float columns can be bound as-is
+        columns = [[run_id] * n, micrograph_ids]
+        for field in VALUE_FIELDS:
+            if field in mapping:
+                values = df[mapping[field]].to_numpy()
+                if field == 'optics_group' and values.dtype.kind == 'f':
+                    columns.append([None if math.isnan(v) else int(v) for v in values])
+                else:
+                    columns.append(values.tolist())
+            else:
+                columns.append([None] * n)
+
+        with span('store.insert', rows=n):
+            self.conn.executemany(
+                'INSERT INTO particles (run_id, micrograph_id, ' + ', '.join(VALUE_FIELDS) + ') '
+                'VALUES (' + ', '.join('?' * (len(VALUE_FIELDS) + 2)) + ')',
+                zip(*columns)
+            )
+        return n
+
+    def ingest(self, filepath, file_type, name=None, tags=None, batch_size=100000, replace=False):
+        from particle_picker.parsers.loader import iter_particle_batches
+
+        path = Path(filepath).resolve()
+        stat = path.stat()
+        existing = self.conn.execute(
+            'SELECT id, size, mtime_ns FROM runs WHERE path = ? AND file_type = ?',
+            (str(path), file_type)
+        ).fetchone()
+
+        if (existing is not None and not replace
+                and (existing['size'], existing['mtime_ns']) == (stat.st_size, stat.st_mtime_ns)):
+            return existing['id'], None
+
+        with self.conn:
+            if existing is not None:
+                self.conn.execute('DELETE FROM runs WHERE id = ?', (existing['id'],))
+
+            run_id = self.conn.execute(
+                'INSERT INTO runs (path, file_type, name, size, mtime_ns, columns, ingested_at) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(path), file_type, name or path.name, stat.st_size, stat.st_mtime_ns, '{}',
+                 time.strftime('%Y-%m-%dT%H:%M:%S'))
+            ).lastrowid
+            self.conn.executemany(
+                'INSERT INTO run_tags (run_id, key, value) VALUES (?, ?, ?)',
+                [(run_id, key, value) for key, value in (tags or {}).items()]
+            )
+
+            mapping = None
+            micrograph_col = None
+            total = 0
+            for df in iter_particle_batches(path, file_type, batch_size=batch_size):
+                if df is None or df.empty:
+                    continue
+                if mapping is None:
+                    mapping = map_columns(df)
+                    micrograph_col = find_micrograph_column(df.columns)
+                total += self._insert_batch(run_id, df, mapping, micrograph_col)
+
+            self.conn.execute('UPDATE runs SET columns = ?, particle_count = ? WHERE id = ?',
+                              (json.dumps(mapping or {}), total, run_id))
+
+        return run_id, total
+
+    def runs(self):
+        return self.conn.execute('SELECT * FROM runs ORDER BY id').fetchall()
+
+    def find_run(self, reference, file_type=None):
+        candidates = [str(Path(reference).resolve()), str(reference)]
+        query = 'SELECT * FROM runs WHERE (path = ? OR name = ?)'
+        params = [candidates[0], candidates[1]]
+        if file_type is not None:
+            query += ' AND file_type = ?'
+            params.append(file_type)
+
+        rows = self.conn.execute(query + ' ORDER BY path = ? DESC, id',
+                                 params + [candidates[0]]).fetchall()
+        return rows[0] if rows else None
+
+    def run_tags(self, run_id):
+        return dict(self.conn.execute('SELECT key, value FROM run_tags WHERE run_id = ?',
+                                      (run_id,)).fetchall())
+
+    def runs_with_tag(self, key, value):
+        return [row['id'] for row in self.conn.execute(
+            'SELECT run_id AS id FROM run_tags WHERE key = ? AND value = ? ORDER BY run_id',
+            (key, value)
+        )]
+
+    def count_particles(self, run_id):
+        return self.conn.execute('SELECT COUNT(*) FROM particles WHERE run_id = ?',
+                                 (run_id,)).fetchone()[0]
+
+    def micrograph_counts(self, run_id):
+        return dict(self.conn.execute(
+            'SELECT m.name, c.n FROM ('
+            '  SELECT micrograph_id, COUNT(*) AS n FROM particles'
+            '  WHERE run_id = ? AND micrograph_id IS NOT NULL GROUP BY micrograph_id'
+            ') AS c JOIN micrographs AS m ON m.id = c.micrograph_id',
+            (run_id,)
+        ).fetchall())
+
+    def micrograph_totals(self, run_id):
+        # (micrographs, particles on a micrograph)
+        return tuple(self.conn.execute(
+            'SELECT COUNT(DISTINCT micrograph_id), COUNT(micrograph_id) FROM particles '
+            'WHERE run_id = ?', (run_id,)
+        ).fetchone())
+
+    def iter_micrograph_counts(self, run_id, sort='count', descending=False, minimum=None,
+                               maximum=None, top=None, bottom=None, batch_size=10000):
+        # Yields lists of (name, count) rows in display order. Thresholds and
+        # top/bottom selection run in SQL, and rows are fetched batch by batch.
+        having, params = [], [run_id]
+        if minimum is not None:
+            having.append('COUNT(*) >= ?')
+            params.append(minimum)
+        if maximum is not None:
+            having.append('COUNT(*) <= ?')
+            params.append(maximum)
+
+        query = (
+            'SELECT m.name AS name, c.n AS n FROM ('
+            '  SELECT micrograph_id, COUNT(*) AS n FROM particles'
+            '  WHERE run_id = ? AND micrograph_id IS NOT NULL GROUP BY micrograph_id'
+            + (' HAVING ' + ' AND '.join(having) if having else '') +
+            ') AS c JOIN micrographs AS m ON m.id = c.micrograph_id'
+        )
+        if top is not None or bottom is not None:
+            # Ties at the cut-off go to the first names
+            query = (f'SELECT name, n FROM ({query} ORDER BY n '
+                     f'{"DESC" if top is not None else ""}, name LIMIT ?)')
+            params.append(top if top is not None else bottom)
+
+        direction = 'DESC' if descending else ''
+        order = f'name {direction}' if sort == 'name' else f'n {direction}, name'
+        cursor = self.conn.execute(f'{query} ORDER BY {order}', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield rows
+
+    def shared_micrographs(self, run_ids):
+        run_ids = list(run_ids)
+        placeholders = ','.join('?' * len(run_ids))
+        return [row[0] for row in self.conn.execute(
+            'SELECT m.name FROM particles AS p JOIN micrographs AS m ON m.id = p.micrograph_id '
+            f'WHERE p.run_id IN ({placeholders}) GROUP BY p.micrograph_id '
+            'HAVING COUNT(DISTINCT p.run_id) = ? ORDER BY m.name',
+            run_ids + [len(run_ids)]
+        )]
+
+    def summary(self, run_id):
+        total = self.count_particles(run_id)
+        count, mean, minimum, maximum = self.conn.execute(
+            'SELECT COUNT(*), AVG(n), MIN(n), MAX(n) FROM ('
+            '  SELECT COUNT(*) AS n FROM particles'
+            '  WHERE run_id = ? AND micrograph_id IS NOT NULL GROUP BY micrograph_id'
+            ')',
+            (run_id,)
+        ).fetchone()
+
+        summary = {
+            'total_particles': total,
+            'total_micrographs': 0,
+            'avg_particles_per_micrograph': 0,
+            'min_particles_per_micrograph': 0,
+            'max_particles_per_micrograph': 0,
+            'std_particles_per_micrograph': 0
+        }
+
+        if count:
+            squares = self.conn.execute(
+                'SELECT SUM((n - ?) * (n - ?)) FROM ('
+                '  SELECT COUNT(*) AS n FROM particles'
+                '  WHERE run_id = ? AND micrograph_id IS NOT NULL GROUP BY micrograph_id'
+                ')',
+                (mean, mean, run_id)
+            ).fetchone()[0]
+            summary['total_micrographs'] = count
+            summary['avg_particles_per_micrograph'] = float(mean)
+            summary['min_particles_per_micrograph'] = int(minimum)
+            summary['max_particles_per_micrograph'] = int(maximum)
+            summary['std_particles_per_micrograph'] = (
+                math.sqrt(squares / (count - 1)) if count > 1 else float('nan')
+            )
+
+        return summary
+
+    def field_statistics(self, run_id, fields, median=()):
+        for field in fields:
+            if field not in VALUE_FIELDS:
+                raise ValueError(f"Unknown field: {field}")
+        if not fields:
+            return {}
+
+        aggregates = ', '.join(f'COUNT({f}), AVG({f}), MIN({f}), MAX({f})' for f in fields)
+        row = self.conn.execute(f'SELECT {aggregates} FROM particles WHERE run_id = ?',
+                                (run_id,)).fetchone()
+        moments = {field: row[4 * i:4 * i + 4] for i, field in enumerate(fields)}
+        fields = [field for field in fields if moments[field][0]]
+        if not fields:
+            return {}
+
+        deviations = ', '.join(f'SUM(({f} - ?) * ({f} - ?))' for f in fields)
+        means = [moments[field][1] for field in fields for _ in range(2)]
+        squares = self.conn.execute(f'SELECT {deviations} FROM particles WHERE run_id = ?',
+                                    means + [run_id]).fetchone()
+
+        stats = {}
+        for field, total in zip(fields, squares):
+            count, mean, minimum, maximum = moments[field]
+            stats[field] = {
+                'mean': float(mean),
+                'std': math.sqrt(total / (count - 1)) if count > 1 else float('nan'),
+                'min': float(minimum),
+                'max': float(maximum),
+            }
+
+        # Sorting in SQLite is several times slower than a numpy selection
+        median = [field for field in median if field in stats]
+        if median:
+            values = np.array(self.conn.execute(
+                f'SELECT {", ".join(median)} FROM particles WHERE run_id = ?', (run_id,)
+            ).fetchall(), dtype=float).reshape(-1, len(median))
+            for i, field in enumerate(median):
+                stats[field]['median'] = float(np.nanmedian(values[:, i]))
+
+        return stats
+
+    def statistics(self, run_id):
+        return StoredRunStatistics(self, run_id)
+
+
+class StoredRunStatistics:
+
+    def __init__(self, store, run_id):
+        self.store = store
+        self.run_id = run_id
+        row = store.conn.execute('SELECT columns FROM runs WHERE id = ?', (run_id,)).fetchone()
+        self.columns = json.loads(row['columns']) if row else {}
+
+    def get_distribution_per_micrograph(self):
+        counts = self.store.micrograph_counts(self.run_id)
+        if not counts:
+            return pd.Series(dtype=int)
+        return pd.Series(counts).sort_index().sort_values(ascending=False, kind='stable')
+
+    def _named_statistics(self, fields, median=()):
+        stats = self.store.field_statistics(self.run_id, fields, median)
+        return {self.columns[field]: stats[field] for field in fields if field in stats}
+
+    def get_coordinate_statistics(self):
+        fields = [field for field in COORDINATE_FIELDS
+                  if field in self.columns and _is_coordinate_column(self.columns[field])]
+        return self._named_statistics(fields, median=fields)
+
+    def get_defocus_statistics(self):
+        return self._named_statistics([field for field in DEFOCUS_FIELDS if field in self.columns])
+
+    def get_box_statistics(self):
+        # Box statistics are not among the ingested fields
+        return {}
+
+    def get_summary_statistics(self):
+        return self.store.summary(self.run_id)
@@ -0,0 +1,163 @@
+import numpy as np
+import pandas as pd
+
+from particle_picker.analysis.columns import find_micrograph_column
+
+
+def _decode(codes, names):
+    values = np.empty(len(names) + 1, dtype=object)
+    values[:-1] = names
+    values[-1] = np.nan
+    return values[codes]
+
+
+def _stable_order(codes, size):
+    # numpy radix-sorts 16-bit keys, so two stable 16-bit passes give the
+    # same order as a stable argsort of the codes in a fraction of the time
+    keys = codes.astype(np.int64) + 1
+    if size < 0xFFFF:
+        return np.argsort(keys.astype(np.uint16), kind='stable')
+    order = np.argsort((keys & 0xFFFF).astype(np.uint16), kind='stable')
+    return order[np.argsort((keys[order] >> 16).astype(np.uint16), kind='stable')]
+
+
+class ParticleTable:
+    __slots__ = ('_columns', '_order', 'micrograph_column', 'codes', 'names', '_grouped')
+
+    def __init__(self, columns, order=None, micrograph_column=None, codes=None, names=None):
+        self._columns = {name: np.asarray(values) for name, values in columns.items()}
+        self._order = list(order) if order is not None else list(columns)
+        self.micrograph_column = micrograph_column
+        self.codes = None
+        self.names = None
+        self._grouped = None
+
+        if micrograph_column is not None:
+            if micrograph_column not in self._order:
+                self._order.append(micrograph_column)
+            codes = np.asarray(codes)
+            if codes.dtype not in (np.int8, np.int16):
+                codes = codes.astype(np.int32, copy=False)
+            self.codes = codes
+            self.names = np.asarray(names, dtype=object)
+
+    @classmethod
+    def from_arrays(cls, columns, micrograph_column=None):
+        # columns maps names to arrays in column order. The micrograph column
+        # (plain or categorical) is dictionary-encoded and never decoded.
+        if micrograph_column is None:
+            micrograph_column = find_micrograph_column(list(columns))
+        if micrograph_column not in columns:
+            return cls(columns)
+
+        data = {col: values for col, values in columns.items() if col != micrograph_column}
+        codes, names = pd.factorize(columns[micrograph_column])
+        return cls(data, order=columns, micrograph_column=micrograph_column,
+                   codes=codes, names=np.asarray(names, dtype=object))
+
+    @classmethod
+    def from_pandas(cls, df, micrograph_column=None):
+        if micrograph_column is None:
+            micrograph_column = find_micrograph_column(df.columns)
+        return cls.from_arrays({col: df[col] if col == micrograph_column else df[col].to_numpy()
+                                for col in df.columns}, micrograph_column)
+
+    def to_pandas(self):
+        data = {col: self.column(col) for col in self._order}
+        return pd.DataFrame(data, columns=self._order, copy=False)
+
+    def __len__(self):
+        if self.codes is not None:
+            return len(self.codes)
+        for values in self._columns.values():
+            return len(values)
+        return 0
+
+    def __contains__(self, name):
+        return name in self._order
+
+    def __getitem__(self, name):
+        return self.column(name)
+
+    @property
+    def column_names(self):
+        return list(self._order)
+
+    @property
+    def nbytes(self):
+        total = sum(values.nbytes for values in self._columns.values())
+        if self.codes is not None:
+            total += self.codes.nbytes + self.names.nbytes
+        return total
+
+    def column(self, name):
+        if name == self.micrograph_column:
+            return _decode(self.codes, self.names)
+        return self._columns[name]
+
+    def is_numeric(self, name):
+        return name != self.micrograph_column and self._columns[name].dtype.kind in 'biufc'
+
+    def _derive(self, index):
+        columns = {col: values[index] for col, values in self._columns.items()}
+        if self.micrograph_column is None:
+            return ParticleTable(columns, order=self._order)
+        return ParticleTable(columns, order=self._order, micrograph_column=self.micrograph_column,
+                             codes=self.codes[index], names=self.names)
+
+    def with_columns(self, columns):
+        merged = dict(self._columns)
+        merged.update(columns)
+        order = self._order + [name for name in columns if name not in self._order]
+        return ParticleTable(merged, order=order, micrograph_column=self.micrograph_column,
+                             codes=self.codes, names=self.names)
+
+    def slice(self, start, stop):
+        return self._derive(slice(start, stop))
+
+    def take(self, indices):
+        return self._derive(np.asarray(indices))
+
+    def micrograph_counts(self):
+        if self.codes is None:
+            return np.zeros(0, dtype=np.int64)
+        return np.bincount(self.codes[self.codes >= 0], minlength=len(self.names))
+
+    def group_by_micrograph(self):
+        # Returns (table, starts, stops) with each micrograph's rows contiguous,
+        # so per-micrograph tables are slices that share memory with the table
+        if self._grouped is None:
+            if self.codes is None:
+                raise ValueError("Table has no micrograph column")
+
+            codes = self.codes
+            changes = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+            run_codes = codes[np.concatenate([[0], changes])] if len(codes) else codes
+
+            if len(np.unique(run_codes)) == len(run_codes):
+                table = self
+            else:
+                table = self.take(_stable_order(codes, len(self.names)))
+                codes = table.codes
+                changes = np.flatnonzero(codes[1:] != codes[:-1]) + 1
+
+            starts = np.concatenate([[0], changes]) if len(codes) else changes
+            stops = np.concatenate([changes, [len(codes)]]) if len(codes) else changes
+            self._grouped = (table, starts, stops)
+        return self._grouped
+
+    def iter_micrographs(self):
+        table, starts, stops = self.group_by_micrograph()
+        for start, stop in zip(starts, stops):
+            code = table.codes[start]
+            if code >= 0:
+                yield self.names[code], table.slice(start, stop)
+
+    def micrograph(self, name):
+        matches = np.flatnonzero(self.names == name) if self.names is not None else []
+        if not len(matches):
+            raise KeyError(name)
+
+        table, starts, stops = self.group_by_micrograph()
+        position = np.flatnonzero(table.codes[starts] == matches[0])[0]
+        return table.slice(starts[position], stops[position])
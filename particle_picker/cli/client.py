@@ -0,0 +1,51 @@
+import json
+import os
+import socket
+import sys
+import tempfile
+
+# The client half of the serve daemon. main() imports only this module, so
+# forwarding a command does not load the server machinery.
+
+FORWARDED_COMMANDS = ('analyze', 'compare', 'list', 'export', 'filter', 'qc', 'stats')
+
+
+def default_socket_path():
+    if os.environ.get('PARTICLE_PICKER_SOCKET'):
+        return os.environ['PARTICLE_PICKER_SOCKET']
+
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or tempfile.gettempdir()
+    uid = os.getuid() if hasattr(os, 'getuid') else 0
+    return os.path.join(runtime_dir, f'particle-picker-{uid}.sock')
+
+
+def _receive(sock):
+    chunks = []
+    while True:
+        chunk = sock.recv(65536)
+        if not chunk:
+            break
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def forward(argv, socket_path=None):
+    socket_path = socket_path or default_socket_path()
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(socket_path):
+        return None
+
+    request = json.dumps({'argv': list(argv), 'cwd': os.getcwd()}).encode() + b'\n'
+
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+            sock.sendall(request)
+            sock.shutdown(socket.SHUT_WR)
+            response = json.loads(_receive(sock))
+    except (OSError, ValueError):
+        return None
+
+    sys.stdout.write(response['stdout'])
+    sys.stdout.flush()
+    sys.stderr.write(response['stderr'])
+    return response['exit_code']
@@ -0,0 +1,135 @@
+import io
+import json
+import os
+import signal
+import socket
+import socketserver
+import time
+import traceback
+from contextlib import redirect_stderr, redirect_stdout
+
+from particle_picker import metrics
+from particle_picker.cli.client import FORWARDED_COMMANDS
+
+REQUEST_SECONDS = metrics.histogram('particle_picker_daemon_request_seconds',
+                                    'Time to answer a forwarded CLI command', ['command'])
+
+
+def execute_request(request):
+    from particle_picker.cli import particle_cli
+
+    stdout = io.StringIO()
+    stderr = io.StringIO()
+    exit_code = 0
+    previous_cwd = os.getcwd()
+
+    try:
+        os.chdir(request['cwd'])
+        with redirect_stdout(stdout), redirect_stderr(stderr):
+            args = particle_cli.parse_arguments().parse_args(request['argv'])
+            if args.command not in FORWARDED_COMMANDS:
+                print(f"Error: '{args.command}' cannot be run through the daemon")
+                exit_code = 1
+            else:
+                particle_cli.execute(args)
+    except SystemExit as e:
+        if e.code is None:
+            exit_code = 0
+        elif isinstance(e.code, int):
+            exit_code = e.code
+        else:
+            stderr.write(f"{e.code}\n")
+            exit_code = 1
+    except Exception:
+        stderr.write(traceback.format_exc())
+        exit_code = 1
+    finally:
+        os.chdir(previous_cwd)
+
+    return {'stdout': stdout.getvalue(), 'stderr': stderr.getvalue(), 'exit_code': exit_code}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        start = time.perf_counter()
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError:
+            return
+
+        response = execute_request(request)
+        payload = json.dumps(response).encode()
+        self.wfile.write(payload)
+
+        command = next((arg for arg in request['argv'] if not arg.startswith('-')), '')
+        REQUEST_SECONDS.observe(time.perf_counter() - start,
+                                command=command if command in FORWARDED_COMMANDS else 'other')
+        metrics.RESPONSE_BYTES.observe(len(payload), route='daemon')
+
+        if self.server.log:
+            info = self.server.cache.info()
+            print(f"[{time.strftime('%H:%M:%S')}] {' '.join(request['argv'])} -> "
+                  f"exit {response['exit_code']} in {(time.perf_counter() - start) * 1000:.1f} ms "
+                  f"(cache: {info['datasets']} datasets, {info['hits']} hits, "
+                  f"{info['misses']} misses)", flush=True)
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+
+    def __init__(self, socket_path, cache, log=True):
+        self.cache = cache
+        self.log = log
+        # The socket is created by bind(); a restrictive umask keeps other
+        # users from connecting before the chmod
+        umask = os.umask(0o177)
+        try:
+            super().__init__(socket_path, _RequestHandler)
+        finally:
+            os.umask(umask)
+        os.chmod(socket_path, 0o600)
+
+
+def is_running(socket_path):
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.connect(socket_path)
+        return True
+    except OSError:
+        return False
+
+
+def create_server(socket_path, max_datasets=8, log=True):
+    from particle_picker.analysis.cache import DatasetCache
+    from particle_picker.cli import particle_cli
+
+    if os.path.exists(socket_path):
+        if is_running(socket_path):
+            raise RuntimeError(f"A daemon is already listening on {socket_path}")
+        os.unlink(socket_path)
+
+    cache = DatasetCache(max_datasets)
+    particle_cli.use_dataset_cache(cache)
+    metrics.register_collector('daemon', cache.metrics)
+    return DaemonServer(socket_path, cache, log=log)
+
+
+def _stop(signum, frame):
+    raise KeyboardInterrupt
+
+
+def serve(socket_path, max_datasets=8):
+    server = create_server(socket_path, max_datasets)
+    signal.signal(signal.SIGTERM, _stop)
+    print(f"Serving particle-picker on {socket_path} (cache: {max_datasets} datasets)")
+    print("Press Ctrl+C to stop", flush=True)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        print("\nDaemon stopped")
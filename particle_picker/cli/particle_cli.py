@@ -1,12 +1,12 @@
 import argparse
 import sys
+import time
 from pathlib import Path
 import json
 
-from particle_picker.parsers.star_parser import StarFileParser
-from particle_picker.parsers.csv_parser import CSVParticleParser
-from particle_picker.parsers.box_parser import BoxFileParser
-from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker import profiling
+
+_dataset_cache = None
 
 def parse_arguments():
     parser = argparse.ArgumentParser(
@@ -17,36 +17,133 @@ Examples:
   %(prog)s analyze -i data/particles.star -t star
   %(prog)s analyze -i data/particles.csv -t csv --output stats.json
   %(prog)s analyze -i data/particles.star -t star --verbose
+  %(prog)s analyze -i data/particles.star -t star --verbose --jobs 0
+  %(prog)s analyze -i data/particles.star -t star --approx --error 0.01
   %(prog)s compare -i file1.star file2.star -t star
+  %(prog)s compare -i run*.star -t star --per-micrograph --matrix runs.parquet
+  %(prog)s filter -i data/particles.star -t star -e "count() >= 50" -o subset.csv
+  %(prog)s watch -i data/particles.star -t star --interval 10
+  %(prog)s serve --socket /tmp/particle-picker.sock
+  %(prog)s analyze -i data/particles.star -t star --socket /tmp/particle-picker.sock
+  %(prog)s ingest -i run1.star run2.star -t star --db picks.sqlite --tag detector=K3
+  %(prog)s analyze -i run1.star -t star --db picks.sqlite
+  %(prog)s memory -i data/particles.star -t star
+  %(prog)s qc -i data/particles.star -t star --window 50 --exclude excluded.txt
+  %(prog)s list -i data/particles.star -t star --verbose --output micrographs.parquet
+  %(prog)s report -i nightly/*.star -t star -o reports/ --jobs 0
+  %(prog)s boxes -i data/particles.star -t star --jobs 0 -o particles_boxes.parquet
+  %(prog)s stats --prometheus
         '''
     )
+    parser.add_argument('--no-daemon', action='store_true',
+                        help='Run locally even if a serve daemon is listening')
+
+    profile_parser = argparse.ArgumentParser(add_help=False)
+    profile_parser.add_argument('--profile', action='store_true',
+                                help='Print per-stage timing and memory after the command')
+    profile_parser.add_argument('--profile-json', metavar='PATH',
+                                help='Write a Chrome trace-event JSON file of per-stage timings')
+
+    socket_parser = argparse.ArgumentParser(add_help=False)
+    socket_parser.add_argument('--socket', metavar='PATH',
+                               help='Serve daemon socket (default: $PARTICLE_PICKER_SOCKET '
+                                    'or a per-user path in $XDG_RUNTIME_DIR/tmp)')
+
+    jobs_parser = argparse.ArgumentParser(add_help=False)
+    jobs_parser.add_argument('-j', '--jobs', type=int, default=1,
+                             help='Worker processes for parsing STAR/CSV files '
+                                  '(0 = all cores, default: 1)')
+
+    db_parser = argparse.ArgumentParser(add_help=False)
+    db_parser.add_argument('--db', metavar='PATH',
+                           help='Answer from a database built by "ingest" instead of parsing; '
+                                'inputs are the ingested paths or run names')
+
+    compact_parser = argparse.ArgumentParser(add_help=False)
+    compact_parser.add_argument('--compact', action='store_true',
+                                help='Downcast columns to the smallest dtype within a fixed '
+                                     'precision bound (see "memory")')
+
+    box_stats_parser = argparse.ArgumentParser(add_help=False)
+    box_stats_parser.add_argument('--box-size', type=int, metavar='PIXELS',
+                                  help='Box size in micrograph pixels (default: .box width or '
+                                       'optics ImageSize)')
+    box_stats_parser.add_argument('--micrographs', metavar='DIR',
+                                  help='Directory micrograph paths are relative to (default: '
+                                       'the particle file\'s directory and its parents)')
     
     subparsers = parser.add_subparsers(dest='command', help='Available commands')
     
-    analyze_parser = subparsers.add_parser('analyze', help='Analyze a single particle picking file')
+    analyze_parser = subparsers.add_parser('analyze',
+                                           parents=[profile_parser, socket_parser, jobs_parser,
+                                                    db_parser, compact_parser],
+                                           help='Analyze a single particle picking file')
     analyze_parser.add_argument('-i', '--input', required=True, help='Input file path')
     analyze_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'], 
                                help='File type')
     analyze_parser.add_argument('-o', '--output', help='Output file for statistics (JSON format)')
     analyze_parser.add_argument('-v', '--verbose', action='store_true', 
                                help='Show detailed statistics')
+    analyze_parser.add_argument('--approx', action='store_true',
+                                help='Estimate statistics from a random sample of rows')
+    sample_group = analyze_parser.add_mutually_exclusive_group()
+    sample_group.add_argument('--sample-rows', type=int, metavar='N',
+                              help='Rows to sample with --approx (default: 10000)')
+    sample_group.add_argument('--error', type=float, metavar='FRACTION',
+                              help='Sample until 95%% CIs of means are within FRACTION '
+                                   'of the mean (e.g. 0.01)')
+    analyze_parser.add_argument('--exact-counts', action='store_true',
+                                help='With --approx, also run a count-only scan for exact '
+                                     'per-micrograph counts')
+    analyze_parser.add_argument('--seed', type=int, help='Random seed for --approx sampling')
     
-    compare_parser = subparsers.add_parser('compare', help='Compare multiple particle picking files')
+    compare_parser = subparsers.add_parser('compare',
+                                           parents=[profile_parser, socket_parser, db_parser,
+                                                    compact_parser],
+                                           help='Compare multiple particle picking files')
     compare_parser.add_argument('-i', '--input', nargs='+', required=True, 
                                help='Input file paths')
     compare_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'], 
                                help='File type')
     compare_parser.add_argument('-o', '--output', help='Output file for comparison (JSON format)')
+    compare_parser.add_argument('--per-micrograph', action='store_true',
+                                help='Join per-micrograph counts across files (by basename) and '
+                                     'report missing micrographs, deltas and rank correlations')
+    compare_parser.add_argument('--matrix', metavar='PATH',
+                                help='With --per-micrograph, write the micrograph x file matrix '
+                                     '(.parquet, .csv or .json)')
     
-    list_parser = subparsers.add_parser('list', help='List micrographs and particle counts')
+    list_parser = subparsers.add_parser('list',
+                                        parents=[profile_parser, socket_parser, jobs_parser,
+                                                 db_parser, compact_parser],
+                                        help='List micrographs and particle counts')
     list_parser.add_argument('-i', '--input', required=True, help='Input file path')
     list_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'], 
                             help='File type')
     list_parser.add_argument('-s', '--sort', choices=['name', 'count'], default='count',
                             help='Sort by name or particle count')
     list_parser.add_argument('--reverse', action='store_true', help='Reverse sort order')
+    list_parser.add_argument('-v', '--verbose', action='store_true',
+                             help='Show defocus, centroid, spread and extent per micrograph')
+    list_parser.add_argument('-o', '--output',
+                             help='Write the per-micrograph table (.parquet, .csv or .json)')
+    limit_group = list_parser.add_mutually_exclusive_group()
+    limit_group.add_argument('--top', type=int, metavar='N',
+                             help='Only the N micrographs with the most particles')
+    limit_group.add_argument('--bottom', type=int, metavar='N',
+                             help='Only the N micrographs with the fewest particles')
+    list_parser.add_argument('--min', type=int, dest='minimum', metavar='COUNT',
+                             help='Skip micrographs with fewer particles')
+    list_parser.add_argument('--max', type=int, dest='maximum', metavar='COUNT',
+                             help='Skip micrographs with more particles')
+    list_parser.add_argument('-f', '--format', choices=['text', 'tsv', 'json', 'ndjson'],
+                             default='text',
+                             help='Output format; tsv, json and ndjson print only the rows '
+                                  'with full micrograph paths (default: text)')
     
-    export_parser = subparsers.add_parser('export', help='Export data to different formats')
+    export_parser = subparsers.add_parser('export',
+                                          parents=[profile_parser, socket_parser, jobs_parser],
+                                          help='Export data to different formats')
     export_parser.add_argument('-i', '--input', required=True, help='Input file path')
     export_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'], 
                               help='Input file type')
@@ -54,44 +151,238 @@ Examples:
     export_parser.add_argument('-f', '--format', choices=['csv', 'json'], default='csv',
                               help='Output format')
     
+    filter_parser = subparsers.add_parser(
+        'filter', parents=[profile_parser, socket_parser, jobs_parser, box_stats_parser],
+        help='Select particles matching an expression',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog='''
+Expressions combine column comparisons with and/or/not, for example:
+  "DefocusU between 10000 and 30000"
+  "count() >= 50 and CoordinateX > 100 and CoordinateX < 3900"
+  "MicrographName in ['mic_001.mrc', 'mic_002.mrc']"
+  "not MicrographName in @excluded.txt"
+Per-micrograph functions: count(), mean(col), min(col), max(col), std(col), sum(col)
+Row functions: abs(col), basename(col)
+        '''
+    )
+    filter_parser.add_argument('-i', '--input', required=True, help='Input file path')
+    filter_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'],
+                               help='Input file type')
+    filter_parser.add_argument('-e', '--expression', required=True, help='Filter expression')
+    filter_parser.add_argument('-o', '--output', required=True, help='Output file path')
+    filter_parser.add_argument('-f', '--format', choices=['csv', 'json'], default='csv',
+                               help='Output format')
+    filter_parser.add_argument('--batch-size', type=int, default=100000,
+                               help='Rows per batch when streaming (default: 100000)')
+    filter_parser.add_argument('--box-stats', action='store_true',
+                               help='Add box_mean, box_std, box_contrast, edge_distance and '
+                                    'near_edge columns from the micrographs (see "boxes")')
+
+    watch_parser = subparsers.add_parser('watch', parents=[profile_parser],
+                                         help='Follow a file that is still being written')
+    watch_parser.add_argument('-i', '--input', required=True, help='Input file path')
+    watch_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'],
+                              help='File type')
+    watch_parser.add_argument('--interval', type=float, default=5.0,
+                              help='Seconds between refreshes (default: 5)')
+    watch_parser.add_argument('--max-polls', type=int, default=0,
+                              help='Stop after N polls (default: run until interrupted)')
+
+    serve_parser = subparsers.add_parser(
+        'serve', parents=[socket_parser],
+        help='Keep parsed files in memory and answer CLI calls over a Unix socket'
+    )
+    serve_parser.add_argument('--max-datasets', type=int, default=8,
+                              help='Parsed files kept in memory (default: 8)')
+
+    ingest_parser = subparsers.add_parser(
+        'ingest', parents=[profile_parser],
+        help='Bulk-load particle files into an indexed SQLite database'
+    )
+    ingest_parser.add_argument('-i', '--input', nargs='+', required=True,
+                               help='Input file paths')
+    ingest_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'],
+                               help='File type')
+    ingest_parser.add_argument('--db', required=True, metavar='PATH',
+                               help='SQLite database file (created if missing)')
+    ingest_parser.add_argument('--name', help='Run name (default: file name; single input only)')
+    ingest_parser.add_argument('--tag', action='append', default=[], metavar='KEY=VALUE',
+                               help='Attach a tag to the ingested runs (repeatable)')
+    ingest_parser.add_argument('--replace', action='store_true',
+                               help='Re-ingest files even if they are unchanged')
+    ingest_parser.add_argument('--batch-size', type=int, default=100000,
+                               help='Rows inserted per transaction batch (default: 100000)')
+
+    qc_parser = subparsers.add_parser(
+        'qc', parents=[profile_parser, socket_parser, jobs_parser, compact_parser],
+        help='Flag outlier micrographs with robust z-scores'
+    )
+    qc_parser.add_argument('-i', '--input', required=True, help='Input file path')
+    qc_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'],
+                           help='File type')
+    qc_parser.add_argument('--threshold', type=float, default=3.5,
+                           help='Flag micrographs with |robust z| above this (default: 3.5)')
+    qc_parser.add_argument('--window', type=int, default=0, metavar='N',
+                           help='Compare defocus with a rolling median over N micrographs in '
+                                'acquisition order (default: session median)')
+    qc_parser.add_argument('--micrographs', metavar='PATH',
+                           help='File listing every acquired micrograph, to flag empty ones')
+    qc_parser.add_argument('-o', '--output',
+                           help='Write the flagged-micrograph table (.parquet, .csv or .json)')
+    qc_parser.add_argument('--exclude', metavar='PATH',
+                           help='Write flagged micrograph names for filter "@PATH" expressions')
+
+    memory_parser = subparsers.add_parser(
+        'memory', parents=[profile_parser, jobs_parser],
+        help='Report bytes per column before and after --compact'
+    )
+    memory_parser.add_argument('-i', '--input', required=True, help='Input file path')
+    memory_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'],
+                               help='File type')
+    memory_parser.add_argument('-o', '--output', help='Output file for the report (JSON format)')
+
+    report_parser = subparsers.add_parser(
+        'report', parents=[profile_parser],
+        help='Render static HTML reports for many datasets'
+    )
+    report_parser.add_argument('-i', '--input', nargs='+', required=True,
+                               help='Input file paths')
+    report_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'],
+                               help='File type')
+    report_parser.add_argument('-o', '--output', required=True, metavar='DIR',
+                               help='Directory for the reports, index.html and plotly.min.js')
+    report_parser.add_argument('-j', '--jobs', type=int, default=1,
+                               help='Reports rendered in parallel (0 = all cores, default: 1)')
+    report_parser.add_argument('--force', action='store_true',
+                               help='Re-render reports whose input files are unchanged')
+
+    boxes_parser = subparsers.add_parser(
+        'boxes', parents=[profile_parser, jobs_parser, box_stats_parser],
+        help='Measure intensity, contrast and edge distance of every particle box'
+    )
+    boxes_parser.add_argument('-i', '--input', required=True, help='Input file path')
+    boxes_parser.add_argument('-t', '--type', required=True, choices=['star', 'csv', 'box'],
+                              help='File type')
+    boxes_parser.add_argument('-o', '--output',
+                              help='Write the particles with the new columns '
+                                   '(.parquet, .csv or .json)')
+
+    stats_parser = subparsers.add_parser(
+        'stats', parents=[profile_parser, socket_parser],
+        help='Show parse latency, cache and memory metrics of the serve daemon'
+    )
+    stats_parser.add_argument('--prometheus', action='store_true',
+                              help='Print the Prometheus text format (as served at /metrics)')
+
     return parser
 
-def load_file(filepath, file_type):
+
+def use_dataset_cache(cache):
+    global _dataset_cache
+    _dataset_cache = cache
+
+
+def _load_dataset(filepath, file_type, jobs, kind):
+    from particle_picker.parsers import loader
+
     filepath = Path(filepath)
     
     if not filepath.exists():
         print(f"Error: File not found: {filepath}")
         sys.exit(1)
     
+    def load():
+        if kind == 'particles':
+            return loader.load_particles(filepath, file_type, jobs=jobs)
+        return loader.load_table(filepath, file_type, jobs=jobs, compact=kind == 'compact-table')
+
     try:
-        if file_type == 'star':
-            parser = StarFileParser(filepath)
-            return parser.get_particles()
-        elif file_type == 'csv':
-            parser = CSVParticleParser(filepath)
-            return parser.get_particles()
-        elif file_type == 'box':
-            parser = BoxFileParser(filepath)
-            return parser.get_particles()
+        if _dataset_cache is not None:
+            return _dataset_cache.get(filepath, file_type, kind, load)
+        return load()
     except Exception as e:
         print(f"Error loading file: {e}")
         sys.exit(1)
 
-def command_analyze(args):
-    print(f"\nAnalyzing: {args.input}")
-    print(f"File type: {args.type}")
-    print("-" * 60)
+
+def load_file(filepath, file_type, jobs=1):
+    return _load_dataset(filepath, file_type, jobs, 'particles')
+
+
+def load_table(filepath, file_type, jobs=1, compact=False):
+    return _load_dataset(filepath, file_type, jobs, 'compact-table' if compact else 'table')
+
+
+def load_counts(filepath, file_type):
+    from particle_picker.parsers.tokenizer import count_micrographs
     
-    df = load_file(args.input, args.type)
+    if not Path(filepath).exists():
+        return None
     
-    if df is None or df.empty:
-        print("Error: No particle data found in file")
+    with profiling.span('fast_count') as count_span:
+        if _dataset_cache is not None:
+            result = _dataset_cache.get(filepath, file_type, 'counts',
+                                        lambda: count_micrographs(filepath, file_type))
+        else:
+            result = count_micrographs(filepath, file_type)
+        if result is not None:
+            count_span.rows = result[0]
+    return result
+
+
+def load_statistics(filepath, file_type, particles, compact=False):
+    if _dataset_cache is not None:
+        return _dataset_cache.get_statistics(filepath, file_type, particles, compact=compact)
+
+    from particle_picker.analysis.statistics import ParticleStatistics
+    return ParticleStatistics(particles)
+
+
+def open_store(db_path):
+    from particle_picker.analysis.store import ParticleStore
+
+    if not Path(db_path).exists():
+        print(f"Error: Database not found: {db_path}")
         sys.exit(1)
     
-    stats = ParticleStatistics(df)
-    summary = stats.get_summary_statistics()
+    return ParticleStore(db_path)
+
+
+def find_stored_run(store, reference, file_type):
+    run = store.find_run(reference, file_type)
     
-    print(f"\nSummary Statistics:")
+    if run is None:
+        print(f"Error: Run not found in database: {reference}")
+        sys.exit(1)
+
+    return run
+
+
+def load_stored_statistics(store, reference, file_type):
+    return store.statistics(find_stored_run(store, reference, file_type)['id'])
+
+
+def write_particles(frames, output_path, output_format):
+    import pandas as pd
+
+    total = 0
+
+    if output_format == 'csv':
+        with open(output_path, 'w', newline='') as f:
+            for i, df in enumerate(frames):
+                df.to_csv(f, index=False, header=(i == 0))
+                total += len(df)
+
+    elif output_format == 'json':
+        frames = list(frames)
+        df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+        df.to_json(output_path, orient='records', indent=2)
+        total = len(df)
+
+    return total
+
+
+def print_summary(summary):
     print(f"  Total particles: {summary['total_particles']:,}")
     print(f"  Total micrographs: {summary['total_micrographs']:,}")
     
@@ -100,6 +391,139 @@ def command_analyze(args):
         print(f"  Min particles per micrograph: {summary['min_particles_per_micrograph']}")
         print(f"  Max particles per micrograph: {summary['max_particles_per_micrograph']}")
         print(f"  Std deviation: {summary['std_particles_per_micrograph']:.2f}")
+
+
+def print_column_statistics(title, column_stats):
+    print(f"\n{title}:")
+    for col, values in column_stats.items():
+        print(f"  {col}:")
+        print(f"    Mean: {values['mean']:.2f}")
+        print(f"    Std: {values['std']:.2f}")
+        print(f"    Min: {values['min']:.2f}")
+        print(f"    Max: {values['max']:.2f}")
+
+
+def print_interval_statistics(title, column_stats):
+    print(f"\n{title} (approximate, 95% CI):")
+    for col, values in column_stats.items():
+        print(f"  {col}:")
+        print(f"    Mean: {values['mean']:.2f} "
+              f"[{values['mean_ci'][0]:.2f}, {values['mean_ci'][1]:.2f}]")
+        if 'median_ci' in values:
+            print(f"    Median: {values['median']:.2f} "
+                  f"[{values['median_ci'][0]:.2f}, {values['median_ci'][1]:.2f}]")
+        print(f"    Std: {values['std']:.2f}")
+        print(f"    Min: {values['min']:.2f} (in sample)")
+        print(f"    Max: {values['max']:.2f} (in sample)")
+
+
+def analyze_approximate(args):
+    from particle_picker.analysis.sampling import approximate_statistics
+
+    if not Path(args.input).exists():
+        print(f"Error: File not found: {args.input}")
+        sys.exit(1)
+
+    count = (lambda: load_counts(args.input, args.type)) if args.exact_counts else None
+
+    try:
+        stats = approximate_statistics(args.input, args.type, sample_rows=args.sample_rows,
+                                       error=args.error, count=count, seed=args.seed)
+    except Exception as e:
+        print(f"Error sampling file: {e}")
+        sys.exit(1)
+
+    if stats is None:
+        print("Error: No particle data found in file")
+        sys.exit(1)
+
+    summary = stats.get_summary_statistics()
+    low, high = summary['total_particles_ci']
+
+    print(f"Sampled {stats.sample_rows:,} rows ({stats.method} sampling)")
+    if low == high:
+        print("\nSummary Statistics (exact counts):")
+        print_summary(summary)
+    else:
+        print("\nSummary Statistics (approximate):")
+        print(f"  Total particles: ~{summary['total_particles']:,} "
+              f"[95% CI {low:,} - {high:,}]")
+        print("  Per-micrograph counts: not computed (add --exact-counts)")
+
+    if args.verbose:
+        print_interval_statistics("Coordinate Statistics", stats.get_coordinate_statistics())
+
+        defocus_stats = stats.get_defocus_statistics()
+        if defocus_stats:
+            print_interval_statistics("Defocus Statistics", defocus_stats)
+
+    if args.output:
+        output_data = {
+            'file': str(args.input),
+            'approximate': True,
+            'summary': summary,
+        }
+
+        if args.verbose:
+            output_data['coordinate_stats'] = stats.get_coordinate_statistics()
+            output_data['defocus_stats'] = stats.get_defocus_statistics()
+
+        with open(args.output, 'w') as f:
+            json.dump(output_data, f, indent=2)
+
+        print(f"\nStatistics saved to: {args.output}")
+
+
+def command_analyze(args):
+    print(f"\nAnalyzing: {args.input}")
+    print(f"File type: {args.type}")
+    print("-" * 60)
+
+    if not args.approx and (args.sample_rows or args.error or args.exact_counts):
+        print("Error: --sample-rows, --error and --exact-counts need --approx")
+        sys.exit(1)
+
+    if args.approx:
+        if args.db:
+            print("Error: --approx cannot be combined with --db")
+            sys.exit(1)
+        if (args.sample_rows is not None and args.sample_rows < 2) or \
+                (args.error is not None and not 0 < args.error < 1):
+            print("Error: --sample-rows must be at least 2 and --error between 0 and 1")
+            sys.exit(1)
+        analyze_approximate(args)
+        return
+
+    counts = None
+    if not (args.db or args.verbose or args.jobs != 1):
+        counts = load_counts(args.input, args.type)
+
+    if args.db:
+        stats = load_stored_statistics(open_store(args.db), args.input, args.type)
+        summary = stats.get_summary_statistics()
+
+        if summary['total_particles'] == 0:
+            print("Error: No particle data found in file")
+            sys.exit(1)
+    elif counts is not None:
+        from particle_picker.parsers.tokenizer import summarize_counts
+
+        if counts[0] == 0:
+            print("Error: No particle data found in file")
+            sys.exit(1)
+        summary = summarize_counts(*counts)
+    else:
+        table = load_table(args.input, args.type, args.jobs, compact=args.compact)
+
+        if table is None or len(table) == 0:
+            print("Error: No particle data found in file")
+            sys.exit(1)
+
+        stats = load_statistics(args.input, args.type, table, compact=args.compact)
+        summary = stats.get_summary_statistics()
+
+    print("\nSummary Statistics:")
+    print_summary(summary)
     
     if args.verbose:
         print(f"\nCoordinate Statistics:")
@@ -120,6 +544,10 @@ def command_analyze(args):
                 print(f"    Std: {values['std']:.2f}")
                 print(f"    Min: {values['min']:.2f}")
                 print(f"    Max: {values['max']:.2f}")
+
+        box_stats = stats.get_box_statistics()
+        if box_stats:
+            print_column_statistics("Box Statistics", box_stats)
     
     if args.output:
         output_data = {
@@ -130,6 +558,9 @@ def command_analyze(args):
         if args.verbose:
             output_data['coordinate_stats'] = stats.get_coordinate_statistics()
             output_data['defocus_stats'] = stats.get_defocus_statistics()
+            box_stats = stats.get_box_statistics()
+            if box_stats:
+                output_data['box_stats'] = box_stats
         
         with open(args.output, 'w') as f:
             json.dump(output_data, f, indent=2)
@@ -140,21 +571,40 @@ def command_compare(args):
     print(f"\nComparing {len(args.input)} files:")
     print("-" * 60)
     
+    if args.matrix and not args.per_micrograph:
+        print("Error: --matrix needs --per-micrograph")
+        sys.exit(1)
+
     results = []
+    distributions = []
+    store = open_store(args.db) if args.db else None
     
     for filepath in args.input:
         print(f"\nProcessing: {filepath}")
-        df = load_file(filepath, args.type)
         
-        if df is None or df.empty:
-            print(f"  Warning: No data found in {filepath}")
-            continue
-        
-        stats = ParticleStatistics(df)
-        summary = stats.get_summary_statistics()
+        if store is not None:
+            stats = load_stored_statistics(store, filepath, args.type)
+            summary = stats.get_summary_statistics()
+
+            if summary['total_particles'] == 0:
+                print(f"  Warning: No data found in {filepath}")
+                continue
+        else:
+            table = load_table(filepath, args.type, compact=args.compact)
+
+            if table is None or len(table) == 0:
+                print(f"  Warning: No data found in {filepath}")
+                continue
+
+            stats = load_statistics(filepath, args.type, table, compact=args.compact)
+            summary = stats.get_summary_statistics()
         summary['file'] = str(filepath)
         results.append(summary)
         
+        if args.per_micrograph:
+            distribution = stats.get_distribution_per_micrograph()
+            distributions.append((distribution.index.to_numpy(), distribution.to_numpy()))
+
         print(f"  Particles: {summary['total_particles']:,}")
         print(f"  Micrographs: {summary['total_micrographs']:,}")
         print(f"  Avg per micrograph: {summary['avg_particles_per_micrograph']:.2f}")
@@ -169,42 +619,288 @@ def command_compare(args):
         print(f"   Micrographs: {result['total_micrographs']:,}")
         print(f"   Avg: {result['avg_particles_per_micrograph']:.2f}")
     
+    if args.per_micrograph and results:
+        print_micrograph_comparison(results, distributions, args.matrix)
+
     if args.output:
         with open(args.output, 'w') as f:
             json.dump(results, f, indent=2)
         print(f"\nComparison saved to: {args.output}")
 
+
+def print_micrograph_comparison(results, distributions, matrix_path=None, top=10):
+    from particle_picker.analysis.comparison import compare_micrographs, run_labels
+
+    labels = run_labels([result['file'] for result in results])
+    comparison = compare_micrographs(distributions, labels)
+    matrix = comparison['matrix']
+
+    print("\n" + "=" * 60)
+    print(f"Per-micrograph comparison (reference: {labels[0]}):")
+    print("=" * 60)
+    print(f"\nMicrographs in any file: {len(matrix):,}")
+    print(f"Micrographs in every file: {int((matrix['present'] == len(labels)).sum()):,}\n")
+
+    print(f"{'File':<32} {'Micrographs':>11} {'Missing':>8} {'Avg/mic':>8} "
+          f"{'Delta':>10} {'Spearman':>9}")
+    print("-" * 83)
+    for result, run in zip(results, comparison['runs']):
+        print(f"{run['run'][:32]:<32} {run['micrographs']:>11,} {run['missing_micrographs']:>8,} "
+              f"{run['avg_particles_per_micrograph']:>8.2f} {run['delta_particles']:>+10,} "
+              f"{run['spearman_vs_reference']:>9.3f}")
+        result['per_micrograph'] = run
+
+    if len(labels) > 1 and len(labels) <= 8:
+        print("\nLargest per-micrograph differences:")
+        print(f"{'Micrograph':<40}" + ''.join(f" {label[:10]:>10}" for label in labels))
+        print("-" * (40 + 11 * len(labels)))
+        changed = matrix[matrix['max_abs_delta'] > 0]
+        for micrograph, row in changed.nlargest(top, 'max_abs_delta').iterrows():
+            print(f"{micrograph[:40]:<40}" + ''.join(f" {row[label]:>10,}" for label in labels))
+
+    if matrix_path:
+        write_table(matrix, matrix_path)
+        print(f"\nPer-micrograph matrix saved to: {matrix_path}")
+
+
+def write_table(df, output_path):
+    suffix = Path(output_path).suffix.lower()
+
+    if suffix == '.parquet':
+        try:
+            df.to_parquet(output_path)
+        except ImportError:
+            print("Error: Writing Parquet requires the 'pyarrow' package (pip install pyarrow)")
+            sys.exit(1)
+    elif suffix == '.json':
+        with open(output_path, 'w') as f:
+            json.dump(df.reset_index().to_dict(orient='records'), f, indent=2)
+    else:
+        df.to_csv(output_path)
+
+
+LIST_CHUNK_ROWS = 10000
+
+
+def strip_directories(names):
+    # One pass over a whole chunk; the fast count path never imports pandas,
+    # and str.rpartition beats pandas/numpy string ops at these lengths
+    return [str(name).replace('\\', '/').rpartition('/')[2] for name in names]
+
+
+def select_micrographs(names, counts, sort='count', reverse=False, top=None, bottom=None,
+                       minimum=None, maximum=None):
+    import numpy as np
+
+    # Row indices in display order. Thresholds apply first; --top/--bottom
+    # partition around the N-th count, so only the selected rows get sorted.
+    keep = np.ones(len(counts), dtype=bool)
+    if minimum is not None:
+        keep &= counts >= minimum
+    if maximum is not None:
+        keep &= counts <= maximum
+    index = np.flatnonzero(keep)
+
+    limit = top if top is not None else bottom
+    if limit is not None:
+        key = -counts[index] if top is not None else counts[index]
+        if 0 < limit < len(index):
+            cutoff = np.partition(key, limit - 1)[limit - 1]
+            index, key = index[key <= cutoff], key[key <= cutoff]
+        # Ties at the cut-off go to the first names
+        by_name = np.argsort(names[index], kind='stable')
+        index = index[by_name][np.argsort(key[by_name], kind='stable')][:limit]
+
+    index = index[np.argsort(names[index], kind='stable')]
+    if sort == 'name':
+        return index[::-1] if reverse else index
+    descending = (top is not None) != reverse
+    return index[np.argsort(-counts[index] if descending else counts[index], kind='stable')]
+
+
+def select_micrograph_counts(distribution, sort='count', reverse=False, top=None, bottom=None,
+                             minimum=None, maximum=None):
+    import heapq
+    from operator import itemgetter
+
+    # select_micrographs for a {name: count} dict, in plain Python so the
+    # count path stays free of numpy. Returns (name, count) pairs.
+    items = [(name, count) for name, count in distribution.items()
+             if (minimum is None or count >= minimum) and (maximum is None or count <= maximum)]
+
+    limit = top if top is not None else bottom
+    if limit is not None:
+        sign = -1 if top is not None else 1
+        items = heapq.nsmallest(limit, items, key=lambda item: (sign * item[1], item[0]))
+
+    items.sort(key=itemgetter(0))
+    if sort == 'name':
+        return items[::-1] if reverse else items
+    items.sort(key=itemgetter(1), reverse=(top is not None) != reverse)
+    return items
+
+
+def write_micrograph_rows(chunks, fmt):
+    # chunks yields (names, counts) lists; each chunk is formatted in one pass
+    # and written with a single call. Returns (rows, particles) written.
+    out = sys.stdout
+    rows = particles = 0
+    if fmt == 'text':
+        out.write(f"{'Micrograph':<50} {'Particles':>10}\n{'-' * 62}\n")
+    elif fmt == 'tsv':
+        out.write("micrograph\tparticles\n")
+    elif fmt == 'json':
+        out.write('[')
+
+    for names, counts in chunks:
+        if fmt == 'text':
+            lines = map('{:<50} {:>10,}'.format, strip_directories(names), counts)
+        elif fmt == 'tsv':
+            lines = map('{}\t{}'.format, names, counts)
+        else:
+            lines = (json.dumps({'micrograph': name, 'particles': count})
+                     for name, count in zip(names, counts))
+
+        if fmt == 'json':
+            out.write(('\n  ' if not rows else ',\n  ') + ',\n  '.join(lines))
+        else:
+            out.write('\n'.join(lines) + '\n')
+        rows += len(counts)
+        particles += sum(counts)
+
+    if fmt == 'json':
+        out.write('\n]\n' if rows else ']\n')
+    return rows, particles
+
+
+def write_micrograph_frame(per_micrograph, fmt):
+    frame = per_micrograph.reset_index()
+    if fmt == 'tsv':
+        frame.to_csv(sys.stdout, sep='\t', index=False)
+    else:
+        sys.stdout.write(frame.to_json(orient='records', lines=fmt == 'ndjson').rstrip('\n') + '\n')
+
+
+def print_micrograph_table(per_micrograph):
+    print(f"{'Micrograph':<40} {'Particles':>9} {'Defocus':>10} {'Def std':>8} "
+          f"{'Centroid X':>10} {'Centroid Y':>10} {'Spread':>8} {'Extent X':>13} {'Extent Y':>13}")
+    print("-" * 129)
+
+    names = strip_directories(per_micrograph.index)
+    for name, (_, row) in zip(names, per_micrograph.iterrows()):
+        extent_x = f"{row['min_x']:.0f}-{row['max_x']:.0f}"
+        extent_y = f"{row['min_y']:.0f}-{row['max_y']:.0f}"
+        print(f"{name[:40]:<40} {int(row['count']):>9,} {row['defocus_mean']:>10.1f} "
+              f"{row['defocus_std']:>8.1f} {row['centroid_x']:>10.1f} {row['centroid_y']:>10.1f} "
+              f"{row['spread']:>8.1f} {extent_x:>13} {extent_y:>13}")
+
 def command_list(args):
-    print(f"\nListing micrographs from: {args.input}")
-    print("-" * 60)
+    text = args.format == 'text'
+    if text:
+        print(f"\nListing micrographs from: {args.input}")
+        print("-" * 60)
     
-    df = load_file(args.input, args.type)
-    
-    if df is None or df.empty:
-        print("Error: No particle data found in file")
+    detailed = args.verbose or args.output
+    if detailed and args.db:
+        print("Error: --verbose and --output need the particle file and cannot be combined "
+              "with --db")
         sys.exit(1)
     
-    stats = ParticleStatistics(df)
-    distribution = stats.get_distribution_per_micrograph()
-    
-    if distribution.empty:
-        print("No micrograph information found in file")
+    if min(args.top or 0, args.bottom or 0) < 0:
+        print("Error: --top and --bottom need a count of 0 or more")
         sys.exit(1)
     
-    if args.sort == 'name':
-        distribution = distribution.sort_index(ascending=not args.reverse)
+    selection = {'sort': args.sort, 'top': args.top, 'bottom': args.bottom,
+                 'minimum': args.minimum, 'maximum': args.maximum}
+    selected = any(value is not None for key, value in selection.items() if key != 'sort')
+
+    per_micrograph = None
+    if args.db:
+        store = open_store(args.db)
+        run = find_stored_run(store, args.input, args.type)
+
+        if store.count_particles(run['id']) == 0:
+            print("Error: No particle data found in file")
+            sys.exit(1)
+
+        micrographs, particles = store.micrograph_totals(run['id'])
+        if not micrographs:
+            print("No micrograph information found in file")
+            sys.exit(1)
+
+        # Rows stream from the index batch by batch
+        descending = args.reverse if args.sort == 'name' else (args.top is not None) != args.reverse
+        chunks = (tuple(map(list, zip(*rows))) for rows in
+                  store.iter_micrograph_counts(run['id'], descending=descending,
+                                               batch_size=LIST_CHUNK_ROWS, **selection))
     else:
-        distribution = distribution.sort_values(ascending=not args.reverse)
+        counts = load_counts(args.input, args.type) if args.jobs == 1 and not detailed else None
+
+        if counts is not None:
+            total, distribution = counts
+
+            if total == 0:
+                print("Error: No particle data found in file")
+                sys.exit(1)
+            if not distribution:
+                print("No micrograph information found in file")
+                sys.exit(1)
+
+            micrographs, particles = len(distribution), sum(distribution.values())
+            items = select_micrograph_counts(distribution, reverse=args.reverse, **selection)
+            chunks = (tuple(map(list, zip(*items[start:start + LIST_CHUNK_ROWS])))
+                      for start in range(0, len(items), LIST_CHUNK_ROWS))
+        else:
+            import numpy as np
+
+            table = load_table(args.input, args.type, args.jobs, compact=args.compact)
+
+            if table is None or len(table) == 0:
+                print("Error: No particle data found in file")
+                sys.exit(1)
+
+            stats = load_statistics(args.input, args.type, table, compact=args.compact)
+            if detailed:
+                per_micrograph = stats.get_per_micrograph_table()
+                distribution = per_micrograph['count']
+            else:
+                distribution = stats.get_distribution_per_micrograph()
+
+            names = distribution.index.to_numpy(dtype=object)
+            values = distribution.to_numpy(dtype=np.int64)
+
+            if not len(values):
+                print("No micrograph information found in file")
+                sys.exit(1)
+
+            micrographs, particles = len(values), int(values.sum())
+            index = select_micrographs(names, values, reverse=args.reverse, **selection)
+            if per_micrograph is not None:
+                per_micrograph = per_micrograph.iloc[index]
+            chunks = ((names[rows].tolist(), values[rows].tolist())
+                      for rows in (index[start:start + LIST_CHUNK_ROWS]
+                                   for start in range(0, len(index), LIST_CHUNK_ROWS)))
     
-    print(f"\nTotal micrographs: {len(distribution)}")
-    print(f"Total particles: {distribution.sum():,}\n")
+    if text:
+        print(f"\nTotal micrographs: {micrographs}")
+        print(f"Total particles: {particles:,}\n")
     
-    print(f"{'Micrograph':<50} {'Particles':>10}")
-    print("-" * 62)
+    if args.verbose:
+        if text:
+            print_micrograph_table(per_micrograph)
+        else:
+            write_micrograph_frame(per_micrograph, args.format)
+        rows, shown = len(per_micrograph), int(per_micrograph['count'].sum())
+    else:
+        rows, shown = write_micrograph_rows(chunks, args.format)
     
-    for micrograph, count in distribution.items():
-        micrograph_name = Path(micrograph).name if '/' in micrograph or '\\' in micrograph else micrograph
-        print(f"{micrograph_name:<50} {count:>10,}")
+    if text and selected:
+        print(f"\nListed: {rows:,} micrographs, {shown:,} particles")
+
+    if args.output:
+        write_table(per_micrograph, args.output)
+        if text:
+            print(f"\nPer-micrograph table saved to: {args.output}")
 
 def command_export(args):
     print(f"\nExporting: {args.input}")
@@ -212,7 +908,7 @@ def command_export(args):
     print(f"Output file: {args.output}")
     print("-" * 60)
     
-    df = load_file(args.input, args.type)
+    df = load_file(args.input, args.type, args.jobs)
     
     if df is None or df.empty:
         print("Error: No particle data found in file")
@@ -221,28 +917,397 @@ def command_export(args):
     output_path = Path(args.output)
     
     try:
-        if args.format == 'csv':
-            df.to_csv(output_path, index=False)
-            print(f"\nSuccessfully exported {len(df):,} particles to CSV")
-        
-        elif args.format == 'json':
-            df.to_json(output_path, orient='records', indent=2)
-            print(f"\nSuccessfully exported {len(df):,} particles to JSON")
-        
+        total = write_particles([df], output_path, args.format)
+        print(f"\nSuccessfully exported {total:,} particles to {args.format.upper()}")
         print(f"Output saved to: {output_path}")
         
     except Exception as e:
         print(f"Error exporting data: {e}")
         sys.exit(1)
 
-def main():
-    parser = parse_arguments()
-    args = parser.parse_args()
+
+def command_filter(args):
+    from particle_picker.parsers.loader import iter_particle_batches
+    from particle_picker.analysis.filters import ParticleFilter, FilterSyntaxError
     
-    if not args.command:
-        parser.print_help()
+    print(f"\nFiltering: {args.input}")
+    print(f"Expression: {args.expression}")
+    print("-" * 60)
+
+    try:
+        particle_filter = ParticleFilter(args.expression)
+    except FilterSyntaxError as e:
+        print(f"Error: Invalid filter expression: {e}")
+        sys.exit(1)
+
+    if not Path(args.input).exists():
+        print(f"Error: File not found: {args.input}")
+        sys.exit(1)
+
+    counts = {'input': 0}
+
+    def filtered_batches(batches):
+        for df in batches:
+            counts['input'] += len(df)
+            yield particle_filter.apply(df)
+
+    if args.box_stats:
+        table = load_table(args.input, args.type, args.jobs)
+        if table is None or len(table) == 0:
+            print("Error: No particle data found in file")
+            sys.exit(1)
+        table, _ = attach_box_statistics(args, table)
+        batches = [table.to_pandas()]
+    elif particle_filter.requires_groups:
+        df = load_file(args.input, args.type, args.jobs)
+        if df is None or df.empty:
+            print("Error: No particle data found in file")
+            sys.exit(1)
+        batches = [df]
+    else:
+        batches = iter_particle_batches(args.input, args.type, batch_size=args.batch_size)
+
+    try:
+        total = write_particles(filtered_batches(batches), Path(args.output), args.format)
+    except KeyError as e:
+        print(f"Error: {e.args[0]}")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error filtering data: {e}")
+        sys.exit(1)
+
+    mode = "in memory" if particle_filter.requires_groups or args.box_stats else "streaming"
+    print(f"\nKept {total:,} of {counts['input']:,} particles ({mode})")
+    print(f"Output saved to: {args.output}")
+
+
+def command_watch(args):
+    from particle_picker.analysis.incremental import FileWatcher
+
+    print(f"\nWatching: {args.input}")
+    print(f"File type: {args.type}")
+    print(f"Refresh interval: {args.interval:g}s (Ctrl+C to stop)")
+    print("-" * 60)
+
+    if not Path(args.input).exists():
+        print(f"Error: File not found: {args.input}")
+        sys.exit(1)
+
+    watcher = FileWatcher(args.input, args.type)
+    polls = 0
+
+    try:
+        while True:
+            new_rows = watcher.poll()
+            polls += 1
+
+            if watcher.reader.truncated:
+                print(f"\n[{time.strftime('%H:%M:%S')}] File was truncated or replaced, restarting")
+
+            if new_rows:
+                print(f"\n[{time.strftime('%H:%M:%S')}] +{new_rows:,} particles "
+                      f"(read up to byte {watcher.reader.offset:,})")
+                print_summary(watcher.stats.get_summary_statistics())
+
+            if args.max_polls and polls >= args.max_polls:
+                break
+
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    except Exception as e:
+        print(f"Error reading file: {e}")
+        sys.exit(1)
+
+    print(f"\nStopped watching after {polls} polls "
+          f"({watcher.stats.total_particles:,} particles seen)")
+
+
+def command_ingest(args):
+    from particle_picker.analysis.store import ParticleStore
+
+    if args.name and len(args.input) > 1:
+        print("Error: --name can only be used with a single input file")
+        sys.exit(1)
+
+    tags = {}
+    for tag in args.tag:
+        key, sep, value = tag.partition('=')
+        if not sep or not key:
+            print(f"Error: Tags must look like KEY=VALUE: {tag}")
+            sys.exit(1)
+        tags[key] = value
+
+    for filepath in args.input:
+        if not Path(filepath).exists():
+            print(f"Error: File not found: {filepath}")
+            sys.exit(1)
+
+    print(f"\nIngesting into: {args.db}")
+    print("-" * 60)
+
+    with ParticleStore(args.db) as store:
+        for filepath in args.input:
+            start = time.perf_counter()
+            try:
+                run_id, rows = store.ingest(filepath, args.type, name=args.name, tags=tags,
+                                            batch_size=args.batch_size, replace=args.replace)
+            except Exception as e:
+                print(f"Error ingesting {filepath}: {e}")
+                sys.exit(1)
+
+            if rows is None:
+                print(f"  {Path(filepath).name}: unchanged, skipped")
+            else:
+                print(f"  {Path(filepath).name}: {rows:,} particles "
+                      f"({time.perf_counter() - start:.2f}s)")
+
+        runs = store.runs()
+        total = sum(run['particle_count'] for run in runs)
+
+    print(f"\nDatabase holds {len(runs)} runs, {total:,} particles")
+
+
+def format_bytes(size):
+    for unit in ('B', 'KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.1f} {unit}" if unit != 'B' else f"{size} B"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def command_qc(args):
+    from particle_picker.analysis import qc
+    from particle_picker.analysis.filters import read_value_list
+
+    print(f"\nQuality control: {args.input}")
+    print("-" * 60)
+
+    if args.threshold <= 0 or args.window < 0:
+        print("Error: --threshold must be positive and --window non-negative")
+        sys.exit(1)
+
+    expected = None
+    if args.micrographs:
+        try:
+            expected = read_value_list(args.micrographs)
+        except OSError as e:
+            print(f"Error reading micrograph list: {e}")
+            sys.exit(1)
+
+    table = load_table(args.input, args.type, args.jobs, compact=args.compact)
+
+    if table is None or len(table) == 0:
+        print("Error: No particle data found in file")
+        sys.exit(1)
+
+    if table.micrograph_column is None:
+        print("No micrograph information found in file")
         sys.exit(1)
     
+    stats = load_statistics(args.input, args.type, table, compact=args.compact)
+    features = qc.flag_micrographs(stats, threshold=args.threshold, window=args.window,
+                                   expected=expected)
+    flagged = qc.flagged_micrographs(features)
+
+    print(f"\nMicrographs: {len(features):,}")
+    print(f"Flagged: {len(flagged):,} (|z| > {args.threshold:g})")
+    for flag in qc.FLAGS:
+        count = int(features['flags'].str.split(',').apply(lambda flags: flag in flags).sum())
+        if count:
+            print(f"  {flag}: {count:,}")
+
+    if len(flagged):
+        print(f"\n{'Micrograph':<40} {'Particles':>9} {'z count':>8} {'z spread':>9} "
+              f"{'z offset':>9} {'z defocus':>10}  Flags")
+        print("-" * 110)
+        for micrograph, row in flagged.iterrows():
+            name = Path(micrograph).name if '/' in micrograph or '\\' in micrograph else micrograph
+            print(f"{name[:40]:<40} {int(row['count']):>9,} {row['z_count']:>8.1f} "
+                  f"{row['z_spread']:>9.1f} {row['z_centroid_offset']:>9.1f} "
+                  f"{row['z_defocus_residual']:>10.1f}  {row['flags']}")
+
+    if args.output:
+        write_table(flagged, args.output)
+        print(f"\nFlagged-micrograph table saved to: {args.output}")
+
+    if args.exclude:
+        qc.write_exclusion_list(features, args.exclude, threshold=args.threshold)
+        print(f"\nExclusion list saved to: {args.exclude}")
+        print(f'Use it with: filter -e "not {table.micrograph_column} in @{args.exclude}"')
+
+
+def command_memory(args):
+    from particle_picker.parsers.compact import memory_report
+
+    print(f"\nMemory footprint: {args.input}")
+    print("-" * 60)
+
+    table = load_table(args.input, args.type, args.jobs)
+
+    if table is None or len(table) == 0:
+        print("Error: No particle data found in file")
+        sys.exit(1)
+
+    report = memory_report(table)
+
+    print(f"\nParticles: {report['particles']:,}\n")
+    print(f"{'Column':<28} {'Before':>24} {'After':>24} {'Max error':>10}")
+    print("-" * 89)
+
+    for column in report['columns']:
+        before = f"{column['dtype_before']} {format_bytes(column['bytes_before'])}"
+        after = f"{column['dtype_after']} {format_bytes(column['bytes_after'])}"
+        print(f"{column['column'][:28]:<28} {before:>24} {after:>24} {column['max_error']:>10.2g}")
+
+    print("-" * 89)
+    print(f"{'Total':<28} {format_bytes(report['bytes_before']):>24} "
+          f"{format_bytes(report['bytes_after']):>24}")
+    print(f"\nBytes per particle: {report['bytes_per_particle_before']:.1f} -> "
+          f"{report['bytes_per_particle_after']:.1f}")
+
+    if args.output:
+        report['file'] = str(args.input)
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to: {args.output}")
+
+
+def command_report(args):
+    from particle_picker.visualization.report import generate_reports
+
+    print(f"\nRendering reports for {len(args.input)} files into {args.output}")
+    print("-" * 60)
+
+    start = time.perf_counter()
+
+    def progress(entry):
+        if entry['status'] != 'ok':
+            print(f"  {entry['name']}: error: {entry['error']}")
+        elif entry.get('reused'):
+            print(f"  {entry['name']}: unchanged, kept existing report")
+        else:
+            print(f"  {entry['name']}: {entry['summary']['total_particles']:,} particles "
+                  f"({entry['seconds']:.1f}s)")
+
+    try:
+        index, entries = generate_reports(args.input, args.type, args.output, jobs=args.jobs,
+                                          force=args.force, progress=progress)
+    except OSError as e:
+        print(f"Error writing reports: {e}")
+        sys.exit(1)
+
+    failed = sum(entry['status'] != 'ok' for entry in entries)
+    print(f"\nIndex: {index}")
+    print(f"Reports: {len(entries) - failed:,} written, {failed:,} failed "
+          f"in {time.perf_counter() - start:.1f}s")
+
+    if failed:
+        sys.exit(1)
+
+
+def attach_box_statistics(args, table):
+    from particle_picker.analysis.boxes import box_statistics
+    from particle_picker.parsers.star_parser import StarFileParser
+
+    try:
+        optics = StarFileParser.read_optics(args.input) if args.type == 'star' else None
+        columns, report = box_statistics(table, args.type, args.input, box_size=args.box_size,
+                                         optics=optics, root=args.micrographs, jobs=args.jobs)
+    except (ValueError, OSError) as e:
+        print(f"Error measuring boxes: {e}")
+        sys.exit(1)
+
+    return table.with_columns(columns), report
+
+
+def command_boxes(args):
+    from particle_picker.analysis.statistics import ParticleStatistics
+
+    print(f"\nMeasuring boxes: {args.input}")
+    print("-" * 60)
+
+    table = load_table(args.input, args.type, args.jobs)
+    if table is None or len(table) == 0:
+        print("Error: No particle data found in file")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    table, report = attach_box_statistics(args, table)
+
+    missing = report['missing_micrographs']
+    print(f"Box size: {report['box_size']} px")
+    print(f"Micrographs: {report['micrographs']:,} measured, {len(missing):,} not found")
+    for name in missing[:5]:
+        print(f"  missing: {name}")
+    if len(missing) > 5:
+        print(f"  ... and {len(missing) - 5:,} more")
+    print(f"Particles: {report['particles']:,} of {len(table):,} measured "
+          f"in {time.perf_counter() - start:.1f}s")
+    print(f"Near an edge: {report['near_edge']:,}")
+
+    if report['particles']:
+        print_column_statistics("Box Statistics", ParticleStatistics(table).get_box_statistics())
+
+    if args.output:
+        write_table(table.to_pandas(), args.output)
+        print(f"\nParticles saved to: {args.output}")
+
+
+def format_metric_value(name, value):
+    if name.endswith('_bytes'):
+        return format_bytes(int(value)) if value != float('inf') else 'inf'
+    return f"{value * 1000:.1f} ms" if value != float('inf') else 'inf'
+
+
+def command_stats(args):
+    from particle_picker import metrics
+
+    # Metrics live in the process that did the work, so this only makes
+    # sense when forwarded to the daemon
+    if _dataset_cache is None:
+        print("Error: No serve daemon is running; start one with 'particle-picker serve' "
+              "(the dashboard serves the same metrics at /metrics)")
+        sys.exit(1)
+
+    if args.prometheus:
+        sys.stdout.write(metrics.render())
+        return
+
+    for metric in metrics.REGISTRY.collect():
+        if metric.kind == 'histogram':
+            series = metric.summary()
+            if not series:
+                continue
+            print(f"\n{metric.description}:")
+            for entry in series:
+                labels = ', '.join(f"{key}={value}" for key, value in entry['labels'].items())
+                print(f"  {labels or 'all':<40} {entry['count']:>7,} x  "
+                      f"mean {format_metric_value(metric.name, entry['mean']):>10}  "
+                      f"p50 <= {format_metric_value(metric.name, entry['p50']):>10}  "
+                      f"p95 <= {format_metric_value(metric.name, entry['p95']):>10}")
+        else:
+            samples = metric.samples()
+            if not samples:
+                continue
+            print(f"\n{metric.description}:")
+            for _, labels, value in samples:
+                labels = ', '.join(f"{key}={label}" for key, label in labels.items())
+                shown = format_bytes(value) if metric.name.endswith('_bytes') else f"{value:,}"
+                print(f"  {labels or 'all':<40} {shown:>12}")
+
+
+def report_profile(recorder, args):
+    if args.profile:
+        print("\nProfile:")
+        print(recorder.format_table())
+
+    if args.profile_json:
+        recorder.write_trace(args.profile_json)
+        print(f"\nProfile trace saved to: {args.profile_json}")
+
+
+def run_command(args):
     if args.command == 'analyze':
         command_analyze(args)
     elif args.command == 'compare':
@@ -251,6 +1316,68 @@ def main():
         command_list(args)
     elif args.command == 'export':
         command_export(args)
+    elif args.command == 'filter':
+        command_filter(args)
+    elif args.command == 'watch':
+        command_watch(args)
+    elif args.command == 'ingest':
+        command_ingest(args)
+    elif args.command == 'memory':
+        command_memory(args)
+    elif args.command == 'qc':
+        command_qc(args)
+    elif args.command == 'report':
+        command_report(args)
+    elif args.command == 'boxes':
+        command_boxes(args)
+    elif args.command == 'stats':
+        command_stats(args)
+
+
+def command_serve(args):
+    from particle_picker.cli import client, daemon
+
+    socket_path = args.socket or client.default_socket_path()
+
+    try:
+        daemon.serve(socket_path, args.max_datasets)
+    except (RuntimeError, OSError) as e:
+        print(f"Error starting daemon: {e}")
+        sys.exit(1)
+
+
+def execute(args):
+    recorder = profiling.enable() if args.profile or args.profile_json else None
+
+    try:
+        run_command(args)
+    finally:
+        if recorder is not None:
+            profiling.disable()
+            report_profile(recorder, args)
+
+
+def main():
+    parser = parse_arguments()
+    args = parser.parse_args()
+
+    if not args.command:
+        parser.print_help()
+        sys.exit(1)
+
+    if args.command == 'serve':
+        command_serve(args)
+        return
+
+    if not args.no_daemon:
+        from particle_picker.cli import client
+
+        if args.command in client.FORWARDED_COMMANDS:
+            exit_code = client.forward(sys.argv[1:], args.socket)
+            if exit_code is not None:
+                sys.exit(exit_code)
+
+    execute(args)
 
 if __name__ == '__main__':
     main()
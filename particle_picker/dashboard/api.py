@@ -0,0 +1,361 @@
+import hashlib
+import json
+import math
+import threading
+from pathlib import Path
+
+from flask import Blueprint, Response, jsonify, request
+
+from particle_picker.analysis.cache import file_fingerprint, get_shared_cache
+from particle_picker.analysis.sampling import approximate_statistics
+from particle_picker.parsers.loader import PARSERS, load_table
+from particle_picker.parsers.tokenizer import count_micrographs
+from particle_picker.visualization.figure_cache import CachedVisualizations, get_shared_figure_cache
+from particle_picker.parsers.mrc import resolve_micrograph
+from particle_picker.visualization.tiles import get_pyramid
+
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+MIN_HEATMAP_BIN = 10
+MAX_SCATTER_POINTS = 100000
+
+FIGURES = {
+    'summary': 'create_summary_table',
+    'distribution': 'create_distribution_bar_chart',
+    'histogram': 'create_histogram',
+    'scatter': 'create_coordinate_scatter',
+    'heatmap': 'create_heatmap',
+    'defocus': 'create_defocus_distribution',
+    'boxes': 'create_box_distribution',
+}
+
+_datasets = {}
+_datasets_lock = threading.Lock()
+
+
+def dataset_id(filepath, file_type):
+    key = f"{Path(filepath).resolve()}:{file_type}"
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+def register_dataset(filepath, file_type):
+    if file_type not in PARSERS:
+        raise ValueError(f"Unknown file type: {file_type}")
+
+    filepath = Path(filepath).resolve()
+    if not filepath.is_file():
+        raise FileNotFoundError(f"File not found: {filepath}")
+
+    identifier = dataset_id(filepath, file_type)
+    with _datasets_lock:
+        _datasets[identifier] = (filepath, file_type)
+    return identifier
+
+
+def _clean(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    if isinstance(value, dict):
+        return {key: _clean(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_clean(item) for item in value]
+    if hasattr(value, 'item'):
+        return _clean(value.item())
+    return value
+
+
+def _error(status, message):
+    response = jsonify({'error': message})
+    response.status_code = status
+    return response
+
+
+def _int_arg(name, default, minimum, maximum=None):
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        raise ValueError(f"'{name}' must be an integer")
+
+    if value < minimum or (maximum is not None and value > maximum):
+        limit = f"between {minimum} and {maximum}" if maximum is not None else f">= {minimum}"
+        raise ValueError(f"'{name}' must be {limit}")
+    return value
+
+
+class _NoParticles(Exception):
+    pass
+
+
+def dataset_entry(identifier):
+    with _datasets_lock:
+        return _datasets.get(identifier)
+
+
+def load_approximate_statistics(cache, filepath, file_type):
+    # The distribution charts need every micrograph, so sampled views still
+    # get exact per-micrograph counts from the count-only scan
+    return cache.get(filepath, file_type, 'approximate', lambda: approximate_statistics(
+        filepath, file_type,
+        count=lambda: cache.get(filepath, file_type, 'counts',
+                                lambda: count_micrographs(filepath, file_type))
+    ))
+
+
+def micrograph_path(stats, index, particles_path, root=None):
+    names = stats.table.names
+    if names is None or not 0 <= index < len(names):
+        raise KeyError(f"Unknown micrograph index: {index}")
+
+    path = resolve_micrograph(names[index], particles_path, root)
+    if path is None:
+        raise FileNotFoundError(f"Micrograph not found: {names[index]}")
+    return names[index], path
+
+
+def micrograph_pyramid(stats, index, particles_path, root=None):
+    name, path = micrograph_path(stats, index, particles_path, root)
+    return name, get_pyramid(path)
+
+
+def create_blueprint(cache=None, figure_cache=None):
+    api = Blueprint('api', __name__, url_prefix='/api')
+
+    def get_cache():
+        return cache if cache is not None else get_shared_cache()
+
+    def get_figure_cache():
+        return figure_cache if figure_cache is not None else get_shared_figure_cache()
+
+    def resolve(identifier):
+        with _datasets_lock:
+            entry = _datasets.get(identifier)
+        if entry is None:
+            return None, None, _error(404, f"Unknown dataset: {identifier}")
+
+        filepath, file_type = entry
+        try:
+            fingerprint = file_fingerprint(filepath)
+        except OSError:
+            return None, None, _error(404, f"File no longer exists: {filepath}")
+        return entry, fingerprint, None
+
+    def statistics(filepath, file_type):
+        dataset_cache = get_cache()
+        table = dataset_cache.get_table(filepath, file_type,
+                                        lambda: load_table(filepath, file_type))
+        if table is None or len(table) == 0:
+            return None
+        return dataset_cache.get_statistics(filepath, file_type, table)
+
+    def conditional(identifier, build, validator=None):
+        # validator(filepath, file_type) names any other file the response
+        # depends on; its result is part of the ETag
+        entry, fingerprint, error = resolve(identifier)
+        if error is not None:
+            return error
+
+        extra = validator(*entry) if validator is not None else None
+        tag = hashlib.sha1(
+            repr((fingerprint, extra, request.path,
+                  sorted(request.args.items(multi=True)))).encode()
+        ).hexdigest()
+        if tag in request.if_none_match:
+            response = Response(status=304)
+        else:
+            try:
+                response = build(*entry)
+            except ValueError as e:
+                return _error(400, str(e))
+
+        if response.status_code in (200, 304):
+            response.set_etag(tag)
+            response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    def with_statistics(identifier, render, validator=None):
+        def build(filepath, file_type):
+            stats = statistics(filepath, file_type)
+            if stats is None:
+                return _error(422, "No particle data found in file")
+            return render(stats)
+
+        return conditional(identifier, build, validator)
+
+    @api.route('/datasets', methods=['GET'])
+    def list_datasets():
+        with _datasets_lock:
+            entries = sorted(_datasets.items(), key=lambda item: str(item[1][0]))
+        return jsonify({'datasets': [
+            {'id': identifier, 'path': str(filepath), 'type': file_type}
+            for identifier, (filepath, file_type) in entries
+        ]})
+
+    @api.route('/datasets', methods=['POST'])
+    def add_dataset():
+        payload = request.get_json(silent=True) or {}
+        if not payload.get('path') or not payload.get('type'):
+            return _error(400, "Request body needs 'path' and 'type'")
+
+        try:
+            identifier = register_dataset(payload['path'], payload['type'])
+        except FileNotFoundError as e:
+            return _error(404, str(e))
+        except ValueError as e:
+            return _error(400, str(e))
+
+        response = jsonify({'id': identifier, 'path': str(Path(payload['path']).resolve()),
+                            'type': payload['type']})
+        response.status_code = 201
+        response.headers['Location'] = f"{api.url_prefix}/datasets/{identifier}/summary"
+        return response
+
+    @api.route('/datasets/<identifier>/summary')
+    def summary(identifier):
+        return with_statistics(
+            identifier, lambda stats: jsonify(_clean(stats.get_summary_statistics()))
+        )
+
+    @api.route('/datasets/<identifier>/distribution')
+    def distribution(identifier):
+        def render(stats):
+            counts = stats.get_distribution_per_micrograph()
+            stream = request.args.get('format') == 'ndjson'
+            offset = _int_arg('offset', 0, 0)
+            if stream:
+                limit = _int_arg('limit', max(len(counts), 1), 1)
+            else:
+                limit = _int_arg('limit', DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+            page = counts.iloc[offset:offset + limit]
+
+            if stream:
+                def lines():
+                    for name, count in page.items():
+                        yield json.dumps({'micrograph': _clean(name), 'count': int(count)}) + '\n'
+                return Response(lines(), mimetype='application/x-ndjson')
+
+            body = {
+                'total': len(counts),
+                'offset': offset,
+                'limit': limit,
+                'items': [{'micrograph': _clean(name), 'count': int(count)}
+                          for name, count in page.items()],
+            }
+            if offset + limit < len(counts):
+                body['next'] = f"{request.path}?offset={offset + limit}&limit={limit}"
+            return jsonify(body)
+
+        return with_statistics(identifier, render)
+
+    @api.route('/datasets/<identifier>/heatmap')
+    def heatmap(identifier):
+        def render(stats):
+            bin_size = _int_arg('bin', 200, MIN_HEATMAP_BIN)
+            data = stats.get_heatmap_data(bin_size=bin_size)
+            if data is None:
+                return _error(422, "No coordinate columns found")
+
+            return jsonify({
+                'bin_size': bin_size,
+                'x_col': data['x_col'],
+                'y_col': data['y_col'],
+                'x_edges': data['x_edges'].tolist(),
+                'y_edges': data['y_edges'].tolist(),
+                'counts': data['histogram'].astype(int).tolist(),
+            })
+
+        return with_statistics(identifier, render)
+
+    @api.route('/datasets/<identifier>/figures/<name>')
+    def figure(identifier, name):
+        if name not in FIGURES:
+            return _error(404, f"Unknown figure: {name}")
+
+        def build(filepath, file_type):
+            mode = request.args.get('mode', 'exact')
+            if mode not in ('exact', 'approximate'):
+                raise ValueError("'mode' must be exact or approximate")
+
+            params = {}
+            if name == 'heatmap':
+                params['bin_size'] = _int_arg('bin', 200, MIN_HEATMAP_BIN)
+            elif name == 'scatter':
+                params['max_points'] = _int_arg('points', 10000, 1, MAX_SCATTER_POINTS)
+                params['seed'] = _int_arg('seed', 42, 0)
+
+            def load():
+                if mode == 'approximate':
+                    stats = load_approximate_statistics(get_cache(), filepath, file_type)
+                else:
+                    stats = statistics(filepath, file_type)
+                if stats is None:
+                    raise _NoParticles()
+                return stats
+
+            # Same cache entries as the dashboard, returned without re-encoding
+            viz = CachedVisualizations(get_figure_cache(),
+                                       (file_fingerprint(filepath), file_type, mode), load)
+            try:
+                data = viz.get_json(FIGURES[name], **params)
+            except _NoParticles:
+                return _error(422, "No particle data found in file")
+            return Response(data, mimetype='application/json')
+
+        return conditional(identifier, build)
+
+    def with_micrograph(identifier, index, render):
+        def build(stats):
+            try:
+                name, pyramid = micrograph_pyramid(stats, index, dataset_entry(identifier)[0],
+                                                   request.args.get('root'))
+            except KeyError as e:
+                return _error(404, str(e.args[0]))
+            except FileNotFoundError as e:
+                return _error(404, str(e))
+            except ValueError as e:
+                return _error(422, str(e))
+            return render(stats, name, pyramid)
+
+        def micrograph_fingerprint(filepath, file_type):
+            # A regenerated MRC gets a new pyramid, so cached tiles and sizes
+            # must not validate. Lookup errors are left to build().
+            stats = statistics(filepath, file_type)
+            if stats is None:
+                return None
+            try:
+                _, path = micrograph_path(stats, index, filepath, request.args.get('root'))
+                return file_fingerprint(path)
+            except (KeyError, OSError):
+                return None
+
+        return with_statistics(identifier, build, micrograph_fingerprint)
+
+    @api.route('/datasets/<identifier>/micrographs/<int:index>')
+    def micrograph(identifier, index):
+        def render(stats, name, pyramid):
+            picks = stats.get_micrograph_picks(name)
+            return jsonify(_clean({
+                'micrograph': name,
+                'path': str(pyramid.mrc_path),
+                'width': pyramid.width,
+                'height': pyramid.height,
+                'pixel_size': pyramid.pixel_size,
+                'levels': pyramid.levels,
+                'tile_size': pyramid.tile_size,
+                'picks': {'x': picks['x'].tolist(), 'y': picks['y'].tolist()} if picks else None,
+            }))
+
+        return with_micrograph(identifier, index, render)
+
+    @api.route('/datasets/<identifier>/micrographs/<int:index>/tiles/'
+               '<int:level>/<int:tile_x>/<int:tile_y>.png')
+    def micrograph_tile(identifier, index, level, tile_x, tile_y):
+        def render(stats, name, pyramid):
+            try:
+                png = pyramid.tile_png(level, tile_x, tile_y)
+            except IndexError as e:
+                return _error(404, str(e))
+            return Response(png, mimetype='image/png')
+
+        return with_micrograph(identifier, index, render)
+
+    return api
@@ -1,19 +1,58 @@
 import sys
 from pathlib import Path
+from urllib.parse import quote
 import dash
-from dash import dcc, html, Input, Output, State
+from dash import dcc, html, Input, Output, State, MATCH
 import dash_bootstrap_components as dbc
+import flask
 import pandas as pd
 
-sys.path.append(str(Path(__file__).parent.parent))
+from particle_picker import metrics, profiling
+from particle_picker.analysis.boxes import BOX_COLUMNS
+from particle_picker.analysis.incremental import get_watcher
+from particle_picker.analysis.cache import file_fingerprint, get_shared_cache
+from particle_picker.dashboard.api import (
+    FIGURES, create_blueprint, dataset_entry, load_approximate_statistics, micrograph_pyramid,
+    register_dataset
+)
+from particle_picker.parsers.loader import load_table
+from particle_picker.visualization.plots import ParticleVisualizations
+from particle_picker.visualization.figure_cache import CachedVisualizations, get_shared_figure_cache
+from particle_picker.dashboard.loads import (
+    LoadLimitError, SMALL_FILE_BYTES, estimate_load_bytes, get_load_scheduler
+)
+
+# Must match the figures route's defaults, which the page's requests rely on
+FIGURE_PARAMS = {'heatmap': {'bin_size': 200}}
+
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP],
+                suppress_callback_exceptions=True)
+app.server.register_blueprint(create_blueprint())
+
+
+def collect_dashboard_metrics():
+    return (get_shared_cache().metrics() + get_shared_figure_cache().metrics()
+            + get_load_scheduler().metrics())
+
+
+metrics.register_collector('dashboard', collect_dashboard_metrics)
+
 
-from parsers.star_parser import StarFileParser
-from parsers.csv_parser import CSVParticleParser
-from parsers.box_parser import BoxFileParser
-from analysis.statistics import ParticleStatistics
-from visualization.plots import ParticleVisualizations
+@app.server.after_request
+def record_response_size(response):
+    # Streamed responses (NDJSON distributions) have no size up front
+    size = response.content_length
+    if size is None and not response.is_streamed:
+        size = response.calculate_content_length()
+    if size is not None:
+        rule = flask.request.url_rule
+        metrics.RESPONSE_BYTES.observe(size, route=rule.rule if rule is not None else 'unmatched')
+    return response
 
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+
+@app.server.route('/metrics')
+def serve_metrics():
+    return flask.Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 app.layout = dbc.Container([
     dbc.Row([
@@ -45,6 +84,22 @@ app.layout = dbc.Container([
                         value="star",
                         className="mb-3"
                     ),
+                    dbc.Checklist(
+                        id="live-mode",
+                        options=[{"label": "Live update (follow appended particles)",
+                                  "value": "live"}],
+                        value=[],
+                        switch=True,
+                        className="mb-3"
+                    ),
+                    dbc.Checklist(
+                        id="approx-mode",
+                        options=[{"label": "Quick look (approximate, sampled statistics)",
+                                  "value": "approx"}],
+                        value=[],
+                        switch=True,
+                        className="mb-3"
+                    ),
                     dbc.Button("Load File", id="load-button", color="primary", className="w-100"),
                     html.Div(id="load-status", className="mt-3")
                 ])
@@ -52,19 +107,99 @@ app.layout = dbc.Container([
         ], width=12)
     ], className="mb-4"),
     
-    html.Div(id="dashboard-content")
+    html.Div(id="dashboard-content"),
+
+    dcc.Interval(id="live-interval", interval=5000, disabled=True)
     
 ], fluid=True)
 
+
+def build_live_dashboard(stats):
+    viz = ParticleVisualizations(stats)
+
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Live Summary", className="card-title"),
+                        html.P(id="live-status", className="text-muted"),
+                        dcc.Graph(id="live-summary", figure=viz.create_summary_table())
+                    ])
+                ])
+            ], width=12)
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Particle Distribution", className="card-title"),
+                        dcc.Graph(id="live-distribution",
+                                  figure=viz.create_distribution_bar_chart())
+                    ])
+                ])
+            ], width=12)
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Distribution Histogram", className="card-title"),
+                        dcc.Graph(id="live-histogram", figure=viz.create_histogram())
+                    ])
+                ])
+            ], width=12)
+        ], className="mb-4")
+    ], fluid=True)
+
+
+@app.callback(
+    [Output("live-summary", "figure"),
+     Output("live-distribution", "figure"),
+     Output("live-histogram", "figure"),
+     Output("live-status", "children")],
+    Input("live-interval", "n_intervals"),
+    [State("file-path", "value"),
+     State("file-type", "value")],
+    prevent_initial_call=True
+)
+def refresh_live_dashboard(n_intervals, filepath, file_type):
+    watcher = get_watcher(filepath, file_type)
+
+    try:
+        new_rows = watcher.poll()
+    except Exception as e:
+        return dash.no_update, dash.no_update, dash.no_update, f"Error reading file: {e}"
+
+    status = (f"{watcher.stats.total_particles:,} particles, "
+              f"read up to byte {watcher.reader.offset:,}")
+
+    if not new_rows and not watcher.reader.truncated:
+        return dash.no_update, dash.no_update, dash.no_update, status
+
+    viz = ParticleVisualizations(watcher.stats)
+    return (viz.create_summary_table(), viz.create_distribution_bar_chart(),
+            viz.create_histogram(), status)
+
 @app.callback(
     [Output("load-status", "children"),
-     Output("dashboard-content", "children")],
+     Output("dashboard-content", "children"),
+     Output("live-interval", "disabled")],
     Input("load-button", "n_clicks"),
     [State("file-path", "value"),
-     State("file-type", "value")],
+     State("file-type", "value"),
+     State("live-mode", "value"),
+     State("approx-mode", "value")],
     prevent_initial_call=True
 )
-def load_and_analyze(n_clicks, filepath, file_type):
+def load_and_analyze(n_clicks, filepath, file_type, live_mode, approx_mode):
+    status, content = load_dashboard(filepath, file_type, bool(live_mode), bool(approx_mode))
+    return status, content, not (live_mode and content is not None)
+
+
+def load_dashboard(filepath, file_type, live=False, approx=False):
     if not filepath:
         return dbc.Alert("Please enter a file path", color="warning"), None
     
@@ -73,102 +208,319 @@ def load_and_analyze(n_clicks, filepath, file_type):
     if not filepath.exists():
         return dbc.Alert(f"File not found: {filepath}", color="danger"), None
     
+    if live:
+        try:
+            watcher = get_watcher(filepath, file_type)
+            watcher.poll()
+        except Exception as e:
+            return dbc.Alert(f"Error loading file: {str(e)}", color="danger"), None
+
+        status = dbc.Alert(
+            f"Following {filepath}: {watcher.stats.total_particles} particles so far",
+            color="info"
+        )
+        return status, build_live_dashboard(watcher.stats)
+
     try:
-        if file_type == "star":
-            parser = StarFileParser(filepath)
-            particles_df = parser.get_particles()
-        elif file_type == "csv":
-            parser = CSVParticleParser(filepath)
-            particles_df = parser.get_particles()
-        elif file_type == "box":
-            parser = BoxFileParser(filepath)
-            particles_df = parser.get_particles()
-        else:
-            return dbc.Alert("Invalid file type", color="danger"), None
+        with profiling.record() as recorder:
+            status, dashboard = build_dashboard(filepath, file_type, approx)
         
-        if particles_df is None or particles_df.empty:
-            return dbc.Alert("No particle data found in file", color="warning"), None
+        if dashboard is not None:
+            dashboard.children.append(build_timing_footer(recorder))
         
-        stats = ParticleStatistics(particles_df)
-        viz = ParticleVisualizations(stats)
+        return status, dashboard
         
-        summary = stats.get_summary_statistics()
+    except LoadLimitError as e:
+        return dbc.Alert(str(e), color="warning"), None
+    except Exception as e:
+        return dbc.Alert(f"Error loading file: {str(e)}", color="danger"), None
+
+
+def build_timing_footer(recorder):
+    totals = {}
+    for entry in recorder.summary():
+        if entry['depth'] == 0:
+            stage = entry['name'].split('.')[0]
+            stage = 'parse' if stage in ('star', 'csv', 'box') else stage
+            totals[stage] = totals.get(stage, 0.0) + entry['wall']
+
+    parts = [f"{stage} {seconds * 1000:.0f} ms" for stage, seconds in totals.items()]
+
+    return dbc.Row([
+        dbc.Col([
+            html.Details([
+                html.Summary(f"Timing: {' · '.join(parts)} "
+                             f"(total {sum(totals.values()) * 1000:.0f} ms)"),
+                html.Pre(recorder.format_table(), className="small")
+            ], className="text-muted small")
+        ], width=12)
+    ], className="mb-4")
+
+
+def load_dashboard_data(filepath, file_type, approx=False):
+    # Everything expensive behind a dashboard: parsing, statistics and figures
+    cache = get_shared_cache()
+
+    if approx:
+        stats = load_approximate_statistics(cache, filepath, file_type)
+        if stats is None:
+            return None
+    else:
+        table = cache.get_table(filepath, file_type, lambda: load_table(filepath, file_type))
         
-        dashboard = dbc.Container([
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("Summary", className="card-title"),
-                            dcc.Graph(figure=viz.create_summary_table())
-                        ])
-                    ])
-                ], width=12)
-            ], className="mb-4"),
-            
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("Particle Distribution", className="card-title"),
-                            dcc.Graph(figure=viz.create_distribution_bar_chart())
-                        ])
+        if table is None or len(table) == 0:
+            return None
+
+        stats = cache.get_statistics(filepath, file_type, table)
+
+    # Repeat views of an unchanged file reuse the serialized figures
+    dataset = (file_fingerprint(filepath), file_type, 'approximate' if approx else 'exact')
+    viz = CachedVisualizations(get_shared_figure_cache(), dataset, lambda: stats)
+
+    figures = ['summary', 'distribution', 'histogram', 'scatter', 'heatmap', 'defocus']
+    if not approx and any(col in stats.table for col in BOX_COLUMNS):
+        figures.append('boxes')
+
+    # Figures are built here, on the load pool, but only their names go back
+    # to the page, which fetches the cached JSON from the figures route
+    for name in figures:
+        viz.get_json(FIGURES[name], **FIGURE_PARAMS.get(name, {}))
+
+    return stats, figures
+
+
+def cached_graph(identifier, name, approx=False):
+    query = "?mode=approximate" if approx else ""
+    return html.Div([
+        dcc.Store(id={"type": "figure-url", "index": name},
+                  data=f"/api/datasets/{identifier}/figures/{name}{query}"),
+        dcc.Graph(id={"type": "cached-figure", "index": name}, figure={})
+    ])
+
+
+# The browser parses the cached bytes itself; Dash never decodes or
+# re-encodes them
+app.clientside_callback(
+    """
+    function(url) {
+        return fetch(url).then(function(response) { return response.json(); });
+    }
+    """,
+    Output({"type": "cached-figure", "index": MATCH}, "figure"),
+    Input({"type": "figure-url", "index": MATCH}, "data")
+)
+
+
+def build_dashboard(filepath, file_type, approx=False):
+    if file_type not in ("star", "csv", "box"):
+        return dbc.Alert("Invalid file type", color="danger"), None
+
+    # Concurrent views of one file share a single load, and the scheduler
+    # bounds how many loads run at once and how much memory they may take
+    size = Path(filepath).stat().st_size
+    loaded = get_load_scheduler().run(
+        (file_fingerprint(filepath), file_type, approx),
+        lambda: load_dashboard_data(filepath, file_type, approx),
+        cost=estimate_load_bytes(filepath, approx),
+        small=approx or size <= SMALL_FILE_BYTES,
+    )
+    if loaded is None:
+        return dbc.Alert("No particle data found in file", color="warning"), None
+
+    stats, figures = loaded
+    identifier = register_dataset(filepath, file_type)
+    summary = stats.get_summary_statistics()
+
+    dashboard = dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Summary", className="card-title"),
+                        cached_graph(identifier, 'summary', approx)
                     ])
-                ], width=12)
-            ], className="mb-4"),
-            
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("Distribution Histogram", className="card-title"),
-                            dcc.Graph(figure=viz.create_histogram())
-                        ])
+                ])
+            ], width=12)
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Particle Distribution", className="card-title"),
+                        cached_graph(identifier, 'distribution', approx)
                     ])
-                ], width=6),
-                
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("Coordinate Scatter Plot", className="card-title"),
-                            dcc.Graph(figure=viz.create_coordinate_scatter())
-                        ])
+                ])
+            ], width=12)
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Distribution Histogram", className="card-title"),
+                        cached_graph(identifier, 'histogram', approx)
                     ])
-                ], width=6)
-            ], className="mb-4"),
+                ])
+            ], width=6),
             
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("Particle Density Heatmap", className="card-title"),
-                            dcc.Graph(figure=viz.create_heatmap(bin_size=200))
-                        ])
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Coordinate Scatter Plot", className="card-title"),
+                        cached_graph(identifier, 'scatter', approx)
                     ])
-                ], width=12)
-            ], className="mb-4"),
-            
-            dbc.Row([
-                dbc.Col([
-                    dbc.Card([
-                        dbc.CardBody([
-                            html.H4("Defocus Distribution", className="card-title"),
-                            dcc.Graph(figure=viz.create_defocus_distribution())
-                        ])
+                ])
+            ], width=6)
+        ], className="mb-4"),
+
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Particle Density Heatmap", className="card-title"),
+                        cached_graph(identifier, 'heatmap', approx)
                     ])
-                ], width=12)
-            ], className="mb-4")
-        ], fluid=True)
+                ])
+            ], width=12)
+        ], className="mb-4"),
         
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Defocus Distribution", className="card-title"),
+                        cached_graph(identifier, 'defocus', approx)
+                    ])
+                ])
+            ], width=12)
+        ], className="mb-4")
+    ], fluid=True)
+
+    if 'boxes' in figures:
+        dashboard.children.append(dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H4("Box Statistics", className="card-title"),
+                        cached_graph(identifier, 'boxes', approx)
+                    ])
+                ])
+            ], width=12)
+        ], className="mb-4"))
+
+    if not approx and stats.table.names is not None:
+        dashboard.children.append(build_micrograph_viewer(identifier, stats.table.names))
+
+    if approx:
+        status = dbc.Alert(
+            f"Approximate: ~{summary['total_particles']} particles, statistics from "
+            f"{stats.sample_rows} sampled rows ({stats.method} sampling)",
+            color="info"
+        )
+    else:
         status = dbc.Alert(
             f"Successfully loaded {summary['total_particles']} particles from {summary['total_micrographs']} micrographs",
             color="success"
         )
-        
-        return status, dashboard
-        
-    except Exception as e:
-        return dbc.Alert(f"Error loading file: {str(e)}", color="danger"), None
+
+    return status, dashboard
+
+
+def build_micrograph_viewer(identifier, names):
+    options = [{"label": Path(str(name)).name, "value": index} for index, name in enumerate(names)]
+
+    return dbc.Row([
+        dbc.Col([
+            dbc.Card([
+                dbc.CardBody([
+                    html.H4("Micrograph Viewer", className="card-title"),
+                    dcc.Store(id="viewer-dataset", data=identifier),
+                    dbc.Row([
+                        dbc.Col([
+                            dcc.Dropdown(id="micrograph-select", options=options,
+                                         placeholder="Select a micrograph")
+                        ], width=6),
+                        dbc.Col([
+                            dbc.Input(id="micrograph-root", type="text", debounce=True,
+                                      placeholder="Micrograph directory (default: search "
+                                                  "above the particle file)")
+                        ], width=6)
+                    ], className="mb-3"),
+                    html.Div(id="micrograph-status", className="text-muted small"),
+                    dcc.Graph(id="micrograph-view", figure={})
+                ])
+            ])
+        ], width=12)
+    ], className="mb-4")
+
+
+def _relayout_ranges(relayout):
+    # Zooming sends both ends of each axis; autorange means the whole frame
+    relayout = relayout or {}
+    ranges = []
+    for axis in ('xaxis', 'yaxis'):
+        if f'{axis}.range[0]' in relayout and f'{axis}.range[1]' in relayout:
+            ranges.append([relayout[f'{axis}.range[0]'], relayout[f'{axis}.range[1]']])
+        elif f'{axis}.range' in relayout:
+            ranges.append(list(relayout[f'{axis}.range']))
+        else:
+            ranges.append(None)
+    return ranges
+
+
+@app.callback(
+    [Output("micrograph-view", "figure"),
+     Output("micrograph-status", "children")],
+    [Input("micrograph-select", "value"),
+     Input("micrograph-root", "value"),
+     Input("micrograph-view", "relayoutData")],
+    State("viewer-dataset", "data"),
+    prevent_initial_call=True
+)
+def update_micrograph_view(index, root, relayout, identifier):
+    entry = dataset_entry(identifier)
+    if index is None or entry is None:
+        return dash.no_update, ""
+
+    filepath, file_type = entry
+    cache = get_shared_cache()
+    table = cache.get_table(filepath, file_type, lambda: load_table(filepath, file_type))
+    stats = cache.get_statistics(filepath, file_type, table)
+
+    try:
+        name, pyramid = micrograph_pyramid(stats, index, filepath, root or None)
+        pyramid.build()
+    except (KeyError, FileNotFoundError, ValueError) as e:
+        return {}, str(e.args[0] if isinstance(e, KeyError) else e)
+
+    x_range, y_range = (None, None)
+    if dash.ctx.triggered_id == "micrograph-view":
+        x_range, y_range = _relayout_ranges(relayout)
+
+    query = f"?root={quote(root)}" if root else ""
+
+    def tile_url(level, tile_x, tile_y):
+        return (f"/api/datasets/{identifier}/micrographs/{index}/tiles/"
+                f"{level}/{tile_x}/{tile_y}.png{query}")
+
+    figure = ParticleVisualizations(stats).create_micrograph_view(
+        name, pyramid, tile_url, x_range=x_range, y_range=y_range
+    )
+    status = f"{pyramid.mrc_path} ({pyramid.width} x {pyramid.height} px)"
+    return figure, status
+
+
+def run_production_server(host='0.0.0.0', port=8050):
+    try:
+        from waitress import serve
+    except ImportError:
+        return False
+
+    print(f"Serving dashboard and /api on http://{host}:{port} (waitress, keep-alive)")
+    serve(app.server, host=host, port=port, threads=8)
+    return True
 
 if __name__ == "__main__":
-    app.run(debug=True, host='0.0.0.0', port=8050)
+    if '--debug' in sys.argv or not run_production_server():
+        app.run(debug=True, host='0.0.0.0', port=8050)
@@ -0,0 +1,200 @@
+import os
+import threading
+from collections import deque
+from contextlib import nullcontext
+from concurrent.futures import Future, TimeoutError
+from pathlib import Path
+
+from particle_picker import metrics, profiling
+from particle_picker.parsers.compression import detect_compression
+
+# Peak memory of a parse plus statistics is about 15x the text size for STAR
+# and CSV files; compressed text expands about 4x more
+LOAD_MEMORY_FACTOR = 16
+COMPRESSED_MEMORY_FACTOR = 4
+# Sampled (--approx style) loads keep a bounded sample in memory
+APPROX_MEMORY_BYTES = 64 * 1024 * 1024
+# Files up to this size go through the fast lane: large loads never take
+# the last worker, so small ones start even while big files are parsing
+SMALL_FILE_BYTES = 64 * 1024 * 1024
+
+DEFAULT_TIMEOUT = 300.0
+
+
+class LoadLimitError(Exception):
+    pass
+
+
+def estimate_load_bytes(filepath, approx=False):
+    size = Path(filepath).stat().st_size
+    if detect_compression(filepath):
+        size *= COMPRESSED_MEMORY_FACTOR
+    estimate = size * LOAD_MEMORY_FACTOR
+    return min(estimate, APPROX_MEMORY_BYTES) if approx else estimate
+
+
+def default_memory_budget():
+    try:
+        total = os.sysconf('SC_PHYS_PAGES') * os.sysconf('SC_PAGE_SIZE')
+    except (AttributeError, ValueError, OSError):
+        total = 16 * 1024 ** 3
+    return total // 2
+
+
+class _Load:
+    __slots__ = ('key', 'compute', 'cost', 'small', 'recorder', 'future')
+
+    def __init__(self, key, compute, cost, small, recorder):
+        self.key = key
+        self.compute = compute
+        self.cost = cost
+        self.small = small
+        self.recorder = recorder
+        self.future = Future()
+
+
+class LoadScheduler:
+    # Runs dashboard loads on at most max_workers threads. Requests for a key
+    # that is queued or running join that load instead of starting another.
+    # Loads start in arrival order as long as their estimated memory fits the
+    # budget; a queued large load does not hold back small ones behind it.
+
+    def __init__(self, max_workers=2, memory_budget=None, max_request_bytes=None,
+                 timeout=DEFAULT_TIMEOUT):
+        self.max_workers = max(1, max_workers)
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.max_request_bytes = min(max_request_bytes or self.memory_budget,
+                                     self.memory_budget)
+        self.timeout = timeout
+        self.completed = 0
+        self.joined = 0
+        self._loads = {}
+        self._queue = deque()
+        self._running = 0
+        self._running_large = 0
+        self._memory = 0
+        self._lock = threading.Lock()
+
+    def run(self, key, compute, cost=0, small=True, timeout=None):
+        # Waits at most `timeout` seconds (queueing included). A load that
+        # times out keeps running, and retries of the same key join it.
+        if cost > self.max_request_bytes:
+            raise LoadLimitError(f"Load needs about {cost / 1024 ** 2:,.0f} MiB, over the "
+                                 f"{self.max_request_bytes / 1024 ** 2:,.0f} MiB limit per request")
+
+        with self._lock:
+            load = self._loads.get(key)
+            joined = load is not None
+            if joined:
+                self.joined += 1
+            else:
+                # The load reports its spans to the recorder of the request
+                # that started it
+                load = self._loads[key] = _Load(key, compute, cost, small,
+                                                profiling.current_recorder())
+                self._queue.append(load)
+                self._dispatch()
+
+        timeout = self.timeout if timeout is None else timeout
+        try:
+            with profiling.span('load.wait') if joined else nullcontext():
+                return load.future.result(timeout=timeout)
+        except TimeoutError:
+            raise LoadLimitError(f"Still loading after {timeout:g}s; the load continues in "
+                                 f"the background, try again shortly") from None
+
+    def _dispatch(self):
+        large_slots = max(1, self.max_workers - 1)
+        for load in list(self._queue):
+            if self._running >= self.max_workers:
+                break
+            if not load.small and self._running_large >= large_slots:
+                continue
+            if self._memory + load.cost > self.memory_budget:
+                continue
+
+            self._queue.remove(load)
+            self._running += 1
+            self._running_large += not load.small
+            self._memory += load.cost
+            threading.Thread(target=self._execute, args=(load,), daemon=True).start()
+
+    def _execute(self, load):
+        value = error = None
+        try:
+            with profiling.record(load.recorder):
+                value = load.compute()
+        except BaseException as e:
+            error = e
+
+        # Release the slot before waking waiters, so a retry after a failure
+        # starts a new load instead of joining the finished one
+        with self._lock:
+            del self._loads[load.key]
+            self._running -= 1
+            self._running_large -= not load.small
+            self._memory -= load.cost
+            self.completed += 1
+            self._dispatch()
+
+        if error is not None:
+            load.future.set_exception(error)
+        else:
+            load.future.set_result(value)
+
+    def info(self):
+        with self._lock:
+            return {
+                'running': self._running,
+                'queued': len(self._queue),
+                'memory_reserved': self._memory,
+                'memory_budget': self.memory_budget,
+                'max_request_bytes': self.max_request_bytes,
+                'max_workers': self.max_workers,
+                'completed': self.completed,
+                'joined': self.joined,
+            }
+
+    def metrics(self):
+        info = self.info()
+        result = []
+        for name, description, value in (
+            ('particle_picker_loads_running', 'Dashboard loads running', info['running']),
+            ('particle_picker_loads_queued', 'Dashboard loads waiting for a worker',
+             info['queued']),
+            ('particle_picker_loads_memory_reserved_bytes',
+             'Estimated memory reserved by running loads', info['memory_reserved']),
+        ):
+            gauge = metrics.Gauge(name, description)
+            gauge.set(value)
+            result.append(gauge)
+
+        for name, description, value in (
+            ('particle_picker_loads_completed_total', 'Dashboard loads finished',
+             info['completed']),
+            ('particle_picker_loads_joined_total',
+             'Requests that waited on a load already in flight', info['joined']),
+        ):
+            counter = metrics.Counter(name, description)
+            counter.inc(value)
+            result.append(counter)
+        return result
+
+
+_shared_scheduler = None
+_shared_scheduler_lock = threading.Lock()
+
+
+def get_load_scheduler():
+    # PARTICLE_PICKER_LOAD_WORKERS, PARTICLE_PICKER_LOAD_MEMORY_MB and
+    # PARTICLE_PICKER_LOAD_TIMEOUT override the defaults
+    global _shared_scheduler
+    with _shared_scheduler_lock:
+        if _shared_scheduler is None:
+            memory_mb = os.environ.get('PARTICLE_PICKER_LOAD_MEMORY_MB')
+            _shared_scheduler = LoadScheduler(
+                max_workers=int(os.environ.get('PARTICLE_PICKER_LOAD_WORKERS', 2)),
+                memory_budget=int(memory_mb) * 1024 ** 2 if memory_mb else None,
+                timeout=float(os.environ.get('PARTICLE_PICKER_LOAD_TIMEOUT', DEFAULT_TIMEOUT)),
+            )
+        return _shared_scheduler
@@ -0,0 +1,229 @@
+import bisect
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+                   60.0, 120.0, 300.0)
+BYTES_BUCKETS = tuple(1024 * 4 ** power for power in range(10))
+
+# Upper bounds of the file size label on parse latency
+SIZE_BUCKETS = (
+    (1024 ** 2, '<1MiB'),
+    (10 * 1024 ** 2, '1-10MiB'),
+    (100 * 1024 ** 2, '10-100MiB'),
+    (1024 ** 3, '100MiB-1GiB'),
+)
+
+
+def size_bucket(nbytes):
+    for limit, label in SIZE_BUCKETS:
+        if nbytes < limit:
+            return label
+    return '>1GiB'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if math.isinf(value):
+        return '+Inf' if value > 0 else '-Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_sample(name, labels, value):
+    if labels:
+        pairs = ','.join(f'{key}="{_escape(label)}"' for key, label in labels.items())
+        name = f"{name}{{{pairs}}}"
+    return f"{name} {_format_value(value)}"
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labels):
+            raise ValueError(f"{self.name} takes labels {self.labels}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        return [(self.name, dict(zip(self.labels, key)), value) for key, value in values]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][index] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _snapshot(self):
+        with self._lock:
+            return sorted((key, ([*counts], total, count))
+                          for key, (counts, total, count) in self._values.items())
+
+    def summary(self):
+        # Per label set: count, mean and the bucket bounds holding the median
+        # and the 95th percentile
+        result = []
+        for key, (counts, total, count) in self._snapshot():
+            cumulative = list(itertools.accumulate(counts))
+            result.append({
+                'labels': dict(zip(self.labels, key)),
+                'count': count,
+                'mean': total / count if count else 0.0,
+                'p50': self.buckets[bisect.bisect_left(cumulative, 0.5 * count)],
+                'p95': self.buckets[bisect.bisect_left(cumulative, 0.95 * count)],
+            })
+        return result
+
+    def samples(self):
+        samples = []
+        for key, (counts, total, count) in self._snapshot():
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                samples.append((f"{self.name}_bucket", {**labels, 'le': _format_value(bound)},
+                                cumulative))
+            samples.append((f"{self.name}_sum", labels, total))
+            samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    # Collectors report values read at scrape time, such as cache counters
+    # and resident bytes.
+
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered")
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, description, labels=()):
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name, description, labels=()):
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def register_collector(self, key, collect):
+        # collect() returns metrics (usually fresh Gauge/Counter objects);
+        # registering the same key again replaces the collector
+        with self._lock:
+            self._collectors[key] = collect
+
+    def unregister_collector(self, key):
+        with self._lock:
+            self._collectors.pop(key, None)
+
+    def collect(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.values())
+
+        families = {metric.name: metric for metric in metrics}
+        for collect in collectors:
+            for metric in collect():
+                if metric.name in families:
+                    # Two collectors for one name (say, two caches) merge
+                    merged = families[metric.name]
+                    families[metric.name] = _Merged(merged, metric)
+                else:
+                    families[metric.name] = metric
+        return [families[name] for name in sorted(families)]
+
+    def render(self):
+        lines = []
+        for metric in self.collect():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(format_sample(*sample) for sample in metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+class _Merged:
+
+    def __init__(self, first, second):
+        self.name = first.name
+        self.description = first.description
+        self.kind = first.kind
+        self._parts = (first, second)
+
+    def samples(self):
+        return [sample for part in self._parts for sample in part.samples()]
+
+
+REGISTRY = Registry()
+
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+register_collector = REGISTRY.register_collector
+unregister_collector = REGISTRY.unregister_collector
+render = REGISTRY.render
+
+# Shared by the serve daemon and the dashboard, labelled by route
+RESPONSE_BYTES = histogram('particle_picker_response_bytes', 'Size of response payloads',
+                           ['route'], buckets=BYTES_BUCKETS)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
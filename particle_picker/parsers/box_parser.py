@@ -1,35 +1,83 @@
+import numpy as np
 import pandas as pd
 from pathlib import Path
 
+from particle_picker.profiling import span
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.parsers.compression import open_binary
+
 class BoxFileParser:
     
     def __init__(self, filepath):
         self.filepath = Path(filepath)
         self.data = None
+        self.table = None
         self._parse()
-    
+
+    @property
+    def data(self):
+        if self._data is None and self.table is not None:
+            self._data = self.table.to_pandas()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
     def _parse(self):
         try:
-            df = pd.read_csv(
-                self.filepath,
-                sep=r'\s+',
-                header=None,
-                names=['x', 'y', 'width', 'height']
-            )
-            
-            for col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce')
-            
-            df = df.dropna()
-            self.data = df
-            
+            with span('box.parse'):
+                with span('box.read_csv') as read_span:
+                    with open_binary(self.filepath) as f:
+                        df = pd.read_csv(
+                            f,
+                            sep=r'\s+',
+                            header=None,
+                            names=['x', 'y', 'width', 'height']
+                        )
+                    read_span.rows = len(df)
+
+                with span('box.convert', rows=len(df)):
+                    columns = {col: pd.to_numeric(df[col], errors='coerce').to_numpy()
+                               for col in df.columns}
+                    del df
+
+                    # Drop incomplete rows with one mask instead of a dropna copy
+                    valid = np.logical_and.reduce([~np.isnan(values)
+                                                   for values in columns.values()])
+                    if not valid.all():
+                        columns = {col: values[valid] for col, values in columns.items()}
+                self.table = ParticleTable.from_arrays(columns)
+
         except Exception as e:
             print(f"Error parsing {self.filepath}: {e}")
             self.data = None
+            self.table = None
     
+    @classmethod
+    def iter_batches(cls, filepath, batch_size=100000):
+        with open_binary(filepath) as f:
+            reader = pd.read_csv(
+                f,
+                sep=r'\s+',
+                header=None,
+                names=['x', 'y', 'width', 'height'],
+                chunksize=batch_size
+            )
+
+            for df in reader:
+                for col in df.columns:
+                    df[col] = pd.to_numeric(df[col], errors='coerce')
+                yield df.dropna()
+
     def get_particles(self):
         return self.data
     
+    def get_table(self):
+        if self.table is None and self.data is not None:
+            self.table = ParticleTable.from_pandas(self.data)
+        return self.table
+
     def get_statistics(self):
         if self.data is None:
             return {}
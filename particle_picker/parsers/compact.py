@@ -0,0 +1,137 @@
+import sys
+
+import numpy as np
+
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.parsers.csv_parser import detect_column_roles
+
+# Largest absolute error a float32 downcast may introduce, per column role
+# (pixels, Angstrom, degrees). Other float columns are bounded relative to
+# their largest magnitude. Columns that would exceed the bound stay float64.
+FLOAT_TOLERANCES = {
+    'coordinate': 0.01,
+    'defocus': 1.0,
+    'angle': 0.01,
+}
+RELATIVE_TOLERANCE = 1e-6
+INTEGER_DTYPES = (np.int8, np.int16, np.int32)
+
+
+def _float_bound(values, role):
+    if role in FLOAT_TOLERANCES:
+        return FLOAT_TOLERANCES[role]
+    return RELATIVE_TOLERANCE * float(np.abs(values).max())
+
+
+def compact_column(values, role=None):
+    # Returns (values, max_error); values are unchanged when no smaller
+    # dtype keeps every value within the precision bound
+    if values.dtype.kind in 'iu' and len(values) and values.dtype.itemsize > 1:
+        low, high = values.min(), values.max()
+        for dtype in INTEGER_DTYPES:
+            info = np.iinfo(dtype)
+            if np.dtype(dtype).itemsize >= values.dtype.itemsize:
+                break
+            if info.min <= low and high <= info.max:
+                return values.astype(dtype), 0.0
+        return values, 0.0
+
+    if values.dtype == np.float64:
+        finite = values[np.isfinite(values)]
+        if not len(finite):
+            return values.astype(np.float32), 0.0
+
+        if np.abs(finite).max() > np.finfo(np.float32).max:
+            return values, 0.0
+
+        converted = values.astype(np.float32)
+        error = np.abs(converted[np.isfinite(values)].astype(np.float64) - finite).max()
+        if error <= _float_bound(finite, role):
+            return converted, float(error)
+    return values, 0.0
+
+
+def compact_codes(codes, names):
+    for dtype in INTEGER_DTYPES:
+        if len(names) <= np.iinfo(dtype).max:
+            return codes.astype(dtype, copy=False)
+    return codes
+
+
+def compact_table(table):
+    roles = detect_column_roles(table.column_names)
+    columns = {}
+    errors = {}
+
+    for name in table.column_names:
+        if name == table.micrograph_column:
+            continue
+        columns[name], errors[name] = compact_column(table[name], roles.get(name))
+
+    if table.micrograph_column is None:
+        compacted = ParticleTable(columns, order=table.column_names)
+    else:
+        compacted = ParticleTable(columns, order=table.column_names,
+                                  micrograph_column=table.micrograph_column,
+                                  codes=compact_codes(table.codes, table.names),
+                                  names=table.names)
+    return compacted, errors
+
+
+def _object_bytes(values):
+    return values.nbytes + sum(sys.getsizeof(value) for value in values)
+
+
+def column_bytes(table, name, encoded=True):
+    # Bytes held by a column; with encoded=False the micrograph column is
+    # counted as the object column pandas would hold
+    if name == table.micrograph_column:
+        if encoded:
+            return table.codes.nbytes + _object_bytes(table.names)
+
+        sizes = np.array([sys.getsizeof(value) for value in table.names], dtype=np.int64)
+        present = table.codes >= 0
+        missing = len(table.codes) - int(present.sum())
+        pointers = len(table.codes) * np.dtype(object).itemsize
+        return (pointers + int(sizes[table.codes[present]].sum())
+                + missing * sys.getsizeof(float('nan')))
+
+    values = table[name]
+    if values.dtype == object:
+        return _object_bytes(values)
+    return values.nbytes
+
+
+def column_dtype(table, name, encoded=True):
+    if name == table.micrograph_column:
+        return f'{table.codes.dtype}+names' if encoded else 'object'
+    return str(table[name].dtype)
+
+
+def memory_report(table):
+    compacted, errors = compact_table(table)
+    roles = detect_column_roles(table.column_names)
+
+    columns = []
+    for name in table.column_names:
+        columns.append({
+            'column': name,
+            'role': 'micrograph' if name == table.micrograph_column else roles.get(name),
+            'dtype_before': column_dtype(table, name, encoded=False),
+            'bytes_before': column_bytes(table, name, encoded=False),
+            'dtype_after': column_dtype(compacted, name),
+            'bytes_after': column_bytes(compacted, name),
+            'max_error': errors.get(name, 0.0),
+        })
+
+    rows = len(table)
+    before = sum(column['bytes_before'] for column in columns)
+    after = sum(column['bytes_after'] for column in columns)
+    return {
+        'particles': rows,
+        'columns': columns,
+        'bytes_before': before,
+        'bytes_after': after,
+        'bytes_per_particle_before': before / rows if rows else 0.0,
+        'bytes_per_particle_after': after / rows if rows else 0.0,
+    }
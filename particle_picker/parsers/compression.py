@@ -0,0 +1,59 @@
+import bz2
+import gzip
+import io
+import lzma
+
+MAGIC_NUMBERS = [
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\xfd7zXZ\x00', 'xz'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+]
+
+
+def detect_compression(filepath):
+    with open(filepath, 'rb') as f:
+        header = f.read(6)
+
+    for magic, name in MAGIC_NUMBERS:
+        if header.startswith(magic):
+            return name
+    return None
+
+
+def _open_zstd(filepath):
+    try:
+        from compression import zstd
+        return zstd.open(filepath, 'rb')
+    except ImportError:
+        pass
+
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError("Reading zstd-compressed files requires the 'zstandard' package "
+                          "(pip install zstandard)")
+
+    raw = open(filepath, 'rb')
+    reader = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+    return io.BufferedReader(reader)
+
+
+def open_binary(filepath):
+    compression = detect_compression(filepath)
+
+    if compression == 'gzip':
+        return gzip.open(filepath, 'rb')
+    elif compression == 'bz2':
+        return bz2.open(filepath, 'rb')
+    elif compression == 'xz':
+        return lzma.open(filepath, 'rb')
+    elif compression == 'zstd':
+        return _open_zstd(filepath)
+    return open(filepath, 'rb')
+
+
+def open_text(filepath, newline=None):
+    if detect_compression(filepath) is None:
+        return open(filepath, 'r', newline=newline)
+    return io.TextIOWrapper(open_binary(filepath), newline=newline)
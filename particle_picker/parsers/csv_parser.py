@@ -1,47 +1,231 @@
+import importlib.util
+
 import pandas as pd
 from pathlib import Path
 
+from particle_picker.profiling import span
+from particle_picker.analysis.columns import find_micrograph_column
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.parsers import parallel
+from particle_picker.parsers.compression import detect_compression, open_binary
+
+ROLE_DTYPES = {
+    'name': str,
+    'coordinate': 'float64',
+    'defocus': 'float64',
+    'angle': 'float64',
+    'score': 'float64',
+}
+
+
+def _column_role(column):
+    key = column.lower()
+    if key.startswith('_rln'):
+        key = key[4:]
+    elif key.startswith('rln'):
+        key = key[3:]
+
+    if key.endswith('name'):
+        return 'name'
+    if key in ('x', 'y', 'coordinatex', 'coordinatey'):
+        return 'coordinate'
+    if key in ('defocusu', 'defocusv'):
+        return 'defocus'
+    if key.startswith('angle') or key == 'defocusangle':
+        return 'angle'
+    if key in ('autopickfigureofmerit', 'score'):
+        return 'score'
+    return None
+
+
+def detect_column_roles(columns):
+    roles = {}
+    for col in columns:
+        role = _column_role(col)
+        if role is not None:
+            roles[col] = role
+    return roles
+
+
+def declared_dtypes(columns, schema=None):
+    schema = ROLE_DTYPES if schema is None else schema
+    return {col: schema[role] for col, role in detect_column_roles(columns).items()
+            if role in schema}
+
+
+def csv_engine():
+    if importlib.util.find_spec('pyarrow') is not None:
+        return 'pyarrow'
+    return 'c'
+
+
+def _read_arrow(filepath, dtypes):
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    arrow_types = {str: pa.string(), 'float64': pa.float64(),
+                   'category': pa.dictionary(pa.int32(), pa.string())}
+    options = pa_csv.ConvertOptions(
+        column_types={col: arrow_types[dtype] for col, dtype in dtypes.items()
+                      if dtype in arrow_types},
+        strings_can_be_null=True
+    )
+    # Plain files go through Arrow's own reader; a Python file object would
+    # be read in 1 MiB bytes blocks whatever the file size
+    opener = open_binary if detect_compression(filepath) else lambda path: pa.OSFile(str(path))
+    with opener(filepath) as f:
+        return pa_csv.read_csv(f, convert_options=options).to_pandas()
+
+
 class CSVParticleParser:
     
-    def __init__(self, filepath):
+    def __init__(self, filepath, schema=None, jobs=1):
         self.filepath = Path(filepath)
+        self.schema = ROLE_DTYPES if schema is None else schema
+        self.jobs = jobs
         self.data = None
+        self.table = None
+        self.roles = {}
+        self.dtypes = {}
+        self.micrograph_column = None
+        self.coordinate_columns = []
         self._parse()
     
+    @property
+    def data(self):
+        if self._data is None and self.table is not None:
+            self._data = self.table.to_pandas()
+        return self._data
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+
     def _parse(self):
         try:
-            df = pd.read_csv(self.filepath)
-            
-            for col in df.columns:
-                if df[col].dtype == 'object':
-                    try:
-                        df[col] = pd.to_numeric(df[col], errors='ignore')
-                    except:
-                        pass
-            
-            self.data = df
+            with span('csv.parse'):
+                with span('csv.read_csv') as read_span:
+                    columns = self._read_header(self.filepath)
+                    self._detect_roles(columns)
+                    table = self._read_parallel(columns) if self.jobs != 1 else None
+                    if table is not None:
+                        read_span.rows = len(table)
+                        self.table = table
+                        return
+                    df = self._read_frame(self.filepath, self._read_dtypes(columns))
+                    read_span.rows = len(df)
+
+                with span('csv.convert', rows=len(df)):
+                    df = self._convert_numeric(df, skip=self.dtypes)
+                    self.table = ParticleTable.from_arrays(
+                        {col: df[col] if df[col].dtype == 'category' else df[col].to_numpy()
+                         for col in df.columns})
             
         except Exception as e:
             print(f"Error parsing CSV {self.filepath}: {e}")
             self.data = None
     
+    def _detect_roles(self, columns):
+        self.roles = detect_column_roles(columns)
+        self.dtypes = declared_dtypes(columns, self.schema)
+
+        micrograph_cols = [col for col in columns
+                           if 'micrograph' in col.lower() or 'image' in col.lower()]
+        self.micrograph_column = micrograph_cols[0] if micrograph_cols else None
+        self.coordinate_columns = [col for col in columns
+                                   if any(x in col.lower() for x in ['x', 'y', 'coordinate'])]
+
+    def _read_dtypes(self, columns):
+        # Read the micrograph names dictionary-encoded so the table takes its
+        # codes from the reader instead of hashing one string per row
+        dtypes = dict(self.dtypes)
+        micrograph_column = find_micrograph_column(columns)
+        if dtypes.get(micrograph_column) is str:
+            dtypes[micrograph_column] = 'category'
+        return dtypes
+
+    def _read_parallel(self, columns):
+        if not parallel.can_parallelize(self.filepath):
+            return None
+
+        layout = parallel.locate_csv_body(self.filepath)
+        if layout is None or layout[0] != columns:
+            return None
+
+        _, start, end = layout
+        return parallel.parse_table(self.filepath, start, end, columns,
+                                    parallel.resolve_jobs(self.jobs), star=False,
+                                    declared=self.dtypes)
+
+    @staticmethod
+    def _read_header(filepath):
+        with open_binary(filepath) as f:
+            return list(pd.read_csv(f, nrows=0).columns)
+
+    @staticmethod
+    def _read_frame(filepath, dtypes):
+        if csv_engine() == 'pyarrow':
+            try:
+                return _read_arrow(filepath, dtypes)
+            except (ValueError, TypeError):
+                pass
+
+        try:
+            with open_binary(filepath) as f:
+                return pd.read_csv(f, dtype=dtypes or None)
+        except (ValueError, TypeError):
+            if not dtypes:
+                raise
+
+        with open_binary(filepath) as f:
+            return pd.read_csv(f)
+
+    @classmethod
+    def iter_batches(cls, filepath, batch_size=100000, schema=None):
+        dtypes = declared_dtypes(cls._read_header(filepath), schema)
+        yielded = False
+
+        try:
+            for df in cls._iter_chunks(filepath, batch_size, dtypes):
+                yielded = True
+                yield cls._convert_numeric(df, skip=dtypes)
+        except (ValueError, TypeError):
+            if yielded or not dtypes:
+                raise
+            for df in cls._iter_chunks(filepath, batch_size, None):
+                yield cls._convert_numeric(df)
+
+    @staticmethod
+    def _iter_chunks(filepath, batch_size, dtypes):
+        with open_binary(filepath) as f:
+            yield from pd.read_csv(f, engine='c', dtype=dtypes or None, chunksize=batch_size)
+
+    @staticmethod
+    def _convert_numeric(df, skip=()):
+        for col in df.columns:
+            if col not in skip and df[col].dtype == 'object':
+                try:
+                    df[col] = pd.to_numeric(df[col])
+                except (ValueError, TypeError):
+                    pass
+        return df
+
     def get_particles(self):
         return self.data
     
+    def get_table(self):
+        if self.table is None and self.data is not None:
+            self.table = ParticleTable.from_pandas(self.data)
+        return self.table
+
     def get_micrograph_names(self):
-        if self.data is not None:
-            micrograph_cols = [col for col in self.data.columns 
-                             if 'micrograph' in col.lower() or 'image' in col.lower()]
-            if micrograph_cols:
-                return self.data[micrograph_cols[0]].unique()
+        if self.data is not None and self.micrograph_column is not None:
+            return self.data[self.micrograph_column].unique()
         return []
     
     def get_particles_per_micrograph(self):
-        if self.data is not None:
-            micrograph_cols = [col for col in self.data.columns 
-                             if 'micrograph' in col.lower() or 'image' in col.lower()]
-            if micrograph_cols:
-                return self.data.groupby(micrograph_cols[0]).size().to_dict()
+        if self.data is not None and self.micrograph_column is not None:
+            return self.data.groupby(self.micrograph_column).size().to_dict()
         return {}
     
     def get_statistics(self):
@@ -53,17 +237,12 @@ class CSVParticleParser:
             'columns': list(self.data.columns)
         }
         
-        coord_cols = [col for col in self.data.columns 
-                     if any(x in col.lower() for x in ['x', 'y', 'coordinate'])]
-        
-        for col in coord_cols:
+        for col in self.coordinate_columns:
             if pd.api.types.is_numeric_dtype(self.data[col]):
                 stats[f'{col}_mean'] = float(self.data[col].mean())
                 stats[f'{col}_std'] = float(self.data[col].std())
         
-        micrograph_cols = [col for col in self.data.columns 
-                         if 'micrograph' in col.lower() or 'image' in col.lower()]
-        if micrograph_cols:
-            stats['unique_micrographs'] = len(self.data[micrograph_cols[0]].unique())
+        if self.micrograph_column is not None:
+            stats['unique_micrographs'] = len(self.data[self.micrograph_column].unique())
         
         return stats
@@ -0,0 +1,53 @@
+import importlib
+from pathlib import Path
+
+from particle_picker import metrics
+
+PARSERS = {
+    'star': ('particle_picker.parsers.star_parser', 'StarFileParser'),
+    'csv': ('particle_picker.parsers.csv_parser', 'CSVParticleParser'),
+    'box': ('particle_picker.parsers.box_parser', 'BoxFileParser'),
+}
+
+
+def get_parser_class(file_type):
+    if file_type not in PARSERS:
+        raise ValueError(f"Unknown file type: {file_type}")
+    module_name, class_name = PARSERS[file_type]
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+PARALLEL_TYPES = ('star', 'csv')
+
+PARSE_SECONDS = metrics.histogram('particle_picker_parse_seconds',
+                                  'Time to parse a particle file', ['type', 'size'])
+
+
+def _create_parser(filepath, file_type, jobs):
+    parser_class = get_parser_class(file_type)
+    if jobs != 1 and file_type in PARALLEL_TYPES:
+        return parser_class(Path(filepath), jobs=jobs)
+    return parser_class(Path(filepath))
+
+
+def _parse(filepath, file_type, jobs, read):
+    size = metrics.size_bucket(Path(filepath).stat().st_size)
+    with PARSE_SECONDS.time(type=file_type, size=size):
+        return read(_create_parser(filepath, file_type, jobs))
+
+
+def load_particles(filepath, file_type, jobs=1):
+    return _parse(filepath, file_type, jobs, lambda parser: parser.get_particles())
+
+
+def load_table(filepath, file_type, jobs=1, compact=False):
+    table = _parse(filepath, file_type, jobs, lambda parser: parser.get_table())
+    if compact and table is not None:
+        from particle_picker.parsers.compact import compact_table
+
+        table = compact_table(table)[0]
+    return table
+
+
+def iter_particle_batches(filepath, file_type, batch_size=100000):
+    return get_parser_class(file_type).iter_batches(Path(filepath), batch_size=batch_size)
@@ -0,0 +1,119 @@
+from pathlib import Path
+
+import numpy as np
+
+HEADER_BYTES = 1024
+
+# MRC2014 data modes that hold real-valued images
+MODES = {
+    0: 'i1',
+    1: 'i2',
+    2: 'f4',
+    6: 'u2',
+    12: 'f2',
+}
+
+
+class MrcHeader:
+
+    def __init__(self, nx, ny, nz, mode, byte_order, data_offset, pixel_size):
+        self.nx = nx
+        self.ny = ny
+        self.nz = nz
+        self.mode = mode
+        self.dtype = np.dtype(byte_order + MODES[mode])
+        self.data_offset = data_offset
+        self.pixel_size = pixel_size
+
+    @property
+    def shape(self):
+        return self.nz, self.ny, self.nx
+
+
+def _byte_order(header):
+    # Machine stamp: 0x44 0x44 or 0x44 0x41 little-endian, 0x11 0x11 big-endian.
+    # Some writers leave it empty, so fall back to the plausible mode word.
+    stamp = header[212:214]
+    if stamp[0] == 0x44:
+        return '<'
+    if stamp[0] == 0x11:
+        return '>'
+    mode = int(np.frombuffer(header, dtype='<i4', count=1, offset=12)[0])
+    return '<' if mode in MODES else '>'
+
+
+def read_mrc_header(filepath):
+    with open(filepath, 'rb') as f:
+        header = f.read(HEADER_BYTES)
+    if len(header) < HEADER_BYTES:
+        raise ValueError(f"Not an MRC file (header too short): {filepath}")
+
+    byte_order = _byte_order(header)
+    words = np.frombuffer(header, dtype=byte_order + 'i4', count=24)
+    nx, ny, nz, mode = (int(value) for value in words[:4])
+    mx = int(words[7])
+    cell_x = float(np.frombuffer(header, dtype=byte_order + 'f4', count=1, offset=40)[0])
+    extended = int(words[23])
+
+    if mode not in MODES:
+        raise ValueError(f"Unsupported MRC mode {mode}: {filepath}")
+    if min(nx, ny, nz) < 1 or extended < 0:
+        raise ValueError(f"Invalid MRC dimensions {nx}x{ny}x{nz}: {filepath}")
+
+    result = MrcHeader(nx, ny, nz, mode, byte_order, HEADER_BYTES + extended,
+                       cell_x / mx if mx > 0 and cell_x > 0 else None)
+    expected = result.data_offset + nx * ny * nz * result.dtype.itemsize
+    if Path(filepath).stat().st_size < expected:
+        raise ValueError(f"MRC file is truncated ({expected} bytes expected): {filepath}")
+    return result
+
+
+def open_mrc(filepath, section=0):
+    # Maps one section read-only; pages are only read when the image is indexed
+    header = read_mrc_header(filepath)
+    if not 0 <= section < header.nz:
+        raise IndexError(f"Section {section} out of range for {header.nz} sections")
+
+    offset = header.data_offset + section * header.nx * header.ny * header.dtype.itemsize
+    return np.memmap(filepath, dtype=header.dtype, mode='r', offset=offset,
+                     shape=(header.ny, header.nx))
+
+
+def write_mrc(filepath, data, pixel_size=1.0):
+    data = np.asarray(data)
+    if data.ndim == 2:
+        data = data[np.newaxis]
+    modes = {np.dtype(code).newbyteorder('<'): mode for mode, code in MODES.items()}
+    dtype = np.dtype(data.dtype).newbyteorder('<')
+    if dtype not in modes:
+        dtype = np.dtype('<f4')
+
+    nz, ny, nx = data.shape
+    words = np.zeros(256, dtype='<i4')
+    words[:4] = nx, ny, nz, modes[dtype]
+    words[7:10] = nx, ny, nz
+    words[16:19] = 1, 2, 3
+    header = bytearray(words.tobytes())
+    header[40:52] = np.array([nx * pixel_size, ny * pixel_size, nz * pixel_size], '<f4').tobytes()
+    header[52:64] = np.array([90, 90, 90], '<f4').tobytes()
+    header[208:216] = b'MAP DD\x00\x00'
+
+    with open(filepath, 'wb') as f:
+        f.write(bytes(header))
+        f.write(np.ascontiguousarray(data, dtype=dtype).tobytes())
+
+
+def resolve_micrograph(name, particles_path, root=None):
+    # RELION stores micrograph paths relative to the project directory, which
+    # is usually an ancestor of the directory holding the particle file
+    name = Path(name)
+    if name.is_absolute():
+        return name if name.is_file() else None
+
+    bases = [Path(root)] if root else []
+    bases += [Path(particles_path).resolve().parent, *Path(particles_path).resolve().parents]
+    for base in bases:
+        candidate = base / name
+        if candidate.is_file():
+            return candidate
+    return None
@@ -0,0 +1,287 @@
+import csv
+import io
+import mmap
+import multiprocessing
+import os
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from particle_picker.profiling import span
+from particle_picker.analysis.columns import find_micrograph_column
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.parsers.compression import detect_compression
+from particle_picker.parsers.tokenizer import clean_star_column_name
+
+MIN_RANGE_BYTES = 4 * 1024 * 1024
+SAMPLE_BYTES = 256 * 1024
+COUNT_CHUNK_BYTES = 16 * 1024 * 1024
+
+KIND_DTYPES = {'int64': np.int64, 'float64': np.float64, 'str': np.int32}
+
+_buffers = {}
+
+
+def resolve_jobs(jobs):
+    if not jobs or jobs < 0:
+        return os.cpu_count() or 1
+    return jobs
+
+
+def can_parallelize(filepath):
+    return ('fork' in multiprocessing.get_all_start_methods()
+            and detect_compression(filepath) is None)
+
+
+def locate_star_loop(filepath, section='data_particles'):
+    block = None
+    columns = []
+    in_loop = False
+    offset = 0
+
+    with open(filepath, 'rb') as f:
+        for line in f:
+            stripped = line.strip()
+
+            if stripped and stripped[:1] != b'#':
+                if stripped.startswith(b'data_'):
+                    if columns:
+                        return None
+                    block = stripped.split()[0].decode()
+                    in_loop = False
+                elif block is not None and block.startswith(section):
+                    if stripped == b'loop_':
+                        in_loop = True
+                    elif in_loop and stripped[:1] == b'_':
+                        columns.append(clean_star_column_name(stripped.decode()))
+                    elif columns:
+                        break
+
+            offset += len(line)
+        else:
+            return None
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = mm.find(b'\ndata_', offset)
+
+    body_end = end + 1 if end >= 0 else os.path.getsize(filepath)
+    return columns, offset, body_end
+
+
+def locate_csv_body(filepath):
+    with open(filepath, 'rb') as f:
+        header = f.readline()
+
+    if not header.strip() or b'"' in header:
+        return None
+    columns = next(csv.reader([header.decode()]))
+    return columns, len(header), os.path.getsize(filepath)
+
+
+def split_ranges(filepath, start, end, parts):
+    bounds = [start]
+
+    with open(filepath, 'rb') as f:
+        for i in range(1, parts):
+            f.seek(max(start + (end - start) * i // parts - 1, bounds[-1]))
+            f.readline()
+            position = min(f.tell(), end)
+            if position > bounds[-1]:
+                bounds.append(position)
+
+    if bounds[-1] < end:
+        bounds.append(end)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_range(data, columns, star, str_columns):
+    if star:
+        options = {'sep': r'\s+', 'quoting': csv.QUOTE_NONE, 'na_filter': False}
+    else:
+        options = {'sep': ','}
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', pd.errors.ParserWarning)
+        return pd.read_csv(
+            io.BytesIO(data), header=None, names=columns, index_col=False, engine='c',
+            dtype={col: str for col in str_columns},
+            **options
+        )
+
+
+def _column_kinds(df, str_columns):
+    kinds = {}
+    for col in df.columns:
+        if col in str_columns or df[col].dtype == object:
+            kinds[col] = 'str'
+        elif df[col].dtype == np.int64:
+            kinds[col] = 'int64'
+        elif df[col].dtype == np.float64:
+            kinds[col] = 'float64'
+        else:
+            return None
+    return kinds
+
+
+def _count_lines(task):
+    filepath, start, end = task
+    lines = 0
+    last = b'\n'
+
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            chunk = f.read(min(COUNT_CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+            remaining -= len(chunk)
+
+    return lines + (last != b'\n')
+
+
+def _parse_range(task):
+    filepath, start, end, columns, kinds, star, row_offset = task
+
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+
+    if not star and b'"' in data:
+        return None
+
+    str_columns = [col for col in columns if kinds[col] == 'str']
+    try:
+        df = _read_range(data, columns, star, str_columns)
+    except (ValueError, pd.errors.ParserWarning):
+        return None
+
+    categories = {}
+    n = len(df)
+
+    for col in columns:
+        values = df[col]
+        kind = kinds[col]
+        target = np.frombuffer(_buffers[col], dtype=KIND_DTYPES[kind])[row_offset:row_offset + n]
+
+        if kind == 'str':
+            if star and (values == '').any():
+                return None
+            codes, uniques = pd.factorize(values)
+            target[:] = codes
+            categories[col] = list(uniques)
+        elif values.dtype == np.int64 or (kind == 'float64' and values.dtype == np.float64):
+            target[:] = values.to_numpy()
+        else:
+            return None
+
+    return n, categories
+
+
+def _run_pool(func, tasks, jobs, buffers=None):
+    global _buffers
+    _buffers = buffers or {}
+    try:
+        if len(tasks) < 2:
+            return [func(task) for task in tasks]
+
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks)), mp_context=context) as pool:
+            return list(pool.map(func, tasks))
+    finally:
+        _buffers = {}
+
+
+def _remap_codes(codes, local_categories, index):
+    mapping = np.empty(len(local_categories) + 1, dtype=np.int32)
+    for i, value in enumerate(local_categories):
+        mapping[i] = index.setdefault(value, len(index))
+    mapping[-1] = -1
+    codes[:] = mapping[codes]
+
+
+def parse_columns(filepath, start, end, columns, jobs, star=True, declared=None):
+    table = parse_table(filepath, start, end, columns, jobs, star, declared)
+    return table.to_pandas() if table is not None else None
+
+
+def parse_table(filepath, start, end, columns, jobs, star=True, declared=None):
+    declared = declared or {}
+    str_columns = [col for col, dtype in declared.items() if dtype is str]
+
+    with open(filepath, 'rb') as f:
+        f.seek(start)
+        sample = f.read(min(SAMPLE_BYTES, end - start))
+    sample = sample[:sample.rfind(b'\n') + 1] or sample
+
+    try:
+        kinds = _column_kinds(_read_range(sample, columns, star, str_columns), str_columns)
+    except (ValueError, pd.errors.ParserWarning):
+        return None
+    if kinds is None:
+        return None
+    for col, dtype in declared.items():
+        if dtype == 'float64' and kinds.get(col) == 'int64':
+            kinds[col] = 'float64'
+
+    parts = max(1, min(jobs, (end - start) // MIN_RANGE_BYTES))
+    ranges = split_ranges(filepath, start, end, parts)
+
+    with span('parallel.count_lines'):
+        capacities = _run_pool(_count_lines, [(filepath, a, b) for a, b in ranges], jobs)
+    offsets = np.concatenate([[0], np.cumsum(capacities)]).astype(int)
+    capacity = int(offsets[-1])
+
+    buffers = {
+        col: mmap.mmap(-1, max(capacity * np.dtype(KIND_DTYPES[kinds[col]]).itemsize, 1))
+        for col in columns
+    }
+    tasks = [(filepath, a, b, columns, kinds, star, int(offsets[i]))
+             for i, (a, b) in enumerate(ranges)]
+
+    with span('parallel.parse_ranges', rows=capacity):
+        results = _run_pool(_parse_range, tasks, jobs, buffers)
+    if any(result is None for result in results):
+        return None
+
+    with span('parallel.assemble'):
+        arrays = {col: np.frombuffer(buffers[col], dtype=KIND_DTYPES[kinds[col]])[:capacity]
+                  for col in columns}
+        indexes = {col: {} for col in columns if kinds[col] == 'str'}
+        total = 0
+
+        for i, (n, categories) in enumerate(results):
+            source = int(offsets[i])
+            for col, array in arrays.items():
+                if source != total:
+                    array[total:total + n] = array[source:source + n]
+                if col in indexes:
+                    _remap_codes(array[total:total + n], categories[col], indexes[col])
+            total += n
+
+        # The micrograph column stays dictionary-encoded; other string
+        # columns are decoded into object arrays
+        micrograph_col = find_micrograph_column(columns)
+        if micrograph_col not in indexes:
+            micrograph_col = None
+
+        data = {}
+        for col in columns:
+            array = arrays[col][:total]
+            if col == micrograph_col:
+                continue
+            if col in indexes:
+                values = np.empty(len(indexes[col]) + 1, dtype=object)
+                values[:-1] = list(indexes[col])
+                values[-1] = np.nan
+                array = values[array]
+            data[col] = array
+
+    if micrograph_col is None:
+        return ParticleTable(data, order=columns)
+    return ParticleTable(data, order=columns, micrograph_column=micrograph_col,
+                         codes=arrays[micrograph_col][:total], names=list(indexes[micrograph_col]))
@@ -1,86 +1,162 @@
+import numpy as np
 import pandas as pd
-import re
 from pathlib import Path
 
+from particle_picker.profiling import span
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.parsers import parallel
+from particle_picker.parsers.compression import open_text
+from particle_picker.parsers.tokenizer import (
+    clean_star_column_name, iter_star_blocks, iter_star_rows
+)
+
+
+def _to_numeric(values):
+    # Columns that are not all numbers (micrograph names) stay as strings
+    try:
+        return pd.to_numeric(values)
+    except (ValueError, TypeError):
+        return values
+
+
 class StarFileParser:
     
-    def __init__(self, filepath):
+    def __init__(self, filepath, jobs=1):
         self.filepath = Path(filepath)
+        self.jobs = jobs
         self.optics_data = None
         self.particles_data = None
+        self.particles_table = None
         self._parse()
     
-    def _parse(self):
-        with open(self.filepath, 'r') as f:
-            content = f.read()
-        
-        optics_section = self._extract_section(content, 'data_optics')
-        particles_section = self._extract_section(content, 'data_particles')
-        
-        if optics_section:
-            self.optics_data = self._parse_data_block(optics_section)
-        
-        if particles_section:
-            self.particles_data = self._parse_data_block(particles_section)
+    @property
+    def particles_data(self):
+        if self._particles_data is None and self.particles_table is not None:
+            self._particles_data = self.particles_table.to_pandas()
+        return self._particles_data
     
-    def _extract_section(self, content, section_name):
-        pattern = f'{section_name}(.*?)(?=data_|$)'
-        match = re.search(pattern, content, re.DOTALL)
-        return match.group(1).strip() if match else None
+    @particles_data.setter
+    def particles_data(self, value):
+        self._particles_data = value
     
-    def _parse_data_block(self, block):
-        lines = [line.strip() for line in block.split('\n') if line.strip()]
-        
-        if not lines or 'loop_' not in lines[0]:
-            return None
-        
-        loop_idx = lines.index('loop_')
-        header_lines = []
-        data_start_idx = None
-        
-        for i in range(loop_idx + 1, len(lines)):
-            if lines[i].startswith('_'):
-                header_lines.append(lines[i])
-            else:
-                data_start_idx = i
-                break
-        
-        if not header_lines or data_start_idx is None:
-            return None
-        
-        column_names = [self._clean_column_name(h) for h in header_lines]
-        data_lines = lines[data_start_idx:]
+    def _parse(self):
+        blocks = {}
         
+        with span('star.parse'):
+            if self.jobs != 1 and self._parse_parallel():
+                return
+
+            with span('star.read_tokenize') as tokenize_span:
+                with open_text(self.filepath) as f:
+                    for block, columns, values in iter_star_blocks(f):
+                        blocks.setdefault(block, (columns, []))[1].append(values)
+                tokenize_span.rows = sum(len(rows) for _, rows in blocks.values())
+
+            self.optics_data = self._block_to_frame(blocks, 'data_optics')
+            self.particles_table = self._block_to_table(blocks, 'data_particles')
+
+    def _parse_parallel(self):
+        if not parallel.can_parallelize(self.filepath):
+            return False
+        
+        layout = parallel.locate_star_loop(self.filepath, 'data_particles')
+        if layout is None:
+            return False
+        
+        columns, start, end = layout
+        particles = parallel.parse_table(self.filepath, start, end, columns,
+                                         parallel.resolve_jobs(self.jobs))
+        if particles is None:
+            return False
+        
+        with open(self.filepath, 'rb') as f:
+            header = f.read(start)
+            f.seek(end)
+            header += f.read()
+        
+        blocks = {}
+        for block, block_columns, values in iter_star_blocks(header.decode().splitlines()):
+            blocks.setdefault(block, (block_columns, []))[1].append(values)
+        
+        self.optics_data = self._block_to_frame(blocks, 'data_optics')
+        self.particles_table = particles
+        return True
+
+    def _block_to_frame(self, blocks, section_name, convert=None):
+        convert = convert or self._rows_to_frame
+        for block, (columns, rows) in blocks.items():
+            if block.startswith(section_name):
+                return convert(rows, columns) if rows else None
+        return None
+
+    def _block_to_table(self, blocks, section_name):
+        return self._block_to_frame(blocks, section_name, self._rows_to_table)
+
+    @classmethod
+    def iter_batches(cls, filepath, batch_size=100000, section='data_particles'):
+        column_names = []
         rows = []
-        for line in data_lines:
-            if line and not line.startswith('_') and not line.startswith('#'):
-                values = line.split()
-                if len(values) == len(column_names):
-                    rows.append(values)
-        
-        if not rows:
-            return None
         
-        df = pd.DataFrame(rows, columns=column_names)
+        with open_text(filepath) as f:
+            for values in iter_star_rows(f, column_names, section):
+                rows.append(values)
+                if len(rows) >= batch_size:
+                    yield cls._rows_to_frame(rows, column_names)
+                    rows = []
         
-        for col in df.columns:
-            df[col] = pd.to_numeric(df[col], errors='ignore')
+        if rows:
+            yield cls._rows_to_frame(rows, column_names)
+
+    @staticmethod
+    def _rows_to_frame(rows, column_names):
+        with span('star.convert', rows=len(rows)):
+            df = pd.DataFrame(rows, columns=column_names)
+
+            for col in df.columns:
+                df[col] = _to_numeric(df[col])
         
         return df
     
-    def _clean_column_name(self, header):
-        parts = header.split('#')
-        name = parts[0].strip()
-        if name.startswith('_rln'):
-            name = name[4:]
-        return name
+    @staticmethod
+    def _rows_to_table(rows, column_names):
+        # Column arrays straight from the tokenized rows, one column at a
+        # time, with the same numeric conversion as _rows_to_frame
+        with span('star.convert', rows=len(rows)):
+            columns = {}
+            for i, col in enumerate(column_names):
+                values = np.array([row[i] for row in rows], dtype=object)
+                columns[col] = _to_numeric(values)
+            return ParticleTable.from_arrays(columns)
+
+    @staticmethod
+    def _clean_column_name(header):
+        return clean_star_column_name(header)
     
     def get_particles(self):
         return self.particles_data
     
+    def get_table(self):
+        if self.particles_table is None and self.particles_data is not None:
+            self.particles_table = ParticleTable.from_pandas(self.particles_data)
+        return self.particles_table
+
     def get_optics(self):
         return self.optics_data
     
+    @classmethod
+    def read_optics(cls, filepath):
+        # Only the header is read: the optics block precedes the particles
+        def header_lines(f):
+            for line in f:
+                if line.startswith('data_particles'):
+                    return
+                yield line
+
+        column_names = []
+        with open_text(filepath) as f:
+            rows = list(iter_star_rows(header_lines(f), column_names, 'data_optics'))
+        return cls._rows_to_frame(rows, column_names) if rows else None
+
     def get_micrograph_names(self):
         if self.particles_data is not None and 'MicrographName' in self.particles_data.columns:
             return self.particles_data['MicrographName'].unique()
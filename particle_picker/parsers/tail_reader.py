@@ -0,0 +1,130 @@
+import io
+import csv
+import pandas as pd
+from pathlib import Path
+
+from particle_picker.parsers.star_parser import StarFileParser
+from particle_picker.parsers.csv_parser import CSVParticleParser, declared_dtypes
+from particle_picker.parsers.compression import detect_compression
+
+
+class IncrementalReader:
+
+    def __init__(self, filepath, file_type, section='data_particles'):
+        if file_type not in ('star', 'csv', 'box'):
+            raise ValueError(f"Unknown file type: {file_type}")
+
+        self.filepath = Path(filepath)
+        self.file_type = file_type
+        self.section = section
+        self.truncated = False
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.inode = None
+        self.columns = None
+        self.finished = False
+        self._in_section = False
+        self._in_loop = False
+        self._headers = []
+
+    def read_new(self):
+        self.truncated = False
+        stat = self.filepath.stat()
+
+        if stat.st_size < self.offset or (self.inode is not None and stat.st_ino != self.inode):
+            self._reset()
+            self.truncated = True
+
+        if self.inode is None and stat.st_size and detect_compression(self.filepath):
+            raise ValueError(f"Cannot watch compressed file: {self.filepath}")
+
+        self.inode = stat.st_ino
+        if self.finished or stat.st_size == self.offset:
+            return None
+
+        with open(self.filepath, 'rb') as f:
+            f.seek(self.offset)
+            chunk = f.read(stat.st_size - self.offset)
+
+        end = chunk.rfind(b'\n')
+        if end < 0:
+            return None
+
+        self.offset += end + 1
+        lines = chunk[:end + 1].decode().splitlines()
+
+        if self.file_type == 'star':
+            return self._parse_star_lines(lines)
+        elif self.file_type == 'csv':
+            return self._parse_csv_lines(lines)
+        return self._parse_box_lines(lines)
+
+    def _parse_star_lines(self, lines):
+        rows = []
+
+        for line in lines:
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+
+            if line.startswith('data_'):
+                if self._in_section:
+                    self.finished = True
+                    break
+                self._in_section = line.startswith(self.section)
+                continue
+
+            if not self._in_section:
+                continue
+
+            if line == 'loop_':
+                self._in_loop = True
+                continue
+
+            if self._in_loop and line.startswith('_'):
+                self._headers.append(StarFileParser._clean_column_name(line))
+                continue
+
+            if self.columns is None and self._headers:
+                self.columns = list(self._headers)
+
+            values = line.split()
+            if self.columns and len(values) == len(self.columns):
+                rows.append(values)
+
+        if not rows:
+            return None
+        return StarFileParser._rows_to_frame(rows, self.columns)
+
+    def _parse_csv_lines(self, lines):
+        lines = [line for line in lines if line.strip()]
+
+        if self.columns is None and lines:
+            self.columns = next(csv.reader([lines[0]]))
+            lines = lines[1:]
+
+        if not lines:
+            return None
+
+        text = '\n'.join(lines)
+        dtypes = declared_dtypes(self.columns)
+        try:
+            df = pd.read_csv(io.StringIO(text), header=None, names=self.columns, dtype=dtypes)
+        except (ValueError, TypeError):
+            df = pd.read_csv(io.StringIO(text), header=None, names=self.columns)
+            dtypes = {}
+        return CSVParticleParser._convert_numeric(df, skip=dtypes)
+
+    def _parse_box_lines(self, lines):
+        lines = [line for line in lines if line.strip()]
+        if not lines:
+            return None
+
+        self.columns = ['x', 'y', 'width', 'height']
+        df = pd.read_csv(io.StringIO('\n'.join(lines)), sep=r'\s+', header=None,
+                         names=self.columns)
+        for col in df.columns:
+            df[col] = pd.to_numeric(df[col], errors='coerce')
+        return df.dropna()
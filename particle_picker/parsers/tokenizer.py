@@ -0,0 +1,162 @@
+import csv
+import math
+
+from particle_picker.analysis.columns import find_micrograph_column
+from particle_picker.parsers.compression import open_text
+
+CSV_MISSING_VALUES = {'', 'NA', 'N/A', 'n/a', 'NaN', 'nan', 'NULL', 'null', 'None', '#N/A'}
+
+
+def clean_star_column_name(header):
+    name = header.split('#')[0].strip()
+    if name.startswith('_rln'):
+        name = name[4:]
+    return name
+
+
+def iter_star_blocks(lines):
+    block = None
+    columns = None
+    in_loop = False
+
+    for line in lines:
+        line = line.strip()
+        if not line or line[0] == '#':
+            continue
+
+        if line.startswith('data_'):
+            block = line.split()[0]
+            columns = []
+            in_loop = False
+            continue
+
+        if block is None:
+            continue
+
+        if line == 'loop_':
+            in_loop = True
+            continue
+
+        if in_loop and line[0] == '_':
+            columns.append(clean_star_column_name(line))
+            continue
+
+        values = line.split()
+        if columns and len(values) == len(columns):
+            yield block, columns, values
+
+
+def iter_star_rows(lines, columns, section='data_particles'):
+    current = None
+
+    for block, block_columns, values in iter_star_blocks(lines):
+        if current is None and block.startswith(section):
+            current = block
+            columns.extend(block_columns)
+        elif block != current:
+            if current is not None:
+                return
+            continue
+        yield values
+
+
+def count_star(filepath, section='data_particles'):
+    columns = []
+    counts = {}
+    total = 0
+    index = None
+
+    with open_text(filepath) as f:
+        for values in iter_star_rows(f, columns, section):
+            if index is None:
+                micrograph_col = find_micrograph_column(columns)
+                index = columns.index(micrograph_col) if micrograph_col in columns else -1
+
+            total += 1
+            if index >= 0:
+                name = values[index]
+                counts[name] = counts.get(name, 0) + 1
+
+    return total, counts
+
+
+def count_csv(filepath):
+    counts = {}
+    total = 0
+
+    with open_text(filepath, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return 0, counts
+
+        micrograph_col = find_micrograph_column(header)
+        index = header.index(micrograph_col) if micrograph_col in header else -1
+
+        for row in reader:
+            if not row:
+                continue
+            total += 1
+            if 0 <= index < len(row) and row[index] not in CSV_MISSING_VALUES:
+                name = row[index]
+                counts[name] = counts.get(name, 0) + 1
+
+    return total, counts
+
+
+def count_box(filepath):
+    total = 0
+
+    with open_text(filepath) as f:
+        for line in f:
+            values = line.split()
+            if not values:
+                continue
+            if len(values) != 4:
+                return None
+            try:
+                if not any(math.isnan(float(value)) for value in values):
+                    total += 1
+            except ValueError:
+                continue
+
+    return total, {}
+
+
+COUNTERS = {
+    'star': count_star,
+    'csv': count_csv,
+    'box': count_box,
+}
+
+
+def count_micrographs(filepath, file_type):
+    try:
+        return COUNTERS[file_type](filepath)
+    except (OSError, EOFError, UnicodeDecodeError, ImportError, csv.Error):
+        return None
+
+
+def summarize_counts(total, counts):
+    summary = {
+        'total_particles': total,
+        'total_micrographs': 0,
+        'avg_particles_per_micrograph': 0,
+        'min_particles_per_micrograph': 0,
+        'max_particles_per_micrograph': 0,
+        'std_particles_per_micrograph': 0
+    }
+
+    if counts:
+        values = list(counts.values())
+        mean = sum(values) / len(values)
+        summary['total_micrographs'] = len(values)
+        summary['avg_particles_per_micrograph'] = float(mean)
+        summary['min_particles_per_micrograph'] = int(min(values))
+        summary['max_particles_per_micrograph'] = int(max(values))
+        summary['std_particles_per_micrograph'] = (
+            math.sqrt(sum((v - mean) ** 2 for v in values) / (len(values) - 1))
+            if len(values) > 1 else float('nan')
+        )
+
+    return summary
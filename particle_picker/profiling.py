@@ -0,0 +1,200 @@
+import functools
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+_RSS_SCALE = 1 if sys.platform == 'darwin' else 1024
+
+_local = threading.local()
+_global_recorder = None
+
+
+def _peak_rss():
+    if resource is None:
+        return 0
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _RSS_SCALE
+
+
+class SpanRecord:
+
+    __slots__ = ('name', 'depth', 'thread', 'start', 'wall', 'cpu', 'peak_rss_delta', 'rows')
+
+    def __init__(self, name, depth, thread, start, wall, cpu, peak_rss_delta, rows):
+        self.name = name
+        self.depth = depth
+        self.thread = thread
+        self.start = start
+        self.wall = wall
+        self.cpu = cpu
+        self.peak_rss_delta = peak_rss_delta
+        self.rows = rows
+
+    def to_dict(self):
+        return {slot: getattr(self, slot) for slot in self.__slots__}
+
+
+class Recorder:
+
+    def __init__(self):
+        self.records = []
+        self.origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add(self, record):
+        with self._lock:
+            self.records.append(record)
+
+    def summary(self):
+        totals = {}
+        for record in sorted(self.records, key=lambda r: r.start):
+            entry = totals.setdefault(record.name, {
+                'name': record.name, 'depth': record.depth, 'calls': 0, 'wall': 0.0,
+                'cpu': 0.0, 'peak_rss_delta': 0, 'rows': None
+            })
+            entry['calls'] += 1
+            entry['wall'] += record.wall
+            entry['cpu'] += record.cpu
+            entry['peak_rss_delta'] += record.peak_rss_delta
+            if record.rows is not None:
+                entry['rows'] = (entry['rows'] or 0) + record.rows
+        return list(totals.values())
+
+    def format_table(self):
+        lines = [
+            f"{'Span':<48} {'Calls':>5} {'Wall ms':>10} {'CPU ms':>10} "
+            f"{'dRSS MB':>8} {'Rows':>11}",
+            "-" * 97
+        ]
+        for entry in self.summary():
+            name = ('  ' * entry['depth'] + entry['name'])[:48]
+            rows = f"{entry['rows']:,}" if entry['rows'] is not None else ''
+            lines.append(
+                f"{name:<48} {entry['calls']:>5} {entry['wall'] * 1000:>10.2f} "
+                f"{entry['cpu'] * 1000:>10.2f} {entry['peak_rss_delta'] / 1e6:>8.1f} {rows:>11}"
+            )
+        return '\n'.join(lines)
+
+    def to_trace(self):
+        pid = os.getpid()
+        events = []
+        for record in self.records:
+            args = {'cpu_ms': record.cpu * 1000, 'peak_rss_delta_bytes': record.peak_rss_delta}
+            if record.rows is not None:
+                args['rows'] = record.rows
+            events.append({
+                'name': record.name,
+                'ph': 'X',
+                'ts': (record.start - self.origin) * 1e6,
+                'dur': record.wall * 1e6,
+                'pid': pid,
+                'tid': record.thread,
+                'args': args
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_trace(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_trace(), f, indent=1)
+
+
+class _Span:
+
+    __slots__ = ('recorder', 'name', 'rows', '_start', '_cpu', '_rss', '_depth')
+
+    def __init__(self, recorder, name, rows):
+        self.recorder = recorder
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self._depth = getattr(_local, 'depth', 0)
+        _local.depth = self._depth + 1
+        self._rss = _peak_rss()
+        self._cpu = time.process_time()
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        wall = time.perf_counter() - self._start
+        cpu = time.process_time() - self._cpu
+        _local.depth = self._depth
+        self.recorder.add(SpanRecord(
+            self.name, self._depth, threading.get_ident(), self._start, wall, cpu,
+            _peak_rss() - self._rss, self.rows
+        ))
+        return False
+
+
+class _NullSpan:
+
+    __slots__ = ('rows',)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def current_recorder():
+    return getattr(_local, 'recorder', None) or _global_recorder
+
+
+def span(name, rows=None):
+    recorder = getattr(_local, 'recorder', None) or _global_recorder
+    if recorder is None:
+        return _NULL_SPAN
+    return _Span(recorder, name, rows)
+
+
+def profiled(name, rows=None):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            recorder = getattr(_local, 'recorder', None) or _global_recorder
+            if recorder is None:
+                return func(*args, **kwargs)
+            with _Span(recorder, name, rows(args[0]) if rows else None):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def enable():
+    global _global_recorder
+    _global_recorder = Recorder()
+    return _global_recorder
+
+
+def disable():
+    global _global_recorder
+    recorder, _global_recorder = _global_recorder, None
+    return recorder
+
+
+def is_enabled():
+    return current_recorder() is not None
+
+
+@contextmanager
+def record(recorder=None):
+    # Passing a recorder lets work handed to another thread report into it
+    previous = getattr(_local, 'recorder', None)
+    if recorder is None:
+        recorder = Recorder()
+    _local.recorder = recorder
+    try:
+        yield recorder
+    finally:
+        _local.recorder = previous
@@ -0,0 +1,217 @@
+import hashlib
+import inspect
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import plotly.io as pio
+
+from particle_picker import metrics
+from particle_picker.analysis.cache import SingleFlight, cache_metrics
+from particle_picker.profiling import span
+
+# Part of every key; bump it when figure code changes so entries written to
+# disk by an older version are never served
+FIGURE_VERSION = 1
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_MAX_DISK_BYTES = 2 * 1024 ** 3
+
+FIGURE_SECONDS = metrics.histogram('particle_picker_figure_build_seconds',
+                                   'Time to build a dashboard figure', ['figure'])
+FIGURE_BYTES = metrics.histogram('particle_picker_figure_bytes', 'Size of serialized figures',
+                                 buckets=metrics.BYTES_BUCKETS)
+
+
+def figure_key(dataset, figure, params=None):
+    payload = repr((FIGURE_VERSION, dataset, figure, sorted((params or {}).items())))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class FigureCache:
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, directory=None,
+                 max_disk_bytes=DEFAULT_MAX_DISK_BYTES):
+        self.max_bytes = max_bytes
+        self.directory = Path(directory) if directory else None
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._flights = SingleFlight()
+        self._lock = threading.RLock()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, build):
+        # Returns the figure serialized as JSON bytes; build() is only called,
+        # and the figure only serialized, when neither tier has the key
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return data
+
+        # Builds run outside the lock and concurrent misses share one build
+        return self._flights.do(key, lambda: self._load(key, build))
+
+    def _load(self, key, build):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self.hits += 1
+                return data
+
+        data = self._read_disk(key)
+        built = data is None
+        if built:
+            figure = build()
+            with span('figure.serialize'):
+                data = pio.to_json(figure, validate=False).encode()
+            FIGURE_BYTES.observe(len(data))
+            self._write_disk(key, data)
+
+        with self._lock:
+            if built:
+                self.misses += 1
+            else:
+                self.disk_hits += 1
+            self._remember(key, data)
+        return data
+
+    def _remember(self, key, data):
+        if len(data) > self.max_bytes:
+            return
+        self._entries[key] = data
+        self._bytes += len(data)
+        while self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self.evictions += 1
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def _read_disk(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        try:
+            data = path.read_bytes()
+            # Reads refresh the mtime that eviction orders by
+            os.utime(path)
+        except OSError:
+            return None
+        return data
+
+    def _write_disk(self, key, data):
+        if self.directory is None or len(data) > self.max_disk_bytes:
+            return
+        path = self._path(key)
+        temp = path.with_suffix(f'.{os.getpid()}.tmp')
+        try:
+            temp.write_bytes(data)
+            os.replace(temp, path)
+        except OSError:
+            temp.unlink(missing_ok=True)
+            return
+        self._evict_disk()
+
+    def _evict_disk(self):
+        entries = []
+        for path in self.directory.glob('*.json'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_disk_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if self.directory is not None:
+                for path in self.directory.glob('*.json'):
+                    path.unlink(missing_ok=True)
+
+    def info(self):
+        with self._lock:
+            return {
+                'figures': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'directory': str(self.directory) if self.directory else None,
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def metrics(self, name='figures'):
+        # Disk hits count as hits: the figure was not rebuilt
+        info = self.info()
+        result = cache_metrics(name, info['hits'] + info['disk_hits'], info['misses'],
+                               info['evictions'], info['figures'])
+        resident = metrics.Gauge('particle_picker_cache_bytes',
+                                 'Bytes held in memory by the cache', ['cache'])
+        resident.set(info['bytes'], cache=name)
+        return result + [resident]
+
+
+class CachedVisualizations:
+    # Serialized ParticleVisualizations figures from the cache. The JSON is
+    # returned as is for the caller to send on. Statistics are only loaded on
+    # a miss, and arguments are bound with their defaults, so
+    # get_json('create_heatmap') and get_json('create_heatmap', bin_size=100)
+    # share an entry.
+
+    def __init__(self, cache, dataset, load_statistics):
+        self._cache = cache
+        self._dataset = dataset
+        self._load_statistics = load_statistics
+        self._visualizations = None
+
+    def get_json(self, name, **kwargs):
+        from particle_picker.visualization.plots import ParticleVisualizations
+
+        bound = inspect.signature(getattr(ParticleVisualizations, name)).bind(None, **kwargs)
+        bound.apply_defaults()
+        params = dict(bound.arguments)
+        del params['self']
+
+        def build():
+            if self._visualizations is None:
+                self._visualizations = ParticleVisualizations(self._load_statistics())
+            with FIGURE_SECONDS.time(figure=name):
+                return getattr(self._visualizations, name)(**kwargs)
+
+        return self._cache.get(figure_key(self._dataset, name, params), build)
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_shared_figure_cache():
+    # PARTICLE_PICKER_FIGURE_CACHE names a directory for the on-disk tier
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = FigureCache(directory=os.environ.get('PARTICLE_PICKER_FIGURE_CACHE'))
+        return _shared_cache
@@ -4,11 +4,14 @@ from plotly.subplots import make_subplots
 import pandas as pd
 import numpy as np
 
+from particle_picker.profiling import profiled
+
 class ParticleVisualizations:
     
     def __init__(self, statistics):
         self.stats = statistics
     
+    @profiled('figure.create_distribution_bar_chart')
     def create_distribution_bar_chart(self):
         distribution = self.stats.get_distribution_per_micrograph()
         
@@ -36,6 +39,7 @@ class ParticleVisualizations:
         
         return fig
     
+    @profiled('figure.create_histogram')
     def create_histogram(self):
         distribution = self.stats.get_distribution_per_micrograph()
         
@@ -61,13 +65,14 @@ class ParticleVisualizations:
         
         return fig
     
-    def create_coordinate_scatter(self, max_points=10000):
+    @profiled('figure.create_coordinate_scatter')
+    def create_coordinate_scatter(self, max_points=10000, seed=42):
         coord_stats = self.stats.get_coordinate_statistics()
         
         if not coord_stats:
             return go.Figure()
         
-        df = self.stats.df
+        table = self.stats.table
         
         x_cols = [col for col in coord_stats.keys() if 'x' in col.lower()]
         y_cols = [col for col in coord_stats.keys() if 'y' in col.lower()]
@@ -78,28 +83,29 @@ class ParticleVisualizations:
         x_col = x_cols[0]
         y_col = y_cols[0]
         
-        if len(df) > max_points:
-            sample_df = df.sample(n=max_points, random_state=42)
+        # Same rows as DataFrame.sample(n=max_points, random_state=seed)
+        if len(table) > max_points:
+            rows = np.random.RandomState(seed).choice(len(table), size=max_points, replace=False)
         else:
-            sample_df = df
+            rows = np.arange(len(table))
         
         fig = go.Figure(data=[
             go.Scattergl(
-                x=sample_df[x_col],
-                y=sample_df[y_col],
+                x=table[x_col][rows],
+                y=table[y_col][rows],
                 mode='markers',
                 marker=dict(
                     size=3,
                     color='blue',
                     opacity=0.5
                 ),
-                text=sample_df.index,
+                text=rows,
                 hovertemplate='<b>X:</b> %{x}<br><b>Y:</b> %{y}<extra></extra>'
             )
         ])
         
         fig.update_layout(
-            title=f'Particle Coordinates ({len(sample_df)} points)',
+            title=f'Particle Coordinates ({len(rows)} points)',
             xaxis_title=x_col,
             yaxis_title=y_col,
             height=500,
@@ -108,6 +114,7 @@ class ParticleVisualizations:
         
         return fig
     
+    @profiled('figure.create_heatmap')
     def create_heatmap(self, bin_size=100):
         heatmap_data = self.stats.get_heatmap_data(bin_size=bin_size)
         
@@ -131,13 +138,14 @@ class ParticleVisualizations:
         
         return fig
     
+    @profiled('figure.create_defocus_distribution')
     def create_defocus_distribution(self):
         defocus_stats = self.stats.get_defocus_statistics()
         
         if not defocus_stats:
             return go.Figure()
         
-        df = self.stats.df
+        table = self.stats.table
         defocus_cols = list(defocus_stats.keys())
         
         if not defocus_cols:
@@ -151,7 +159,7 @@ class ParticleVisualizations:
         for idx, col in enumerate(defocus_cols, 1):
             fig.add_trace(
                 go.Histogram(
-                    x=df[col],
+                    x=table[col],
                     name=col,
                     nbinsx=30,
                     marker_color='lightgreen'
@@ -167,6 +175,37 @@ class ParticleVisualizations:
         
         return fig
     
+    @profiled('figure.create_box_distribution')
+    def create_box_distribution(self):
+        box_stats = self.stats.get_box_statistics()
+        box_cols = [col for col in box_stats if col != 'near_edge']
+
+        if not box_cols:
+            return go.Figure()
+
+        table = self.stats.table
+        fig = make_subplots(rows=1, cols=len(box_cols), subplot_titles=box_cols)
+
+        for idx, col in enumerate(box_cols, 1):
+            fig.add_trace(
+                go.Histogram(
+                    x=table[col],
+                    name=col,
+                    nbinsx=30,
+                    marker_color='lightsalmon'
+                ),
+                row=1, col=idx
+            )
+
+        fig.update_layout(
+            title='Box Statistics',
+            height=400,
+            showlegend=False
+        )
+
+        return fig
+
+    @profiled('figure.create_summary_table')
     def create_summary_table(self):
         summary = self.stats.get_summary_statistics()
         
@@ -201,3 +240,53 @@ class ParticleVisualizations:
         )
         
         return fig
+
+    @profiled('figure.create_micrograph_view')
+    def create_micrograph_view(self, micrograph, pyramid, tile_url, x_range=None, y_range=None,
+                               screen_pixels=900):
+        # Only the tiles inside the visible window, at the coarsest level that
+        # keeps one image pixel per screen pixel, are referenced
+        x_range = sorted(x_range) if x_range else [0, pyramid.width]
+        y_range = sorted(y_range) if y_range else [0, pyramid.height]
+        level = pyramid.level_for(x_range[1] - x_range[0], screen_pixels)
+        scale = 1 << level
+        size = pyramid.tile_size
+        height, width = pyramid.level_shape(level)
+
+        images = []
+        for tile_x, tile_y in pyramid.visible_tiles(x_range, y_range, level):
+            images.append(dict(
+                source=tile_url(level, tile_x, tile_y),
+                xref='x', yref='y',
+                x=tile_x * size * scale,
+                y=tile_y * size * scale,
+                sizex=min(size, width - tile_x * size) * scale,
+                sizey=min(size, height - tile_y * size) * scale,
+                xanchor='left', yanchor='top',
+                sizing='stretch',
+                layer='below'
+            ))
+
+        fig = go.Figure()
+        picks = self.stats.get_micrograph_picks(micrograph)
+        if picks is not None:
+            fig.add_trace(go.Scattergl(
+                x=picks['x'],
+                y=picks['y'],
+                mode='markers',
+                marker=dict(symbol='circle-open', size=14, color='lime', line=dict(width=2)),
+                hovertemplate='<b>X:</b> %{x}<br><b>Y:</b> %{y}<extra></extra>'
+            ))
+
+        fig.update_layout(
+            title=f'{micrograph} ({len(picks["x"]) if picks else 0} picks, level {level})',
+            images=images,
+            xaxis=dict(range=x_range, showgrid=False, zeroline=False),
+            yaxis=dict(range=[y_range[1], y_range[0]], showgrid=False, zeroline=False,
+                       scaleanchor='x', scaleratio=1),
+            plot_bgcolor='black',
+            height=800,
+            uirevision=str(micrograph)
+        )
+
+        return fig
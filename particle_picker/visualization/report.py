@@ -0,0 +1,213 @@
+import html
+import json
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+from particle_picker.profiling import span
+
+PLOTLY_BUNDLE = 'plotly.min.js'
+MANIFEST = 'reports.json'
+
+# Same panels, titles and options as the dashboard
+FIGURES = [
+    ('Summary', 'create_summary_table', {}),
+    ('Particle Distribution', 'create_distribution_bar_chart', {}),
+    ('Distribution Histogram', 'create_histogram', {}),
+    ('Coordinate Scatter Plot', 'create_coordinate_scatter', {}),
+    ('Particle Density Heatmap', 'create_heatmap', {'bin_size': 200}),
+    ('Defocus Distribution', 'create_defocus_distribution', {}),
+]
+
+PAGE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{bundle}"></script>
+<style>
+body {{ font-family: sans-serif; margin: 2em auto; max-width: 1200px; color: #222; }}
+table {{ border-collapse: collapse; }}
+th, td {{ padding: 4px 12px; border-bottom: 1px solid #ddd; text-align: left; }}
+td.number {{ text-align: right; }}
+section {{ margin-bottom: 2em; }}
+.error {{ color: #b00; }}
+</style>
+</head>
+<body>
+{body}
+</body>
+</html>
+"""
+
+
+def write_plotly_bundle(outdir):
+    from plotly.offline import get_plotlyjs
+
+    path = Path(outdir) / PLOTLY_BUNDLE
+    if not path.exists():
+        path.write_text(get_plotlyjs(), encoding='utf-8')
+    return path
+
+
+def report_names(paths):
+    names = []
+    seen = set()
+    for path in paths:
+        stem = Path(str(path)).name.split('.')[0] or 'report'
+        name, suffix = stem, 2
+        while name in seen:
+            name, suffix = f"{stem}-{suffix}", suffix + 1
+        seen.add(name)
+        names.append(name)
+    return names
+
+
+def render_report(job):
+    from particle_picker.analysis.cache import MemoizedStatistics, file_fingerprint
+    from particle_picker.analysis.statistics import ParticleStatistics
+    from particle_picker.parsers.loader import load_table
+    from particle_picker.visualization.plots import ParticleVisualizations
+
+    filepath, file_type, outdir, name = job
+    entry = {'name': name, 'file': str(filepath), 'report': f"{name}.html"}
+    start = time.perf_counter()
+
+    try:
+        entry['fingerprint'] = list(file_fingerprint(filepath))
+        with span('report.load'):
+            table = load_table(filepath, file_type)
+        if table is None or len(table) == 0:
+            raise ValueError("No particle data found in file")
+
+        # Several figures share the distribution, so compute each statistic once
+        stats = MemoizedStatistics(ParticleStatistics(table))
+        viz = ParticleVisualizations(stats)
+        summary = stats.get_summary_statistics()
+
+        sections = []
+        with span('report.figures'):
+            for title, method, kwargs in FIGURES:
+                figure = getattr(viz, method)(**kwargs)
+                sections.append(f"<section><h2>{html.escape(title)}</h2>\n"
+                                f"{figure.to_html(full_html=False, include_plotlyjs=False)}"
+                                f"</section>")
+
+        body = (f"<p><a href=\"index.html\">All reports</a></p>\n"
+                f"<h1>{html.escape(Path(str(filepath)).name)}</h1>\n"
+                f"<p>{html.escape(str(filepath))}</p>\n" + '\n'.join(sections))
+        page = PAGE.format(title=html.escape(name), bundle=PLOTLY_BUNDLE, body=body)
+        (Path(outdir) / entry['report']).write_text(page, encoding='utf-8')
+
+        entry['summary'] = summary
+        entry['status'] = 'ok'
+    except Exception as e:
+        entry['status'] = 'error'
+        entry['error'] = str(e)
+
+    entry['seconds'] = time.perf_counter() - start
+    return entry
+
+
+def load_manifest(outdir):
+    path = Path(outdir) / MANIFEST
+    if not path.exists():
+        return {}
+    try:
+        with open(path) as f:
+            return {entry['name']: entry for entry in json.load(f)}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def _is_current(entry, filepath, outdir):
+    from particle_picker.analysis.cache import file_fingerprint
+
+    if entry is None or entry.get('status') != 'ok':
+        return False
+    try:
+        fingerprint = list(file_fingerprint(filepath))
+    except OSError:
+        return False
+    return entry.get('fingerprint') == fingerprint and (Path(outdir) / entry['report']).exists()
+
+
+def _format_summary_cells(entry):
+    summary = entry.get('summary') or {}
+    if entry.get('status') != 'ok':
+        return f"<td colspan=\"3\" class=\"error\">{html.escape(entry.get('error', ''))}</td>"
+    return (f"<td class=\"number\">{summary.get('total_particles', 0):,}</td>"
+            f"<td class=\"number\">{summary.get('total_micrographs', 0):,}</td>"
+            f"<td class=\"number\">{summary.get('avg_particles_per_micrograph', 0):.2f}</td>")
+
+
+def write_index(outdir, entries):
+    rows = []
+    for entry in entries:
+        if entry.get('status') == 'ok':
+            link = (f"<a href=\"{html.escape(entry['report'])}\">"
+                    f"{html.escape(entry['name'])}</a>")
+        else:
+            link = html.escape(entry['name'])
+        rows.append(f"<tr><td>{link}</td><td>{html.escape(entry['file'])}</td>"
+                    f"{_format_summary_cells(entry)}</tr>")
+
+    body = (f"<h1>Particle picking reports</h1>\n"
+            f"<p>Generated {time.strftime('%Y-%m-%d %H:%M')}, {len(entries)} datasets</p>\n"
+            "<table>\n<tr><th>Report</th><th>File</th><th>Particles</th>"
+            "<th>Micrographs</th><th>Avg per micrograph</th></tr>\n"
+            + '\n'.join(rows) + "\n</table>")
+    path = Path(outdir) / 'index.html'
+    path.write_text(PAGE.format(title='Particle picking reports', bundle=PLOTLY_BUNDLE,
+                                body=body), encoding='utf-8')
+
+    with open(Path(outdir) / MANIFEST, 'w') as f:
+        json.dump(entries, f, indent=2)
+    return path
+
+
+def generate_reports(inputs, file_type, outdir, jobs=1, force=False, progress=None):
+    from particle_picker.parsers.parallel import resolve_jobs
+
+    outdir = Path(outdir)
+    outdir.mkdir(parents=True, exist_ok=True)
+    write_plotly_bundle(outdir)
+
+    manifest = {} if force else load_manifest(outdir)
+    names = report_names(inputs)
+    entries = {}
+    jobs_to_run = []
+
+    for filepath, name in zip(inputs, names):
+        previous = manifest.get(name)
+        if previous is not None and previous.get('file') == str(filepath) and \
+                _is_current(previous, filepath, outdir):
+            entries[name] = dict(previous, reused=True)
+            if progress is not None:
+                progress(entries[name])
+        else:
+            jobs_to_run.append((str(filepath), file_type, str(outdir), name))
+
+    workers = min(resolve_jobs(jobs), len(jobs_to_run)) if jobs_to_run else 0
+    if workers > 1:
+        # Each worker parses and renders one whole dataset; fork keeps the
+        # plotly import from being repeated in every worker where possible
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('fork' if 'fork' in methods else None)
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool:
+            futures = [pool.submit(render_report, job) for job in jobs_to_run]
+            for future in as_completed(futures):
+                entry = future.result()
+                entries[entry['name']] = entry
+                if progress is not None:
+                    progress(entry)
+    else:
+        for job in jobs_to_run:
+            entry = render_report(job)
+            entries[entry['name']] = entry
+            if progress is not None:
+                progress(entry)
+
+    ordered = [entries[name] for name in names]
+    return write_index(outdir, ordered), ordered
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import threading
+import zlib
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from particle_picker.analysis.cache import file_fingerprint
+from particle_picker.parsers.mrc import open_mrc, read_mrc_header
+from particle_picker.profiling import span
+
+TILE_SIZE = 256
+STRIP_ROWS = 512
+# Display range: clip to these percentiles of a strided sample of the frame
+CONTRAST_PERCENTILES = (0.5, 99.5)
+CONTRAST_SAMPLE = 512
+
+
+def encode_png(pixels):
+    # 8-bit grayscale PNG with no row filters; enough for tiles and needs
+    # only zlib
+    pixels = np.ascontiguousarray(pixels, dtype=np.uint8)
+    height, width = pixels.shape
+    rows = np.zeros((height, width + 1), dtype=np.uint8)
+    rows[:, 1:] = pixels
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+
+    return (b'\x89PNG\r\n\x1a\n'
+            + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 0, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows.tobytes(), 6))
+            + chunk(b'IEND', b''))
+
+
+def display_range(image):
+    step_y = max(1, image.shape[0] // CONTRAST_SAMPLE)
+    step_x = max(1, image.shape[1] // CONTRAST_SAMPLE)
+    sample = np.asarray(image[::step_y, ::step_x], dtype=np.float32)
+    sample = sample[np.isfinite(sample)]
+    if not sample.size:
+        return 0.0, 1.0
+    low, high = (float(value) for value in np.percentile(sample, CONTRAST_PERCENTILES))
+    return low, (high if high > low else low + 1.0)
+
+
+def downsample(block):
+    # 2x2 mean; an odd last row or column is averaged with itself
+    if block.shape[0] % 2:
+        block = np.concatenate([block, block[-1:]], axis=0)
+    if block.shape[1] % 2:
+        block = np.concatenate([block, block[:, -1:]], axis=1)
+    height, width = block.shape
+    return block.reshape(height // 2, 2, width // 2, 2).mean(axis=(1, 3))
+
+
+def level_count(width, height, tile_size=TILE_SIZE):
+    levels = 1
+    while max(width, height) > tile_size:
+        width, height = (width + 1) // 2, (height + 1) // 2
+        levels += 1
+    return levels
+
+
+def default_cache_dir():
+    return Path(os.environ.get('PARTICLE_PICKER_TILE_CACHE')
+                or Path(tempfile.gettempdir()) / 'particle-picker-tiles')
+
+
+class TilePyramid:
+    # Level 0 is full resolution and each level halves the previous one,
+    # down to a single tile. Levels are uint8 .npy files in a directory keyed
+    # by the micrograph's fingerprint, and tiles are cut from them through
+    # memory maps, so neither building nor serving holds a full frame.
+
+    def __init__(self, mrc_path, cache_dir=None, tile_size=TILE_SIZE):
+        self.mrc_path = Path(mrc_path)
+        self.tile_size = tile_size
+        header = read_mrc_header(self.mrc_path)
+        self.width, self.height = header.nx, header.ny
+        self.pixel_size = header.pixel_size
+        self.levels = level_count(self.width, self.height, tile_size)
+
+        key = hashlib.sha1(repr((file_fingerprint(self.mrc_path), tile_size,
+                                 CONTRAST_PERCENTILES)).encode()).hexdigest()[:20]
+        self.directory = Path(cache_dir or default_cache_dir()) / key
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def _level_path(self, level):
+        return self.directory / f"level{level}.npy"
+
+    def is_built(self):
+        return (self.directory / 'pyramid.json').exists()
+
+    def build(self):
+        with self._lock:
+            if not self.is_built():
+                self._build()
+        return self
+
+    def _build(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        image = open_mrc(self.mrc_path)
+        low, high = display_range(image)
+        scale = 255.0 / (high - low)
+
+        with span('tiles.build'):
+            level = np.lib.format.open_memmap(self._level_path(0), mode='w+', dtype=np.uint8,
+                                              shape=(self.height, self.width))
+            for start in range(0, self.height, STRIP_ROWS):
+                strip = np.asarray(image[start:start + STRIP_ROWS], dtype=np.float32)
+                level[start:start + STRIP_ROWS] = np.clip((strip - low) * scale, 0, 255)
+            level.flush()
+
+            for index in range(1, self.levels):
+                previous = level
+                shape = ((previous.shape[0] + 1) // 2, (previous.shape[1] + 1) // 2)
+                level = np.lib.format.open_memmap(self._level_path(index), mode='w+',
+                                                  dtype=np.uint8, shape=shape)
+                for start in range(0, previous.shape[0], STRIP_ROWS):
+                    strip = np.asarray(previous[start:start + STRIP_ROWS], dtype=np.float32)
+                    level[start // 2:start // 2 + len(strip) // 2 + len(strip) % 2] = \
+                        np.rint(downsample(strip))
+                level.flush()
+
+        with open(self.directory / 'pyramid.json', 'w') as f:
+            json.dump({'file': str(self.mrc_path), 'width': self.width, 'height': self.height,
+                       'levels': self.levels, 'display_range': [low, high]}, f)
+
+    def level_shape(self, level):
+        height, width = self.height, self.width
+        for _ in range(level):
+            height, width = (height + 1) // 2, (width + 1) // 2
+        return height, width
+
+    def tile_grid(self, level):
+        height, width = self.level_shape(level)
+        return -(-width // self.tile_size), -(-height // self.tile_size)
+
+    def tile(self, level, tile_x, tile_y):
+        if not 0 <= level < self.levels:
+            raise IndexError(f"Level {level} out of range (0-{self.levels - 1})")
+        columns, rows = self.tile_grid(level)
+        if not (0 <= tile_x < columns and 0 <= tile_y < rows):
+            raise IndexError(f"Tile {tile_x},{tile_y} out of range at level {level}")
+
+        self.build()
+        if level not in self._maps:
+            self._maps[level] = np.load(self._level_path(level), mmap_mode='r')
+        size = self.tile_size
+        return np.array(self._maps[level][tile_y * size:(tile_y + 1) * size,
+                                          tile_x * size:(tile_x + 1) * size])
+
+    def tile_png(self, level, tile_x, tile_y):
+        return encode_png(self.tile(level, tile_x, tile_y))
+
+    def visible_tiles(self, x_range, y_range, level):
+        # Tiles at `level` that intersect a full-resolution pixel window
+        span_size = self.tile_size << level
+        columns, rows = self.tile_grid(level)
+        first_x = max(0, int(min(x_range) // span_size))
+        last_x = min(columns - 1, int(max(x_range) // span_size))
+        first_y = max(0, int(min(y_range) // span_size))
+        last_y = min(rows - 1, int(max(y_range) // span_size))
+        return [(tile_x, tile_y) for tile_y in range(first_y, last_y + 1)
+                for tile_x in range(first_x, last_x + 1)]
+
+    def level_for(self, visible_pixels, screen_pixels):
+        # Coarsest level that still gives at least one image pixel per screen pixel
+        level = 0
+        while level + 1 < self.levels and visible_pixels / (2 << level) >= screen_pixels:
+            level += 1
+        return level
+
+
+MAX_OPEN_PYRAMIDS = 32
+
+_pyramids = OrderedDict()
+_pyramids_lock = threading.Lock()
+
+
+def get_pyramid(mrc_path, cache_dir=None):
+    key = (file_fingerprint(mrc_path), str(cache_dir))
+    with _pyramids_lock:
+        if key not in _pyramids:
+            _pyramids[key] = TilePyramid(mrc_path, cache_dir)
+            while len(_pyramids) > MAX_OPEN_PYRAMIDS:
+                _pyramids.popitem(last=False)
+        _pyramids.move_to_end(key)
+        return _pyramids[key]
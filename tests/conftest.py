@@ -3,6 +3,8 @@ from pathlib import Path
 import tempfile
 import shutil
 
+from particle_picker.cli import particle_cli
+
 
 @pytest.fixture
 def temp_dir():
@@ -80,3 +82,18 @@ def sample_box_file(temp_dir, sample_box_content):
     box_file = temp_dir / "test.box"
     box_file.write_text(sample_box_content)
     return box_file
+
+
+@pytest.fixture
+def run_cli(capsys):
+    # Runs a CLI command in-process; returns (stdout, exit code)
+    def run(argv):
+        args = particle_cli.parse_arguments().parse_args(argv)
+        try:
+            particle_cli.execute(args)
+            code = 0
+        except SystemExit as e:
+            code = e.code
+        return capsys.readouterr().out, code
+
+    return run
@@ -0,0 +1,188 @@
+import json
+
+import numpy as np
+import pytest
+from flask import Flask
+
+from particle_picker.analysis.cache import DatasetCache
+from particle_picker.dashboard import api
+from particle_picker.parsers.mrc import write_mrc
+from particle_picker.visualization.figure_cache import FigureCache
+
+
+@pytest.fixture
+def cache():
+    return DatasetCache()
+
+
+@pytest.fixture
+def client(cache):
+    app = Flask(__name__)
+    app.register_blueprint(api.create_blueprint(cache))
+    return app.test_client()
+
+
+@pytest.fixture
+def dataset(client, sample_star_file):
+    response = client.post('/api/datasets', json={'path': str(sample_star_file), 'type': 'star'})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+class TestStatsAPI:
+
+    def test_register_and_list(self, client, dataset, sample_star_file):
+        datasets = client.get('/api/datasets').get_json()['datasets']
+
+        assert {'id': dataset, 'path': str(sample_star_file.resolve()), 'type': 'star'} in datasets
+
+    def test_register_errors(self, client, temp_dir, sample_star_file):
+        missing = client.post('/api/datasets', json={'path': str(temp_dir / "x.star"),
+                                                     'type': 'star'})
+        bad_type = client.post('/api/datasets', json={'path': str(sample_star_file),
+                                                      'type': 'mrc'})
+
+        assert missing.status_code == 404
+        assert bad_type.status_code == 400
+        assert client.post('/api/datasets', json={}).status_code == 400
+
+    def test_summary(self, client, dataset):
+        summary = client.get(f'/api/datasets/{dataset}/summary').get_json()
+
+        assert summary['total_particles'] == 4
+        assert summary['total_micrographs'] == 2
+
+    def test_unknown_dataset(self, client):
+        assert client.get('/api/datasets/nope/summary').status_code == 404
+
+    def test_etag_conditional(self, client, dataset, sample_star_file, sample_star_content):
+        first = client.get(f'/api/datasets/{dataset}/summary')
+        etag = first.headers['ETag']
+
+        cached = client.get(f'/api/datasets/{dataset}/summary', headers={'If-None-Match': etag})
+        other = client.get(f'/api/datasets/{dataset}/heatmap', headers={'If-None-Match': etag})
+
+        assert cached.status_code == 304
+        assert other.status_code == 200
+
+        sample_star_file.write_text(sample_star_content + "9.0 9.0 micrograph_003.mrc 1.0 1.0\n")
+        changed = client.get(f'/api/datasets/{dataset}/summary', headers={'If-None-Match': etag})
+
+        assert changed.status_code == 200
+        assert changed.headers['ETag'] != etag
+        assert changed.get_json()['total_particles'] == 5
+
+    def test_distribution_pagination(self, client, dataset):
+        page = client.get(f'/api/datasets/{dataset}/distribution?offset=0&limit=1').get_json()
+
+        assert page['total'] == 2
+        assert len(page['items']) == 1
+        assert page['items'][0]['count'] == 2
+
+        following = client.get(page['next']).get_json()
+        assert 'next' not in following
+        assert following['items'][0]['micrograph'] != page['items'][0]['micrograph']
+
+    def test_distribution_ndjson_stream(self, client, dataset):
+        response = client.get(f'/api/datasets/{dataset}/distribution?format=ndjson')
+
+        assert response.mimetype == 'application/x-ndjson'
+        rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        assert sorted(row['micrograph'] for row in rows) == ['micrograph_001.mrc',
+                                                             'micrograph_002.mrc']
+
+    @pytest.mark.parametrize('query', ['limit=0', 'limit=abc', 'offset=-1', 'limit=100000'])
+    def test_distribution_bad_arguments(self, client, dataset, query):
+        assert client.get(f'/api/datasets/{dataset}/distribution?{query}').status_code == 400
+
+    def test_heatmap(self, client, dataset):
+        heatmap = client.get(f'/api/datasets/{dataset}/heatmap?bin=500').get_json()
+
+        assert heatmap['bin_size'] == 500
+        assert heatmap['x_col'] == 'CoordinateX'
+        assert sum(map(sum, heatmap['counts'])) == 4
+        assert len(heatmap['counts']) == len(heatmap['x_edges']) - 1
+
+    def test_heatmap_rejects_tiny_bins(self, client, dataset):
+        assert client.get(f'/api/datasets/{dataset}/heatmap?bin=1').status_code == 400
+
+    def test_uses_shared_cache(self, client, dataset, cache):
+        client.get(f'/api/datasets/{dataset}/summary')
+        client.get(f'/api/datasets/{dataset}/heatmap')
+
+        assert cache.info()['misses'] == 2
+        assert cache.info()['hits'] >= 2
+
+
+class TestFigureAPI:
+
+    @pytest.fixture
+    def figures(self):
+        return FigureCache()
+
+    @pytest.fixture
+    def client(self, cache, figures):
+        app = Flask(__name__)
+        app.register_blueprint(api.create_blueprint(cache, figures))
+        return app.test_client()
+
+    def test_figure_json(self, client, dataset, figures):
+        response = client.get(f'/api/datasets/{dataset}/figures/heatmap?bin=500')
+        client.get(f'/api/datasets/{dataset}/figures/heatmap?bin=500')
+
+        assert response.status_code == 200
+        assert response.get_json()['layout']['title']['text'] == 'Particle Density Heatmap'
+        assert figures.info()['misses'] == 1
+        assert figures.info()['hits'] == 1
+
+    def test_figure_errors(self, client, dataset):
+        assert client.get(f'/api/datasets/{dataset}/figures/nope').status_code == 404
+        assert client.get(f'/api/datasets/{dataset}/figures/scatter?points=0').status_code == 400
+        assert client.get(f'/api/datasets/{dataset}/figures/summary?mode=x').status_code == 400
+
+    def test_figure_modes_are_cached_apart(self, client, dataset, figures):
+        exact = client.get(f'/api/datasets/{dataset}/figures/histogram')
+        approximate = client.get(f'/api/datasets/{dataset}/figures/histogram?mode=approximate')
+
+        assert exact.status_code == approximate.status_code == 200
+        assert figures.info()['misses'] == 2
+
+
+class TestMicrographAPI:
+
+    @pytest.fixture
+    def micrographs(self, sample_star_file, temp_dir, monkeypatch):
+        monkeypatch.setenv('PARTICLE_PICKER_TILE_CACHE', str(temp_dir / 'tiles'))
+        write_mrc(temp_dir / 'micrograph_001.mrc', np.zeros((4096, 4096), dtype=np.int8))
+
+    def test_micrograph_info(self, client, dataset, micrographs):
+        info = client.get(f'/api/datasets/{dataset}/micrographs/0').get_json()
+
+        assert info['micrograph'] == 'micrograph_001.mrc'
+        assert (info['width'], info['height'], info['levels']) == (4096, 4096, 5)
+        assert info['picks']['x'] == [1234.5, 1456.7]
+
+    def test_tiles(self, client, dataset, micrographs):
+        response = client.get(f'/api/datasets/{dataset}/micrographs/0/tiles/4/0/0.png')
+
+        assert response.status_code == 200
+        assert response.mimetype == 'image/png'
+        assert response.data.startswith(b'\x89PNG')
+        assert client.get(
+            f'/api/datasets/{dataset}/micrographs/0/tiles/0/16/0.png').status_code == 404
+
+    def test_rewritten_micrograph_is_not_validated(self, client, dataset, micrographs,
+                                                   temp_dir):
+        url = f'/api/datasets/{dataset}/micrographs/0'
+        etag = client.get(url).headers['ETag']
+        assert client.get(url, headers={'If-None-Match': etag}).status_code == 304
+
+        write_mrc(temp_dir / 'micrograph_001.mrc', np.zeros((2048, 2048), dtype=np.int8))
+        response = client.get(url, headers={'If-None-Match': etag})
+
+        assert response.status_code == 200
+        assert response.get_json()['width'] == 2048
+
+    def test_missing_micrograph(self, client, dataset, micrographs):
+        assert client.get(f'/api/datasets/{dataset}/micrographs/1').status_code == 404
+        assert client.get(f'/api/datasets/{dataset}/micrographs/9').status_code == 404
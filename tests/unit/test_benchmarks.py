@@ -0,0 +1,46 @@
+import pytest
+from benchmarks.datasets import generate_particles, generate_dataset
+from benchmarks.run_benchmarks import compare_to_baseline
+from particle_picker.parsers.star_parser import StarFileParser
+from particle_picker.parsers.box_parser import BoxFileParser
+
+
+class TestBenchmarks:
+
+    def test_generator_is_deterministic(self):
+        first = generate_particles(500, 10, seed=3)
+        second = generate_particles(500, 10, seed=3)
+
+        assert first.equals(second)
+        assert len(first) == 500
+        assert first['MicrographName'].nunique() <= 10
+
+    def test_generated_star_round_trip(self, temp_dir):
+        path = generate_dataset('1e3', 'star', temp_dir)
+        parser = StarFileParser(path)
+
+        assert len(parser.get_particles()) == 1000
+        assert len(parser.get_optics()) == 2
+        assert parser.get_statistics()['unique_micrographs'] <= 10
+
+    def test_generated_box_round_trip(self, temp_dir):
+        path = generate_dataset('1e3', 'box', temp_dir)
+
+        assert len(BoxFileParser(path).get_particles()) == 1000
+
+    def test_compare_to_baseline(self):
+        baseline = {
+            'parse/star/1e5': {'seconds': 1.0, 'peak_bytes': 1000, 'rows': 10},
+            'stats/get_summary_statistics/1e5': {'seconds': 0.001},
+        }
+        results = {
+            'parse/star/1e5': {'seconds': 1.5, 'peak_bytes': 1050, 'rows': 10},
+            'stats/get_summary_statistics/1e5': {'seconds': 0.003},
+            'parse/csv/1e5': {'seconds': 9.0},
+        }
+
+        regressions = compare_to_baseline(results, baseline)
+
+        assert len(regressions) == 1
+        assert regressions[0]['benchmark'] == 'parse/star/1e5'
+        assert regressions[0]['change'] == pytest.approx(0.5)
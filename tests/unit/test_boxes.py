@@ -0,0 +1,177 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from particle_picker.analysis.boxes import (
+    BOX_COLUMNS, box_size_from_optics, box_statistics, micrograph_box_statistics
+)
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.cli import particle_cli
+from particle_picker.parsers.mrc import write_mrc
+from particle_picker.parsers.star_parser import StarFileParser
+from particle_picker.visualization.plots import ParticleVisualizations
+
+
+def _micrograph(path, seed=0):
+    image = np.random.default_rng(seed).normal(0, 1, (200, 300)).astype(np.float32)
+    write_mrc(path, image, pixel_size=1.0)
+    return image
+
+
+@pytest.fixture
+def project(temp_dir):
+    (temp_dir / "Micrographs").mkdir()
+    images = {name: _micrograph(temp_dir / "Micrographs" / name, seed)
+              for seed, name in enumerate(["mic_a.mrc", "mic_b.mrc"])}
+    df = pd.DataFrame({
+        'CoordinateX': [50.0, 150.0, 290.0, 100.0, 60.0],
+        'CoordinateY': [50.0, 100.0, 190.0, 80.0, 120.0],
+        'MicrographName': ["Micrographs/mic_a.mrc", "Micrographs/mic_b.mrc",
+                           "Micrographs/mic_a.mrc", "Micrographs/missing.mrc",
+                           "Micrographs/mic_b.mrc"],
+    })
+    return temp_dir, images, df
+
+
+class TestMicrographBoxStatistics:
+
+    def test_matches_per_box_reference(self, temp_dir):
+        image = _micrograph(temp_dir / "mic.mrc")
+        x = np.array([40.0, 120.5, 250.0])
+        y = np.array([30.0, 100.0, 170.0])
+
+        result = micrograph_box_statistics((str(temp_dir / "mic.mrc"), x, y, 20))
+
+        for i in range(3):
+            left, top = int(np.rint(x[i])) - 10, int(np.rint(y[i])) - 10
+            box = image[top:top + 20, left:left + 20].astype(np.float64)
+            inner = box[5:15, 5:15]
+            outer_mean = (box.sum() - inner.sum()) / (400 - 100)
+            assert result['box_mean'][i] == pytest.approx(box.mean())
+            assert result['box_std'][i] == pytest.approx(box.std())
+            assert result['box_contrast'][i] == pytest.approx(
+                (inner.mean() - outer_mean) / image.std(), rel=1e-4)
+
+    def test_edge_boxes_are_clamped_and_flagged(self, temp_dir):
+        image = _micrograph(temp_dir / "mic.mrc")
+        result = micrograph_box_statistics(
+            (str(temp_dir / "mic.mrc"), np.array([2.0, 150.0]), np.array([100.0, 100.0]), 20))
+
+        np.testing.assert_array_equal(result['near_edge'], [True, False])
+        np.testing.assert_allclose(result['edge_distance'], [2.0, 99.0])
+        assert result['box_mean'][0] == pytest.approx(image[90:110, 0:20].mean())
+
+    def test_bright_particle_has_positive_contrast(self, temp_dir):
+        image = np.zeros((64, 64), dtype=np.float32)
+        image[::2] = 1.0
+        image[28:36, 28:36] = 10.0
+        write_mrc(temp_dir / "mic.mrc", image)
+
+        result = micrograph_box_statistics(
+            (str(temp_dir / "mic.mrc"), np.array([32.0]), np.array([32.0]), 16))
+
+        assert result['box_contrast'][0] > 0
+
+
+class TestBoxStatistics:
+
+    def test_columns_align_with_rows(self, project):
+        root, images, df = project
+        table = ParticleTable.from_pandas(df)
+
+        columns, report = box_statistics(table, 'star', root / "particles.star", box_size=20)
+
+        assert report['micrographs'] == 2
+        assert report['missing_micrographs'] == ["Micrographs/missing.mrc"]
+        assert report['particles'] == 4
+        assert np.isnan(columns['box_mean'][3])
+        assert columns['box_mean'][1] == pytest.approx(images["mic_b.mrc"][90:110, 140:160].mean())
+        assert columns['box_mean'][4] == pytest.approx(images["mic_b.mrc"][110:130, 50:70].mean())
+        np.testing.assert_array_equal(columns['near_edge'], [False, False, True, False, False])
+
+    def test_process_pool_matches_serial(self, project):
+        root, _, df = project
+        table = ParticleTable.from_pandas(df)
+
+        serial, _ = box_statistics(table, 'star', root / "particles.star", box_size=20)
+        pooled, _ = box_statistics(table, 'star', root / "particles.star", box_size=20, jobs=2)
+
+        for name in BOX_COLUMNS:
+            np.testing.assert_array_equal(serial[name], pooled[name])
+
+    def test_box_file_uses_corners_and_width(self, temp_dir):
+        image = _micrograph(temp_dir / "mic.mrc")
+        table = ParticleTable.from_pandas(pd.DataFrame(
+            {'x': [30], 'y': [40], 'width': [24], 'height': [24]}))
+
+        columns, report = box_statistics(table, 'box', temp_dir / "mic.box")
+
+        assert report['box_size'] == 24
+        assert columns['box_mean'][0] == pytest.approx(image[40:64, 30:54].mean())
+
+    def test_box_size_from_optics(self, sample_star_file):
+        optics = StarFileParser.read_optics(sample_star_file)
+
+        assert box_size_from_optics(optics) == 360
+        assert box_size_from_optics(optics, micrograph_pixel_size=0.885) == 720
+        assert box_size_from_optics(None) is None
+
+    def test_unknown_box_size_raises(self, project):
+        root, _, df = project
+        table = ParticleTable.from_pandas(df)
+
+        with pytest.raises(ValueError):
+            box_statistics(table, 'csv', root / "particles.csv")
+
+    def test_statistics_and_table_columns(self, project):
+        root, _, df = project
+        table = ParticleTable.from_pandas(df)
+        columns, _ = box_statistics(table, 'star', root / "particles.star", box_size=20)
+
+        extended = table.with_columns(columns)
+        stats = ParticleStatistics(extended).get_box_statistics()
+
+        assert extended.column_names == list(df.columns) + BOX_COLUMNS
+        assert list(extended['MicrographName']) == list(df['MicrographName'])
+        assert set(stats) == set(BOX_COLUMNS)
+        assert ParticleStatistics(table).get_box_statistics() == {}
+
+    def test_distribution_figure(self, project):
+        root, _, df = project
+        table = ParticleTable.from_pandas(df)
+        columns, _ = box_statistics(table, 'star', root / "particles.star", box_size=20)
+
+        figure = ParticleVisualizations(ParticleStatistics(table.with_columns(columns)))
+        titles = [note.text for note in figure.create_box_distribution().layout.annotations]
+
+        assert titles == ['box_mean', 'box_std', 'box_contrast', 'edge_distance']
+        assert not ParticleVisualizations(ParticleStatistics(table)).create_box_distribution().data
+
+
+class TestBoxesCommand:
+
+    def test_boxes_writes_columns(self, project, capsys):
+        root, _, df = project
+        df.to_csv(root / "particles.csv", index=False)
+        output = root / "boxes.csv"
+
+        particle_cli.execute(particle_cli.parse_arguments().parse_args([
+            'boxes', '-i', str(root / "particles.csv"), '-t', 'csv', '--box-size', '20',
+            '-o', str(output)]))
+
+        out = capsys.readouterr().out
+        assert "Particles: 4 of 5 measured" in out
+        assert "Near an edge: 1" in out
+        assert set(BOX_COLUMNS) <= set(pd.read_csv(output).columns)
+
+    def test_filter_with_box_stats(self, project, capsys):
+        root, _, df = project
+        df.to_csv(root / "particles.csv", index=False)
+        output = root / "kept.csv"
+
+        particle_cli.execute(particle_cli.parse_arguments().parse_args([
+            'filter', '-i', str(root / "particles.csv"), '-t', 'csv', '--box-stats',
+            '--box-size', '20', '-e', 'not near_edge and box_std > 0', '-o', str(output)]))
+
+        assert len(pd.read_csv(output)) == 3
@@ -0,0 +1,178 @@
+import os
+import threading
+import time
+
+import pytest
+
+from particle_picker.analysis.cache import DatasetCache, MemoizedStatistics, file_fingerprint
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.parsers.loader import load_particles
+
+
+class TestDatasetCache:
+
+    def test_hit_skips_compute(self, sample_star_file):
+        cache = DatasetCache()
+        calls = []
+
+        def load():
+            calls.append(1)
+            return load_particles(sample_star_file, 'star')
+
+        first = cache.get_particles(sample_star_file, 'star', load)
+        second = cache.get_particles(sample_star_file, 'star', load)
+
+        assert first is second
+        assert len(calls) == 1
+        assert cache.info()['hits'] == 1
+
+    def test_file_change_invalidates(self, sample_csv_file, sample_csv_content):
+        cache = DatasetCache()
+        first = cache.get_particles(sample_csv_file, 'csv',
+                                    lambda: load_particles(sample_csv_file, 'csv'))
+
+        sample_csv_file.write_text(sample_csv_content + "9.0,9.0,micrograph_003.mrc\n")
+        stat = sample_csv_file.stat()
+        os.utime(sample_csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        second = cache.get_particles(sample_csv_file, 'csv',
+                                     lambda: load_particles(sample_csv_file, 'csv'))
+
+        assert len(first) == 4
+        assert len(second) == 5
+        assert len(cache) == 1
+
+    def test_lru_eviction(self, temp_dir):
+        cache = DatasetCache(max_datasets=2)
+        paths = []
+        for name in 'abc':
+            path = temp_dir / f"{name}.box"
+            path.write_text("1 2 3 4\n")
+            paths.append(path)
+            cache.get(path, 'box', 'counts', lambda: name)
+
+        cache.get(paths[1], 'box', 'counts', lambda: 'recomputed')
+        cache.get(paths[0], 'box', 'counts', lambda: 'recomputed')
+
+        assert cache.get(paths[1], 'box', 'counts', lambda: 'evicted') == 'b'
+        assert cache.get(paths[2], 'box', 'counts', lambda: 'evicted') == 'evicted'
+
+    def test_missing_file_raises(self, temp_dir):
+        with pytest.raises(OSError):
+            file_fingerprint(temp_dir / "missing.star")
+
+    def test_concurrent_misses_share_one_compute(self, sample_box_file):
+        cache = DatasetCache()
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def load():
+            calls.append(1)
+            release.wait(5)
+            return 'parsed'
+
+        threads = [threading.Thread(target=lambda: results.append(
+            cache.get(sample_box_file, 'box', 'counts', load))) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.05)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ['parsed'] * 4
+        assert len(calls) == 1
+        assert cache.info()['misses'] == 1
+
+    def test_slow_compute_does_not_block_other_files(self, sample_box_file, sample_csv_file):
+        cache = DatasetCache()
+        release = threading.Event()
+        thread = threading.Thread(
+            target=lambda: cache.get(sample_box_file, 'box', 'counts', lambda: release.wait(5)))
+        thread.start()
+
+        try:
+            assert cache.get(sample_csv_file, 'csv', 'counts', lambda: 'fast') == 'fast'
+            assert thread.is_alive()
+        finally:
+            release.set()
+            thread.join()
+
+    def test_errors_reach_every_waiter_and_are_not_cached(self, sample_box_file):
+        cache = DatasetCache()
+
+        def fail():
+            raise ValueError("bad file")
+
+        with pytest.raises(ValueError):
+            cache.get(sample_box_file, 'box', 'counts', fail)
+        assert cache.get(sample_box_file, 'box', 'counts', lambda: 'ok') == 'ok'
+
+
+class TestMemoizedStatistics:
+
+    def test_results_are_cached_and_shared_read_only(self, sample_star_file):
+        df = load_particles(sample_star_file, 'star')
+        stats = MemoizedStatistics(ParticleStatistics(df))
+
+        summary = stats.get_summary_statistics()
+        summary['file'] = 'mutated'
+        heatmap = stats.get_heatmap_data(bin_size=500)
+
+        assert 'file' not in stats.get_summary_statistics()
+        assert stats.get_summary_statistics() == ParticleStatistics(df).get_summary_statistics()
+        assert stats.get_heatmap_data(bin_size=500)['histogram'] is heatmap['histogram']
+        with pytest.raises(ValueError):
+            heatmap['histogram'][0, 0] = 1
+        assert stats.micrograph_col == 'MicrographName'
+
+    def test_different_statistics_compute_concurrently(self):
+        class Slow:
+            def __init__(self):
+                self.calls = []
+                self.started = threading.Barrier(2, timeout=5)
+
+            def get_a(self):
+                self.calls.append('a')
+                self.started.wait()
+                return 1
+
+            def get_b(self):
+                self.calls.append('b')
+                self.started.wait()
+                return 2
+
+        slow = Slow()
+        stats = MemoizedStatistics(slow)
+        results = []
+        threads = [threading.Thread(target=lambda get=get: results.append(get()))
+                   for get in (stats.get_a, stats.get_b, stats.get_a)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # get_a and get_b both passed the barrier, so neither waited on the other
+        assert sorted(results) == [1, 1, 2]
+        assert sorted(slow.calls) == ['a', 'b']
+
+    def test_argument_results_are_bounded(self):
+        class Counting:
+            calls = 0
+
+            def get_value(self, n):
+                Counting.calls += 1
+                return n
+
+            def get_micrograph_picks(self, name):
+                Counting.calls += 1
+                return name
+
+        stats = MemoizedStatistics(Counting())
+        for n in range(MemoizedStatistics.MAX_ARGUMENT_RESULTS + 5):
+            stats.get_value(n)
+        stats.get_micrograph_picks('a')
+        stats.get_micrograph_picks('a')
+
+        assert len(stats._results) == MemoizedStatistics.MAX_ARGUMENT_RESULTS
+        assert Counting.calls == MemoizedStatistics.MAX_ARGUMENT_RESULTS + 7
@@ -0,0 +1,108 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.parsers import compact
+from particle_picker.parsers.compact import compact_column, compact_table, memory_report
+from particle_picker.parsers.loader import load_table
+
+
+class TestCompactColumn:
+
+    def test_integers_use_smallest_signed_dtype(self):
+        assert compact_column(np.array([1, 50, 100]))[0].dtype == np.int8
+        assert compact_column(np.array([-1, 200]))[0].dtype == np.int16
+        assert compact_column(np.array([0, 70000]))[0].dtype == np.int32
+        assert compact_column(np.array([0, 2 ** 40]))[0].dtype == np.int64
+
+    def test_floats_within_bound(self):
+        values = np.array([0.5, 1234.25, np.nan, 4095.75])
+        converted, error = compact_column(values, 'coordinate')
+
+        assert converted.dtype == np.float32
+        assert error <= compact.FLOAT_TOLERANCES['coordinate']
+        assert np.isnan(converted[2])
+
+    def test_floats_outside_bound_stay_float64(self, monkeypatch):
+        monkeypatch.setitem(compact.FLOAT_TOLERANCES, 'coordinate', 1e-9)
+        values = np.array([0.1, 1234.567])
+
+        converted, error = compact_column(values, 'coordinate')
+        assert converted is values
+        assert error == 0.0
+
+    def test_out_of_range_floats_stay_float64(self):
+        values = np.array([1.0, 1e300])
+        assert compact_column(values)[0].dtype == np.float64
+
+
+class TestCompactTable:
+
+    def test_statistics_within_precision_bound(self, sample_star_file):
+        table = load_table(sample_star_file, 'star')
+        compacted, errors = compact_table(table)
+
+        assert compacted.codes.dtype == np.int8
+        assert compacted['CoordinateX'].dtype == np.float32
+        assert compacted['DefocusU'].dtype == np.float32
+        assert max(errors.values()) < compact.FLOAT_TOLERANCES['coordinate']
+
+        exact = ParticleStatistics(table)
+        approx = ParticleStatistics(compacted)
+        assert approx.get_summary_statistics() == exact.get_summary_statistics()
+        for col, values in exact.get_coordinate_statistics().items():
+            for key, value in values.items():
+                assert abs(approx.get_coordinate_statistics()[col][key] - value) < 0.01
+
+    def test_loader_option(self, sample_box_file):
+        table = load_table(sample_box_file, 'box', compact=True)
+        assert [str(table[col].dtype) for col in table.column_names] == [
+            'int16', 'int16', 'int8', 'int8'
+        ]
+
+    def test_string_columns_are_kept(self):
+        table = ParticleTable.from_pandas(pd.DataFrame({
+            'ImageName': ['1@a.mrcs', '2@a.mrcs'],
+            'MicrographName': ['a.mrc', 'a.mrc'],
+        }))
+
+        compacted = compact_table(table)[0]
+        assert list(compacted['ImageName']) == ['1@a.mrcs', '2@a.mrcs']
+        assert list(compacted['MicrographName']) == ['a.mrc', 'a.mrc']
+
+
+class TestMemoryReport:
+
+    def test_bytes_per_column(self, sample_star_file):
+        report = memory_report(load_table(sample_star_file, 'star'))
+        columns = {column['column']: column for column in report['columns']}
+
+        assert report['particles'] == 4
+        assert columns['CoordinateX']['bytes_before'] == 32
+        assert columns['CoordinateX']['bytes_after'] == 16
+        assert columns['MicrographName']['dtype_before'] == 'object'
+        assert columns['MicrographName']['dtype_after'] == 'int8+names'
+        assert report['bytes_after'] < report['bytes_before']
+        assert report['bytes_per_particle_after'] == report['bytes_after'] / 4
+
+    def test_command(self, sample_star_file, temp_dir, run_cli):
+        output = temp_dir / "memory.json"
+
+        out, code = run_cli(['memory', '-i', str(sample_star_file), '-t', 'star',
+                             '-o', str(output)])
+
+        assert code == 0
+        assert 'CoordinateX' in out
+        assert 'Bytes per particle' in out
+        assert json.loads(output.read_text())['particles'] == 4
+
+    def test_compact_analyze(self, sample_star_file, run_cli):
+        plain, _ = run_cli(['analyze', '-i', str(sample_star_file), '-t', 'star', '-v'])
+        compacted, code = run_cli(['analyze', '-i', str(sample_star_file), '-t', 'star', '-v',
+                                   '--compact'])
+
+        assert code == 0
+        assert compacted == plain
@@ -0,0 +1,119 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from particle_picker.analysis.comparison import (
+    average_ranks, compare_micrographs, normalize_micrograph_names, rank_correlation, run_labels
+)
+from particle_picker.cli import particle_cli
+
+
+class TestHelpers:
+
+    def test_normalize_names(self):
+        names = normalize_micrograph_names(['a/b/mic1.mrc', 'C:\\data\\mic2.mrc', 'mic3.mrc'])
+        assert list(names) == ['mic1.mrc', 'mic2.mrc', 'mic3.mrc']
+
+    def test_run_labels_are_unique(self):
+        assert run_labels(['a/run.star', 'b/run.star', 'c/other.star']) == [
+            'run.star', 'run.star#2', 'other.star'
+        ]
+
+    @pytest.mark.parametrize('counts', [
+        np.random.default_rng(0).poisson(4, (200, 5)),
+        np.random.default_rng(1).integers(0, 10 ** 8, (50, 3)),
+    ])
+    def test_average_ranks_match_pandas(self, counts):
+        np.testing.assert_allclose(average_ranks(counts),
+                                   pd.DataFrame(counts).rank(axis=0).to_numpy())
+
+    def test_rank_correlation(self):
+        x = np.arange(20)
+        counts = np.column_stack([x, x ** 2, -x, np.full(20, 3)])
+
+        correlation = rank_correlation(counts)
+
+        assert correlation[0, 1] == pytest.approx(1.0)
+        assert correlation[0, 2] == pytest.approx(-1.0)
+        assert np.isnan(correlation[0, 3])
+
+
+class TestCompareMicrographs:
+
+    def test_join_on_basenames(self):
+        result = compare_micrographs([
+            (np.array(['x/mic1.mrc', 'x/mic2.mrc', 'x/mic3.mrc'], dtype=object), [10, 20, 30]),
+            (np.array(['y/mic2.mrc', 'y/mic3.mrc', 'y/mic4.mrc'], dtype=object), [25, 30, 5]),
+        ], ['a', 'b'])
+
+        matrix = result['matrix']
+        assert list(matrix.index) == ['mic1.mrc', 'mic2.mrc', 'mic3.mrc', 'mic4.mrc']
+        assert list(matrix['a']) == [10, 20, 30, 0]
+        assert list(matrix['b']) == [0, 25, 30, 5]
+        assert list(matrix['delta:b']) == [-10, 5, 0, 5]
+        assert list(matrix['present']) == [1, 2, 2, 1]
+
+        a, b = result['runs']
+        assert (a['missing_micrographs'], b['missing_micrographs']) == (1, 1)
+        assert b['delta_particles'] == 0
+        assert a['spearman_vs_reference'] == pytest.approx(1.0)
+        assert result['correlation'].loc['a', 'b'] == pytest.approx(b['spearman_vs_reference'])
+
+    def test_colliding_basenames_are_summed(self):
+        result = compare_micrographs([
+            (np.array(['x/mic1.mrc', 'y/mic1.mrc'], dtype=object), [3, 4]),
+        ], ['a'])
+
+        assert result['matrix'].loc['mic1.mrc', 'a'] == 7
+
+    def test_many_runs(self):
+        rng = np.random.default_rng(0)
+        names = np.array([f'mic_{i:05d}.mrc' for i in range(2000)], dtype=object)
+        runs = [(names[rng.random(2000) > 0.1], None) for _ in range(50)]
+        runs = [(run_names, rng.poisson(50, len(run_names))) for run_names, _ in runs]
+
+        result = compare_micrographs(runs, [f'run{i}' for i in range(50)])
+
+        assert result['matrix'].shape == (2000, 50 + 49 + 2)
+        assert result['correlation'].shape == (50, 50)
+        for i, (run_names, counts) in enumerate(runs):
+            assert result['runs'][i]['micrographs'] == len(run_names)
+            assert result['runs'][i]['particles'] == counts.sum()
+
+
+class TestCompareCommand:
+
+    def test_per_micrograph(self, temp_dir, capsys):
+        path = temp_dir / "picks.csv"
+        path.write_text("x,y,MicrographName\n" + ''.join(
+            f"{i}.0,{i}.0,mic_{i % 3}.mrc\n" for i in range(3)
+        ) + "5.0,5.0,mic_2.mrc\n5.0,5.0,mic_2.mrc\n9.0,9.0,mic_1.mrc\n")
+        matrix_path = temp_dir / "matrix.csv"
+        output = temp_dir / "compare.json"
+
+        args = particle_cli.parse_arguments().parse_args([
+            'compare', '-i', str(path), str(path), '-t', 'csv',
+            '--per-micrograph', '--matrix', str(matrix_path), '-o', str(output)
+        ])
+        particle_cli.execute(args)
+        out = capsys.readouterr().out
+
+        assert 'Per-micrograph comparison' in out
+        assert 'Micrographs in every file: 3' in out
+        matrix = pd.read_csv(matrix_path, index_col=0)
+        assert list(matrix.columns[:2]) == ['picks.csv', 'picks.csv#2']
+        assert list(matrix['picks.csv']) == [1, 2, 3]
+        assert (matrix['delta:picks.csv#2'] == 0).all()
+        results = json.loads(output.read_text())
+        assert results[1]['per_micrograph']['spearman_vs_reference'] == pytest.approx(1.0)
+
+    def test_matrix_needs_per_micrograph(self, sample_star_file, temp_dir, capsys):
+        args = particle_cli.parse_arguments().parse_args([
+            'compare', '-i', str(sample_star_file), '-t', 'star',
+            '--matrix', str(temp_dir / 'matrix.csv')
+        ])
+
+        with pytest.raises(SystemExit):
+            particle_cli.execute(args)
@@ -0,0 +1,91 @@
+import bz2
+import gzip
+import lzma
+
+import pytest
+
+from particle_picker.parsers.compression import detect_compression, open_text
+from particle_picker.parsers.loader import iter_particle_batches, load_particles
+from particle_picker.parsers.tail_reader import IncrementalReader
+from particle_picker.parsers.tokenizer import count_micrographs
+
+COMPRESSORS = {
+    'gzip': gzip.compress,
+    'bz2': bz2.compress,
+    'xz': lzma.compress,
+}
+
+try:
+    import zstandard
+    COMPRESSORS['zstd'] = lambda data: zstandard.ZstdCompressor().compress(data)
+except ImportError:
+    pass
+
+
+def write_compressed(path, content, compression):
+    path.write_bytes(COMPRESSORS[compression](content.encode()))
+    return path
+
+
+@pytest.fixture(params=sorted(COMPRESSORS))
+def compression(request):
+    return request.param
+
+
+class TestDetectCompression:
+
+    def test_plain_file(self, sample_star_file):
+        assert detect_compression(sample_star_file) is None
+
+    def test_detects_by_magic_not_extension(self, temp_dir, sample_star_content, compression):
+        path = write_compressed(temp_dir / "particles.star", sample_star_content, compression)
+        assert detect_compression(path) == compression
+
+    def test_open_text_round_trip(self, temp_dir, sample_csv_content, compression):
+        path = write_compressed(temp_dir / "particles.csv.any", sample_csv_content, compression)
+        with open_text(path) as f:
+            assert f.read() == sample_csv_content
+
+
+class TestCompressedParsing:
+
+    @pytest.mark.parametrize('file_type', ['star', 'csv', 'box'])
+    def test_matches_uncompressed(self, temp_dir, request, compression, file_type):
+        content = request.getfixturevalue(f'sample_{file_type}_content')
+        plain = load_particles(request.getfixturevalue(f'sample_{file_type}_file'), file_type)
+        path = write_compressed(temp_dir / f"test.{file_type}.z", content, compression)
+
+        df = load_particles(path, file_type)
+
+        assert df is not None
+        assert df.equals(plain)
+
+    @pytest.mark.parametrize('file_type', ['star', 'csv', 'box'])
+    def test_batches(self, temp_dir, request, compression, file_type):
+        content = request.getfixturevalue(f'sample_{file_type}_content')
+        path = write_compressed(temp_dir / f"test.{file_type}", content, compression)
+
+        batches = list(iter_particle_batches(path, file_type, batch_size=3))
+
+        assert [len(batch) for batch in batches] == [3, 1]
+
+    def test_fast_count(self, temp_dir, sample_star_content, compression):
+        path = write_compressed(temp_dir / "test.star.gz", sample_star_content, compression)
+
+        total, counts = count_micrographs(path, 'star')
+
+        assert total == 4
+        assert counts == {'micrograph_001.mrc': 2, 'micrograph_002.mrc': 2}
+
+    def test_corrupt_stream(self, temp_dir, sample_csv_content):
+        path = temp_dir / "broken.csv.gz"
+        path.write_bytes(gzip.compress(sample_csv_content.encode())[:20])
+
+        assert count_micrographs(path, 'csv') is None
+        assert load_particles(path, 'csv') is None
+
+    def test_watch_rejects_compressed(self, temp_dir, sample_star_content):
+        path = write_compressed(temp_dir / "live.star.gz", sample_star_content, 'gzip')
+
+        with pytest.raises(ValueError):
+            IncrementalReader(path, 'star').read_new()
@@ -1,5 +1,8 @@
 import pytest
-from particle_picker.parsers.csv_parser import CSVParticleParser
+import pandas as pd
+
+from particle_picker.parsers import csv_parser
+from particle_picker.parsers.csv_parser import CSVParticleParser, detect_column_roles
 
 
 class TestCSVParser:
@@ -52,3 +55,60 @@ class TestCSVParser:
         
         parser = CSVParticleParser(malformed)
         assert parser.data is not None
+
+    def test_roles_detected_once(self, sample_csv_file):
+        parser = CSVParticleParser(sample_csv_file)
+
+        assert parser.roles == {
+            'CoordinateX': 'coordinate',
+            'CoordinateY': 'coordinate',
+            'MicrographName': 'name'
+        }
+        assert parser.micrograph_column == 'MicrographName'
+        assert parser.dtypes['CoordinateX'] == 'float64'
+
+    def test_detect_column_roles_relion_prefix(self):
+        roles = detect_column_roles(['_rlnCoordinateX', '_rlnDefocusU', '_rlnDefocusAngle',
+                                     '_rlnClassNumber', '_rlnImageName'])
+
+        assert roles == {
+            '_rlnCoordinateX': 'coordinate',
+            '_rlnDefocusU': 'defocus',
+            '_rlnDefocusAngle': 'angle',
+            '_rlnImageName': 'name'
+        }
+
+    @pytest.mark.parametrize('engine', ['pyarrow', 'c'])
+    def test_names_stay_strings(self, temp_dir, monkeypatch, engine):
+        if engine == 'pyarrow':
+            pytest.importorskip('pyarrow')
+        monkeypatch.setattr(csv_parser, 'csv_engine', lambda: engine)
+        path = temp_dir / "numeric_names.csv"
+        path.write_text("x,y,MicrographName\n1,2,001\n3,4,001\n5,6,\n")
+
+        parser = CSVParticleParser(path)
+
+        assert parser.data['x'].dtype == 'float64'
+        assert parser.get_particles_per_micrograph() == {'001': 2}
+
+    @pytest.mark.parametrize('engine', ['pyarrow', 'c'])
+    def test_declared_dtype_mismatch_falls_back(self, temp_dir, monkeypatch, engine):
+        if engine == 'pyarrow':
+            pytest.importorskip('pyarrow')
+        monkeypatch.setattr(csv_parser, 'csv_engine', lambda: engine)
+        path = temp_dir / "mixed.csv"
+        path.write_text("CoordinateX,DefocusU\n1.5,28000\n2.5,unknown\n")
+
+        parser = CSVParticleParser(path)
+
+        assert parser.data['CoordinateX'].tolist() == [1.5, 2.5]
+        assert parser.data['DefocusU'].tolist() == ['28000', 'unknown']
+
+    def test_iter_batches_matches_parse(self, sample_csv_file):
+        batches = list(CSVParticleParser.iter_batches(sample_csv_file, batch_size=3))
+
+        assert [len(batch) for batch in batches] == [3, 1]
+        pd.testing.assert_frame_equal(
+            pd.concat(batches, ignore_index=True),
+            CSVParticleParser(sample_csv_file).get_particles()
+        )
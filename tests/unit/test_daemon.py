@@ -0,0 +1,89 @@
+import os
+import stat
+import sys
+import threading
+
+import pytest
+
+from particle_picker.cli import client, daemon, particle_cli
+
+
+@pytest.fixture
+def server(temp_dir):
+    socket_path = str(temp_dir / "pp.sock")
+    server = daemon.create_server(socket_path, max_datasets=2, log=False)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, socket_path
+    server.shutdown()
+    server.server_close()
+    particle_cli.use_dataset_cache(None)
+
+
+class TestDaemon:
+
+    def test_no_daemon_returns_none(self, temp_dir):
+        assert client.forward(['list'], str(temp_dir / "missing.sock")) is None
+
+    @pytest.mark.parametrize('command', [
+        ['analyze', '-v'],
+        ['list', '--sort', 'name'],
+    ])
+    def test_forwarded_output_matches_local(self, server, sample_star_file, capsys, run_cli,
+                                            command):
+        _, socket_path = server
+        argv = command + ['-i', str(sample_star_file), '-t', 'star']
+
+        for _ in range(2):
+            code = client.forward(argv, socket_path)
+            forwarded = capsys.readouterr().out
+            particle_cli.use_dataset_cache(None)
+            assert (forwarded, code) == run_cli(argv)
+            particle_cli.use_dataset_cache(server[0].cache)
+
+        assert server[0].cache.info()['hits'] > 0
+
+    def test_relative_paths_use_client_cwd(self, server, sample_csv_file, capsys, monkeypatch):
+        _, socket_path = server
+        monkeypatch.chdir(sample_csv_file.parent)
+
+        code = client.forward(['list', '-i', sample_csv_file.name, '-t', 'csv'], socket_path)
+
+        assert code == 0
+        assert 'Total particles: 4' in capsys.readouterr().out
+
+    def test_errors_keep_exit_code(self, server, temp_dir, capsys):
+        _, socket_path = server
+
+        code = client.forward(['analyze', '-i', str(temp_dir / "none.star"), '-t', 'star'],
+                              socket_path)
+
+        assert code == 1
+        assert 'Error: File not found' in capsys.readouterr().out
+
+    def test_refuses_second_daemon(self, server):
+        _, socket_path = server
+
+        with pytest.raises(RuntimeError):
+            daemon.create_server(socket_path)
+
+    def test_socket_is_private(self, server):
+        _, socket_path = server
+        umask = os.umask(0)
+        os.umask(umask)
+
+        assert stat.S_IMODE(os.stat(socket_path).st_mode) == 0o600
+        assert umask != 0o177
+
+    def test_main_forwards_to_socket_option(self, server, sample_csv_file, capsys, monkeypatch):
+        _, socket_path = server
+        monkeypatch.setattr(sys, 'argv', ['particle-picker', 'list', '-i', str(sample_csv_file),
+                                          '-t', 'csv', '--socket', socket_path])
+        misses = server[0].cache.info()['misses']
+
+        with pytest.raises(SystemExit) as exc:
+            particle_cli.main()
+
+        assert exc.value.code == 0
+        assert 'Total particles: 4' in capsys.readouterr().out
+        assert server[0].cache.info()['misses'] > misses
@@ -0,0 +1,95 @@
+import json
+
+import plotly.graph_objects as go
+import pytest
+
+from particle_picker.analysis.cache import file_fingerprint
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.parsers.loader import load_table
+from particle_picker.visualization.figure_cache import (
+    CachedVisualizations, FigureCache, figure_key
+)
+
+
+def bar(values):
+    return go.Figure(data=[go.Bar(y=values)])
+
+
+class TestFigureCache:
+
+    def test_builds_once(self):
+        cache = FigureCache()
+        calls = []
+
+        def build():
+            calls.append(1)
+            return bar([1, 2, 3])
+
+        first = cache.get('key', build)
+        second = cache.get('key', build)
+
+        assert first is second
+        assert len(calls) == 1
+        assert json.loads(first)['data'][0]['y'] == [1, 2, 3]
+        assert cache.info()['hits'] == 1
+
+    def test_evicts_by_size(self):
+        size = len(FigureCache().get('probe', lambda: bar([0] * 100)))
+        cache = FigureCache(max_bytes=int(size * 2.5))
+
+        for key in 'abc':
+            cache.get(key, lambda: bar([0] * 100))
+
+        assert len(cache) == 2
+        assert cache.info()['bytes'] <= cache.max_bytes
+        cache.get('a', lambda: bar([0] * 100))
+        assert cache.info()['misses'] == 4
+
+    def test_disk_tier(self, temp_dir):
+        FigureCache(directory=temp_dir).get('key', lambda: bar([4, 5]))
+
+        cache = FigureCache(directory=temp_dir)
+        data = cache.get('key', lambda: pytest.fail("figure rebuilt"))
+
+        assert json.loads(data)['data'][0]['y'] == [4, 5]
+        assert cache.info()['disk_hits'] == 1
+
+    def test_disk_eviction(self, temp_dir):
+        size = len(FigureCache().get('probe', lambda: bar([0] * 100)))
+        cache = FigureCache(directory=temp_dir, max_disk_bytes=int(size * 2.5))
+
+        for key in 'abcd':
+            cache.get(key, lambda: bar([0] * 100))
+
+        assert sorted(path.stem for path in temp_dir.glob('*.json')) == ['c', 'd']
+
+
+class TestCachedVisualizations:
+
+    def test_key_covers_parameters(self, sample_star_file):
+        table = load_table(sample_star_file, 'star')
+        loads = []
+
+        def load():
+            loads.append(1)
+            return ParticleStatistics(table)
+
+        cache = FigureCache()
+        dataset = (file_fingerprint(sample_star_file), 'star', 'exact')
+        viz = CachedVisualizations(cache, dataset, load)
+
+        heatmap = viz.get_json('create_heatmap')
+        assert viz.get_json('create_heatmap', bin_size=100) is heatmap
+        viz.get_json('create_heatmap', bin_size=200)
+        viz.get_json('create_coordinate_scatter', seed=1)
+        CachedVisualizations(cache, dataset, load).get_json('create_heatmap')
+
+        assert cache.info()['misses'] == 3
+        assert cache.info()['hits'] == 2
+        assert len(loads) == 1
+        assert json.loads(heatmap)['layout']['title']['text'] == 'Particle Density Heatmap'
+
+    def test_key_includes_dataset(self):
+        assert figure_key(('a', 1), 'create_histogram') != figure_key(('a', 2), 'create_histogram')
+        assert (figure_key('d', 'create_heatmap', {'bin_size': 100})
+                != figure_key('d', 'create_heatmap', {'bin_size': 200}))
@@ -0,0 +1,93 @@
+import pytest
+import pandas as pd
+from particle_picker.analysis.filters import ParticleFilter, FilterSyntaxError, tokenize
+from particle_picker.parsers.star_parser import StarFileParser
+
+
+class TestParticleFilter:
+
+    @pytest.fixture
+    def sample_dataframe(self):
+        return pd.DataFrame({
+            'CoordinateX': [50.0, 1456.7, 2000.0, 2500.0, 3000.0],
+            'CoordinateY': [2345.6, 3456.8, 3000.0, 3500.0, 100.0],
+            'MicrographName': ['data/mic1.mrc', 'data/mic1.mrc', 'data/mic2.mrc',
+                               'data/mic2.mrc', 'data/mic3.mrc'],
+            'DefocusU': [28000.0, 28000.0, 29000.0, 29000.0, 35000.0]
+        })
+
+    def test_tokenize(self):
+        tokens = tokenize("DefocusU >= 1.5e4 and MicrographName == 'a.mrc'")
+
+        assert tokens[0] == ('name', 'DefocusU')
+        assert tokens[1] == ('op', '>=')
+        assert tokens[2] == ('number', 15000.0)
+        assert tokens[3] == ('keyword', 'and')
+        assert tokens[-1] == ('string', 'a.mrc')
+
+    def test_between(self, sample_dataframe):
+        particle_filter = ParticleFilter("DefocusU between 27000 and 29000")
+        result = particle_filter.apply(sample_dataframe)
+
+        assert len(result) == 4
+        assert not particle_filter.requires_groups
+
+    def test_edge_distance(self, sample_dataframe):
+        particle_filter = ParticleFilter(
+            "CoordinateX > 100 and CoordinateX < 4096 - 100 and not CoordinateY <= 100"
+        )
+        result = particle_filter.apply(sample_dataframe)
+
+        assert list(result['CoordinateX']) == [1456.7, 2000.0, 2500.0]
+
+    def test_group_count(self, sample_dataframe):
+        particle_filter = ParticleFilter("count() >= 2")
+        result = particle_filter.apply(sample_dataframe)
+
+        assert particle_filter.requires_groups
+        assert len(result) == 4
+        assert 'data/mic3.mrc' not in set(result['MicrographName'])
+
+    def test_group_mean(self, sample_dataframe):
+        particle_filter = ParticleFilter("mean(DefocusU) > 28500 or count() < 2")
+        result = particle_filter.apply(sample_dataframe)
+
+        assert set(result['MicrographName']) == {'data/mic2.mrc', 'data/mic3.mrc'}
+
+    def test_in_list_with_basename(self, sample_dataframe):
+        particle_filter = ParticleFilter("basename(MicrographName) in [mic1.mrc, 'mic3.mrc']")
+        result = particle_filter.apply(sample_dataframe)
+
+        assert len(result) == 3
+
+    def test_not_in_file(self, sample_dataframe, temp_dir):
+        excluded = temp_dir / "excluded.txt"
+        excluded.write_text("data/mic1.mrc\n# comment\ndata/mic2.mrc\n")
+
+        particle_filter = ParticleFilter(f"MicrographName not in @{excluded}")
+        result = particle_filter.apply(sample_dataframe)
+
+        assert list(result['MicrographName']) == ['data/mic3.mrc']
+
+    def test_missing_column(self, sample_dataframe):
+        particle_filter = ParticleFilter("Foo > 1")
+
+        with pytest.raises(KeyError):
+            particle_filter.mask(sample_dataframe)
+
+    def test_syntax_error(self):
+        with pytest.raises(FilterSyntaxError):
+            ParticleFilter("DefocusU between 1")
+
+        with pytest.raises(FilterSyntaxError):
+            ParticleFilter("unknown(DefocusU) > 1")
+
+    def test_streaming_matches_full_load(self, sample_star_file):
+        particle_filter = ParticleFilter("CoordinateX > 1500")
+        full = particle_filter.apply(StarFileParser(sample_star_file).get_particles())
+
+        batches = StarFileParser.iter_batches(sample_star_file, batch_size=1)
+        streamed = pd.concat([particle_filter.apply(df) for df in batches], ignore_index=True)
+
+        assert len(streamed) == len(full) == 2
+        assert list(streamed['CoordinateX']) == list(full['CoordinateX'])
@@ -0,0 +1,78 @@
+import pytest
+import numpy as np
+from particle_picker.analysis.incremental import RunningMoments, IncrementalStatistics, FileWatcher
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.parsers.star_parser import StarFileParser
+from particle_picker.parsers.tail_reader import IncrementalReader
+
+
+class TestIncrementalStatistics:
+
+    def test_running_moments_match_numpy(self):
+        values = np.random.default_rng(0).normal(100.0, 15.0, size=1000)
+        running = RunningMoments()
+        for batch in np.array_split(values, 7):
+            running.update(batch)
+
+        result = running.to_dict()
+        assert result['mean'] == pytest.approx(values.mean())
+        assert result['std'] == pytest.approx(values.std(ddof=1))
+        assert result['min'] == values.min()
+        assert result['max'] == values.max()
+
+    def test_summary_matches_full_statistics(self, sample_star_file):
+        particles = StarFileParser(sample_star_file).get_particles()
+        incremental = IncrementalStatistics()
+        incremental.update(particles.iloc[:1])
+        incremental.update(particles.iloc[1:])
+
+        expected = ParticleStatistics(particles).get_summary_statistics()
+        assert incremental.get_summary_statistics() == pytest.approx(expected)
+        assert incremental.get_distribution_per_micrograph().to_dict() == {
+            'micrograph_001.mrc': 2, 'micrograph_002.mrc': 2
+        }
+        assert 'CoordinateX' in incremental.get_coordinate_statistics()
+        assert 'DefocusU' in incremental.get_defocus_statistics()
+
+    def test_reader_parses_only_appended_rows(self, sample_star_file):
+        reader = IncrementalReader(sample_star_file, 'star')
+        assert not reader.truncated
+        first = reader.read_new()
+        assert len(first) == 4
+        assert reader.read_new() is None
+
+        with open(sample_star_file, 'a') as f:
+            f.write("3000.0 4000.0 micrograph_003.mrc 30000.0 29500.0\n")
+            f.write("3100.0 4100.0 micrograph_003")
+
+        appended = reader.read_new()
+        assert len(appended) == 1
+        assert appended.iloc[0]['MicrographName'] == 'micrograph_003.mrc'
+
+        with open(sample_star_file, 'a') as f:
+            f.write(".mrc 30000.0 29500.0\n")
+
+        completed = reader.read_new()
+        assert len(completed) == 1
+        assert completed.iloc[0]['CoordinateX'] == 3100.0
+
+    def test_csv_reader(self, sample_csv_file):
+        reader = IncrementalReader(sample_csv_file, 'csv')
+        assert len(reader.read_new()) == 4
+
+        with open(sample_csv_file, 'a') as f:
+            f.write("10.0,20.0,micrograph_003.mrc\n")
+
+        appended = reader.read_new()
+        assert list(appended.columns) == ['CoordinateX', 'CoordinateY', 'MicrographName']
+        assert appended.iloc[0]['CoordinateY'] == 20.0
+
+    def test_watcher_resets_on_truncation(self, sample_csv_file):
+        watcher = FileWatcher(sample_csv_file, 'csv')
+        assert watcher.poll() == 4
+
+        sample_csv_file.write_text("CoordinateX,CoordinateY,MicrographName\n1.0,2.0,mic.mrc\n")
+
+        assert watcher.poll() == 1
+        assert watcher.reader.truncated
+        assert watcher.stats.get_summary_statistics()['total_particles'] == 1
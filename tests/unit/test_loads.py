@@ -0,0 +1,151 @@
+import gzip
+import threading
+import time
+
+import pytest
+
+from particle_picker import profiling
+from particle_picker.dashboard import loads
+from particle_picker.dashboard.loads import (
+    COMPRESSED_MEMORY_FACTOR, LOAD_MEMORY_FACTOR, LoadLimitError, LoadScheduler,
+    estimate_load_bytes
+)
+
+
+def _wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+def _start(scheduler, results, *args, **kwargs):
+    thread = threading.Thread(target=lambda: results.append(scheduler.run(*args, **kwargs)))
+    thread.start()
+    return thread
+
+
+class TestLoadScheduler:
+
+    def test_concurrent_requests_share_one_load(self):
+        scheduler = LoadScheduler(max_workers=2, memory_budget=1000)
+        release = threading.Event()
+        calls = []
+        results = []
+
+        def load():
+            calls.append(1)
+            release.wait(5)
+            return 'stats'
+
+        threads = [_start(scheduler, results, 'dataset', load) for _ in range(5)]
+        _wait_for(lambda: scheduler.info()['joined'] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+
+        assert results == ['stats'] * 5
+        assert len(calls) == 1
+        assert scheduler.info()['completed'] == 1
+
+    def test_errors_propagate(self):
+        scheduler = LoadScheduler(memory_budget=1000)
+
+        def load():
+            raise ValueError("unreadable")
+
+        with pytest.raises(ValueError):
+            scheduler.run('dataset', load)
+        assert scheduler.run('dataset', lambda: 'retried') == 'retried'
+
+    def test_request_over_memory_limit_is_rejected(self):
+        scheduler = LoadScheduler(memory_budget=1000, max_request_bytes=100)
+
+        with pytest.raises(LoadLimitError, match='limit per request'):
+            scheduler.run('dataset', lambda: 'never', cost=101)
+        assert scheduler.run('dataset', lambda: 'ok', cost=100) == 'ok'
+
+    def test_timeout_leaves_load_running_for_retries(self):
+        scheduler = LoadScheduler(memory_budget=1000)
+        release = threading.Event()
+        calls = []
+
+        def load():
+            calls.append(1)
+            release.wait(5)
+            return 'stats'
+
+        with pytest.raises(LoadLimitError, match='Still loading'):
+            scheduler.run('dataset', load, timeout=0.05)
+        release.set()
+
+        assert scheduler.run('dataset', load) == 'stats'
+        assert len(calls) == 1
+
+    def test_small_loads_pass_queued_large_loads(self):
+        scheduler = LoadScheduler(max_workers=2, memory_budget=1000)
+        release = threading.Event()
+        results = []
+
+        large = [_start(scheduler, results, name, lambda: release.wait(5), small=False)
+                 for name in ('large-1', 'large-2')]
+        _wait_for(lambda: scheduler.info()['queued'] == 1)
+
+        assert scheduler.run('small', lambda: 'small', timeout=1) == 'small'
+        assert scheduler.info()['running'] == 1
+
+        release.set()
+        for thread in large:
+            thread.join()
+        assert results == [True, True]
+
+    def test_memory_budget_queues_loads(self):
+        scheduler = LoadScheduler(max_workers=4, memory_budget=100)
+        release = threading.Event()
+        order = []
+
+        def load(name):
+            order.append(name)
+            release.wait(5)
+
+        first = _start(scheduler, [], 'a', lambda: load('a'), cost=80)
+        _wait_for(lambda: order == ['a'])
+        second = _start(scheduler, [], 'b', lambda: load('b'), cost=50)
+        _wait_for(lambda: scheduler.info()['queued'] == 1)
+
+        assert scheduler.info()['memory_reserved'] == 80
+        release.set()
+        for thread in (first, second):
+            thread.join()
+        assert order == ['a', 'b']
+
+    def test_load_spans_reach_the_requesting_recorder(self):
+        scheduler = LoadScheduler(memory_budget=1000)
+
+        def load():
+            with profiling.span('star.parse'):
+                return 'stats'
+
+        with profiling.record() as recorder:
+            scheduler.run('dataset', load)
+
+        assert [entry['name'] for entry in recorder.summary()] == ['star.parse']
+
+
+class TestEstimateLoadBytes:
+
+    def test_scales_with_file_size(self, sample_star_file, temp_dir):
+        size = sample_star_file.stat().st_size
+        compressed = temp_dir / "test.star.gz"
+        compressed.write_bytes(gzip.compress(sample_star_file.read_bytes()))
+
+        assert estimate_load_bytes(sample_star_file) == size * LOAD_MEMORY_FACTOR
+        assert estimate_load_bytes(compressed) == (compressed.stat().st_size
+                                                   * COMPRESSED_MEMORY_FACTOR
+                                                   * LOAD_MEMORY_FACTOR)
+        assert estimate_load_bytes(sample_star_file, approx=True) == size * LOAD_MEMORY_FACTOR
+
+    def test_approximate_loads_are_capped(self, sample_star_file, monkeypatch):
+        monkeypatch.setattr(loads, 'APPROX_MEMORY_BYTES', 1000)
+
+        assert estimate_load_bytes(sample_star_file, approx=True) == 1000
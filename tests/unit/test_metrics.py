@@ -0,0 +1,139 @@
+import threading
+
+import pytest
+
+from particle_picker import metrics
+from particle_picker.analysis.cache import DatasetCache
+from particle_picker.cli import client, daemon, particle_cli
+from particle_picker.parsers.loader import PARSE_SECONDS, load_table
+
+
+class TestMetrics:
+
+    def test_counter_and_gauge_render(self):
+        registry = metrics.Registry()
+        registry.counter('requests_total', 'Requests', ['route']).inc(route='/a"b')
+        registry.gauge('temperature', 'Temperature').set(1.5)
+
+        assert registry.render() == (
+            '# HELP requests_total Requests\n'
+            '# TYPE requests_total counter\n'
+            'requests_total{route="/a\\"b"} 1\n'
+            '# HELP temperature Temperature\n'
+            '# TYPE temperature gauge\n'
+            'temperature 1.5\n'
+        )
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.Histogram('latency_seconds', 'Latency', buckets=(1, 2, 5))
+        for value in (0.5, 1.5, 1.7, 4, 10):
+            histogram.observe(value)
+
+        samples = {(name, labels.get('le')): value for name, labels, value in histogram.samples()}
+
+        assert [samples['latency_seconds_bucket', le] for le in ('1', '2', '5', '+Inf')] == \
+            [1, 3, 4, 5]
+        assert samples['latency_seconds_count', None] == 5
+        assert samples['latency_seconds_sum', None] == pytest.approx(17.7)
+
+        summary, = histogram.summary()
+        assert summary['count'] == 5
+        assert (summary['p50'], summary['p95']) == (2, float('inf'))
+
+    def test_labels_must_match(self):
+        counter = metrics.Counter('hits_total', 'Hits', ['cache'])
+
+        with pytest.raises(ValueError):
+            counter.inc()
+
+    def test_registry_rejects_duplicate_names(self):
+        registry = metrics.Registry()
+        registry.counter('a_total', 'A')
+
+        with pytest.raises(ValueError):
+            registry.gauge('a_total', 'A')
+
+    def test_collectors_merge_same_name(self):
+        registry = metrics.Registry()
+        for name in ('first', 'second'):
+            cache = DatasetCache()
+            registry.register_collector(name, lambda cache=cache, name=name: cache.metrics(name))
+
+        text = registry.render()
+
+        assert text.count('# TYPE particle_picker_cache_hits_total counter') == 1
+        assert 'particle_picker_cache_hits_total{cache="first"} 0' in text
+        assert 'particle_picker_cache_hits_total{cache="second"} 0' in text
+
+    @pytest.mark.parametrize('nbytes, label', [
+        (0, '<1MiB'), (5 * 1024 ** 2, '1-10MiB'), (2 * 1024 ** 3, '>1GiB'),
+    ])
+    def test_size_bucket(self, nbytes, label):
+        assert metrics.size_bucket(nbytes) == label
+
+
+class TestInstrumentation:
+
+    def test_parse_latency_by_type_and_size(self, sample_star_file):
+        def count():
+            return sum(entry['count'] for entry in PARSE_SECONDS.summary()
+                       if entry['labels'] == {'type': 'star', 'size': '<1MiB'})
+
+        before = count()
+        load_table(sample_star_file, 'star')
+
+        assert count() == before + 1
+
+    def test_dataset_cache_evictions_and_resident_bytes(self, sample_star_file, sample_csv_file):
+        cache = DatasetCache(max_datasets=1)
+        cache.get_table(sample_star_file, 'star', lambda: load_table(sample_star_file, 'star'))
+        cache.get_table(sample_csv_file, 'csv', lambda: load_table(sample_csv_file, 'csv'))
+
+        registry = metrics.Registry()
+        registry.register_collector('test', lambda: cache.metrics('test'))
+        text = registry.render()
+
+        assert cache.info()['evictions'] == 1
+        assert 'particle_picker_cache_evictions_total{cache="test"} 1' in text
+        assert 'particle_picker_cache_misses_total{cache="test"} 2' in text
+        path, file_type, kind, size = cache.memory_usage()[0]
+        assert (path, file_type, kind) == (str(sample_csv_file.resolve()), 'csv', 'table')
+        assert size > 0
+        assert 'particle_picker_dataset_resident_bytes{cache="test",' in text
+
+
+class TestStatsCommand:
+
+    def test_requires_daemon(self, capsys):
+        args = particle_cli.parse_arguments().parse_args(['stats'])
+
+        with pytest.raises(SystemExit) as exc:
+            particle_cli.execute(args)
+
+        assert exc.value.code == 1
+        assert 'No serve daemon' in capsys.readouterr().out
+
+    def test_daemon_reports_metrics(self, temp_dir, sample_csv_file, capsys):
+        socket_path = str(temp_dir / "pp.sock")
+        server = daemon.create_server(socket_path, log=False)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            client.forward(['list', '-i', str(sample_csv_file), '-t', 'csv'], socket_path)
+            capsys.readouterr()
+
+            assert client.forward(['stats'], socket_path) == 0
+            summary = capsys.readouterr().out
+            assert client.forward(['stats', '--prometheus'], socket_path) == 0
+            text = capsys.readouterr().out
+        finally:
+            server.shutdown()
+            server.server_close()
+            particle_cli.use_dataset_cache(None)
+            metrics.unregister_collector('daemon')
+
+        assert 'Time to parse a particle file:' in summary
+        assert 'type=csv, size=<1MiB' in summary
+        assert '# TYPE particle_picker_parse_seconds histogram' in text
+        assert 'particle_picker_cache_misses_total{cache="datasets"}' in text
+        assert 'particle_picker_response_bytes_count{route="daemon"}' in text
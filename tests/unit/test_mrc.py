@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from particle_picker.parsers.mrc import open_mrc, read_mrc_header, write_mrc
+
+
+class TestMrcReader:
+
+    @pytest.mark.parametrize('dtype', [np.int8, np.int16, np.uint16, np.float16, np.float32])
+    def test_roundtrip(self, temp_dir, dtype):
+        data = (np.arange(12 * 20).reshape(12, 20) % 100).astype(dtype)
+        path = temp_dir / "image.mrc"
+        write_mrc(path, data, pixel_size=0.83)
+
+        header = read_mrc_header(path)
+        image = open_mrc(path)
+
+        assert header.shape == (1, 12, 20)
+        assert header.pixel_size == pytest.approx(0.83)
+        assert isinstance(image, np.memmap)
+        np.testing.assert_array_equal(image, data)
+
+    def test_stack_sections(self, temp_dir):
+        data = np.arange(3 * 4 * 5, dtype=np.float32).reshape(3, 4, 5)
+        path = temp_dir / "stack.mrc"
+        write_mrc(path, data)
+
+        np.testing.assert_array_equal(open_mrc(path, section=2), data[2])
+        with pytest.raises(IndexError):
+            open_mrc(path, section=3)
+
+    def test_big_endian_and_extended_header(self, temp_dir):
+        data = np.arange(6 * 7, dtype='>f4').reshape(6, 7)
+        header = bytearray(1024)
+        words = np.zeros(24, dtype='>i4')
+        words[:4] = 7, 6, 1, 2
+        words[23] = 128
+        header[:96] = words.tobytes()
+        header[208:214] = b'MAP \x11\x11'
+        path = temp_dir / "big.mrc"
+        path.write_bytes(bytes(header) + bytes(128) + data.tobytes())
+
+        np.testing.assert_array_equal(open_mrc(path), data)
+
+    def test_rejects_bad_files(self, temp_dir):
+        short = temp_dir / "short.mrc"
+        short.write_bytes(b'MRC')
+        with pytest.raises(ValueError):
+            read_mrc_header(short)
+
+        truncated = temp_dir / "truncated.mrc"
+        write_mrc(truncated, np.zeros((10, 10), dtype=np.float32))
+        truncated.write_bytes(truncated.read_bytes()[:-4])
+        with pytest.raises(ValueError):
+            read_mrc_header(truncated)
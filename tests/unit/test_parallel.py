@@ -0,0 +1,165 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from particle_picker.parsers import parallel
+from particle_picker.parsers.csv_parser import CSVParticleParser
+from particle_picker.parsers.star_parser import StarFileParser
+
+
+@pytest.fixture(autouse=True)
+def small_ranges(monkeypatch):
+    monkeypatch.setattr(parallel, 'MIN_RANGE_BYTES', 1)
+    monkeypatch.setattr(parallel, 'SAMPLE_BYTES', 64)
+
+
+def star_content(rows, optics_after=False):
+    optics = """
+data_optics
+
+loop_
+_rlnOpticsGroup #1
+_rlnImagePixelSize #2
+1 1.06
+"""
+    lines = [f"{100 + i}.5 {200 + i}.25 mic_{i % 7:03d}.mrc {i % 3} {28000 + i}"
+             for i in range(rows)]
+    particles = """
+data_particles
+
+loop_
+_rlnCoordinateX #1
+_rlnCoordinateY #2
+_rlnMicrographName #3
+_rlnClassNumber #4
+_rlnDefocusU #5
+""" + '\n'.join(lines) + '\n'
+    return particles + optics if optics_after else optics + particles
+
+
+def assert_same_star(path):
+    serial = StarFileParser(path)
+    sharded = StarFileParser(path, jobs=3)
+
+    pd.testing.assert_frame_equal(sharded.get_particles(), serial.get_particles())
+    pd.testing.assert_frame_equal(sharded.get_optics(), serial.get_optics())
+    return sharded
+
+
+class TestSplitRanges:
+
+    def test_ranges_are_line_aligned(self, temp_dir):
+        path = temp_dir / "lines.txt"
+        content = b''.join(b'x' * (i % 5 + 1) + b'\n' for i in range(100))
+        path.write_bytes(content)
+
+        ranges = parallel.split_ranges(path, 0, len(content), 7)
+
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(content)
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            assert end == start
+            assert content[end - 1:end] == b'\n'
+
+    def test_more_parts_than_lines(self, temp_dir):
+        path = temp_dir / "short.txt"
+        path.write_bytes(b'a\nb\n')
+
+        assert parallel.split_ranges(path, 0, 4, 10) == [(0, 2), (2, 4)]
+
+
+class TestParallelStar:
+
+    def test_matches_serial(self, temp_dir):
+        path = temp_dir / "particles.star"
+        path.write_text(star_content(500))
+
+        parser = assert_same_star(path)
+
+        particles = parser.get_particles()
+        assert len(particles) == 500
+        assert particles['ClassNumber'].dtype == np.int64
+        assert particles['MicrographName'].nunique() == 7
+
+    def test_locate_and_parse_columns(self, temp_dir):
+        path = temp_dir / "particles.star"
+        path.write_text(star_content(100, optics_after=True))
+
+        columns, start, end = parallel.locate_star_loop(path)
+        df = parallel.parse_columns(path, start, end, columns, jobs=4)
+
+        assert columns[:3] == ['CoordinateX', 'CoordinateY', 'MicrographName']
+        assert path.read_bytes()[end:].startswith(b'data_optics')
+        assert len(df) == 100
+        assert df['CoordinateX'].iloc[-1] == 199.5
+
+    def test_block_after_particles(self, temp_dir):
+        path = temp_dir / "optics_last.star"
+        path.write_text(star_content(200, optics_after=True))
+
+        assert_same_star(path)
+
+    def test_sample_fixture(self, sample_star_file):
+        assert_same_star(sample_star_file)
+
+    @pytest.mark.parametrize('bad_line', [
+        '1.0 2.0 mic_x.mrc 1',
+        '1.0 2.0 mic_x.mrc 1 28000 extra',
+        '# comment inside the loop',
+        'nan 2.0 mic_x.mrc 1 28000',
+        '1.0 2.0 mic_x.mrc 1.5 28000',
+    ])
+    def test_irregular_rows_fall_back_to_serial(self, temp_dir, bad_line):
+        lines = star_content(300).splitlines()
+        lines.insert(len(lines) - 20, bad_line)
+        path = temp_dir / "irregular.star"
+        path.write_text('\n'.join(lines) + '\n')
+
+        assert_same_star(path)
+
+    def test_compressed_uses_serial(self, temp_dir):
+        path = temp_dir / "particles.star.gz"
+        path.write_bytes(gzip.compress(star_content(50).encode()))
+
+        assert not parallel.can_parallelize(path)
+        assert_same_star(path)
+
+
+class TestParallelCSV:
+
+    def write_csv(self, path, rows, extra=''):
+        lines = ['CoordinateX,CoordinateY,MicrographName,ClassNumber']
+        lines += [f"{i}.5,{i * 2},mic_{i % 5}.mrc,{i % 4}" for i in range(rows)]
+        path.write_text('\n'.join(lines) + '\n' + extra)
+        return path
+
+    def assert_same(self, path):
+        serial = CSVParticleParser(path).get_particles()
+        sharded = CSVParticleParser(path, jobs=3).get_particles()
+        pd.testing.assert_frame_equal(sharded, serial)
+        return sharded
+
+    def test_matches_serial(self, temp_dir):
+        df = self.assert_same(self.write_csv(temp_dir / "particles.csv", 400))
+
+        assert df['CoordinateY'].dtype == np.float64
+        assert df['ClassNumber'].dtype == np.int64
+
+    def test_missing_values(self, temp_dir):
+        path = self.write_csv(temp_dir / "missing.csv", 300, extra='7.5,,,\n')
+
+        self.assert_same(path)
+
+    def test_quoted_fields_fall_back(self, temp_dir):
+        path = self.write_csv(temp_dir / "quoted.csv", 300, extra='1.5,2,"mic,9.mrc",1\n')
+
+        df = self.assert_same(path)
+        assert df['MicrographName'].iloc[-1] == 'mic,9.mrc'
+
+    def test_parse_columns_declines_unknown_layout(self, temp_dir):
+        path = temp_dir / "flags.csv"
+        path.write_text("x,flag\n" + "1,true\n" * 50)
+
+        assert parallel.parse_columns(path, 7, path.stat().st_size, ['x', 'flag'], 2,
+                                      star=False) is None
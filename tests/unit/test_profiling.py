@@ -0,0 +1,62 @@
+from particle_picker import profiling
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.parsers.star_parser import StarFileParser
+
+
+class TestProfiling:
+
+    def test_disabled_spans_are_free(self):
+        assert not profiling.is_enabled()
+
+        with profiling.span('noop') as first, profiling.span('noop') as second:
+            pass
+
+        assert first is second
+
+    def test_nested_spans(self):
+        with profiling.record() as recorder:
+            with profiling.span('outer'):
+                with profiling.span('inner', rows=10):
+                    pass
+
+        names = {record.name: record for record in recorder.records}
+        assert names['outer'].depth == 0
+        assert names['inner'].depth == 1
+        assert names['inner'].rows == 10
+        assert names['outer'].wall >= names['inner'].wall
+
+    def test_parser_and_statistics_spans(self, sample_star_file):
+        with profiling.record() as recorder:
+            particles = StarFileParser(sample_star_file).get_particles()
+            ParticleStatistics(particles).get_summary_statistics()
+
+        summary = {entry['name']: entry for entry in recorder.summary()}
+        assert {'star.parse', 'star.read_tokenize', 'star.convert'} <= set(summary)
+        assert summary['statistics.get_summary_statistics']['rows'] == 4
+        assert summary['statistics.get_distribution_per_micrograph']['depth'] == 1
+
+    def test_enable_disable(self):
+        recorder = profiling.enable()
+        try:
+            with profiling.span('global'):
+                pass
+        finally:
+            assert profiling.disable() is recorder
+
+        assert [record.name for record in recorder.records] == ['global']
+        assert not profiling.is_enabled()
+
+    def test_trace_output(self, temp_dir):
+        with profiling.record() as recorder:
+            with profiling.span('stage', rows=5):
+                pass
+
+        trace = recorder.to_trace()
+        event = trace['traceEvents'][0]
+        assert event['name'] == 'stage'
+        assert event['ph'] == 'X'
+        assert event['args']['rows'] == 5
+
+        recorder.write_trace(temp_dir / 'trace.json')
+        assert (temp_dir / 'trace.json').exists()
+        assert 'stage' in recorder.format_table()
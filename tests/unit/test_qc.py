@@ -0,0 +1,128 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from particle_picker.analysis import qc
+from particle_picker.analysis.filters import ParticleFilter
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.cli import particle_cli
+
+
+def make_session(micrographs=40, per_micrograph=50, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for i in range(micrographs):
+        n = per_micrograph + rng.integers(-5, 6)
+        x = rng.uniform(0, 4000, n)
+        y = rng.uniform(0, 4000, n)
+        defocus = 15000 + 100 * i + rng.normal(0, 50, n)
+        rows.append(pd.DataFrame({'CoordinateX': x, 'CoordinateY': y,
+                                  'MicrographName': f'mic_{i:03d}.mrc',
+                                  'DefocusU': defocus, 'DefocusV': defocus}))
+    return rows
+
+
+def flags_of(features, name):
+    return set(filter(None, features.loc[name, 'flags'].split(',')))
+
+
+class TestRobustZscores:
+
+    def test_median_and_mad(self):
+        scores = qc.robust_zscores([[1.0], [2.0], [3.0], [4.0], [100.0]])
+
+        assert scores[2, 0] == 0.0
+        assert scores[1, 0] == pytest.approx(-1 / qc.MAD_SCALE)
+        assert scores[4, 0] > 50
+
+    def test_zero_mad_falls_back(self):
+        scores = qc.robust_zscores([[5.0, 1.0], [5.0, 1.0], [5.0, 1.0], [9.0, 1.0]])
+
+        assert scores[3, 0] > 0
+        assert (scores[:, 1] == 0).all()
+
+    def test_columns_are_independent(self):
+        features = np.column_stack([np.arange(10.0), np.arange(10.0) * 1000])
+        scores = qc.robust_zscores(features)
+
+        np.testing.assert_allclose(scores[:, 0], scores[:, 1])
+
+
+class TestFlagMicrographs:
+
+    def test_flags_outliers(self):
+        frames = make_session()
+        frames[3] = pd.concat([frames[3]] * 6)
+        frames[7] = frames[7].assign(CoordinateX=frames[7]['CoordinateX'] / 40 + 100,
+                                     CoordinateY=frames[7]['CoordinateY'] / 40 + 100)
+        stats = ParticleStatistics(pd.concat(frames, ignore_index=True))
+
+        features = qc.flag_micrographs(stats)
+        flagged = qc.flagged_micrographs(features)
+
+        assert 'over_picked' in flags_of(features, 'mic_003.mrc')
+        assert {'clustered', 'off_center'} <= flags_of(features, 'mic_007.mrc')
+        assert set(flagged.index) >= {'mic_003.mrc', 'mic_007.mrc'}
+        assert len(flagged) < 6
+
+    def test_defocus_trend(self):
+        frames = make_session()
+        frames[20] = frames[20].assign(DefocusU=frames[20]['DefocusU'] + 1500,
+                                       DefocusV=frames[20]['DefocusV'] + 1500)
+        stats = ParticleStatistics(pd.concat(frames, ignore_index=True))
+
+        session = qc.flag_micrographs(stats)
+        trend = qc.flag_micrographs(stats, window=5)
+
+        assert 'defocus' not in flags_of(session, 'mic_020.mrc')
+        assert 'defocus' in flags_of(trend, 'mic_020.mrc')
+        assert trend['flags'].str.contains('defocus').sum() == 1
+
+    def test_acquisition_order(self):
+        frames = make_session(micrographs=5)
+        stats = ParticleStatistics(pd.concat(frames[::-1], ignore_index=True))
+
+        features = qc.micrograph_features(stats)
+        assert list(features['order']) == [4, 3, 2, 1, 0]
+
+    def test_empty_micrographs(self):
+        stats = ParticleStatistics(pd.concat(make_session(micrographs=10), ignore_index=True))
+
+        features = qc.flag_micrographs(stats, expected=['mic_000.mrc', 'mic_999.mrc'])
+
+        assert flags_of(features, 'mic_999.mrc') == {'empty'}
+        assert features.loc['mic_999.mrc', 'count'] == 0
+        assert features.index.name == 'MicrographName'
+
+    def test_exclusion_list_works_with_filter(self, temp_dir):
+        frames = make_session(micrographs=20)
+        frames[4] = pd.concat([frames[4]] * 8)
+        df = pd.concat(frames, ignore_index=True)
+        excluded = temp_dir / "excluded.txt"
+
+        count = qc.write_exclusion_list(qc.flag_micrographs(ParticleStatistics(df)), excluded)
+        kept = ParticleFilter(f"not MicrographName in @{excluded}").apply(df)
+
+        assert count >= 1
+        assert 'mic_004.mrc' not in set(kept['MicrographName'])
+        assert excluded.read_text().startswith('#')
+
+
+class TestQcCommand:
+
+    def test_writes_outputs(self, temp_dir, capsys):
+        frames = make_session()
+        frames[3] = pd.concat([frames[3]] * 6)
+        path = temp_dir / "particles.csv"
+        pd.concat(frames, ignore_index=True).to_csv(path, index=False)
+
+        args = particle_cli.parse_arguments().parse_args([
+            'qc', '-i', str(path), '-t', 'csv', '--window', '9',
+            '-o', str(temp_dir / 'flagged.csv'), '--exclude', str(temp_dir / 'excluded.txt')
+        ])
+        particle_cli.execute(args)
+        out = capsys.readouterr().out
+
+        assert 'over_picked' in out
+        assert 'mic_003.mrc' in (temp_dir / 'excluded.txt').read_text()
+        assert 'mic_003.mrc' in set(pd.read_csv(temp_dir / 'flagged.csv')['MicrographName'])
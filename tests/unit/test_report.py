@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from particle_picker.cli import particle_cli
+from particle_picker.visualization import report
+
+
+class TestReportNames:
+
+    def test_unique_names(self):
+        assert report.report_names(['a/run.star', 'b/run.star', 'c/other.csv']) == [
+            'run', 'run-2', 'other'
+        ]
+
+
+class TestGenerateReports:
+
+    def test_writes_reports_and_index(self, sample_star_file, temp_dir):
+        outdir = temp_dir / "reports"
+
+        index, entries = report.generate_reports([sample_star_file], 'star', outdir)
+
+        page = (outdir / entries[0]['report']).read_text()
+        assert entries[0]['status'] == 'ok'
+        assert entries[0]['summary']['total_particles'] == 4
+        assert f'<script src="{report.PLOTLY_BUNDLE}">' in page
+        assert 'Particle Density Heatmap' in page
+        assert len(page) < 1_000_000
+        assert (outdir / report.PLOTLY_BUNDLE).exists()
+        assert entries[0]['report'] in index.read_text()
+
+    def test_failures_are_listed(self, sample_star_file, temp_dir):
+        missing = temp_dir / "missing.star"
+
+        index, entries = report.generate_reports([sample_star_file, missing], 'star', temp_dir)
+
+        assert [entry['status'] for entry in entries] == ['ok', 'error']
+        assert 'missing' in index.read_text()
+        assert not (temp_dir / "missing.html").exists()
+
+    def test_unchanged_files_are_reused(self, sample_star_file, temp_dir):
+        report.generate_reports([sample_star_file], 'star', temp_dir)
+
+        _, entries = report.generate_reports([sample_star_file], 'star', temp_dir)
+        assert entries[0].get('reused')
+
+        _, entries = report.generate_reports([sample_star_file], 'star', temp_dir, force=True)
+        assert not entries[0].get('reused')
+
+    def test_parallel(self, sample_star_file, temp_dir):
+        inputs = [sample_star_file, sample_star_file.with_name('copy.star')]
+        inputs[1].write_text(sample_star_file.read_text())
+
+        _, entries = report.generate_reports(inputs, 'star', temp_dir, jobs=2)
+
+        assert [entry['name'] for entry in entries] == ['test', 'copy']
+        assert all(entry['status'] == 'ok' for entry in entries)
+        manifest = json.loads((temp_dir / report.MANIFEST).read_text())
+        assert [entry['name'] for entry in manifest] == ['test', 'copy']
+
+
+class TestReportCommand:
+
+    def test_report(self, sample_star_file, temp_dir, capsys):
+        args = particle_cli.parse_arguments().parse_args([
+            'report', '-i', str(sample_star_file), '-t', 'star', '-o', str(temp_dir / 'out')
+        ])
+        particle_cli.execute(args)
+
+        out = capsys.readouterr().out
+        assert '1 written, 0 failed' in out
+        assert (temp_dir / 'out' / 'index.html').exists()
+
+    def test_failures_exit_nonzero(self, temp_dir):
+        args = particle_cli.parse_arguments().parse_args([
+            'report', '-i', str(temp_dir / 'missing.star'), '-t', 'star', '-o', str(temp_dir)
+        ])
+
+        with pytest.raises(SystemExit):
+            particle_cli.execute(args)
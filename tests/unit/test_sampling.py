@@ -0,0 +1,178 @@
+import gzip
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from particle_picker.analysis import sampling
+from particle_picker.analysis.sampling import (
+    ApproximateStatistics, ReservoirSampler, approximate_statistics, sample_by_offsets
+)
+
+
+def write_star(path, rows):
+    lines = [f"{(i * 37) % 4000}.5 {(i * 91) % 3000}.25 mic_{i // 20:04d}.mrc {20000 + i % 5000}"
+             for i in range(rows)]
+    path.write_text("""
+data_particles
+
+loop_
+_rlnCoordinateX #1
+_rlnCoordinateY #2
+_rlnMicrographName #3
+_rlnDefocusU #4
+""" + '\n'.join(lines) + '\n')
+    return path
+
+
+class TestReservoirSampler:
+
+    def test_keeps_at_most_size_rows(self):
+        sampler = ReservoirSampler(50, seed=0)
+        for start in range(0, 1000, 100):
+            sampler.update(pd.DataFrame({'value': np.arange(start, start + 100)}))
+
+        sample = sampler.get_sample()
+        assert sampler.rows_seen == 1000
+        assert len(sample) == 50
+        assert list(sample.index) == list(sample['value'])
+        assert sample['value'].is_unique
+
+    def test_roughly_uniform(self):
+        hits = np.zeros(10)
+        for seed in range(200):
+            sampler = ReservoirSampler(10, seed=seed)
+            for start in range(0, 100, 25):
+                sampler.update(pd.DataFrame({'value': np.arange(start, start + 25)}))
+            np.add.at(hits, sampler.get_sample()['value'].to_numpy() // 10, 1)
+
+        assert hits.min() > 150 and hits.max() < 250
+
+    def test_smaller_subsample(self):
+        sampler = ReservoirSampler(100, seed=1)
+        sampler.update(pd.DataFrame({'value': np.arange(500)}))
+
+        subsample = sampler.get_sample(20)
+        assert len(subsample) == 20
+        assert set(subsample['value']) <= set(sampler.get_sample()['value'])
+
+
+class TestOffsetSampling:
+
+    def test_estimates_total(self, temp_dir):
+        path = write_star(temp_dir / "particles.star", 20000)
+
+        sample, total, (low, high) = sample_by_offsets(path, 'star', 2000, seed=3)
+
+        assert list(sample.columns) == ['CoordinateX', 'CoordinateY', 'MicrographName', 'DefocusU']
+        assert 1500 < len(sample) <= 2000
+        assert low <= 20000 <= high
+        assert abs(total - 20000) < 200
+
+    def test_declines_small_and_compressed_files(self, temp_dir, sample_star_file):
+        path = write_star(temp_dir / "particles.star", 20000)
+        compressed = temp_dir / "particles.star.gz"
+        compressed.write_bytes(gzip.compress(path.read_bytes()))
+
+        assert sample_by_offsets(sample_star_file, 'star', 100) is None
+        assert sample_by_offsets(compressed, 'star', 100) is None
+
+    def test_csv_and_box(self, temp_dir):
+        csv_path = temp_dir / "particles.csv"
+        csv_path.write_text("x,y,MicrographName\n" + ''.join(
+            f"{i}.0,{i * 2}.0,mic_{i % 9}.mrc\n" for i in range(5000)))
+        box_path = temp_dir / "particles.box"
+        box_path.write_text(''.join(f"{i}\t{i * 2}\t64\t64\n" for i in range(5000)))
+
+        csv_sample = sample_by_offsets(csv_path, 'csv', 200, seed=0)[0]
+        box_sample = sample_by_offsets(box_path, 'box', 200, seed=0)[0]
+
+        assert csv_sample['x'].dtype == np.float64
+        assert (csv_sample['y'] == csv_sample['x'] * 2).all()
+        assert (box_sample['y'] == box_sample['x'] * 2).all()
+
+
+class TestApproximateStatistics:
+
+    def test_intervals_cover_exact_values(self, temp_dir):
+        path = write_star(temp_dir / "particles.star", 20000)
+        stats = approximate_statistics(path, 'star', sample_rows=3000, seed=5)
+
+        assert isinstance(stats, ApproximateStatistics)
+        assert stats.method == 'byte-offset'
+
+        coordinates = stats.get_coordinate_statistics()
+        exact = (np.arange(20000) * 37) % 4000 + 0.5
+        low, high = coordinates['CoordinateX']['mean_ci']
+        assert low <= exact.mean() <= high
+        low, high = coordinates['CoordinateX']['median_ci']
+        assert low <= np.median(exact) <= high
+        assert 'mean_ci' in stats.get_defocus_statistics()['DefocusU']
+
+    def test_exact_counts_from_count_scan(self, temp_dir):
+        path = write_star(temp_dir / "particles.star", 20000)
+        calls = []
+
+        def count():
+            calls.append(1)
+            return 20000, {f"mic_{i:04d}.mrc": 20 for i in range(1000)}
+
+        summary = approximate_statistics(path, 'star', sample_rows=500, count=count,
+                                         seed=0).get_summary_statistics()
+
+        assert calls == [1]
+        assert summary['total_particles'] == 20000
+        assert summary['total_particles_ci'] == [20000, 20000]
+        assert summary['total_micrographs'] == 1000
+
+    def test_reservoir_fallback_counts_exactly(self, temp_dir, sample_star_content):
+        path = temp_dir / "particles.star.gz"
+        path.write_bytes(gzip.compress(sample_star_content.encode()))
+
+        stats = approximate_statistics(path, 'star', sample_rows=3, seed=0)
+        summary = stats.get_summary_statistics()
+
+        assert stats.method == 'reservoir'
+        assert stats.sample_rows == 3
+        assert summary['total_particles'] == 4
+        assert summary['total_micrographs'] == 2
+
+    def test_error_target_sizes_sample(self, temp_dir, monkeypatch):
+        monkeypatch.setattr(sampling, 'PILOT_ROWS', 200)
+        path = write_star(temp_dir / "particles.star", 40000)
+
+        loose = approximate_statistics(path, 'star', error=0.1, seed=0)
+        tight = approximate_statistics(path, 'star', error=0.02, seed=0)
+
+        assert loose.sample_rows < tight.sample_rows
+
+
+class TestApproxCommand:
+
+    def test_labels_output(self, temp_dir, run_cli):
+        path = write_star(temp_dir / "particles.star", 20000)
+
+        out, code = run_cli(['analyze', '-i', str(path), '-t', 'star', '--approx', '-v',
+                             '--sample-rows', '1000', '--seed', '1'])
+
+        assert code == 0
+        assert 'byte-offset sampling' in out
+        assert 'Total particles: ~' in out
+        assert 'Coordinate Statistics (approximate, 95% CI)' in out
+
+    def test_exact_counts(self, temp_dir, run_cli):
+        path = write_star(temp_dir / "particles.star", 20000)
+
+        out, code = run_cli(['analyze', '-i', str(path), '-t', 'star', '--approx',
+                             '--exact-counts', '--seed', '1'])
+
+        assert code == 0
+        assert 'Summary Statistics (exact counts)' in out
+        assert 'Total micrographs: 1,000' in out
+
+    @pytest.mark.parametrize('extra', [['--error', '0.01'], ['--exact-counts']])
+    def test_sampling_options_need_approx(self, sample_star_file, run_cli, extra):
+        out, code = run_cli(['analyze', '-i', str(sample_star_file), '-t', 'star'] + extra)
+
+        assert code == 1
+        assert 'need --approx' in out
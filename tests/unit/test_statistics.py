@@ -1,6 +1,11 @@
+import itertools
+import json
+
+import numpy as np
 import pytest
 import pandas as pd
 from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.cli import particle_cli
 
 
 class TestParticleStatistics:
@@ -66,9 +71,165 @@ class TestParticleStatistics:
         assert 'x_edges' in heatmap_data
         assert 'y_edges' in heatmap_data
     
+    def test_get_per_micrograph_table(self, sample_dataframe):
+        stats = ParticleStatistics(sample_dataframe)
+        table = stats.get_per_micrograph_table()
+
+        assert list(table.index) == ['mic1.mrc', 'mic2.mrc']
+        assert table.index.name == 'MicrographName'
+        assert list(table['count']) == [2, 2]
+        assert table.loc['mic1.mrc', 'defocus_mean'] == 27750.0
+        assert table.loc['mic1.mrc', 'defocus_std'] == 0.0
+        assert table.loc['mic2.mrc', 'centroid_x'] == 2250.0
+        assert table.loc['mic2.mrc', 'min_y'] == 3000.0
+        assert table.loc['mic2.mrc', 'max_y'] == 3500.0
+        assert table.loc['mic1.mrc', 'spread'] == pytest.approx(
+            np.hypot(np.std([1234.5, 1456.7], ddof=1), np.std([2345.6, 3456.8], ddof=1))
+        )
+
+    def test_per_micrograph_table_matches_groupby(self):
+        rng = np.random.default_rng(0)
+        df = pd.DataFrame({
+            'CoordinateX': rng.random(500) * 4000,
+            'CoordinateY': rng.random(500) * 4000,
+            'MicrographName': rng.choice(['a', 'b', 'c', None, 'd'], 500),
+            'DefocusU': rng.random(500) * 1e4,
+        })
+        df.loc[::7, 'CoordinateX'] = np.nan
+
+        table = ParticleStatistics(df).get_per_micrograph_table()
+        grouped = df.groupby('MicrographName')
+
+        assert list(table.index) == ['a', 'b', 'c', 'd']
+        assert list(table['count']) == list(grouped.size())
+        for column, expected in (('centroid_x', grouped['CoordinateX'].mean()),
+                                 ('std_x', grouped['CoordinateX'].std()),
+                                 ('max_x', grouped['CoordinateX'].max()),
+                                 ('defocus_std', grouped['DefocusU'].std())):
+            np.testing.assert_allclose(table[column], expected, rtol=1e-12)
+
+    def test_per_micrograph_table_without_micrographs(self):
+        stats = ParticleStatistics(pd.DataFrame({'x': [1.0], 'y': [2.0]}))
+        assert stats.get_per_micrograph_table().empty
+
     def test_empty_dataframe(self):
         empty_df = pd.DataFrame()
         stats = ParticleStatistics(empty_df)
         summary = stats.get_summary_statistics()
         
         assert summary['total_particles'] == 0
+
+
+class TestListCommand:
+
+    def run_list(self, argv, capsys):
+        args = particle_cli.parse_arguments().parse_args(['list'] + argv)
+        particle_cli.execute(args)
+        return capsys.readouterr().out
+
+    def test_verbose(self, sample_star_file, capsys):
+        out = self.run_list(['-i', str(sample_star_file), '-t', 'star', '-v'], capsys)
+
+        assert 'Centroid X' in out
+        assert 'Spread' in out
+        assert 'micrograph_001.mrc' in out
+
+    @pytest.mark.parametrize('suffix', ['.csv', '.json', '.parquet'])
+    def test_output(self, sample_star_file, temp_dir, capsys, suffix):
+        if suffix == '.parquet':
+            pytest.importorskip('pyarrow')
+        output = temp_dir / f"micrographs{suffix}"
+
+        out = self.run_list(['-i', str(sample_star_file), '-t', 'star', '-o', str(output),
+                             '-s', 'name'], capsys)
+
+        if suffix == '.parquet':
+            table = pd.read_parquet(output)
+        elif suffix == '.json':
+            table = pd.DataFrame(json.loads(output.read_text())).set_index('MicrographName')
+        else:
+            table = pd.read_csv(output, index_col=0)
+        assert 'Per-micrograph table saved' in out
+        assert list(table.index) == ['micrograph_001.mrc', 'micrograph_002.mrc']
+        assert list(table['count']) == [2, 2]
+
+    def test_verbose_needs_particle_file(self, sample_star_file, temp_dir, capsys):
+        with pytest.raises(SystemExit):
+            self.run_list(['-i', str(sample_star_file), '-t', 'star', '-v',
+                           '--db', str(temp_dir / 'picks.sqlite')], capsys)
+
+    @pytest.fixture
+    def uneven_csv_file(self, temp_dir):
+        counts = {'a/mic_1.mrc': 3, 'b\\mic_2.mrc': 1, 'mic_3.mrc': 5, 'mic_4.mrc': 3}
+        rows = [f"{i}.0,{i}.0,{name}" for name, n in counts.items() for i in range(n)]
+        csv_file = temp_dir / "uneven.csv"
+        csv_file.write_text("CoordinateX,CoordinateY,MicrographName\n" + "\n".join(rows) + "\n")
+        return csv_file
+
+    @pytest.mark.parametrize('argv, expected', [
+        ([], ['mic_2.mrc', 'mic_1.mrc', 'mic_4.mrc', 'mic_3.mrc']),
+        (['--top', '2'], ['mic_3.mrc', 'mic_1.mrc']),
+        (['--bottom', '2'], ['mic_2.mrc', 'mic_1.mrc']),
+        (['--top', '3', '-s', 'name', '--reverse'], ['mic_4.mrc', 'mic_3.mrc', 'mic_1.mrc']),
+        (['--min', '2', '--max', '3'], ['mic_1.mrc', 'mic_4.mrc']),
+        (['--top', '0'], []),
+    ])
+    def test_selection(self, uneven_csv_file, capsys, argv, expected):
+        out = self.run_list(['-i', str(uneven_csv_file), '-t', 'csv'] + argv, capsys)
+
+        rows = itertools.takewhile(bool, out.split('-' * 62 + '\n')[1].splitlines())
+        assert [row.split()[0] for row in rows] == expected
+        assert 'Total micrographs: 4' in out
+        assert ('Listed:' in out) == bool(argv)
+
+    @pytest.mark.parametrize('fmt', ['tsv', 'json', 'ndjson'])
+    def test_machine_formats(self, uneven_csv_file, capsys, fmt):
+        out = self.run_list(['-i', str(uneven_csv_file), '-t', 'csv', '--top', '2',
+                             '-f', fmt], capsys)
+
+        if fmt == 'tsv':
+            rows = [dict(zip(['micrograph', 'particles'], line.split('\t')))
+                    for line in out.splitlines()[1:]]
+            rows = [{'micrograph': row['micrograph'], 'particles': int(row['particles'])}
+                    for row in rows]
+        elif fmt == 'json':
+            rows = json.loads(out)
+        else:
+            rows = [json.loads(line) for line in out.splitlines()]
+        assert rows == [{'micrograph': 'mic_3.mrc', 'particles': 5},
+                        {'micrograph': 'a/mic_1.mrc', 'particles': 3}]
+
+    def test_verbose_machine_format(self, uneven_csv_file, capsys):
+        out = self.run_list(['-i', str(uneven_csv_file), '-t', 'csv', '-v', '--min', '3',
+                             '-f', 'ndjson'], capsys)
+
+        rows = [json.loads(line) for line in out.splitlines()]
+        assert [(row['MicrographName'], row['count']) for row in rows] == \
+            [('a/mic_1.mrc', 3), ('mic_4.mrc', 3), ('mic_3.mrc', 5)]
+
+    def test_top_partition_matches_full_sort(self):
+        rng = np.random.default_rng(0)
+        names = np.array([f"mic_{i:04d}.mrc" for i in rng.permutation(500)], dtype=object)
+        counts = rng.integers(0, 20, 500)
+
+        ranked = sorted(range(500), key=lambda i: (-counts[i], names[i]))
+        index = particle_cli.select_micrographs(names, counts, top=37)
+
+        assert list(index) == ranked[:37]
+
+    @pytest.mark.parametrize('selection', [
+        {}, {'reverse': True}, {'sort': 'name'}, {'sort': 'name', 'reverse': True},
+        {'top': 37}, {'bottom': 12, 'reverse': True}, {'top': 0}, {'minimum': 5, 'maximum': 9},
+    ])
+    def test_count_path_selection_matches_arrays(self, selection):
+        rng = np.random.default_rng(1)
+        names = np.array([f"mic_{i:04d}.mrc" for i in rng.permutation(300)], dtype=object)
+        counts = rng.integers(0, 20, 300)
+
+        index = particle_cli.select_micrographs(names, counts, **selection)
+        items = particle_cli.select_micrograph_counts(dict(zip(names, counts.tolist())),
+                                                      **selection)
+
+        assert items == list(zip(names[index], counts[index].tolist()))
+        assert particle_cli.strip_directories(['a/b/c.mrc', 'x\\y.mrc', 'z.mrc']) == \
+            ['c.mrc', 'y.mrc', 'z.mrc']
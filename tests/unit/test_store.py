@@ -0,0 +1,128 @@
+import os
+
+import pytest
+
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.analysis.store import ParticleStore, map_columns
+from particle_picker.parsers.star_parser import StarFileParser
+
+
+@pytest.fixture
+def store(temp_dir):
+    with ParticleStore(temp_dir / "particles.sqlite") as store:
+        yield store
+
+
+class TestParticleStore:
+
+    def test_ingest_normalizes_micrographs(self, store, sample_star_file):
+        run_id, rows = store.ingest(sample_star_file, 'star', batch_size=1)
+
+        assert rows == 4
+        assert store.count_particles(run_id) == 4
+        assert store.micrograph_counts(run_id) == {
+            'micrograph_001.mrc': 2, 'micrograph_002.mrc': 2
+        }
+        assert store.conn.execute('SELECT COUNT(*) FROM micrographs').fetchone()[0] == 2
+
+    def test_statistics_match_dataframe(self, store, sample_star_file):
+        run_id, _ = store.ingest(sample_star_file, 'star')
+        stored = store.statistics(run_id)
+        expected = ParticleStatistics(StarFileParser(sample_star_file).get_particles())
+
+        assert stored.get_summary_statistics() == pytest.approx(
+            expected.get_summary_statistics())
+        for method in ('get_coordinate_statistics', 'get_defocus_statistics'):
+            actual = getattr(stored, method)()
+            reference = getattr(expected, method)()
+            assert list(actual) == list(reference)
+            for col in reference:
+                assert actual[col] == pytest.approx(reference[col])
+
+    def test_unchanged_file_is_skipped(self, store, sample_csv_file):
+        first, _ = store.ingest(sample_csv_file, 'csv')
+
+        assert store.ingest(sample_csv_file, 'csv') == (first, None)
+
+        sample_csv_file.write_text(sample_csv_file.read_text() + "300.0,400.0,micrograph_003.mrc\n")
+        stat = sample_csv_file.stat()
+        os.utime(sample_csv_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        run_id, rows = store.ingest(sample_csv_file, 'csv')
+
+        assert rows == 5
+        assert len(store.runs()) == 1
+        assert store.conn.execute('SELECT COUNT(*) FROM particles').fetchone()[0] == 5
+
+    def test_find_run_by_path_or_name(self, store, sample_star_file, sample_csv_file):
+        star_id, _ = store.ingest(sample_star_file, 'star', name='run-a')
+        csv_id, _ = store.ingest(sample_csv_file, 'csv')
+
+        assert store.find_run(sample_star_file)['id'] == star_id
+        assert store.find_run('run-a', 'star')['id'] == star_id
+        assert store.find_run(sample_csv_file.name)['id'] == csv_id
+        assert store.find_run('run-a', 'csv') is None
+
+    def test_cross_run_queries(self, store, sample_star_file, sample_csv_file):
+        star_id, _ = store.ingest(sample_star_file, 'star', tags={'detector': 'K3'})
+        csv_id, _ = store.ingest(sample_csv_file, 'csv', tags={'detector': 'Falcon4'})
+
+        assert store.runs_with_tag('detector', 'K3') == [star_id]
+        assert store.shared_micrographs([star_id, csv_id]) == ['micrograph_001.mrc',
+                                                               'micrograph_002.mrc']
+
+    def test_box_columns_are_not_coordinates(self, store, sample_box_file):
+        run_id, _ = store.ingest(sample_box_file, 'box')
+
+        assert store.statistics(run_id).get_coordinate_statistics() == {}
+
+    def test_map_columns(self, sample_star_file):
+        df = StarFileParser(sample_star_file).get_particles()
+
+        assert map_columns(df) == {'x': 'CoordinateX', 'y': 'CoordinateY',
+                                   'defocus_u': 'DefocusU', 'defocus_v': 'DefocusV'}
+
+
+class TestDatabaseCommands:
+
+    @pytest.mark.parametrize('command', [
+        ['analyze', '-v'],
+        ['list', '--sort', 'name'],
+        ['list'],
+        ['list', '--top', '1', '--sort', 'name'],
+        ['list', '--bottom', '1', '--reverse', '-f', 'ndjson'],
+        ['list', '--min', '2', '-f', 'tsv'],
+    ])
+    def test_db_output_matches_file(self, temp_dir, sample_star_file, run_cli, command):
+        db = str(temp_dir / "picks.sqlite")
+        argv = command + ['-i', str(sample_star_file), '-t', 'star']
+
+        _, code = run_cli(['ingest', '-i', str(sample_star_file), '-t', 'star', '--db', db])
+        assert code == 0
+
+        assert run_cli(argv + ['--db', db]) == run_cli(argv)
+
+    def test_compare_by_run_name(self, temp_dir, sample_star_file, run_cli):
+        db = str(temp_dir / "picks.sqlite")
+        run_cli(['ingest', '-i', str(sample_star_file), '-t', 'star', '--db', db,
+                 '--name', 'night-1', '--tag', 'detector=K3'])
+
+        out, code = run_cli(['compare', '-i', 'night-1', '-t', 'star', '--db', db])
+
+        assert code == 0
+        assert 'Particles: 4' in out
+
+    def test_unknown_run(self, temp_dir, sample_star_file, run_cli):
+        db = str(temp_dir / "picks.sqlite")
+        run_cli(['ingest', '-i', str(sample_star_file), '-t', 'star', '--db', db])
+
+        out, code = run_cli(['analyze', '-i', 'missing', '-t', 'star', '--db', db])
+
+        assert code == 1
+        assert 'Run not found in database: missing' in out
+
+    def test_bad_tag(self, temp_dir, sample_star_file, run_cli):
+        out, code = run_cli(['ingest', '-i', str(sample_star_file), '-t', 'star',
+                             '--db', str(temp_dir / "picks.sqlite"), '--tag', 'K3'])
+
+        assert code == 1
+        assert 'KEY=VALUE' in out
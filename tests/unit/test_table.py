@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from particle_picker.analysis.statistics import ParticleStatistics
+from particle_picker.analysis.table import ParticleTable
+from particle_picker.parsers import parallel
+from particle_picker.parsers.box_parser import BoxFileParser
+from particle_picker.parsers.csv_parser import CSVParticleParser
+from particle_picker.parsers.star_parser import StarFileParser
+
+
+@pytest.fixture
+def frame():
+    return pd.DataFrame({
+        'CoordinateX': [1.0, 2.0, 3.0, 4.0, 5.0],
+        'MicrographName': ['b.mrc', 'a.mrc', 'b.mrc', None, 'a.mrc'],
+        'DefocusU': [10.0, 20.0, 30.0, 40.0, 50.0],
+    })
+
+
+class TestParticleTable:
+
+    def test_round_trip(self, frame):
+        table = ParticleTable.from_pandas(frame)
+
+        assert len(table) == 5
+        assert table.column_names == list(frame.columns)
+        assert table.micrograph_column == 'MicrographName'
+        assert table.codes.dtype == np.int32
+        pd.testing.assert_frame_equal(table.to_pandas(), frame.fillna(np.nan))
+
+    def test_columns_are_not_copied(self, frame):
+        table = ParticleTable.from_pandas(frame)
+
+        assert np.shares_memory(table['CoordinateX'], frame['CoordinateX'].to_numpy())
+        assert table.is_numeric('DefocusU')
+        assert not table.is_numeric('MicrographName')
+
+    def test_micrograph_counts_skip_missing(self, frame):
+        table = ParticleTable.from_pandas(frame)
+        counts = dict(zip(table.names, table.micrograph_counts()))
+
+        assert counts == {'b.mrc': 2, 'a.mrc': 2}
+
+    def test_grouped_slices_share_memory(self):
+        table = ParticleTable.from_pandas(pd.DataFrame({
+            'x': np.arange(6, dtype=float),
+            'MicrographName': ['a', 'a', 'b', 'b', 'b', 'c'],
+        }))
+
+        view = table.micrograph('b')
+        assert list(view['x']) == [2.0, 3.0, 4.0]
+        assert np.shares_memory(view['x'], table['x'])
+        assert [(name, len(part)) for name, part in table.iter_micrographs()] == [
+            ('a', 2), ('b', 3), ('c', 1)
+        ]
+
+    def test_interleaved_rows_are_grouped_once(self, frame):
+        table = ParticleTable.from_pandas(frame)
+
+        grouped, starts, stops = table.group_by_micrograph()
+        assert grouped is not table
+        assert table.group_by_micrograph()[0] is grouped
+        assert list(table.micrograph('a.mrc')['DefocusU']) == [20.0, 50.0]
+        assert list(table.micrograph('b.mrc')['DefocusU']) == [10.0, 30.0]
+        with pytest.raises(KeyError):
+            table.micrograph('missing.mrc')
+
+    def test_without_micrograph_column(self):
+        table = ParticleTable.from_pandas(pd.DataFrame({'x': [1.0, 2.0], 'y': [3.0, 4.0]}))
+
+        assert table.micrograph_column is None
+        assert len(table.micrograph_counts()) == 0
+        with pytest.raises(ValueError):
+            table.group_by_micrograph()
+
+
+class TestTableStatistics:
+
+    def test_matches_dataframe_input(self, sample_star_file):
+        parser = StarFileParser(sample_star_file)
+        from_table = ParticleStatistics(parser.get_table())
+        from_frame = ParticleStatistics(parser.get_particles())
+
+        pd.testing.assert_series_equal(from_table.get_distribution_per_micrograph(),
+                                       from_frame.get_distribution_per_micrograph())
+        for method in ('get_summary_statistics', 'get_coordinate_statistics',
+                       'get_defocus_statistics'):
+            assert getattr(from_table, method)() == getattr(from_frame, method)()
+
+    def test_df_is_built_on_demand(self, sample_csv_file):
+        stats = ParticleStatistics(CSVParticleParser(sample_csv_file).get_table())
+
+        assert stats._df is None
+        assert list(stats.df.columns) == stats.table.column_names
+
+
+class TestParallelTables:
+
+    def test_parallel_parse_keeps_codes(self, temp_dir, monkeypatch):
+        monkeypatch.setattr(parallel, 'MIN_RANGE_BYTES', 1)
+        path = temp_dir / "particles.star"
+        path.write_text("data_particles\n\nloop_\n_rlnCoordinateX #1\n_rlnMicrographName #2\n"
+                        + ''.join(f"{i}.5 mic_{i % 4}.mrc\n" for i in range(200)))
+
+        parser = StarFileParser(path, jobs=2)
+        table = parser.get_table()
+
+        assert parser._particles_data is None
+        assert sorted(table.names) == [f"mic_{i}.mrc" for i in range(4)]
+        assert list(table.micrograph_counts()) == [50, 50, 50, 50]
+        pd.testing.assert_frame_equal(parser.get_particles(),
+                                      StarFileParser(path).get_particles())
+
+
+class TestSerialTables:
+
+    def test_serial_parsers_build_tables_directly(self, sample_star_file, sample_csv_file):
+        star = StarFileParser(sample_star_file)
+        csv = CSVParticleParser(sample_csv_file)
+
+        assert star._particles_data is None and csv._data is None
+        for parser in (star, csv):
+            table = parser.get_table()
+            assert table.codes is not None
+            assert table.to_pandas()[table.micrograph_column].dtype == object
+
+    def test_box_rows_with_missing_values_are_dropped(self, temp_dir):
+        path = temp_dir / "particles.box"
+        path.write_text("1 2 10 10\n3 x 10 10\n5 6 10 10\n")
+
+        parser = BoxFileParser(path)
+
+        assert parser._data is None
+        assert list(parser.get_table()['x']) == [1.0, 5.0]
+        assert parser.get_table() is parser.get_table()
@@ -0,0 +1,98 @@
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from particle_picker.parsers.mrc import resolve_micrograph, write_mrc
+from particle_picker.visualization.tiles import (
+    TilePyramid, downsample, encode_png, level_count
+)
+
+
+def decode_png(data):
+    width, height = struct.unpack('>II', data[16:24])
+    position, idat = 8, b''
+    while position < len(data):
+        length = struct.unpack('>I', data[position:position + 4])[0]
+        if data[position + 4:position + 8] == b'IDAT':
+            idat += data[position + 8:position + 8 + length]
+        position += length + 12
+    return np.frombuffer(zlib.decompress(idat), dtype=np.uint8).reshape(height, width + 1)[:, 1:]
+
+
+@pytest.fixture
+def micrograph(temp_dir):
+    image = np.random.default_rng(0).normal(0, 1, (600, 1000)).astype(np.float32)
+    path = temp_dir / "mic.mrc"
+    write_mrc(path, image)
+    return path
+
+
+class TestHelpers:
+
+    def test_png_roundtrip(self):
+        pixels = np.arange(30, dtype=np.uint8).reshape(5, 6)
+        assert np.array_equal(decode_png(encode_png(pixels)), pixels)
+
+    def test_downsample_odd_edges(self):
+        block = np.arange(15, dtype=np.float32).reshape(3, 5)
+        result = downsample(block)
+
+        assert result.shape == (2, 3)
+        assert result[0, 0] == pytest.approx(block[:2, :2].mean())
+        assert result[1, 2] == block[2, 4]
+
+    def test_level_count(self):
+        assert level_count(256, 256) == 1
+        assert level_count(1000, 600) == 3
+        assert level_count(11520, 8184) == 7
+
+
+class TestTilePyramid:
+
+    def test_build_and_tiles(self, micrograph, temp_dir):
+        pyramid = TilePyramid(micrograph, temp_dir / "tiles").build()
+
+        assert pyramid.levels == 3
+        assert pyramid.tile_grid(0) == (4, 3)
+        assert pyramid.tile(0, 3, 2).shape == (600 - 512, 1000 - 768)
+        assert pyramid.tile(2, 0, 0).shape == (150, 250)
+        assert pyramid.tile(0, 0, 0).dtype == np.uint8
+        assert 100 < pyramid.tile(1, 0, 0).mean() < 155
+        assert np.array_equal(decode_png(pyramid.tile_png(1, 1, 0)), pyramid.tile(1, 1, 0))
+        with pytest.raises(IndexError):
+            pyramid.tile(0, 4, 0)
+
+    def test_levels_are_averages(self, micrograph, temp_dir):
+        pyramid = TilePyramid(micrograph, temp_dir / "tiles")
+        full = pyramid.tile(0, 0, 0).astype(float)
+        half = pyramid.tile(1, 0, 0).astype(float)
+
+        assert np.abs(half[:128, :128] - downsample(full)).max() <= 1
+
+    def test_cached_on_disk(self, micrograph, temp_dir):
+        TilePyramid(micrograph, temp_dir / "tiles").build()
+
+        pyramid = TilePyramid(micrograph, temp_dir / "tiles")
+        assert pyramid.is_built()
+        assert len(list(pyramid.directory.glob('level*.npy'))) == 3
+
+    def test_visible_tiles(self, micrograph, temp_dir):
+        pyramid = TilePyramid(micrograph, temp_dir / "tiles")
+
+        assert pyramid.visible_tiles((0, 1000), (0, 600), 2) == [(0, 0)]
+        assert pyramid.visible_tiles((300, 520), (-50, 100), 0) == [(1, 0), (2, 0)]
+        assert pyramid.level_for(1000, 900) == 0
+        assert pyramid.level_for(1000, 250) == 2
+
+
+class TestResolveMicrograph:
+
+    def test_searches_project_directory(self, micrograph, temp_dir):
+        job = temp_dir / "Extract" / "job001"
+        job.mkdir(parents=True)
+
+        assert resolve_micrograph("mic.mrc", job / "particles.star") == micrograph
+        assert resolve_micrograph("other.mrc", job / "particles.star") is None
+        assert resolve_micrograph("mic.mrc", "/elsewhere/p.star", root=temp_dir) == micrograph
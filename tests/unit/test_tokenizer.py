@@ -0,0 +1,65 @@
+import subprocess
+import sys
+from pathlib import Path
+from particle_picker.parsers.tokenizer import (
+    count_micrographs, summarize_counts, iter_star_rows, clean_star_column_name
+)
+from particle_picker.parsers.star_parser import StarFileParser
+from particle_picker.analysis.statistics import ParticleStatistics
+
+
+class TestTokenizer:
+
+    def test_clean_star_column_name(self):
+        assert clean_star_column_name('_rlnCoordinateX #1') == 'CoordinateX'
+        assert clean_star_column_name('_customField') == '_customField'
+
+    def test_iter_star_rows(self, sample_star_content):
+        columns = []
+        rows = list(iter_star_rows(sample_star_content.splitlines(), columns))
+
+        assert len(rows) == 4
+        assert columns[:3] == ['CoordinateX', 'CoordinateY', 'MicrographName']
+
+        optics_columns = []
+        optics = list(iter_star_rows(sample_star_content.splitlines(), optics_columns,
+                                     section='data_optics'))
+        assert len(optics) == 1
+        assert optics_columns[0] == 'Voltage'
+
+    def test_count_star_matches_parser(self, sample_star_file):
+        total, counts = count_micrographs(sample_star_file, 'star')
+        particles = StarFileParser(sample_star_file).get_particles()
+
+        assert total == len(particles)
+        assert counts == particles.groupby('MicrographName').size().to_dict()
+
+    def test_summary_matches_statistics(self, sample_star_file):
+        summary = summarize_counts(*count_micrographs(sample_star_file, 'star'))
+        particles = StarFileParser(sample_star_file).get_particles()
+
+        assert summary == ParticleStatistics(particles).get_summary_statistics()
+
+    def test_count_csv(self, sample_csv_file):
+        total, counts = count_micrographs(sample_csv_file, 'csv')
+
+        assert total == 4
+        assert counts == {'micrograph_001.mrc': 2, 'micrograph_002.mrc': 2}
+
+    def test_count_box(self, sample_box_file, temp_dir):
+        assert count_micrographs(sample_box_file, 'box') == (4, {})
+
+        irregular = temp_dir / "irregular.box"
+        irregular.write_text("1 2 100 100 -3\n")
+        assert count_micrographs(irregular, 'box') is None
+
+    def test_missing_file(self, temp_dir):
+        assert count_micrographs(temp_dir / "missing.star", 'star') is None
+
+    def test_cli_import_does_not_load_pandas(self):
+        code = ("import sys, particle_picker.cli.particle_cli as cli; "
+                "cli.parse_arguments(); print('pandas' in sys.modules)")
+        result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                                cwd=Path(__file__).parents[2])
+
+        assert result.stdout.strip() == 'False'